@@ -0,0 +1,283 @@
+"""
+Batch execution mode for large offline runs.
+
+An experiment is run in rounds. In each round every request that has no response yet is collected instead of sent
+(see `config_utils.start_batch_collection`), written to a batch input file and handed to a batch adapter; once the
+batch has completed, its completions are added to the replay responses and the experiment is run again. When a
+round collects nothing, every request was answered from the batches, and a final pass through the unchanged
+experiment code writes the results - so the results JSON has exactly the shape of an online run.
+
+Completed batches are appended to `batch_responses.jsonl` (response log format) in the batch directory, so an
+interrupted sweep resumes from the batches that already finished. A batch that is still pending when the process
+stops is picked up again from `pending_batch.json`.
+
+Adapters (`BATCH_ADAPTERS`, `--batch_mode` in bias_analyzer.py):
+  - "local": a stand-in that sends the batch's requests itself through the normal API client, in the background.
+  - "openai": an OpenAI-compatible Batch API (files + batches endpoints), e.g. for models served by OpenAI.
+"""
+
+import os
+import json
+import time
+import threading
+
+import config_utils
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+LOGPROB_CUSTOM_ID_SUFFIX = "-lp"  # Marks requests made with top_logprobs, whose results are returned as logprob envelopes
+
+
+class BatchAdapter:
+    """
+    Submits a batch of chat completion requests and returns their completions.
+    `submit` receives the collected requests (each with a `custom_id`, the request `body` and the original `call_args`)
+    and the path of the batch input file already written for them, and returns a batch id.
+    `poll` returns "in_progress", "completed" or "failed"; `fetch_results` returns {custom_id: response text or "Error: ..."}.
+    """
+    name = None
+
+    def format_request_line(self, batch_request: dict) -> dict:
+        return {"custom_id": batch_request["custom_id"], "method": "POST", "url": BATCH_ENDPOINT, "body": batch_request["body"]}
+
+    def submit(self, batch_requests: list, input_path: str) -> str:
+        raise NotImplementedError
+
+    def poll(self, batch_id: str) -> str:
+        raise NotImplementedError
+
+    def fetch_results(self, batch_id: str) -> dict:
+        raise NotImplementedError
+
+
+class LocalBatchAdapter(BatchAdapter):
+    """Local stand-in for a batch API: sends the requests through the regular (rate-limited) API client in the background."""
+    name = "local"
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self._batches = {}  # batch id -> {custom_id: future}
+        self._submitted_count = 0
+        self._lock = threading.Lock()
+
+    def submit(self, batch_requests, input_path):
+        executor = config_utils.ContextThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {request["custom_id"]: executor.submit(self._send, request["call_args"]) for request in batch_requests}
+        executor.shutdown(wait=False)
+        with self._lock:
+            self._submitted_count += 1
+            batch_id = f"local-{self._submitted_count}"
+            self._batches[batch_id] = futures
+        return batch_id
+
+    @staticmethod
+    def _send(call_args):
+        with config_utils._api_call_semaphore:
+            return config_utils._call_openrouter_api_live(quiet=True, **call_args)
+
+    def poll(self, batch_id):
+        with self._lock:
+            futures = self._batches.get(batch_id)
+        if futures is None:
+            return "failed"  # Local batches do not outlive the process that submitted them
+        return "completed" if all(future.done() for future in futures.values()) else "in_progress"
+
+    def fetch_results(self, batch_id):
+        with self._lock:
+            futures = self._batches.pop(batch_id, {})
+        results = {}
+        for custom_id, future in futures.items():
+            try:
+                results[custom_id] = future.result()
+            except Exception as exc:
+                results[custom_id] = f"Error: Local batch request failed: {exc}"
+        return results
+
+
+class OpenAIBatchAdapter(BatchAdapter):
+    """
+    OpenAI-compatible Batch API. OpenRouter-only request fields are dropped and the provider prefix is stripped
+    from model names (e.g. "openai/gpt-4o-mini" -> "gpt-4o-mini").
+    """
+    name = "openai"
+
+    def __init__(self, base_url: str | None = None, api_key: str | None = None, completion_window: str = "24h"):
+        self.base_url = (base_url or os.getenv("BATCH_API_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+        self.api_key = api_key or os.getenv("BATCH_API_KEY") or os.getenv("OPENAI_API_KEY")
+        self.completion_window = completion_window
+
+    def _headers(self):
+        if not self.api_key:
+            raise RuntimeError("No batch API key. Set BATCH_API_KEY or OPENAI_API_KEY.")
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def format_request_line(self, batch_request):
+        body = config_utils.strip_openrouter_extensions(batch_request["body"])
+        body["model"] = body["model"].split("/", 1)[-1]
+        return {"custom_id": batch_request["custom_id"], "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+    def submit(self, batch_requests, input_path):
+        import requests
+        with open(input_path, 'rb') as input_file:
+            upload = requests.post(f"{self.base_url}/files", headers=self._headers(), files={"file": input_file}, data={"purpose": "batch"}, timeout=300)
+        upload.raise_for_status()
+        batch = requests.post(
+            f"{self.base_url}/batches", headers=self._headers(), timeout=60,
+            json={"input_file_id": upload.json()["id"], "endpoint": BATCH_ENDPOINT, "completion_window": self.completion_window}
+        )
+        batch.raise_for_status()
+        return batch.json()["id"]
+
+    def _get_batch(self, batch_id):
+        import requests
+        response = requests.get(f"{self.base_url}/batches/{batch_id}", headers=self._headers(), timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def poll(self, batch_id):
+        status = self._get_batch(batch_id).get("status")
+        if status in ("completed", "expired"):  # Expired batches still return the requests that finished
+            return "completed"
+        if status in ("failed", "cancelled", "cancelling"):
+            return "failed"
+        return "in_progress"
+
+    def _read_file_lines(self, file_id):
+        if not file_id:
+            return []
+        import requests
+        response = requests.get(f"{self.base_url}/files/{file_id}/content", headers=self._headers(), timeout=300)
+        response.raise_for_status()
+        return [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+    def fetch_results(self, batch_id):
+        batch = self._get_batch(batch_id)
+        results = {}
+        for line in self._read_file_lines(batch.get("output_file_id")) + self._read_file_lines(batch.get("error_file_id")):
+            response = line.get("response") or {}
+            if line.get("error") or response.get("status_code") != 200:
+                results[line["custom_id"]] = f"Error: Batch request failed: {line.get('error') or response.get('body')}"
+            else:
+                results[line["custom_id"]] = extract_completion_text(response.get("body") or {}, with_logprobs=line["custom_id"].endswith(LOGPROB_CUSTOM_ID_SUFFIX))
+        return results
+
+
+BATCH_ADAPTERS = {
+    "local": LocalBatchAdapter,
+    "openai": OpenAIBatchAdapter,
+}
+
+
+def extract_completion_text(completion: dict, with_logprobs: bool = False) -> str:
+    """
+    The message text of a chat completion body (falling back to 'reasoning', as the live client does).
+    `with_logprobs` returns the logprob envelope the live client returns for requests made with top_logprobs.
+    """
+    choice = (completion.get("choices") or [{}])[0]
+    message = choice.get("message") or {}
+    for field in ("content", "reasoning"):
+        if message.get(field) and message[field].strip():
+            if with_logprobs:
+                return config_utils.format_logprob_response(message[field].strip(), (choice.get("logprobs") or {}).get("content"))
+            return message[field].strip()
+    return "Error: Batch completion was empty in both 'content' and 'reasoning' fields."
+
+
+def _write_jsonl(path, records):
+    with open(path, 'w') as jsonl_file:
+        for record in records:
+            jsonl_file.write(json.dumps(record) + "\n")
+
+
+def _ingest_batch_results(adapter, batch_id, batch_index, responses_path):
+    """Adds a completed batch's responses for replay; successful ones are also appended to `responses_path`."""
+    results = adapter.fetch_results(batch_id)
+    entries = []
+    for indexed_request in batch_index:
+        response = results.get(indexed_request["custom_id"], "Error: Batch returned no result for this request.")
+        entries.append({"key": indexed_request["key"], "model": indexed_request["model"], "temperature": indexed_request["temperature"], "response": response})
+    # Failed requests are replayed as errors in this process (like an online run) but not persisted, so a resumed sweep retries them.
+    config_utils.add_replay_responses(entries)
+    successes = [entry for entry in entries if not entry["response"].startswith("Error")]
+    with open(responses_path, 'a') as responses_file:
+        for entry in successes:
+            responses_file.write(json.dumps(entry) + "\n")
+    return len(successes), len(entries) - len(successes)
+
+
+def _wait_for_batch(adapter, batch_id, poll_seconds):
+    started_at = time.monotonic()
+    while True:
+        status = adapter.poll(batch_id)
+        if status != "in_progress":
+            return status
+        print(f"  Batch {batch_id} in progress ({time.monotonic() - started_at:.0f}s elapsed), next check in {poll_seconds}s...")
+        time.sleep(poll_seconds)
+
+
+def run_in_batch_mode(run_experiment, adapter: BatchAdapter, batch_dir: str, poll_seconds: float = 60, max_rounds: int = 10):
+    """
+    Runs `run_experiment(final)` in batch rounds (see module docstring) and returns the result of the final pass,
+    the only one called with final=True. The experiment must build the same prompts on every call (seeded).
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    responses_path = os.path.join(batch_dir, "batch_responses.jsonl")
+    pending_path = os.path.join(batch_dir, "pending_batch.json")
+    if os.path.exists(responses_path):
+        print(f"Batch mode: {config_utils.load_response_logs([responses_path])} response(s) loaded from earlier batches in {responses_path}.")
+
+    if os.path.exists(pending_path):
+        with open(pending_path, 'r') as pending_file:
+            pending = json.load(pending_file)
+        if pending.get("adapter") == adapter.name:
+            print(f"Batch mode: resuming pending batch {pending['batch_id']}.")
+            status = _wait_for_batch(adapter, pending["batch_id"], poll_seconds)
+            if status == "completed":
+                succeeded, failed = _ingest_batch_results(adapter, pending["batch_id"], pending["index"], responses_path)
+                print(f"Batch mode: batch {pending['batch_id']} returned {succeeded} response(s), {failed} error(s).")
+            else:
+                print(f"Warning: Pending batch {pending['batch_id']} {status}; its requests will be collected again.")
+        os.remove(pending_path)
+
+    for round_number in range(1, max_rounds + 1):
+        config_utils.reset_replay_positions()
+        config_utils.start_batch_collection()
+        try:
+            run_experiment(False)
+        finally:
+            collected = config_utils.stop_batch_collection()
+        if not collected:
+            break
+
+        batch_requests = [
+            {**request, "custom_id": f"r{round_number}-{index}" + (LOGPROB_CUSTOM_ID_SUFFIX if request["call_args"].get("top_logprobs") else ""),
+             "body": config_utils.build_chat_request(**{**request["call_args"], "actual_model_name": config_utils.resolve_backend(request["model"])[2]})}
+            for index, request in enumerate(collected)
+        ]
+        input_path = os.path.join(batch_dir, f"round_{round_number}_input.jsonl")
+        _write_jsonl(input_path, [adapter.format_request_line(request) for request in batch_requests])
+        batch_index = [{key: request[key] for key in ("custom_id", "key", "model", "temperature")} for request in batch_requests]
+
+        batch_id = adapter.submit(batch_requests, input_path)
+        with open(pending_path, 'w') as pending_file:
+            json.dump({"adapter": adapter.name, "batch_id": batch_id, "input_path": input_path, "index": batch_index}, pending_file)
+        print(f"Batch mode round {round_number}: submitted {len(batch_requests)} request(s) as batch {batch_id} ({input_path}).")
+
+        status = _wait_for_batch(adapter, batch_id, poll_seconds)
+        if status != "completed":
+            os.remove(pending_path)
+            raise RuntimeError(f"Batch {batch_id} {status}. Re-run to collect and submit its requests again.")
+        succeeded, failed = _ingest_batch_results(adapter, batch_id, batch_index, responses_path)
+        os.remove(pending_path)
+        print(f"Batch mode round {round_number}: {succeeded} response(s), {failed} error(s).")
+    else:
+        print(f"Warning: Batch mode stopped after {max_rounds} rounds with requests still outstanding; they are reported as errors.")
+
+    # Final pass: every request is answered from the batches; anything still missing comes back as a deferred error, never live.
+    config_utils.reset_replay_positions()
+    config_utils.start_batch_collection()
+    try:
+        return run_experiment(True)
+    finally:
+        still_missing = config_utils.stop_batch_collection()
+        if still_missing:
+            print(f"Warning: {len(still_missing)} request(s) had no batch response in the final pass.")
@@ -1,22 +1,36 @@
 import os
 import re
-from dotenv import load_dotenv
+import sys
+import glob
+import random
 import argparse
+import importlib
+import subprocess
+import concurrent.futures
 import json
-from tqdm import tqdm
+import types
 import datetime
 import hashlib
 
-# Import experiment runners
-from experiment_runners.picking_experiments import run_positional_bias_picking_experiment
-from experiment_runners.scoring_experiments import run_scoring_experiment
-from experiment_runners.pairwise_elo_experiment import run_pairwise_elo_experiment
-from experiment_runners.multi_criteria_scoring_experiment import run_multi_criteria_experiment
-from experiment_runners.advanced_multi_criteria_experiment import run_permuted_order_multi_criteria_experiment, run_isolated_criterion_scoring_experiment
-from experiment_runners.classification_experiment import run_classification_experiment
+from experiment_options import CRITERIA_ORDER_DESIGNS, STRUCTURED_OUTPUT_MODES
 
 # Import shared config and functions
 from config_utils import set_api_key, set_llm_model, BIAS_SUITE_LLM_MODEL as config_llm_model, call_openrouter_api
+from config_utils import set_shard, set_response_log, load_response_logs, get_response_log_stats, set_max_concurrent_api_calls
+from config_utils import usage_scope, get_usage_report, ContextThreadPoolExecutor, experiment_rng_scope
+from config_utils import set_circuit_breaker, set_failover_models, get_circuit_breaker_report
+from config_utils import set_hedging, get_hedging_report
+from config_utils import BUDGET_LEVELS, BUDGET_KINDS, set_budget, set_budget_prices, get_budget_report, run_budget_exhausted
+from config_utils import load_backends_config, resolve_backend
+from prompt_templates import set_cache_optimised_layout
+from item_store import load_dataset
+from judgment_store import set_judgment_store_path, get_judgment_store
+from batch_runner import BATCH_ADAPTERS, run_in_batch_mode
+from judge_cascade import JudgeCascade, DEFAULT_MIN_AGREEMENT, DEFAULT_MIN_CONFIDENCE
+from task_scheduler import TASK_ORDERS, set_task_order, set_latency_model
+from run_planner import collect_planned_requests, load_usage_history, load_price_table, build_plan, plan_totals, format_plan_row
+from data_fingerprints import dataset_names_for_results_type, get_data_payload_hash, get_data_fingerprints, diff_fingerprints
+from data_fingerprints import find_latest_manifest_record, format_data_changes, RESULTS_MANIFEST_FILENAME
 
 # Import test data for dynamic loading
 from test_data import (
@@ -29,6 +43,26 @@ from test_data import (
     PROMPT_VARIANT_STRATEGIES
 )
 
+# Experiment runners are imported on demand, only for the experiment being run: numpy, tqdm and the runner
+# modules make up most of the CLI's startup time, and --help needs none of them.
+EXPERIMENT_RUNNERS = {
+    "picking": [("picking_experiments", "run_positional_bias_picking_experiment")],
+    "scoring": [("scoring_experiments", "run_scoring_experiment")],
+    "pairwise_elo": [("pairwise_elo_experiment", "run_pairwise_elo_experiment")],
+    "multi_criteria": [("multi_criteria_scoring_experiment", "run_multi_criteria_experiment")],
+    "adv_multi_criteria_permuted": [("advanced_multi_criteria_experiment", "run_permuted_order_multi_criteria_experiment")],
+    "adv_multi_criteria_isolated": [("advanced_multi_criteria_experiment", "run_isolated_criterion_scoring_experiment")],
+    "classification": [("classification_experiment", "run_classification_experiment")],
+}
+EXPERIMENT_RUNNERS["all"] = [runner for runners in EXPERIMENT_RUNNERS.values() for runner in runners]
+
+def import_experiment_runners(experiment):
+    """Imports the runner functions `experiment` needs and returns them as attributes of a namespace."""
+    return types.SimpleNamespace(**{
+        function_name: getattr(importlib.import_module(f"experiment_runners.{module_name}"), function_name)
+        for module_name, function_name in EXPERIMENT_RUNNERS[experiment]
+    })
+
 # --- Configuration (now minimal, mostly handled in config_utils) ---
 # SAMPLE_POEM and SCORING_CRITERION would move if run_poem_scoring_experiment moves
 
@@ -41,80 +75,127 @@ from test_data import (
 def generate_data_payload_hash(experiment_args):
     """
     Generates a hash for the data payloads relevant to the current experiment.
+    Dataset payloads are hashed once per process (see data_fingerprints.py), not once per model.
     """
-    payloads_to_hash = []
     exp_type = experiment_args.experiment
     task_type = experiment_args.task # For multi_criteria and adv_multi_criteria
-    scoring_type = experiment_args.scoring_type # For scoring
-
-    # Dynamically import from test_data to avoid loading everything always
-    # and to ensure the most current data is used for hashing.
-    from test_data import (
-        PICKING_PAIRS, POEMS_FOR_SCORING, TEXTS_FOR_SENTIMENT_SCORING,
-        TEXTS_FOR_CRITERION_ADHERENCE_SCORING, FEW_SHOT_EXAMPLE_SETS_SCORING,
-        RANKING_SETS, SHORT_ARGUMENTS_FOR_SCORING, ARGUMENT_EVALUATION_RUBRIC,
-        STORY_OPENINGS_FOR_SCORING, STORY_OPENING_EVALUATION_RUBRIC,
-        CLASSIFICATION_ITEMS, CLASSIFICATION_CATEGORIES, PROMPT_VARIANT_STRATEGIES
-    )
-
-    if exp_type == "picking":
-        payloads_to_hash.append(PICKING_PAIRS)
-    elif exp_type == "scoring":
-        if scoring_type == "poems" or scoring_type == "all":
-            payloads_to_hash.append(POEMS_FOR_SCORING)
-        if scoring_type == "sentiment" or scoring_type == "all":
-            payloads_to_hash.append(TEXTS_FOR_SENTIMENT_SCORING)
-        if scoring_type == "criterion_adherence" or scoring_type == "all":
-            payloads_to_hash.append(TEXTS_FOR_CRITERION_ADHERENCE_SCORING)
-        payloads_to_hash.append(FEW_SHOT_EXAMPLE_SETS_SCORING) # Hash all few-shot sets
-    elif exp_type == "pairwise_elo":
-        payloads_to_hash.append(RANKING_SETS)
-    elif exp_type == "multi_criteria" or exp_type.startswith("adv_multi_criteria"):
-        if task_type == "argument":
-            payloads_to_hash.append(SHORT_ARGUMENTS_FOR_SCORING)
-            payloads_to_hash.append(ARGUMENT_EVALUATION_RUBRIC)
-        elif task_type == "story_opening":
-            payloads_to_hash.append(STORY_OPENINGS_FOR_SCORING)
-            payloads_to_hash.append(STORY_OPENING_EVALUATION_RUBRIC)
-    elif exp_type == "classification":
-        payloads_to_hash.append(CLASSIFICATION_ITEMS)
-        payloads_to_hash.append(CLASSIFICATION_CATEGORIES)
-        payloads_to_hash.append(PROMPT_VARIANT_STRATEGIES)
-    elif exp_type == "all": # If 'all', hash all known major data structures
-        payloads_to_hash.extend([
-            PICKING_PAIRS, POEMS_FOR_SCORING, TEXTS_FOR_SENTIMENT_SCORING,
-            TEXTS_FOR_CRITERION_ADHERENCE_SCORING, FEW_SHOT_EXAMPLE_SETS_SCORING,
-            RANKING_SETS, SHORT_ARGUMENTS_FOR_SCORING, ARGUMENT_EVALUATION_RUBRIC,
-            STORY_OPENINGS_FOR_SCORING, STORY_OPENING_EVALUATION_RUBRIC,
-            CLASSIFICATION_ITEMS, CLASSIFICATION_CATEGORIES, PROMPT_VARIANT_STRATEGIES
-        ])
-
-
-    if not payloads_to_hash:
-        # This case should ideally not be hit if args.experiment is valid
-        # and not 'all' without specific sub-experiment logic in main.
-        # If args.experiment is a specific type, and this is hit, it implies a logic error above.
+    results_type = f"{exp_type}_{task_type}" if exp_type == "multi_criteria" or exp_type.startswith("adv_multi_criteria") else exp_type
+    dataset_names = dataset_names_for_results_type(results_type, experiment_args.scoring_type)
+
+    if not dataset_names:
+        # This case should ideally not be hit if args.experiment is valid.
         print(f"Warning: No data payloads identified for hashing for experiment type '{exp_type}'. Defaulting to 'nohash'.")
         return "nohash"
 
     try:
-        # Serialize to a consistent, compact JSON string
-        serialized_payloads = json.dumps(payloads_to_hash, sort_keys=True, separators=(',', ':'))
-        hasher = hashlib.sha256()
-        hasher.update(serialized_payloads.encode('utf-8'))
-        return hasher.hexdigest()[:8] # e.g., first 8 characters
+        return get_data_payload_hash(dataset_names, experiment_args.item_store_dir)
     except TypeError as e:
         # This could happen if some data structure isn't JSON serializable,
         # which shouldn't be the case for the current test_data.py contents.
         print(f"Error serializing payload for hashing (experiment: {exp_type}): {e}. Payloads might contain non-serializable objects.")
         return "hash_err"
 
-def main():
+def run_experiment_dag(nodes, max_concurrent_experiments=1, before_node_start=None, on_node_complete=None, usage_scope_prefix="", rng_seed_prefix=None):
+    """
+    Runs experiment nodes ({'slug', 'description', 'depends_on', 'run'}) as soon as all of their dependencies have finished,
+    at most `max_concurrent_experiments` at a time. Ready nodes start in list order.
+    `run` is called with {dependency_slug: results}; a node that raises is reported and hands None to its dependents.
+    API usage of each node is reported under the usage scope `usage_scope_prefix + slug`. With `rng_seed_prefix`, each node
+    draws its random choices from its own generator seeded with "<rng_seed_prefix>:<description>" (see
+    config_utils.experiment_rng), so concurrent nodes stay reproducible.
+    Returns {slug: results}.
+    """
+    slugs = [node["slug"] for node in nodes]
+    if len(set(slugs)) != len(slugs):
+        raise ValueError(f"Duplicate experiment slugs in DAG: {slugs}")
+    # Reject unknown dependencies and cycles up front rather than waiting forever on them.
+    resolved = set()
+    unresolved = list(nodes)
+    while unresolved:
+        ready = [node for node in unresolved if all(dep in resolved for dep in node["depends_on"])]
+        if not ready:
+            raise ValueError(f"Experiment DAG has unknown or cyclic dependencies: {[node['slug'] for node in unresolved]}")
+        resolved.update(node["slug"] for node in ready)
+        unresolved = [node for node in unresolved if node not in ready]
+
+    results = {}
+    pending = list(nodes)
+    running = {}
+    def run_node(node, dependency_results):
+        node_rng_seed = f"{rng_seed_prefix}:{node['description']}" if rng_seed_prefix is not None else None
+        with usage_scope(usage_scope_prefix + node["slug"]), experiment_rng_scope(node_rng_seed):
+            return node["run"](dependency_results)
+
+    with ContextThreadPoolExecutor(max_workers=max(1, max_concurrent_experiments)) as executor:
+        while pending or running:
+            for node in [node for node in pending if all(dep in results for dep in node["depends_on"])]:
+                if len(running) >= max(1, max_concurrent_experiments):
+                    break
+                pending.remove(node)
+                if before_node_start: before_node_start(node)
+                dependency_results = {dep: results[dep] for dep in node["depends_on"]}
+                running[executor.submit(run_node, node, dependency_results)] = node
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    results[node["slug"]] = future.result()
+                except Exception as exc:
+                    print(f"Error: Experiment '{node['description']}' failed: {exc}")
+                    results[node["slug"]] = None
+                    continue
+                if on_node_complete: on_node_complete(node, results[node["slug"]])
+    return results
+
+def parse_shard_spec(shard_spec):
+    """Parses '--shard i/N' into (i, N) with 0 <= i < N."""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", shard_spec)
+    if not match or int(match.group(2)) < 1 or int(match.group(1)) >= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"Invalid shard '{shard_spec}'. Expected 'i/N' with 0 <= i < N, e.g. '0/4'.")
+    return int(match.group(1)), int(match.group(2))
+
+def run_local_shards(shard_count, shard_log_dir, seed):
+    """
+    Runs this same command as `shard_count` local worker processes (one per shard) and waits for them.
+    Returns the response log paths written by the shards, to be merged by the calling process.
+    """
+    # Drop the launcher-only flags; everything else (experiment, models, repetitions, ...) is passed through unchanged.
+    passthrough_args = []
+    skip_next = False
+    for arg in sys.argv[1:]:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg in ("--local_shards", "--shard", "--response_log", "--merge_shards", "--seed"):
+            skip_next = True
+            continue
+        if arg.split("=", 1)[0] in ("--local_shards", "--shard", "--response_log", "--merge_shards", "--seed"):
+            continue
+        passthrough_args.append(arg)
+
+    shard_log_paths = []
+    workers = []
+    for shard_index in range(shard_count):
+        log_path = os.path.join(shard_log_dir, f"shard_{shard_index}_of_{shard_count}.responses.jsonl")
+        shard_log_paths.append(log_path)
+        command = [sys.executable, os.path.abspath(__file__)] + passthrough_args + [
+            "--shard", f"{shard_index}/{shard_count}", "--response_log", log_path, "--seed", str(seed)
+        ]
+        print(f"Launching shard {shard_index}/{shard_count}: logging responses to {log_path}")
+        workers.append(subprocess.Popen(command))
+
+    failed_shards = [i for i, worker in enumerate(workers) if worker.wait() != 0]
+    if failed_shards:
+        print(f"Warning: Shard process(es) {failed_shards} exited with an error. Their missing responses will show up as errors in the merged results.")
+    return shard_log_paths
+
+def build_arg_parser():
     parser = argparse.ArgumentParser(description="Run LLM bias experiments.")
     parser.add_argument(
         "experiment",
         type=str,
-        choices=["picking", "scoring", "pairwise_elo", "multi_criteria", "adv_multi_criteria_permuted", "adv_multi_criteria_isolated", "classification", "all"],
+        choices=list(EXPERIMENT_RUNNERS),
         help="Which experiment to run"
     )
     parser.add_argument(
@@ -152,12 +233,51 @@ def main():
         choices=["argument", "story_opening"],
         help="Task type for multi-criteria experiments."
     )
+    parser.add_argument(
+        "--criteria_order_design",
+        type=str,
+        default="original_reversed",
+        choices=CRITERIA_ORDER_DESIGNS,
+        help="Criteria orders for the permuted-order experiment: original + reversed, a cyclic Latin square, or a Williams design (also balances which criterion precedes which)."
+    )
+    parser.add_argument(
+        "--structured_output",
+        type=str,
+        default="prompt",
+        choices=STRUCTURED_OUTPUT_MODES,
+        help="How multi-criteria experiments request their JSON scores: prompt instructions only, provider JSON mode, or a provider-enforced JSON schema built from the rubric's criteria. Structured modes also parse with a tolerant JSON extractor."
+    )
     parser.add_argument(
         "--repetitions",
         type=int,
         default=1,
         help="Number of repetitions for each LLM call."
     )
+    parser.add_argument(
+        "--logprobs",
+        type=int,
+        default=None,
+        metavar="K",
+        help="Logprob judging for picking, classification and scoring (1-5, 1-10, letter and creative-label scales): one call per judgment requesting the top-K token logprobs, whose answer distribution fills the --repetitions results (majority pick, consistency, expected score). Backends without logprobs fall back to the parsed answer; other experiments and scales keep making --repetitions calls. Typical K: 5-20."
+    )
+    parser.add_argument(
+        "--cascade_model",
+        type=str,
+        default=None,
+        help="Judge cascade for picking, scoring and classification: judge every pair / item-variant with this cheap model first and re-judge it with the configured model only when the item is flagged ambiguous (ambiguity_score, is_control_item), the cheap repetitions disagree, or (with --logprobs) its answer probability is low. Per-tier judgments, calls and cheap/expensive agreement are reported and appended to <output_dir>/cascade_report.jsonl."
+    )
+    parser.add_argument(
+        "--cascade_min_agreement",
+        type=float,
+        default=DEFAULT_MIN_AGREEMENT,
+        help=f"Share of the cheap model's repetitions that must give the majority answer for it to stand (default: {DEFAULT_MIN_AGREEMENT}, unanimous)."
+    )
+    parser.add_argument(
+        "--cascade_min_confidence",
+        type=float,
+        default=DEFAULT_MIN_CONFIDENCE,
+        help=f"With --logprobs, the probability the cheap model's most likely answer needs for it to stand (default: {DEFAULT_MIN_CONFIDENCE})."
+    )
     parser.add_argument(
         "--output_dir",
         type=str,
@@ -188,7 +308,235 @@ def main():
         default=0.1, # Default temperature
         help="Temperature for LLM calls. Default is 0.1. This will be used for API calls and reflected in the output filename."
     )
+    parser.add_argument(
+        "--item_store_dir",
+        type=str,
+        default=None,
+        help="Directory of memory-mapped item stores (built with 'python item_store.py build'). Datasets found there are read on demand instead of from test_data.py."
+    )
+    parser.add_argument(
+        "--judgment_store",
+        type=str,
+        default=None,
+        help="JSONL file persisting holistic multi-criteria judgments, so later runs (e.g. the isolated-criterion experiment) reuse them instead of re-querying."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for sampling, label generation and match ordering, so the task matrix is identical across runs. Required to be the same on every shard."
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard_spec,
+        default=None,
+        help="Run only shard i of N (e.g. '0/4'). Only the LLM requests assigned to this shard are sent; responses are written to --response_log and no results JSON is written."
+    )
+    parser.add_argument(
+        "--response_log",
+        type=str,
+        default=None,
+        help="JSONL file recording every LLM response. Existing entries are replayed, so an interrupted run can be resumed."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-run incrementally against earlier --incremental runs in --output_dir: requests whose prompt is unchanged (same item, variant, template, model and temperature) reuse the recorded response, only new or changed ones are sent, and complete results files are written. Responses are kept in <output_dir>/response_logs/incremental.responses.jsonl unless --response_log is given."
+    )
+    parser.add_argument(
+        "--merge_shards",
+        type=str,
+        default=None,
+        help="Comma-separated shard response logs (globs allowed) to merge. Runs the experiment from the recorded responses only and writes the final results JSON."
+    )
+    parser.add_argument(
+        "--local_shards",
+        type=int,
+        default=None,
+        help="Run the experiment as N local shard processes, then merge them in this process."
+    )
+    parser.add_argument(
+        "--max_concurrent_experiments",
+        type=int,
+        default=3,
+        help="In 'all' mode, how many independent experiments run at once. Seeded runs stay reproducible: each experiment draws from its own seeded generator."
+    )
+    parser.add_argument(
+        "--max_concurrent_api_calls",
+        type=int,
+        default=16,
+        help="Global cap on in-flight API calls across all experiments running concurrently."
+    )
+    parser.add_argument(
+        "--cache_optimised_prompts",
+        action="store_true",
+        help="Send each prompt's static text (instructions, rubric, examples) as a cacheable system message and only the item text as the user message, so providers can reuse their prompt cache. Changes the prompts, so results are not directly comparable with the default layout."
+    )
+    parser.add_argument(
+        "--batch_mode",
+        type=str,
+        default=None,
+        choices=list(BATCH_ADAPTERS),
+        help="Run the experiment's requests as provider batches instead of online calls: 'local' sends them through the normal client in the background, 'openai' uses an OpenAI-compatible Batch API (BATCH_API_BASE_URL, BATCH_API_KEY/OPENAI_API_KEY). Results have the same shape as an online run."
+    )
+    parser.add_argument(
+        "--batch_dir",
+        type=str,
+        default=None,
+        help="Directory for batch input files and completed batch responses (default: <output_dir>/batches). Re-running with the same directory resumes."
+    )
+    parser.add_argument(
+        "--batch_poll_seconds",
+        type=float,
+        default=60,
+        help="Seconds between batch status checks in --batch_mode."
+    )
+    parser.add_argument(
+        "--backends_config",
+        type=str,
+        default=None,
+        help="JSON file registering OpenAI-compatible backends (url, api_key_env, headers, max_concurrent_calls, timeout) and model-name patterns served by them. A model can also name its backend directly, e.g. --models 'openai/gpt-4o-mini,llama-3-8b-instruct@lan'."
+    )
+    parser.add_argument(
+        "--circuit_breaker_threshold",
+        type=float,
+        default=0.5,
+        help="Error rate over a model's recent calls at which its circuit breaker trips and further calls fail fast (0 disables the breakers)."
+    )
+    parser.add_argument(
+        "--circuit_breaker_cooldown",
+        type=float,
+        default=60,
+        help="Seconds a tripped circuit breaker stays open before a single probe call is let through."
+    )
+    parser.add_argument(
+        "--failover",
+        action="append",
+        default=[],
+        metavar="MODEL=EQUIVALENT[,EQUIVALENT...]",
+        help="While MODEL's circuit breaker is open, route its calls to the equivalent model(s)/endpoints instead of failing fast. Repeatable."
+    )
+    parser.add_argument(
+        "--task_order",
+        type=str,
+        choices=TASK_ORDERS,
+        default="longest_first",
+        help="Order in which each experiment dispatches its tasks: 'longest_first' (default) starts the tasks with the longest expected duration (from the latency model, prompt length and repetitions) first to shorten the run's tail; 'submission' keeps dataset order."
+    )
+    parser.add_argument(
+        "--latency_model",
+        type=str,
+        default=None,
+        help="JSONL file of live-call latencies per model and experiment variant, used to estimate task durations for --task_order longest_first and extended with this run's calls (default: <output_dir>/latency_model.jsonl; in-memory without --output_dir)."
+    )
+    parser.add_argument(
+        "--hedge_requests",
+        action="store_true",
+        help="Send a duplicate of any live call still running after the model's observed --hedge_percentile latency; the first successful response wins."
+    )
+    parser.add_argument(
+        "--hedge_percentile",
+        type=float,
+        default=95,
+        help="Latency percentile (of the model's recent successful calls) after which a call is hedged."
+    )
+    parser.add_argument(
+        "--hedge_max_extra",
+        type=float,
+        default=0.05,
+        help="Cap on duplicate requests as a fraction of each model's live calls (bounds the extra spend of --hedge_requests)."
+    )
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="LEVEL:KIND=LIMIT",
+        help=f"Hard budget enforced by the API client, LEVEL one of {BUDGET_LEVELS} (experiment: one experiment of one model) and KIND one of {BUDGET_KINDS} (cost in USD as reported by the provider), e.g. run:calls=5000 or model:cost=2.5. Calls that would exceed it are not sent; the run stops cleanly with partial results that a re-run resumes from the response log without charging them again (default: <output_dir>/response_logs/budgeted.responses.jsonl). Repeatable."
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: enumerate the run's requests without calling any API and print calls, estimated tokens, cost and wall time per experiment and model (history from <output_dir>/usage_report.jsonl and the latency model)."
+    )
+    parser.add_argument(
+        "--price_table",
+        type=str,
+        default=None,
+        help="JSON file of model prices for --plan: {model: {\"prompt\": USD per 1M tokens, \"completion\": USD per 1M tokens}}. Unlisted models are priced from their usage history. Also used to reserve --budget cost limits before a model's first call has settled."
+    )
+    return parser
+
+def main():
+    parser = build_arg_parser()
     args = parser.parse_args()
+    from dotenv import load_dotenv
+    from tqdm import tqdm
+    runners = import_experiment_runners(args.experiment)
+
+    if args.batch_mode and (args.local_shards or args.merge_shards):
+        parser.error("--batch_mode cannot be combined with --local_shards or --merge_shards.")
+    if args.incremental and (args.shard or args.local_shards or args.merge_shards or args.batch_mode):
+        parser.error("--incremental cannot be combined with sharding or --batch_mode.")
+    if args.incremental and not args.output_dir:
+        parser.error("--incremental needs --output_dir (its earlier responses are kept there).")
+    if args.cascade_model and (args.shard or args.local_shards or args.merge_shards):
+        parser.error("--cascade_model cannot be combined with sharding: a unit's cheap-tier calls span shards, so no shard can decide its escalation.")
+    if args.budget and args.batch_mode:
+        parser.error("--budget cannot be combined with --batch_mode (batch requests do not go through the budgeted client).")
+    if args.plan and (args.shard or args.local_shards or args.merge_shards or args.batch_mode):
+        parser.error("--plan cannot be combined with sharding or --batch_mode.")
+    if args.logprobs is not None and args.logprobs < 1:
+        parser.error("--logprobs needs K >= 1 (the number of top tokens to request per position).")
+    if not 0 < args.cascade_min_agreement <= 1 or not 0 < args.cascade_min_confidence <= 1:
+        parser.error("--cascade_min_agreement and --cascade_min_confidence must be in (0, 1].")
+    if not 0 < args.hedge_percentile < 100 or not 0 <= args.hedge_max_extra <= 1:
+        parser.error("--hedge_percentile must be in (0, 100) and --hedge_max_extra in [0, 1].")
+
+    set_max_concurrent_api_calls(args.max_concurrent_api_calls)
+    if args.backends_config:
+        load_backends_config(args.backends_config)
+    set_circuit_breaker(error_rate_threshold=args.circuit_breaker_threshold, cooldown_seconds=args.circuit_breaker_cooldown)
+    failover_models = {}
+    for failover_spec in args.failover:
+        primary_model, _, equivalent_models = failover_spec.partition("=")
+        if not primary_model.strip() or not equivalent_models.strip():
+            parser.error(f"Invalid --failover '{failover_spec}'. Expected MODEL=EQUIVALENT[,EQUIVALENT...].")
+        failover_models[primary_model.strip()] = [m.strip() for m in equivalent_models.split(",") if m.strip()]
+    set_failover_models(failover_models)
+    set_hedging(enabled=args.hedge_requests, percentile=args.hedge_percentile, max_extra_fraction=args.hedge_max_extra)
+    for budget_spec in args.budget:
+        budget_name, _, budget_limit = budget_spec.partition("=")
+        budget_level, _, budget_kind = budget_name.strip().partition(":")
+        try:
+            set_budget(budget_level, budget_kind, float(budget_limit))
+        except ValueError:
+            parser.error(f"Invalid --budget '{budget_spec}'. Expected LEVEL:KIND=LIMIT with LEVEL in {BUDGET_LEVELS} and KIND in {BUDGET_KINDS}.")
+    if args.budget:
+        set_budget_prices(load_price_table(args.price_table))
+    set_cache_optimised_layout(args.cache_optimised_prompts)
+    if args.judgment_store:
+        set_judgment_store_path(args.judgment_store)
+    set_task_order(args.task_order)
+    latency_model = set_latency_model(args.latency_model or (os.path.join(args.output_dir, "latency_model.jsonl") if args.output_dir else None))
+
+    if (args.shard or args.local_shards) and args.seed is None:
+        args.seed = 0
+        print("Sharding requires a fixed task matrix; using --seed 0.")
+    if args.incremental:
+        if args.seed is None:
+            args.seed = 0
+            print("Incremental runs only reuse responses for identical prompts, which needs a fixed task matrix; using --seed 0.")
+        if not args.response_log:
+            args.response_log = os.path.join(args.output_dir, "response_logs", "incremental.responses.jsonl")
+    if args.budget and not args.plan and not (args.shard or args.local_shards or args.merge_shards):
+        if args.seed is None:
+            args.seed = 0
+            print("Budgeted runs are resumed by replaying earlier responses, which needs a fixed task matrix; using --seed 0.")
+        if not args.response_log:
+            args.response_log = os.path.join(args.output_dir or ".", "response_logs", "budgeted.responses.jsonl")
+    if args.batch_mode and args.seed is None:
+        args.seed = 0
+        print("Batch mode re-runs the experiment once per batch round and needs identical prompts each time; using --seed 0.")
 
     load_dotenv() 
     
@@ -208,27 +556,99 @@ def main():
             models_to_run = [config_llm_model] # Default from config_utils
             print(f"Using hardcoded default model: {config_llm_model}")
 
-    if not os.getenv('OPENROUTER_API_KEY'):
-        print("CRITICAL: OPENROUTER_API_KEY is not set.")
-        return
+    if args.local_shards:
+        shard_log_dir = os.path.join(args.output_dir or ".", "shard_logs")
+        args.merge_shards = ",".join(run_local_shards(args.local_shards, shard_log_dir, args.seed))
+
+    if args.merge_shards:
+        shard_log_paths = []
+        for pattern in [p.strip() for p in args.merge_shards.split(",") if p.strip()]:
+            shard_log_paths.extend(sorted(glob.glob(pattern)) or [pattern])
+        missing_logs = [p for p in shard_log_paths if not os.path.exists(p)]
+        if missing_logs:
+            print(f"CRITICAL: Shard response log(s) not found: {missing_logs}")
+            return
+        loaded_count = load_response_logs(shard_log_paths, replay_only=True)
+        print(f"Merging {len(shard_log_paths)} shard log(s) ({loaded_count} recorded responses).")
+    else:
+        uses_openrouter = any(resolve_backend(model)[0] == "openrouter" for model in models_to_run)
+        if not os.getenv('OPENROUTER_API_KEY') and uses_openrouter and args.batch_mode != "openai" and not args.plan:
+            print("CRITICAL: OPENROUTER_API_KEY is not set.")
+            return
+        if args.shard:
+            set_shard(*args.shard)
+            if not args.response_log:
+                args.response_log = os.path.join(args.output_dir or ".", "shard_logs", f"shard_{args.shard[0]}_of_{args.shard[1]}.responses.jsonl")
+            print(f"Running shard {args.shard[0]}/{args.shard[1]}; responses are logged to {args.response_log}")
+        if args.response_log:
+            set_response_log(args.response_log)
 
     print(f"Models to run: {models_to_run}")
     quiet = not args.raw
 
-    def write_results_to_json(filepath_with_ext, data_object, model_name_for_context=None): # model_name_for_context is optional
+    def record_data_fingerprints(results_path, results_type, model_name):
+        # Appends the fingerprints of the datasets behind a results file to the output directory's manifest,
+        # with the items that changed since the previous results of this type for this model.
+        dataset_names = dataset_names_for_results_type(results_type, args.scoring_type)
+        if not dataset_names:
+            return
+        fingerprints = get_data_fingerprints(dataset_names, args.item_store_dir)
+        manifest_path = os.path.join(os.path.dirname(results_path), RESULTS_MANIFEST_FILENAME)
+        previous_record = find_latest_manifest_record(manifest_path, results_type, model_name)
+        changes = diff_fingerprints(previous_record["datasets"], fingerprints) if previous_record else None
+        if previous_record:
+            print(f"Data changes since {previous_record['results_file']}: {format_data_changes(changes)}")
+        manifest_record = {
+            "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+            "results_file": os.path.basename(results_path),
+            "results_type": results_type,
+            "model": model_name,
+            "data_hash": get_data_payload_hash(dataset_names, args.item_store_dir),
+            "datasets": fingerprints,
+            "previous_results_file": previous_record["results_file"] if previous_record else None,
+            "changes_since_previous": changes,
+            "incremental": args.incremental,
+        }
+        with open(manifest_path, 'a') as manifest_file:
+            manifest_file.write(json.dumps(manifest_record) + "\n")
+
+    def write_results_to_json(filepath_with_ext, data_object, model_name_for_context=None, results_type=None): # model_name_for_context is optional
         if not data_object:
             print(f"No data to write for {filepath_with_ext}")
             return
+        if args.shard:
+            # A shard only holds part of the responses; its results are produced by --merge_shards.
+            print(f"Shard run: not writing partial results to {filepath_with_ext}")
+            return
         
         os.makedirs(os.path.dirname(filepath_with_ext), exist_ok=True)
 
         with open(filepath_with_ext, 'w') as output_file:
             json.dump(data_object, output_file, indent=2, default=str)
         print(f"Results saved to {filepath_with_ext}")
+        if results_type and model_name_for_context:
+            record_data_fingerprints(filepath_with_ext, results_type, model_name_for_context)
 
-    def run_for_model(model_name_to_run):
+    cascades = {}  # usage-scope-style "model/experiment" -> JudgeCascade of its latest run
+
+    def run_for_model(model_name_to_run, write_results=True):
+        # write_results is False for the collection rounds of --batch_mode, whose results are incomplete.
         set_llm_model(model_name_to_run)
         print(f"\n================== MODEL: {model_name_to_run} ==================")
+
+        def new_cascade(experiment_slug):
+            if not args.cascade_model:
+                return None
+            cascade = JudgeCascade(args.cascade_model, min_agreement=args.cascade_min_agreement, min_confidence=args.cascade_min_confidence)
+            cascades[f"{model_name_to_run}/{experiment_slug}"] = cascade
+            return cascade
+
+        def seed_experiment_rng(experiment_label):
+            # Re-seeded per model and experiment so every shard (and the merge) builds the same prompts.
+            if args.seed is not None:
+                random.seed(f"{args.seed}:{model_name_to_run}:{experiment_label}")
+
+        seed_experiment_rng(args.experiment)
         
         model_name_slug = re.sub(r'[^a-zA-Z0-9_.-]', '_', model_name_to_run)
         # Generate temperature suffix, e.g., 0.1 -> _temp01, 0.35 -> _temp035, 1.0 -> _temp10
@@ -238,7 +658,7 @@ def main():
         else:
             temp_suffix = f"_temp{temp_str}0" # append 0 if it's a whole number like 1.0 -> 1 -> _temp10
         
-        rep_suffix = f"_rep{args.repetitions}"
+        rep_suffix = f"_rep{args.repetitions}" + (f"_lp{args.logprobs}" if args.logprobs else "") + ("_cascade" if args.cascade_model else "")
         timestamp_str = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
         data_hash_str = generate_data_payload_hash(args)
         
@@ -249,38 +669,55 @@ def main():
 
         def load_multi_criteria_task_data(task_arg):
             if task_arg == "argument":
-                return SHORT_ARGUMENTS_FOR_SCORING, ARGUMENT_EVALUATION_RUBRIC
+                return load_dataset("SHORT_ARGUMENTS_FOR_SCORING", args.item_store_dir), ARGUMENT_EVALUATION_RUBRIC
             elif task_arg == "story_opening":
-                return STORY_OPENINGS_FOR_SCORING, STORY_OPENING_EVALUATION_RUBRIC
+                return load_dataset("STORY_OPENINGS_FOR_SCORING", args.item_store_dir), STORY_OPENING_EVALUATION_RUBRIC
             else:
                 raise ValueError(f"Invalid task type: {task_arg}")
 
+        # Datasets are only swapped for item-store backed lists when --item_store_dir is given.
+        picking_pairs_data = load_dataset("PICKING_PAIRS", args.item_store_dir) if args.item_store_dir else None
+        scoring_datasets = {
+            "poems": load_dataset("POEMS_FOR_SCORING", args.item_store_dir),
+            "sentiment_texts": load_dataset("TEXTS_FOR_SENTIMENT_SCORING", args.item_store_dir),
+            "criterion_adherence_texts": load_dataset("TEXTS_FOR_CRITERION_ADHERENCE_SCORING", args.item_store_dir)
+        } if args.item_store_dir else None
+        classification_items_data = load_dataset("CLASSIFICATION_ITEMS", args.item_store_dir)
+        argument_items_data, _ = load_multi_criteria_task_data("argument")
+        story_opening_items_data, _ = load_multi_criteria_task_data("story_opening")
+
         if args.experiment == "picking":
             current_experiment_type_for_filename = "picking"
-            results_data = run_positional_bias_picking_experiment(
+            results_data = runners.run_positional_bias_picking_experiment(
                 model_to_run_experiment_with=model_name_to_run, 
                 quiet=quiet, 
                 repetitions=args.repetitions,
                 num_pairs_to_test=args.num_picking_pairs,
-                temperature=args.temp # Pass temperature
+                temperature=args.temp, # Pass temperature
+                picking_pairs=picking_pairs_data,
+                top_logprobs=args.logprobs,
+                cascade=new_cascade("picking")
             )
             # The `results_data` from picking experiment should now be a list of variant dicts,
             # where each dict contains a 'pairs_summary' list of pair dicts.
 
         elif args.experiment == "scoring":
             current_experiment_type_for_filename = "scoring"
-            results_data = run_scoring_experiment(
+            results_data = runners.run_scoring_experiment(
                 show_raw=args.raw, 
                 quiet=quiet, 
                 num_samples=args.scoring_samples, 
                 repetitions=args.repetitions,
                 scoring_type=args.scoring_type,
-                temperature=args.temp # Pass temperature
+                temperature=args.temp, # Pass temperature
+                datasets=scoring_datasets,
+                top_logprobs=args.logprobs,
+                cascade=new_cascade("scoring")
             )
 
         elif args.experiment == "pairwise_elo":
             current_experiment_type_for_filename = "pairwise_elo"
-            results_data = run_pairwise_elo_experiment(
+            results_data = runners.run_pairwise_elo_experiment(
                 show_raw=args.raw, 
                 quiet=quiet, 
                 repetitions=args.repetitions,
@@ -290,7 +727,7 @@ def main():
         elif args.experiment == "multi_criteria":
             current_experiment_type_for_filename = f"multi_criteria_{args.task}"
             task_data, task_rubric = load_multi_criteria_task_data(args.task)
-            results_data = run_multi_criteria_experiment(
+            results_data = runners.run_multi_criteria_experiment(
                 data_list=task_data,
                 rubric_dict=task_rubric,
                 task_name=args.task.capitalize(),
@@ -298,13 +735,14 @@ def main():
                 quiet=quiet,
                 num_samples=args.scoring_samples,
                 repetitions=args.repetitions,
-                temperature=args.temp # Pass temperature
+                temperature=args.temp, # Pass temperature
+                structured_output=args.structured_output
             )
 
         elif args.experiment == "adv_multi_criteria_permuted":
             current_experiment_type_for_filename = f"adv_multi_criteria_permuted_{args.task}"
             task_data, task_rubric = load_multi_criteria_task_data(args.task)
-            results_data = run_permuted_order_multi_criteria_experiment(
+            results_data = runners.run_permuted_order_multi_criteria_experiment(
                 data_list=task_data,
                 rubric_dict=task_rubric,
                 task_name=args.task.capitalize(),
@@ -312,24 +750,17 @@ def main():
                 quiet=quiet,
                 num_samples=args.scoring_samples,
                 repetitions=args.repetitions,
-                temperature=args.temp # Pass temperature
+                temperature=args.temp, # Pass temperature
+                order_design=args.criteria_order_design,
+                structured_output=args.structured_output
             )
 
         elif args.experiment == "adv_multi_criteria_isolated":
             current_experiment_type_for_filename = f"adv_multi_criteria_isolated_{args.task}"
             task_data, task_rubric = load_multi_criteria_task_data(args.task)
-            permuted_data_for_isolated = None # Logic to load this remains if needed, but now loads JSON
-            if args.output_dir:
-                 perm_json_path = os.path.join(args.output_dir, f"adv_multi_criteria_permuted_{args.task}_results_{model_name_slug}{temp_suffix}{rep_suffix}.json") # Expect .json, add temp_suffix and rep_suffix
-                 if os.path.exists(perm_json_path):
-                    try:
-                        with open(perm_json_path, 'r') as f_perm:
-                            permuted_data_for_isolated = json.load(f_perm)
-                        if not quiet: print(f"Loaded permuted data ({args.task}) from {perm_json_path} for holistic comparison.")
-                    except Exception as e:
-                        if not quiet: print(f"Could not load permuted results ({args.task}) from {perm_json_path}: {e}")
-            
-            results_data = run_isolated_criterion_scoring_experiment(
+            # The holistic baseline is served from the judgment store when the permuted experiment already judged
+            # these items (in this process, or in an earlier run with the same --judgment_store).
+            results_data = runners.run_isolated_criterion_scoring_experiment(
                 data_list=task_data,
                 rubric_dict=task_rubric,
                 task_name=args.task.capitalize(),
@@ -337,8 +768,9 @@ def main():
                 quiet=quiet,
                 num_samples=args.scoring_samples,
                 repetitions=args.repetitions,
-                holistic_comparison_data=permuted_data_for_isolated,
-                temperature=args.temp # Pass temperature
+                holistic_comparison_data=None,
+                temperature=args.temp, # Pass temperature
+                structured_output=args.structured_output
             )
 
         elif args.experiment == "classification":
@@ -356,118 +788,230 @@ def main():
                 print(f"Warning: No classification strategies found for domain filter '{args.classification_domain_filter}'. Skipping classification experiment.")
                 results_data = []
             else:
-                results_data = run_classification_experiment(
-                    classification_items=CLASSIFICATION_ITEMS,
+                results_data = runners.run_classification_experiment(
+                    classification_items=classification_items_data,
                     category_sets=CLASSIFICATION_CATEGORIES,
                     prompt_variant_strategies=strategies_to_run,
                     show_raw=args.raw,
                     quiet=quiet,
                     num_samples=args.classification_num_samples,
                     repetitions=args.repetitions,
-                    temperature=args.temp # Pass temperature
+                    temperature=args.temp, # Pass temperature
+                    top_logprobs=args.logprobs,
+                    cascade=new_cascade("classification")
                 )
 
         elif args.experiment == "all":
-            experiments_to_execute = [
-                ("PICKING EXPERIMENT", lambda: (
-                    run_positional_bias_picking_experiment(model_to_run_experiment_with=model_name_to_run, quiet=quiet, repetitions=args.repetitions, num_pairs_to_test=args.num_picking_pairs, temperature=args.temp), 
-                    "picking"
-                )),
-                ("SCORING EXPERIMENT", lambda: (
-                    run_scoring_experiment(show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, scoring_type=args.scoring_type, temperature=args.temp), 
-                    "scoring"
-                )),
-                ("PAIRWISE ELO EXPERIMENT", lambda: (
-                    run_pairwise_elo_experiment(show_raw=args.raw, quiet=quiet, repetitions=args.repetitions, temperature=args.temp),
-                    "pairwise_elo"
-                )),
-                ("MULTI_CRITERIA (Argument)", lambda: (
-                    run_multi_criteria_experiment(data_list=SHORT_ARGUMENTS_FOR_SCORING, rubric_dict=ARGUMENT_EVALUATION_RUBRIC, task_name="Argument", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp), 
-                    "multi_criteria_argument"
-                )),
-                ("MULTI_CRITERIA (Story Opening)", lambda: (
-                    run_multi_criteria_experiment(data_list=STORY_OPENINGS_FOR_SCORING, rubric_dict=STORY_OPENING_EVALUATION_RUBRIC, task_name="StoryOpening", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp),
-                    "multi_criteria_story_opening"
-                )),
-                ("ADVANCED: PERMUTED ORDER (Argument)", lambda: (
-                    run_permuted_order_multi_criteria_experiment(data_list=SHORT_ARGUMENTS_FOR_SCORING, rubric_dict=ARGUMENT_EVALUATION_RUBRIC, task_name="Argument", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp), 
-                    "adv_multi_criteria_permuted_argument"
-                )),
-                 ("ADVANCED: PERMUTED ORDER (Story Opening)", lambda: (
-                    run_permuted_order_multi_criteria_experiment(data_list=STORY_OPENINGS_FOR_SCORING, rubric_dict=STORY_OPENING_EVALUATION_RUBRIC, task_name="StoryOpening", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp),
-                    "adv_multi_criteria_permuted_story_opening"
-                ))
-            ]
-            all_permuted_results_temp_store = {}
-            for description, experiment_lambda in tqdm(experiments_to_execute, desc=f"Experiments for {model_name_slug}", leave=False):
-                if not quiet: print(f"\n========== {description} ==========")
-                exp_results, exp_type_slug = experiment_lambda()
-                
-                if exp_type_slug.startswith("adv_multi_criteria_permuted_"):
-                    task_name_from_type = exp_type_slug.replace("adv_multi_criteria_permuted_", "")
-                    all_permuted_results_temp_store[task_name_from_type] = exp_results
-                
-                if args.output_dir and exp_results:
-                    filename = f"{exp_type_slug}_results_{model_name_slug}{temp_suffix}{rep_suffix}.json" # Always .json, add temp_suffix and rep_suffix
-                    filepath = os.path.join(args.output_dir, filename)
-                    write_results_to_json(filepath, exp_results)
-
-            isolated_experiments_to_run = [
-                ("ADVANCED: ISOLATED CRITERION (Argument)", "argument", SHORT_ARGUMENTS_FOR_SCORING, ARGUMENT_EVALUATION_RUBRIC),
-                ("ADVANCED: ISOLATED CRITERION (Story Opening)", "story_opening", STORY_OPENINGS_FOR_SCORING, STORY_OPENING_EVALUATION_RUBRIC)
-            ]
-            for iso_desc, iso_task_name, iso_data, iso_rubric in isolated_experiments_to_run:
-                if not quiet: print(f"\n========== {iso_desc} ==========")
-                exp_type_isolated = f"adv_multi_criteria_isolated_{iso_task_name}"
-                adv_permuted_results_for_isolated = all_permuted_results_temp_store.get(iso_task_name) 
-                if not adv_permuted_results_for_isolated and args.output_dir:
-                    perm_json_path = os.path.join(args.output_dir, f"adv_multi_criteria_permuted_{iso_task_name}_results_{model_name_slug}{temp_suffix}{rep_suffix}.json") # add temp_suffix and rep_suffix
-                    if os.path.exists(perm_json_path):
-                        try:
-                            with open(perm_json_path, 'r') as f_perm: loaded_data = json.load(f_perm)
-                            adv_permuted_results_for_isolated = loaded_data
-                        except Exception as e:
-                            if not quiet: print(f"Could not load permuted results for {iso_task_name} isolated exp: {e}")
-
-                adv_isolated_results = run_isolated_criterion_scoring_experiment(
+            def all_mode_results_path(exp_type_slug):
+                return os.path.join(args.output_dir, f"{exp_type_slug}_results_{model_name_slug}{temp_suffix}{rep_suffix}.json") # Always .json, add temp_suffix and rep_suffix
+
+            def run_isolated_node(iso_task_name, iso_data, iso_rubric, adv_permuted_results_for_isolated):
+                # Items the permuted node did not cover fall back to the holistic baseline via the judgment store.
+                return runners.run_isolated_criterion_scoring_experiment(
                     data_list=iso_data, rubric_dict=iso_rubric, task_name=iso_task_name.capitalize(),
                     show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, 
                     holistic_comparison_data=adv_permuted_results_for_isolated,
-                    temperature=args.temp # Pass temperature
+                    temperature=args.temp, # Pass temperature
+                    structured_output=args.structured_output
                 )
-                if args.output_dir and adv_isolated_results:
-                    filepath = os.path.join(args.output_dir, f"{exp_type_isolated}_results_{model_name_slug}{temp_suffix}{rep_suffix}.json") # add temp_suffix and rep_suffix
-                    write_results_to_json(filepath, adv_isolated_results)
-            
-            classification_strategies_for_all = PROMPT_VARIANT_STRATEGIES
-            classification_results_all = run_classification_experiment(
-                classification_items=CLASSIFICATION_ITEMS,
-                category_sets=CLASSIFICATION_CATEGORIES,
-                prompt_variant_strategies=classification_strategies_for_all,
-                show_raw=args.raw,
-                quiet=quiet,
-                num_samples=args.classification_num_samples,
-                repetitions=args.repetitions,
-                temperature=args.temp # Pass temperature
-            )
-            if args.output_dir and classification_results_all:
-                filename_class_all = f"classification_results_{model_name_slug}{temp_suffix}{rep_suffix}.json" # add temp_suffix and rep_suffix
-                filepath_class_all = os.path.join(args.output_dir, filename_class_all)
-                write_results_to_json(filepath_class_all, classification_results_all)
+
+            # Each node runs once all of its `depends_on` nodes have finished; `run` receives their results keyed by slug.
+            # The slug doubles as the results filename prefix.
+            experiment_dag = [
+                {"description": "PICKING EXPERIMENT", "slug": "picking", "depends_on": [], "run": lambda deps: (
+                    runners.run_positional_bias_picking_experiment(model_to_run_experiment_with=model_name_to_run, quiet=quiet, repetitions=args.repetitions, num_pairs_to_test=args.num_picking_pairs, temperature=args.temp, picking_pairs=picking_pairs_data, top_logprobs=args.logprobs, cascade=new_cascade("picking"))
+                )},
+                {"description": "SCORING EXPERIMENT", "slug": "scoring", "depends_on": [], "run": lambda deps: (
+                    runners.run_scoring_experiment(show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, scoring_type=args.scoring_type, temperature=args.temp, datasets=scoring_datasets, top_logprobs=args.logprobs, cascade=new_cascade("scoring"))
+                )},
+                {"description": "PAIRWISE ELO EXPERIMENT", "slug": "pairwise_elo", "depends_on": [], "run": lambda deps: (
+                    runners.run_pairwise_elo_experiment(show_raw=args.raw, quiet=quiet, repetitions=args.repetitions, temperature=args.temp)
+                )},
+                {"description": "MULTI_CRITERIA (Argument)", "slug": "multi_criteria_argument", "depends_on": [], "run": lambda deps: (
+                    runners.run_multi_criteria_experiment(data_list=argument_items_data, rubric_dict=ARGUMENT_EVALUATION_RUBRIC, task_name="Argument", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp, structured_output=args.structured_output)
+                )},
+                {"description": "MULTI_CRITERIA (Story Opening)", "slug": "multi_criteria_story_opening", "depends_on": [], "run": lambda deps: (
+                    runners.run_multi_criteria_experiment(data_list=story_opening_items_data, rubric_dict=STORY_OPENING_EVALUATION_RUBRIC, task_name="StoryOpening", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp, structured_output=args.structured_output)
+                )},
+                {"description": "ADVANCED: PERMUTED ORDER (Argument)", "slug": "adv_multi_criteria_permuted_argument", "depends_on": [], "run": lambda deps: (
+                    runners.run_permuted_order_multi_criteria_experiment(data_list=argument_items_data, rubric_dict=ARGUMENT_EVALUATION_RUBRIC, task_name="Argument", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp, order_design=args.criteria_order_design, structured_output=args.structured_output)
+                )},
+                {"description": "ADVANCED: PERMUTED ORDER (Story Opening)", "slug": "adv_multi_criteria_permuted_story_opening", "depends_on": [], "run": lambda deps: (
+                    runners.run_permuted_order_multi_criteria_experiment(data_list=story_opening_items_data, rubric_dict=STORY_OPENING_EVALUATION_RUBRIC, task_name="StoryOpening", show_raw=args.raw, quiet=quiet, num_samples=args.scoring_samples, repetitions=args.repetitions, temperature=args.temp, order_design=args.criteria_order_design, structured_output=args.structured_output)
+                )},
+                {"description": "ADVANCED: ISOLATED CRITERION (Argument)", "slug": "adv_multi_criteria_isolated_argument", "depends_on": ["adv_multi_criteria_permuted_argument"], "run": lambda deps: (
+                    run_isolated_node("argument", argument_items_data, ARGUMENT_EVALUATION_RUBRIC, deps["adv_multi_criteria_permuted_argument"])
+                )},
+                {"description": "ADVANCED: ISOLATED CRITERION (Story Opening)", "slug": "adv_multi_criteria_isolated_story_opening", "depends_on": ["adv_multi_criteria_permuted_story_opening"], "run": lambda deps: (
+                    run_isolated_node("story_opening", story_opening_items_data, STORY_OPENING_EVALUATION_RUBRIC, deps["adv_multi_criteria_permuted_story_opening"])
+                )},
+                {"description": "CLASSIFICATION EXPERIMENT", "slug": "classification", "depends_on": [], "run": lambda deps: (
+                    runners.run_classification_experiment(
+                        classification_items=classification_items_data,
+                        category_sets=CLASSIFICATION_CATEGORIES,
+                        prompt_variant_strategies=PROMPT_VARIANT_STRATEGIES,
+                        show_raw=args.raw,
+                        quiet=quiet,
+                        num_samples=args.classification_num_samples,
+                        repetitions=args.repetitions,
+                        temperature=args.temp, # Pass temperature
+                        top_logprobs=args.logprobs,
+                        cascade=new_cascade("classification")
+                    )
+                )},
+            ]
+
+            def before_experiment_node(node):
+                if not quiet: print(f"\n========== {node['description']} ==========")
+
+            def after_experiment_node(node, exp_results):
+                if args.output_dir and exp_results and write_results:
+                    write_results_to_json(all_mode_results_path(node["slug"]), exp_results, model_name_to_run, results_type=node["slug"])
+
+            # Seeded runs give every experiment its own generator (same seed string as seed_experiment_rng), so they can run concurrently.
+            run_experiment_dag(experiment_dag, args.max_concurrent_experiments, before_node_start=before_experiment_node, on_node_complete=after_experiment_node,
+                               usage_scope_prefix=f"{model_name_to_run}/", rng_seed_prefix=f"{args.seed}:{model_name_to_run}" if args.seed is not None else None)
             return 
         else: 
             print(f"Unknown experiment: {args.experiment}")
             parser.print_help()
             exit(1)
         
-        if args.output_dir and results_data is not None:
+        if args.output_dir and results_data is not None and write_results:
             # Construct filename with timestamp and data hash
             filename = f"{current_experiment_type_for_filename}_{timestamp_str}_{data_hash_str}_{model_name_slug}{temp_suffix}{rep_suffix}.{output_extension}"
             filepath = os.path.join(args.output_dir, filename)
-            write_results_to_json(filepath, results_data)
+            write_results_to_json(filepath, results_data, model_name_to_run, results_type=current_experiment_type_for_filename)
 
+    planned_requests = []
     for model_name in tqdm(models_to_run, desc="Running experiments", unit="model"):
-        model_specific_results = run_for_model(model_name) # Renamed model_name var
+        if run_budget_exhausted():
+            print(f"Run budget exhausted: skipping {model_name}.")
+            continue
+        with usage_scope(f"{model_name}/{args.experiment}"): # 'all' mode opens one scope per experiment inside this one
+            if args.plan:
+                planned_requests.extend(collect_planned_requests(lambda: run_for_model(model_name, write_results=False)))
+            elif args.batch_mode:
+                batch_dir = os.path.join(args.batch_dir or os.path.join(args.output_dir or ".", "batches"), re.sub(r'[^a-zA-Z0-9_.-]', '_', model_name))
+                model_specific_results = run_in_batch_mode(
+                    lambda final: run_for_model(model_name, write_results=final),
+                    BATCH_ADAPTERS[args.batch_mode](), batch_dir, poll_seconds=args.batch_poll_seconds
+                )
+            else:
+                stats_before_model = get_response_log_stats()
+                model_specific_results = run_for_model(model_name) # Renamed model_name var
+                if args.incremental:
+                    stats_after_model = get_response_log_stats()
+                    print(f"Incremental run for {model_name}: {stats_after_model['replayed'] - stats_before_model['replayed']} request(s) reused from earlier runs, "
+                          f"{stats_after_model['live'] - stats_before_model['live']} new or changed request(s) sent.")
+
+    if args.plan:
+        usage_history = load_usage_history(os.path.join(args.output_dir, "usage_report.jsonl") if args.output_dir else None)
+        plan = build_plan(planned_requests, usage_history, load_price_table(args.price_table))
+        print(f"\nRun plan (no API calls made; {args.max_concurrent_api_calls} concurrent calls):")
+        for row in plan:
+            print(format_plan_row(f"{row['scope']} [{row['model']}]", row))
+        print(format_plan_row("Total", plan_totals(plan)))
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            run_plan_path = os.path.join(args.output_dir, "run_plan.jsonl")
+            run_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+            with open(run_plan_path, 'a') as plan_file:
+                for row in plan:
+                    plan_file.write(json.dumps({"timestamp": run_timestamp, "experiment": args.experiment, "repetitions": args.repetitions, **row}) + "\n")
+            print(f"Run plan appended to {run_plan_path}")
+        return
+
+    judgment_store = get_judgment_store()
+    if judgment_store.hits:
+        print(f"Judgment store: {judgment_store.hits} holistic judgment repetition(s) reused, {judgment_store.misses} requested.")
+
+    usage_report = get_usage_report()
+    if usage_report:
+        print("\nAPI usage per experiment (live calls only):")
+        for scope_name, totals in sorted(usage_report.items()):
+            print(f"  {scope_name}: {totals['live_calls']} call(s), {totals['prompt_tokens']} prompt tokens "
+                  f"({totals['cached_prompt_tokens']} cached, {totals['cached_prompt_token_ratio']:.1%}), "
+                  f"{totals['completion_tokens']} completion tokens, cost ${totals['cost']:.4f}, "
+                  f"mean latency {totals['mean_latency_seconds']:.2f}s")
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            usage_report_path = os.path.join(args.output_dir, "usage_report.jsonl")
+            run_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+            with open(usage_report_path, 'a') as usage_file:
+                for scope_name, totals in sorted(usage_report.items()):
+                    usage_file.write(json.dumps({"timestamp": run_timestamp, "scope": scope_name, "cache_optimised_prompts": args.cache_optimised_prompts, **totals}) + "\n")
+            print(f"Usage report appended to {usage_report_path}")
+
+    if latency_model.path:
+        print(f"Latency model: {len(latency_model)} live-call observation(s) in {latency_model.path}")
+
+    if cascades:
+        print("\nJudge cascade per experiment:")
+        for scope_name, cascade in sorted(cascades.items()):
+            print(f"  {scope_name}: {cascade.format_summary()}")
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            cascade_report_path = os.path.join(args.output_dir, "cascade_report.jsonl")
+            run_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+            with open(cascade_report_path, 'a') as cascade_file:
+                for scope_name, cascade in sorted(cascades.items()):
+                    cascade_file.write(json.dumps({"timestamp": run_timestamp, "scope": scope_name, **cascade.summary()}) + "\n")
+            print(f"Cascade report appended to {cascade_report_path}")
+
+    circuit_report = get_circuit_breaker_report()
+    if circuit_report["events"] or any(b["fast_failures"] or b["failovers_to_other"] for b in circuit_report["breakers"].values()):
+        print("\nCircuit breakers:")
+        for breaker_model, breaker in sorted(circuit_report["breakers"].items()):
+            print(f"  {breaker_model}: {breaker['state']}, {breaker['trips']} trip(s), {breaker['errors']}/{breaker['calls']} live call(s) failed, "
+                  f"{breaker['fast_failures']} failed fast, {breaker['failovers_to_other']} routed to a failover model")
+        if args.output_dir and circuit_report["events"]:
+            os.makedirs(args.output_dir, exist_ok=True)
+            circuit_events_path = os.path.join(args.output_dir, "circuit_breaker_events.jsonl")
+            with open(circuit_events_path, 'a') as events_file:
+                for circuit_event in circuit_report["events"]:
+                    events_file.write(json.dumps(circuit_event) + "\n")
+            print(f"Circuit breaker events appended to {circuit_events_path}")
+
+    hedging_report = get_hedging_report()
+    if hedging_report:
+        print("\nHedged requests:")
+        for hedged_model, hedging in sorted(hedging_report.items()):
+            improvement = hedging.get("p99_improvement_seconds")
+            print(f"  {hedged_model}: {hedging['hedged']}/{hedging['calls']} live call(s) hedged ({hedging['hedge_rate']:.1%}), {hedging['hedge_wins']} won by the duplicate, "
+                  f"{hedging['skipped_by_cap']} not hedged (spend cap), {hedging['skipped_no_slot']} (no free concurrency slot); p99 {hedging['p99_effective_seconds']:.2f}s vs {hedging['p99_primary_seconds']:.2f}s unhedged"
+                  + (f", improvement {improvement:+.2f}s" if improvement is not None else ""))
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            hedging_report_path = os.path.join(args.output_dir, "hedging_report.jsonl")
+            run_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+            with open(hedging_report_path, 'a') as hedging_file:
+                for hedged_model, hedging in sorted(hedging_report.items()):
+                    hedging_file.write(json.dumps({"timestamp": run_timestamp, "model": hedged_model, **hedging}) + "\n")
+            print(f"Hedging report appended to {hedging_report_path}")
+
+    budget_report = get_budget_report()
+    if budget_report["limits"]:
+        print("\nBudgets (" + ", ".join(f"{name}={limit:g}" for name, limit in budget_report["limits"].items()) + "):")
+        for budget_spent in budget_report["spent"]:
+            refused_text = f", refused {sum(budget_spent['refused'].values())} call(s) ({', '.join(budget_spent['refused'])} limit)" if budget_spent["refused"] else ""
+            print(f"  {budget_spent['level']} {budget_spent['key']}: {budget_spent['calls']} call(s), {budget_spent['tokens']} tokens, ${budget_spent['cost']:.4f}{refused_text}")
+        if budget_report["exhausted"]:
+            print(f"A budget was exhausted: results written after that point are partial. Re-run the command to resume (replayed responses are not charged to the budgets); "
+                  f"the requests already answered are replayed from {args.response_log}.")
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            budget_report_path = os.path.join(args.output_dir, "budget_report.jsonl")
+            run_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+            with open(budget_report_path, 'a') as budget_file:
+                for budget_spent in budget_report["spent"]:
+                    budget_file.write(json.dumps({"timestamp": run_timestamp, "limits": budget_report["limits"], **budget_spent}) + "\n")
+            print(f"Budget report appended to {budget_report_path}")
+
+    if args.shard or args.merge_shards or args.response_log:
+        stats = get_response_log_stats()
+        print(f"Response log summary: {stats['live']} live call(s), {stats['recorded']} recorded, {stats['replayed']} replayed, "
+              f"{stats['skipped_out_of_shard']} skipped (other shards), {stats['replay_misses']} missing from logs.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Benchmarks the classification experiment's CPU-side work, separately from API time (no API calls are made).
+
+  prep: builds the item x strategy task matrix for a synthetic dataset of --items items (the bundled
+        CLASSIFICATION_ITEMS repeated with fresh IDs) and renders every task's prompt. "per-task" is the
+        previous approach, generating each task's prompt from the strategy with `generate_prompt_variants`;
+        "skeleton" is `prepare_classification_tasks` plus rendering from the compiled per-strategy skeletons.
+
+  parse: parses synthetic responses for taxonomies of 5-200 labels with the single-pass `CategoryMatcher`
+         and with the previous per-category parser, and reports the time per response and how often the two
+         agree. The previous parser's word-boundary pattern was written as r"\\\\b", which matches a literal
+         backslash followed by "b", so in practice it only accepted exact category names; "previous (intended)"
+         is the same scan with a real word boundary.
+
+Usage: python classification_benchmark.py prep [--items 100000]
+       python classification_benchmark.py parse [--responses 20000] [--taxonomy_sizes 5,50,200]
+"""
+
+import re
+import time
+import random
+import argparse
+
+from test_data import CLASSIFICATION_ITEMS, CLASSIFICATION_CATEGORIES, PROMPT_VARIANT_STRATEGIES
+from experiment_runners.classification_experiment import generate_prompt_variants, prepare_classification_tasks, compile_category_matcher
+
+TAXONOMY_WORDS = [
+    "Billing", "Account", "Login", "Shipping", "Refund", "Bug", "Feature", "Security", "Privacy", "Performance",
+    "Pricing", "Cancellation", "Upgrade", "Integration", "Export", "Import", "Mobile", "Desktop", "Notification", "Search"
+]
+TAXONOMY_SUFFIXES = ["Issue", "Request", "Question", "Report", "Complaint", "Feedback", "Problem", "Inquiry", "Praise", "Other"]
+
+
+def synthetic_items(item_count: int) -> list:
+    return [
+        {**CLASSIFICATION_ITEMS[i % len(CLASSIFICATION_ITEMS)], "item_id": f"bench_{i}"}
+        for i in range(item_count)
+    ]
+
+
+def prepare_per_task(items: list) -> int:
+    """The task matrix as the runner built it before prompt skeletons: one full prompt generation per task."""
+    prompt_count = 0
+    for item in items:
+        base_categories = CLASSIFICATION_CATEGORIES.get(item.get("domain"))
+        if not base_categories:
+            continue
+        for strategy in PROMPT_VARIANT_STRATEGIES:
+            if strategy.get("domain_target") and strategy.get("domain_target") != item.get("domain"):
+                continue
+            generate_prompt_variants(item["text"], strategy, base_categories, CLASSIFICATION_CATEGORIES)
+            prompt_count += 1
+    return prompt_count
+
+
+def prepare_with_skeletons(items: list) -> int:
+    tasks, _ = prepare_classification_tasks(items, CLASSIFICATION_CATEGORIES, PROMPT_VARIANT_STRATEGIES, quiet=True)
+    for item, _, skeleton in tasks:
+        skeleton["compiled_prompt"].request(item_text=item["text"])
+    return len(tasks)
+
+
+def benchmark_preparation(item_count: int):
+    items = synthetic_items(item_count)
+    print(f"Preparing and rendering the classification task matrix for {item_count} items x {len(PROMPT_VARIANT_STRATEGIES)} strategies:")
+    timings = {}
+    for label, prepare in (("per-task", prepare_per_task), ("skeleton", prepare_with_skeletons)):
+        started_at = time.perf_counter()
+        task_count = prepare(items)
+        timings[label] = time.perf_counter() - started_at
+        print(f"  {label:<10} {task_count} tasks in {timings[label]:.2f}s ({task_count / timings[label]:,.0f} tasks/s)")
+    print(f"  speedup: {timings['per-task'] / timings['skeleton']:.1f}x")
+
+
+def previous_parse_classification_response(response_text, category_names_expected, word_boundary=r"\\b"):
+    """The per-category parser the matcher replaced (pass word_boundary=r"\b" for its intended behaviour)."""
+    response_text_stripped = response_text.strip()
+    for cat_name in category_names_expected:
+        if cat_name.lower() == response_text_stripped.lower():
+            return cat_name
+    for cat_name in category_names_expected:
+        escaped_cat_name = re.escape(cat_name)
+        if re.search(word_boundary + escaped_cat_name + word_boundary, response_text_stripped, re.IGNORECASE):
+            return cat_name
+    return "Unparseable"
+
+
+def synthetic_taxonomy(label_count: int) -> list:
+    labels = [word for word in TAXONOMY_WORDS] + [f"{word} {suffix}" for word in TAXONOMY_WORDS for suffix in TAXONOMY_SUFFIXES]
+    return labels[:label_count]
+
+
+def synthetic_response(rng: random.Random, labels: list) -> str:
+    label, other_label = rng.choice(labels), rng.choice(labels)
+    return rng.choice([
+        label,
+        label.lower(),
+        f"{label}.",
+        f"**{label}**",
+        f"The category is {label}.",
+        f"{label}\n\nThe user describes something that could also be read as {other_label}, but {label} fits best.",
+        f"Category: {label} (not {other_label})",
+        "None of the listed categories apply.",
+    ])
+
+
+def benchmark_parsing(response_count: int, taxonomy_sizes: list):
+    rng = random.Random(0)
+    parsers = {
+        "matcher": lambda response, labels: compile_category_matcher(labels).match(response),
+        "previous": lambda response, labels: previous_parse_classification_response(response, labels),
+        "previous (intended)": lambda response, labels: previous_parse_classification_response(response, labels, word_boundary=r"\b"),
+    }
+    print(f"Parsing {response_count} synthetic responses per taxonomy size:")
+    for label_count in taxonomy_sizes:
+        labels = synthetic_taxonomy(label_count)
+        compile_category_matcher(labels) # Compiled once per strategy by the runner; not part of the per-response time
+        responses = [synthetic_response(rng, labels) for _ in range(response_count)]
+        outputs = {}
+        print(f"  {len(labels)} labels:")
+        for parser_name, parse in parsers.items():
+            started_at = time.perf_counter()
+            outputs[parser_name] = [parse(response, labels) for response in responses]
+            elapsed = time.perf_counter() - started_at
+            print(f"    {parser_name:<20} {elapsed / response_count * 1e6:8.1f} us/response")
+        for reference_name in ("previous", "previous (intended)"):
+            agreeing = sum(a == b for a, b in zip(outputs["matcher"], outputs[reference_name]))
+            reference_parsed = [(a, b) for a, b in zip(outputs["matcher"], outputs[reference_name]) if b != "Unparseable"]
+            agreeing_parsed = sum(a == b for a, b in reference_parsed)
+            print(f"    agreement with {reference_name}: {agreeing}/{response_count} ({agreeing / response_count:.1%}); "
+                  f"where it found a category: {agreeing_parsed}/{len(reference_parsed)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the classification experiment's preparation (no API calls).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prep_parser = subparsers.add_parser("prep", help="Task matrix preparation and prompt rendering.")
+    prep_parser.add_argument("--items", type=int, default=100000, help="Number of synthetic items.")
+    parse_parser = subparsers.add_parser("parse", help="Classification response parsing.")
+    parse_parser.add_argument("--responses", type=int, default=20000, help="Synthetic responses per taxonomy size.")
+    parse_parser.add_argument("--taxonomy_sizes", type=str, default="5,50,200", help="Comma-separated numbers of category labels.")
+    args = parser.parse_args()
+
+    if args.command == "prep":
+        benchmark_preparation(args.items)
+    elif args.command == "parse":
+        benchmark_parsing(args.responses, [int(size) for size in args.taxonomy_sizes.split(",") if size.strip()])
+
+
+if __name__ == "__main__":
+    main()
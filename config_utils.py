@@ -1,7 +1,14 @@
 import os
-import requests
+import fnmatch
 import time
 import json
+import random
+import hashlib
+import threading
+import contextlib
+import contextvars
+import collections
+import concurrent.futures
 
 # --- LLM Configuration ---
 # OPENROUTER_API_KEY is populated by the main script (bias_analyzer.py) after loading .env
@@ -23,36 +30,870 @@ def set_llm_model(model_name):
     if model_name:
         BIAS_SUITE_LLM_MODEL = model_name
 
-def call_openrouter_api(prompt_text, model_name_override=None, quiet=False, temperature=None, system_prompt_text=None):
-    """Calls the OpenRouter API with the given prompt and model, optionally including a system prompt."""
+# --- Backends ---
+# A backend is an OpenAI-compatible chat completions endpoint: OpenRouter, or e.g. a vLLM / llama.cpp server on the LAN.
+# Models are served by OpenRouter unless the name carries an "@backend" suffix ("llama-3-8b-instruct@lan") or matches a
+# pattern in MODEL_BACKEND_PATTERNS. The backend part of the name is not sent to the server, but it stays part of the
+# model name everywhere else (request keys, results filenames), so runs against different backends never mix.
+# `max_concurrent_calls` caps a backend's in-flight calls on top of the global cap; `openrouter_extensions` enables the
+# OpenRouter-only request fields (usage accounting, provider routing, cache_control content parts).
+BACKENDS = {
+    "openrouter": {
+        "url": OPENROUTER_API_URL, "api_key": None, "api_key_env": "OPENROUTER_API_KEY",
+        "headers": {"HTTP-Referer": "http://localhost/bias_suite", "X-Title": "Bias Suite Experiment"},
+        "max_concurrent_calls": None, "timeout": 60, "openrouter_extensions": True
+    }
+}
+MODEL_BACKEND_PATTERNS = {}  # fnmatch pattern -> backend name, checked in insertion order
+_backend_semaphores = {}
 
-    if not OPENROUTER_API_KEY:
-        # This case is critical and should be loud if not quiet.
-        error_msg = "Error: OPENROUTER_API_KEY is not set. Ensure it is loaded and set via set_api_key()."
-        if not quiet: print(f"CRITICAL_API_CALL_FAILURE: {error_msg}")
-        return error_msg
+def register_backend(name, url, api_key=None, api_key_env=None, headers=None, max_concurrent_calls=None, timeout=60, openrouter_extensions=False):
+    """Adds (or replaces) a backend. Without api_key/api_key_env, requests are sent without an Authorization header."""
+    BACKENDS[name] = {
+        "url": url, "api_key": api_key, "api_key_env": api_key_env, "headers": dict(headers or {}),
+        "max_concurrent_calls": max_concurrent_calls, "timeout": timeout, "openrouter_extensions": openrouter_extensions
+    }
+    _backend_semaphores[name] = threading.BoundedSemaphore(max_concurrent_calls) if max_concurrent_calls else contextlib.nullcontext()
+
+def map_models_to_backend(model_pattern, backend_name):
+    """Serves every model whose name matches `model_pattern` (fnmatch, e.g. "meta-llama/*") from `backend_name`."""
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend_name}'. Registered backends: {list(BACKENDS)}")
+    MODEL_BACKEND_PATTERNS[model_pattern] = backend_name
+
+def load_backends_config(path):
+    """
+    Registers the backends and model mappings in a JSON file:
+    {"backends": {"lan": {"url": "http://10.0.0.5:8000/v1/chat/completions", "max_concurrent_calls": 32, ...}},
+     "models": {"meta-llama/*": "lan"}}
+    """
+    with open(path, 'r') as config_file:
+        backends_config = json.load(config_file)
+    for backend_name, backend_settings in backends_config.get("backends", {}).items():
+        register_backend(backend_name, **backend_settings)
+    for model_pattern, backend_name in backends_config.get("models", {}).items():
+        map_models_to_backend(model_pattern, backend_name)
+
+def resolve_backend(model_name):
+    """Returns (backend name, backend settings, model name to send to the backend)."""
+    served_model_name, _, backend_name = model_name.rpartition("@")
+    if served_model_name and backend_name in BACKENDS:
+        return backend_name, BACKENDS[backend_name], served_model_name
+    for model_pattern, pattern_backend_name in MODEL_BACKEND_PATTERNS.items():
+        if fnmatch.fnmatchcase(model_name, model_pattern):
+            return pattern_backend_name, BACKENDS[pattern_backend_name], model_name
+    return "openrouter", BACKENDS["openrouter"], model_name
+
+def _backend_api_key(backend_name, backend):
+    if backend["api_key"]:
+        return backend["api_key"]
+    if backend_name == "openrouter" and OPENROUTER_API_KEY:
+        return OPENROUTER_API_KEY
+    return os.getenv(backend["api_key_env"]) if backend["api_key_env"] else None
+
+def _backend_semaphore(model_name):
+    return _backend_semaphores.get(resolve_backend(model_name)[0]) or contextlib.nullcontext()
+
+def _acquire_call_slots(model_name, blocking=True):
+    """
+    Acquires one request's concurrency slots (the global limit, then the model's backend limit) and returns them for
+    _release_call_slots; without `blocking`, returns None (holding nothing) if a slot is not free.
+    """
+    slots = []
+    for semaphore in (_api_call_semaphore, _backend_semaphore(model_name)):
+        if isinstance(semaphore, contextlib.nullcontext): # Backend without a limit
+            continue
+        if not semaphore.acquire(blocking=blocking):
+            _release_call_slots(slots)
+            return None
+        slots.append(semaphore)
+    return slots
+
+def _release_call_slots(slots):
+    for semaphore in reversed(slots):
+        semaphore.release()
+
+def strip_openrouter_extensions(request_body):
+    """A request body without the OpenRouter-only fields, for plain OpenAI-compatible servers."""
+    stripped_body = {key: value for key, value in request_body.items() if key not in ("usage", "provider")}
+    stripped_body["messages"] = [
+        {**message, "content": "".join(part["text"] for part in message["content"])} if isinstance(message["content"], list) else message
+        for message in request_body["messages"]
+    ]
+    return stripped_body
+
+# Global request budget: caps in-flight API calls across every runner's thread pool, so experiments
+# running concurrently (e.g. the 'all' mode DAG) share one limit instead of multiplying their pools.
+MAX_CONCURRENT_API_CALLS = 16
+_api_call_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_API_CALLS)
+
+def set_max_concurrent_api_calls(max_calls):
+    global MAX_CONCURRENT_API_CALLS, _api_call_semaphore
+    if max_calls and max_calls > 0:
+        MAX_CONCURRENT_API_CALLS = max_calls
+        _api_call_semaphore = threading.BoundedSemaphore(max_calls)
+
+# --- Usage accounting ---
+# Token usage (including provider-cached prompt tokens) and latency of live calls, accumulated per scope.
+# bias_analyzer.py opens one scope per experiment; runners use ContextThreadPoolExecutor so the scope
+# follows their tasks into worker threads.
+_usage_scope = contextvars.ContextVar("usage_scope", default="unscoped")
+_usage_totals = {}
+_usage_lock = threading.Lock()
+
+@contextlib.contextmanager
+def usage_scope(scope_name):
+    """Attributes the usage of every live API call made inside this block (and its context-copying pools) to `scope_name`."""
+    token = _usage_scope.set(scope_name)
+    try:
+        yield
+    finally:
+        _usage_scope.reset(token)
+
+# Calls made inside a `count_calls` block (replayed, deferred and live alike), e.g. per judge cascade tier. Calls answered
+# with a placeholder that a later batch round or the shard merge replaces (BATCH_DEFERRED_RESPONSE,
+# SHARD_SKIPPED_RESPONSE) are also counted as "pending".
+_call_tally = contextvars.ContextVar("call_tally", default=None)
+
+@contextlib.contextmanager
+def count_calls(tally):
+    """Adds the number of call_openrouter_api calls made inside this block (in this thread) to tally["calls"] (and "pending")."""
+    token = _call_tally.set(tally)
+    try:
+        yield tally
+    finally:
+        _call_tally.reset(token)
+
+# Latency observations of live calls (see task_scheduler.py), attributed to the latency group they were submitted under.
+_latency_group = contextvars.ContextVar("latency_group", default=None)
+LATENCY_OBSERVER = None  # observer(model, group, prompt_chars, seconds), called for every successful live call
+
+@contextlib.contextmanager
+def latency_group(group_name):
+    """Attributes the latency of every live call made inside this block (and its context-copying pools) to `group_name`."""
+    token = _latency_group.set(group_name)
+    try:
+        yield
+    finally:
+        _latency_group.reset(token)
+
+def set_latency_observer(observer):
+    global LATENCY_OBSERVER
+    LATENCY_OBSERVER = observer
+
+# Random choices of the runners (sampled pairs, random label IDs, Elo match shuffles) are drawn from experiment_rng().
+# Inside an `experiment_rng_scope` block (and its context-copying pools) that is the block's own seeded generator, so
+# experiments running concurrently draw independent, reproducible sequences; elsewhere it is the module-level `random`.
+_experiment_rng = contextvars.ContextVar("experiment_rng", default=None)
+
+@contextlib.contextmanager
+def experiment_rng_scope(seed):
+    """Draws experiment_rng() from random.Random(seed) inside this block; a None seed keeps the module-level generator."""
+    token = _experiment_rng.set(random.Random(seed) if seed is not None else None)
+    try:
+        yield
+    finally:
+        _experiment_rng.reset(token)
+
+def experiment_rng():
+    rng = _experiment_rng.get()
+    return rng if rng is not None else random
+
+class ContextThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    """ThreadPoolExecutor that runs each task in a copy of the submitting thread's context (so usage scopes carry over)."""
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def _record_usage(usage, latency_seconds):
+    usage = usage or {}
+    prompt_details = usage.get("prompt_tokens_details") or {}
+    with _usage_lock:
+        totals = _usage_totals.setdefault(_usage_scope.get(), {
+            "live_calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0,
+            "cost": 0.0, "latency_seconds": 0.0
+        })
+        totals["live_calls"] += 1
+        totals["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        totals["cached_prompt_tokens"] += prompt_details.get("cached_tokens") or 0
+        totals["completion_tokens"] += usage.get("completion_tokens") or 0
+        totals["cost"] += usage.get("cost") or 0.0
+        totals["latency_seconds"] += latency_seconds
+    budget_reservation = _budget_reservation.get()
+    if budget_reservation is not None:
+        _charge_budget(budget_reservation, (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0), usage.get("cost") or 0.0)
+
+def get_usage_report(scope_name=None):
+    """Usage totals for one scope, or {scope: totals} for all of them. Adds the cached share of prompt tokens and mean latency."""
+    with _usage_lock:
+        report = {name: dict(totals) for name, totals in _usage_totals.items()}
+    for totals in report.values():
+        totals["cached_prompt_token_ratio"] = totals["cached_prompt_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+        totals["mean_latency_seconds"] = totals["latency_seconds"] / totals["live_calls"] if totals["live_calls"] else 0.0
+    return report.get(scope_name) if scope_name is not None else report
+
+# --- Circuit breakers and failover ---
+# One breaker per model. It trips (opens) once at least `min_calls` of the last `window` live calls were made and
+# `error_rate_threshold` of them failed; while open, calls fail fast (or go to a configured failover model) instead
+# of retrying against a degraded endpoint. After `cooldown_seconds` a single probe call is let through (half-open):
+# success closes the breaker, failure opens it again for another cooldown.
+CIRCUIT_BREAKER_CONFIG = {"error_rate_threshold": 0.5, "window": 20, "min_calls": 10, "cooldown_seconds": 60}
+FAILOVER_MODELS = {}     # model -> list of equivalent models/endpoints to route to while its breaker is open
+_circuit_breakers = {}   # model -> breaker state dict
+_circuit_events = []     # Trip/probe/close events, in order
+_circuit_lock = threading.Lock()
+
+def set_circuit_breaker(error_rate_threshold=None, window=None, min_calls=None, cooldown_seconds=None):
+    """Updates the breaker settings; an error_rate_threshold of 0 disables the breakers."""
+    for setting, value in (("error_rate_threshold", error_rate_threshold), ("window", window), ("min_calls", min_calls), ("cooldown_seconds", cooldown_seconds)):
+        if value is not None:
+            CIRCUIT_BREAKER_CONFIG[setting] = value
+
+def set_failover_models(failover_models):
+    """Sets {model: [equivalent models]} used while a model's breaker is open."""
+    FAILOVER_MODELS.clear()
+    FAILOVER_MODELS.update({model: list(alternatives) for model, alternatives in failover_models.items()})
+
+def _get_circuit_breaker(model_name):
+    return _circuit_breakers.setdefault(model_name, {
+        "state": "closed", "recent_outcomes": collections.deque(maxlen=CIRCUIT_BREAKER_CONFIG["window"]),
+        "opened_at": None, "probe_in_flight": False,
+        "calls": 0, "errors": 0, "trips": 0, "fast_failures": 0, "failovers_to_other": 0
+    })
+
+def _log_circuit_event(model_name, event, **details):
+    _circuit_events.append({"time": time.time(), "model": model_name, "event": event, **details})
+
+def _circuit_allows_call(model_name):
+    """
+    Whether a live call to `model_name` may be sent now ("probe" when it is a half-open breaker's probe call). Moves an
+    open breaker to half-open once its cooldown is over.
+    """
+    if not CIRCUIT_BREAKER_CONFIG["error_rate_threshold"]:
+        return True
+    with _circuit_lock:
+        breaker = _get_circuit_breaker(model_name)
+        if breaker["state"] == "closed":
+            return True
+        if breaker["state"] == "open" and time.monotonic() - breaker["opened_at"] >= CIRCUIT_BREAKER_CONFIG["cooldown_seconds"]:
+            breaker["state"] = "half_open"
+            _log_circuit_event(model_name, "half_open")
+        if breaker["state"] == "half_open" and not breaker["probe_in_flight"]:
+            breaker["probe_in_flight"] = True
+            return "probe"
+        return False
+
+def _circuit_is_open(model_name):
+    with _circuit_lock:
+        breaker = _circuit_breakers.get(model_name)
+        return bool(breaker) and breaker["state"] == "open"
+
+def _record_circuit_outcome(model_name, succeeded):
+    if not CIRCUIT_BREAKER_CONFIG["error_rate_threshold"]:
+        return
+    with _circuit_lock:
+        breaker = _get_circuit_breaker(model_name)
+        breaker["calls"] += 1
+        breaker["errors"] += 0 if succeeded else 1
+        if breaker["state"] == "half_open" and breaker["probe_in_flight"]:
+            breaker["probe_in_flight"] = False
+            if succeeded:
+                breaker["state"] = "closed"
+                breaker["recent_outcomes"].clear()
+                _log_circuit_event(model_name, "closed")
+            else:
+                breaker["state"], breaker["opened_at"] = "open", time.monotonic()
+                _log_circuit_event(model_name, "reopened")
+            return
+        if breaker["state"] != "closed":
+            return  # Calls already in flight when the breaker tripped
+        breaker["recent_outcomes"].append(succeeded)
+        outcomes = breaker["recent_outcomes"]
+        error_rate = outcomes.count(False) / len(outcomes)
+        if len(outcomes) >= CIRCUIT_BREAKER_CONFIG["min_calls"] and error_rate >= CIRCUIT_BREAKER_CONFIG["error_rate_threshold"]:
+            breaker["state"], breaker["opened_at"] = "open", time.monotonic()
+            breaker["trips"] += 1
+            _log_circuit_event(model_name, "tripped", error_rate=error_rate, window_calls=len(outcomes))
+            print(f"Warning: Circuit breaker for {model_name} tripped ({error_rate:.0%} errors over the last {len(outcomes)} calls); "
+                  f"failing fast{' / failing over to ' + ', '.join(FAILOVER_MODELS[model_name]) if FAILOVER_MODELS.get(model_name) else ''} "
+                  f"for {CIRCUIT_BREAKER_CONFIG['cooldown_seconds']}s.")
+
+def _select_live_model(model_name):
+    """
+    (model to send a live call to, whether the call is that model's probe): the requested model, a failover model while
+    its breaker is open, or None (fail fast).
+    """
+    allowed = _circuit_allows_call(model_name)
+    if allowed:
+        return model_name, allowed == "probe"
+    for failover_model in FAILOVER_MODELS.get(model_name, []):
+        allowed = _circuit_allows_call(failover_model)
+        if allowed:
+            with _circuit_lock:
+                _get_circuit_breaker(model_name)["failovers_to_other"] += 1
+            return failover_model, allowed == "probe"
+    with _circuit_lock:
+        _get_circuit_breaker(model_name)["fast_failures"] += 1
+    return None, False
+
+def _undo_live_model_selection(model_name, live_model_name, probe_taken):
+    """For a selected call that is not sent after all: frees the probe slot it took and uncounts its failover."""
+    with _circuit_lock:
+        if probe_taken:
+            _get_circuit_breaker(live_model_name)["probe_in_flight"] = False
+        if live_model_name != model_name:
+            _get_circuit_breaker(model_name)["failovers_to_other"] -= 1
+
+def get_circuit_breaker_report():
+    """{"breakers": {model: state and counters}, "events": [trip/probe/close events]} for the run's metrics."""
+    with _circuit_lock:
+        breakers = {
+            model: {key: value for key, value in breaker.items() if key not in ("recent_outcomes", "opened_at", "probe_in_flight")}
+            for model, breaker in _circuit_breakers.items()
+        }
+        return {"breakers": breakers, "events": [dict(event) for event in _circuit_events]}
+
+# --- Hedged requests ---
+# Opt-in (set_hedging). A live call that has not returned after the model's observed `percentile` latency (over its
+# last `window` successful calls, once there are `min_samples`) gets a duplicate request, and the first successful
+# response wins; the other request is left to finish in the background. Each request holds its own slots in the
+# concurrency limits until it is done, winner or not: the duplicate is only sent if a global and a backend slot are
+# free right away. Duplicates are capped at `max_extra_fraction` of the model's live calls, which bounds the extra
+# spend. The primary latency of the last HEDGE_REPORT_SAMPLES calls (what they would have taken unhedged) is kept next
+# to their effective latency, so the report shows the hedge rate and the change in p99.
+HEDGE_CONFIG = {"enabled": False, "percentile": 95, "window": 200, "min_samples": 20, "max_extra_fraction": 0.05}
+HEDGE_REPORT_SAMPLES = 10000
+_hedge_stats = {}        # model -> counters and latency samples
+_hedge_lock = threading.Lock()
+_hedge_executor = None   # Runs primaries and duplicates of hedged calls; created on first use
+
+def set_hedging(enabled=None, percentile=None, window=None, min_samples=None, max_extra_fraction=None):
+    for setting, value in (("enabled", enabled), ("percentile", percentile), ("window", window), ("min_samples", min_samples), ("max_extra_fraction", max_extra_fraction)):
+        if value is not None:
+            HEDGE_CONFIG[setting] = value
+
+def _get_hedge_stats(model_name):
+    return _hedge_stats.setdefault(model_name, {
+        "calls": 0, "hedged": 0, "hedge_wins": 0, "skipped_by_cap": 0, "skipped_no_slot": 0,
+        "recent_seconds": collections.deque(maxlen=HEDGE_CONFIG["window"]),  # Successful primaries, for the hedge delay
+        "primary_seconds": collections.deque(maxlen=HEDGE_REPORT_SAMPLES),
+        "effective_seconds": collections.deque(maxlen=HEDGE_REPORT_SAMPLES)
+    })
+
+def _percentile(values, percentile):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, -(-len(ordered) * percentile // 100) - 1))]
+
+def _record_primary_latency(model_name, seconds, llm_response):
+    with _hedge_lock:
+        stats = _get_hedge_stats(model_name)
+        stats["primary_seconds"].append(seconds)
+        if not llm_response.startswith("Error"):
+            stats["recent_seconds"].append(seconds)
+
+def _future_response(future):
+    try:
+        return future.result()
+    except Exception as exc:
+        return f"Error: Exception during API call: {exc}"
+
+def _call_live_with_hedging(call_slots, prompt_text, actual_model_name, quiet, temperature, system_prompt_text, cache_control=False, response_format=None, top_logprobs=None):
+    """
+    _call_openrouter_api_live with a duplicate request once the call outlasts the model's hedge delay (see above).
+    Takes over the primary request's acquired `call_slots` and releases them when that request is done.
+    """
+    global _hedge_executor
+    call_args = (prompt_text, actual_model_name, quiet, temperature, system_prompt_text, cache_control, response_format, top_logprobs)
+    with _hedge_lock:
+        stats = _get_hedge_stats(actual_model_name)
+        stats["calls"] += 1
+        recent_seconds = list(stats["recent_seconds"])
+        if _hedge_executor is None:
+            _hedge_executor = ContextThreadPoolExecutor(max_workers=max(32, 4 * MAX_CONCURRENT_API_CALLS), thread_name_prefix="hedge")
+    started_at = time.monotonic()
+
+    if len(recent_seconds) < HEDGE_CONFIG["min_samples"]:
+        try:
+            llm_response = _call_openrouter_api_live(*call_args)
+        finally:
+            _release_call_slots(call_slots)
+        _record_primary_latency(actual_model_name, time.monotonic() - started_at, llm_response)
+        with _hedge_lock:
+            stats["effective_seconds"].append(time.monotonic() - started_at)
+        return llm_response
+
+    budget_reservation = _budget_reservation.get()
+    primary = _hedge_executor.submit(_call_openrouter_api_live, *call_args)
+    primary.add_done_callback(lambda _: _release_call_slots(call_slots)) # It may outlive this call (when the duplicate wins)
+    primary.add_done_callback(lambda future: _record_primary_latency(actual_model_name, time.monotonic() - started_at, _future_response(future)))
+    if budget_reservation is not None:
+        # The primary may outlive this call (when the duplicate wins), so it holds the budget reservation until it is done
+        with _budget_lock:
+            budget_reservation["holds"] += 1
+        primary.add_done_callback(lambda _: _release_budget(budget_reservation))
+    if not concurrent.futures.wait([primary], timeout=_percentile(recent_seconds, HEDGE_CONFIG["percentile"])).done:
+        with _hedge_lock:
+            under_cap = stats["hedged"] + 1 <= HEDGE_CONFIG["max_extra_fraction"] * stats["calls"]
+        hedge_slots = _acquire_call_slots(actual_model_name, blocking=False) if under_cap else None
+        hedge_allowed = hedge_slots is not None and (budget_reservation is None or _reserve_duplicate_budget(budget_reservation))
+        if hedge_slots is not None and not hedge_allowed:
+            _release_call_slots(hedge_slots)
+        with _hedge_lock:
+            stats["hedged" if hedge_allowed else "skipped_no_slot" if under_cap and hedge_slots is None else "skipped_by_cap"] += 1
+        if hedge_allowed:
+            hedge = _hedge_executor.submit(_call_openrouter_api_live, prompt_text, actual_model_name, True, temperature, system_prompt_text, cache_control, response_format, top_logprobs)
+            hedge.add_done_callback(lambda _: _release_call_slots(hedge_slots))
+            if budget_reservation is not None:
+                hedge.add_done_callback(lambda _: _release_budget(budget_reservation))
+            responses, pending = {}, {primary, hedge}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                responses.update((future, _future_response(future)) for future in done)
+                winner = next((future for future in (primary, hedge) if future in responses and not responses[future].startswith("Error")), None)
+                if winner is not None:
+                    break
+            else:
+                winner = primary # Both failed: report the primary's error
+            with _hedge_lock:
+                stats["hedge_wins"] += winner is hedge
+                stats["effective_seconds"].append(time.monotonic() - started_at)
+            return responses[winner]
+
+    llm_response = _future_response(primary)
+    with _hedge_lock:
+        stats["effective_seconds"].append(time.monotonic() - started_at)
+    return llm_response
+
+def get_hedging_report():
+    """{model: hedged calls, hedge rate, wins, current hedge delay, and p50/p99 of primary vs effective latency}."""
+    with _hedge_lock:
+        report = {}
+        for model, stats in _hedge_stats.items():
+            if not stats["calls"]:
+                continue
+            model_report = {key: stats[key] for key in ("calls", "hedged", "hedge_wins", "skipped_by_cap", "skipped_no_slot")}
+            model_report["hedge_rate"] = stats["hedged"] / stats["calls"]
+            model_report["hedge_delay_seconds"] = _percentile(stats["recent_seconds"], HEDGE_CONFIG["percentile"]) if len(stats["recent_seconds"]) >= HEDGE_CONFIG["min_samples"] else None
+            for label in ("primary", "effective"):
+                samples = stats[f"{label}_seconds"]
+                model_report[f"p50_{label}_seconds"] = _percentile(samples, 50) if samples else None
+                model_report[f"p99_{label}_seconds"] = _percentile(samples, 99) if samples else None
+            if model_report["p99_primary_seconds"] is not None and model_report["p99_effective_seconds"] is not None:
+                model_report["p99_improvement_seconds"] = model_report["p99_primary_seconds"] - model_report["p99_effective_seconds"]
+            report[model] = model_report
+        return report
+
+# --- Spend budgets ---
+# Limits on live calls, tokens (prompt + completion) and provider-reported cost, for the whole run, per model and per
+# experiment (usage scope, i.e. one experiment of one model). Before it is sent, a live call reserves its share of
+# every applicable budget under one lock: one call, its prompt's tokens (CHARS_PER_BUDGET_TOKEN characters per token)
+# plus MAX_COMPLETION_TOKENS, and the cost of those tokens for the model actually called (a failover model is priced
+# as itself). Reservations count against the limits, so concurrent calls cannot jointly overshoot them. Costs come
+# from the price table (set_budget_prices, USD per 1M prompt/completion tokens) or else the model's settled cost per
+# token; a model with neither has at most one call in flight under a cost budget until one has settled. A hedged
+# duplicate reserves a share of its own and is not sent without headroom. Once every request of a call (duplicates
+# included) has finished, its token and cost reservations are replaced by the usage it reported. A call that only
+# fits once in-flight calls have settled waits for them; a call that does not fit the settled usage is refused
+# without being sent (BUDGET_EXCEEDED_RESPONSE). Replayed and batch-collected requests are not charged.
+MAX_COMPLETION_TOKENS = 1000
+CHARS_PER_BUDGET_TOKEN = 4
+BUDGET_LEVELS = ("run", "model", "experiment")
+BUDGET_KINDS = ("calls", "tokens", "cost")
+BUDGETS = {}             # (level, kind) -> limit
+BUDGET_PRICES = {}       # model -> {"prompt": USD per 1M tokens, "completion": USD per 1M tokens}
+BUDGET_EXCEEDED_RESPONSE = "Error: Budget exceeded (the request was not sent)."
+_budget_spent = {}       # (level, key) -> {"calls", "tokens", "cost"}: settled usage plus in-flight reservations
+_budget_in_flight = {}   # (level, key) -> {"tokens", "cost"} reserved by calls that have not settled yet
+_budget_refusals = {}    # (level, key, kind) -> number of refused calls
+_model_token_costs = {}  # model -> [settled tokens, settled cost], for cost reservations
+_unpriced_in_flight = {} # model -> calls in flight under a cost budget without a price or cost history
+_budget_lock = threading.Lock()
+_budget_settled = threading.Condition(_budget_lock)
+_budget_reservation = contextvars.ContextVar("budget_reservation", default=None)
+
+def set_budget(level, kind, limit):
+    """Limits `kind` ("calls", "tokens" or "cost" in USD) for the run, each model or each experiment (`level`); None removes it."""
+    if level not in BUDGET_LEVELS or kind not in BUDGET_KINDS:
+        raise ValueError(f"Unknown budget {level}:{kind}. Expected a level in {BUDGET_LEVELS} and a kind in {BUDGET_KINDS}.")
+    if limit is None:
+        BUDGETS.pop((level, kind), None)
+    else:
+        BUDGETS[(level, kind)] = limit
+
+def set_budget_prices(price_table):
+    """Sets {model: {"prompt": USD per 1M tokens, "completion": USD per 1M tokens}} used to reserve cost budgets."""
+    BUDGET_PRICES.clear()
+    BUDGET_PRICES.update(price_table or {})
+
+def is_budget_exceeded_response(llm_response):
+    return llm_response == BUDGET_EXCEEDED_RESPONSE
+
+def _reserved_cost(model_name, prompt_tokens):
+    """Cost reserved for one request to `model_name`, or None without a price or settled cost history. Callers hold _budget_lock."""
+    prices = BUDGET_PRICES.get(model_name)
+    if prices:
+        return (prompt_tokens * prices.get("prompt", 0.0) + MAX_COMPLETION_TOKENS * prices.get("completion", 0.0)) / 1_000_000
+    settled_tokens, settled_cost = _model_token_costs.get(model_name, (0, 0.0))
+    return (prompt_tokens + MAX_COMPLETION_TOKENS) * settled_cost / settled_tokens if settled_tokens else None
+
+def _budget_fit(budget_keys, share):
+    """"fits", "wait" (fits once in-flight calls settle) or the refused (level, key, kind). Callers hold _budget_lock."""
+    must_wait = False
+    for level, key in budget_keys:
+        spent = _budget_spent.setdefault((level, key), {"calls": 0, "tokens": 0, "cost": 0.0})
+        in_flight = _budget_in_flight.setdefault((level, key), {"tokens": 0, "cost": 0.0})
+        for kind in BUDGET_KINDS:
+            limit = BUDGETS.get((level, kind))
+            if limit is None or spent[kind] + share[kind] <= limit:
+                continue
+            if kind != "calls" and spent[kind] - in_flight[kind] + share[kind] <= limit:
+                must_wait = True # In-flight calls may settle below their reservations
+                continue
+            return (level, key, kind)
+    return "wait" if must_wait else "fits"
+
+def _add_budget_share(reservation, share):
+    # Callers hold _budget_lock
+    for level, key in reservation["keys"]:
+        for kind in BUDGET_KINDS:
+            _budget_spent[(level, key)][kind] += share[kind]
+        for kind in ("tokens", "cost"):
+            _budget_in_flight[(level, key)][kind] += share[kind]
+    for kind in BUDGET_KINDS:
+        reservation[kind] += share[kind]
+    reservation["holds"] += 1
+
+def _reserve_budget(model_name, live_model_name, prompt_chars):
+    """The reservation for one live call to `live_model_name` (None without budgets), or False if it does not fit a budget."""
+    if not BUDGETS:
+        return None
+    budget_keys = [("run", "run"), ("model", model_name), ("experiment", _usage_scope.get())]
+    prompt_tokens = -(-prompt_chars // CHARS_PER_BUDGET_TOKEN)
+    cost_budgeted = any(kind == "cost" for _, kind in BUDGETS)
+    with _budget_settled:
+        while True:
+            reserved_cost = _reserved_cost(live_model_name, prompt_tokens)
+            unpriced = cost_budgeted and reserved_cost is None
+            share = {"calls": 1, "tokens": prompt_tokens + MAX_COMPLETION_TOKENS, "cost": reserved_cost or 0.0}
+            fit = _budget_fit(budget_keys, share)
+            if fit == "fits" and unpriced and _unpriced_in_flight.get(live_model_name):
+                fit = "wait" # Until a settled call gives the model a cost per token
+            if fit == "fits":
+                break
+            if fit != "wait":
+                _budget_refusals[fit] = _budget_refusals.get(fit, 0) + 1
+                return False
+            _budget_settled.wait()
+        reservation = {"keys": budget_keys, "model": live_model_name, "prompt_tokens": prompt_tokens, "unpriced": unpriced,
+                       "calls": 0, "tokens": 0, "cost": 0.0, "used_tokens": 0, "used_cost": 0.0, "holds": 0}
+        _add_budget_share(reservation, share)
+        if unpriced:
+            _unpriced_in_flight[live_model_name] = _unpriced_in_flight.get(live_model_name, 0) + 1
+    return reservation
+
+def _reserve_duplicate_budget(reservation):
+    """Reserves a share for a hedged duplicate of the call; False (nothing reserved) if it does not fit right now."""
+    with _budget_lock:
+        if reservation["unpriced"]:
+            return False # Its cost could not be reserved
+        share = {"calls": 1, "tokens": reservation["prompt_tokens"] + MAX_COMPLETION_TOKENS,
+                 "cost": _reserved_cost(reservation["model"], reservation["prompt_tokens"]) or 0.0}
+        if _budget_fit(reservation["keys"], share) != "fits":
+            return False
+        _add_budget_share(reservation, share)
+        return True
+
+def _charge_budget(reservation, tokens, cost):
+    """Adds usage reported by one of the call's requests."""
+    with _budget_lock:
+        reservation["used_tokens"] += tokens
+        reservation["used_cost"] += cost
+
+def _release_budget(reservation):
+    """Ends one of the call's requests; after the last one, its token and cost reservations are replaced by the reported usage."""
+    with _budget_settled:
+        reservation["holds"] -= 1
+        if reservation["holds"]:
+            return
+        for level, key in reservation["keys"]:
+            for kind in ("tokens", "cost"):
+                _budget_spent[(level, key)][kind] += reservation[f"used_{kind}"] - reservation[kind]
+                _budget_in_flight[(level, key)][kind] -= reservation[kind]
+        model_token_costs = _model_token_costs.setdefault(reservation["model"], [0, 0.0])
+        model_token_costs[0] += reservation["used_tokens"]
+        model_token_costs[1] += reservation["used_cost"]
+        if reservation["unpriced"]:
+            _unpriced_in_flight[reservation["model"]] -= 1
+        _budget_settled.notify_all()
+
+def get_budget_report():
+    """{"limits": {"level:kind": limit}, "spent": [{level, key, calls, tokens, cost, refused}], "exhausted": bool}."""
+    with _budget_lock:
+        spent = []
+        for (level, key), totals in _budget_spent.items():
+            refused = {kind: count for (refused_level, refused_key, kind), count in _budget_refusals.items() if (refused_level, refused_key) == (level, key)}
+            spent.append({"level": level, "key": key, **totals, "refused": refused})
+        return {"limits": {f"{level}:{kind}": limit for (level, kind), limit in BUDGETS.items()}, "spent": spent, "exhausted": bool(_budget_refusals)}
+
+def run_budget_exhausted(model_name=None):
+    """Whether a run budget (or, with `model_name`, that model's budget) has refused a call."""
+    with _budget_lock:
+        return any(level == "run" or (level == "model" and key == model_name) for level, key, _ in _budget_refusals)
+
+# --- Response log (record/replay) and sharding ---
+# Every LLM request is identified by a stable key over (model, temperature, system prompt, prompt).
+# A shard only sends the requests whose key hashes to it and records the responses to RESPONSE_LOG_PATH;
+# merging replays the recorded responses through the unchanged experiment code, so the merged results
+# JSON is produced by exactly the same analysis as a single-process run.
+RESPONSE_LOG_PATH = None
+SHARD_INDEX = None
+SHARD_COUNT = None
+_replay_responses = {}   # request key -> list of recorded responses, consumed in order
+_replay_positions = {}   # request key -> index of the next response to hand out
+_replay_only = False     # When True (merge mode), requests with no recorded response are never sent
+_response_log_stats = {"live": 0, "recorded": 0, "replayed": 0, "skipped_out_of_shard": 0, "replay_misses": 0, "deferred_to_batch": 0}
+_response_log_lock = threading.Lock()
+_batch_collector = None  # While a list (batch mode), requests without a recorded response are collected here instead of sent
+BATCH_DEFERRED_RESPONSE = "Error: Deferred to batch (the response is requested in the next batch round)."
+SHARD_SKIPPED_RESPONSE = "Error: Skipped (the request belongs to another shard; its response comes from the merge)."
+
+def make_request_key(model_name, temperature, system_prompt_text, prompt_text, response_format=None, top_logprobs=None):
+    """Stable identifier for one LLM request, shared by all processes that build the same prompt."""
+    key_fields = [model_name, temperature, system_prompt_text or "", prompt_text]
+    if response_format is not None: # Only part of the key when set, so existing logs keep replaying
+        key_fields.append(response_format)
+    if top_logprobs: # Likewise; a logprob response is an envelope, not the plain text an otherwise identical request returns
+        key_fields.append({"top_logprobs": top_logprobs})
+    payload = json.dumps(key_fields, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def shard_for_request_key(request_key, shard_count):
+    return int(request_key[:12], 16) % shard_count
+
+def set_shard(shard_index, shard_count):
+    """Restricts live API calls to the requests assigned to shard `shard_index` of `shard_count` (None disables sharding)."""
+    global SHARD_INDEX, SHARD_COUNT
+    SHARD_INDEX, SHARD_COUNT = shard_index, shard_count
+
+def read_response_log(path):
+    """Yields the entries of a response log, skipping (and reporting) malformed lines such as a torn final write."""
+    with open(path, 'r') as log_file:
+        for line_number, line in enumerate(log_file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Warning: Skipping malformed line {line_number} in response log {path}.")
+
+def load_response_logs(paths, replay_only=False):
+    """Loads recorded responses for replay. Returns the number of responses loaded."""
+    global _replay_only
+    loaded = 0
+    with _response_log_lock:
+        for path in paths:
+            for entry in read_response_log(path):
+                _replay_responses.setdefault(entry["key"], []).append(entry["response"])
+                loaded += 1
+        _replay_only = replay_only
+    return loaded
 
-    # Use override model_name if provided, otherwise use the global config
+def set_response_log(path, resume=True):
+    """Appends every live response to `path`. With `resume`, responses already in the file are replayed instead of re-requested."""
+    global RESPONSE_LOG_PATH
+    if resume and path and os.path.exists(path):
+        load_response_logs([path])
+    elif path:
+        parent_dir = os.path.dirname(path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+    RESPONSE_LOG_PATH = path
+
+def get_response_log_stats():
+    with _response_log_lock:
+        return dict(_response_log_stats)
+
+def add_replay_responses(entries):
+    """Makes responses ({"key", "response"} entries, e.g. from a completed batch) available for replay."""
+    with _response_log_lock:
+        for entry in entries:
+            _replay_responses.setdefault(entry["key"], []).append(entry["response"])
+
+def reset_replay_positions():
+    """Replays every recorded response from the start again, for re-running an experiment over the same log."""
+    with _response_log_lock:
+        _replay_positions.clear()
+
+def is_deferred_response(llm_response):
+    """True for the placeholder returned while a request is collected for a batch (retrying it only queues it again)."""
+    return llm_response == BATCH_DEFERRED_RESPONSE
+
+def is_shard_skipped_response(llm_response):
+    """True for the placeholder of a request owned by another shard (retrying it only skips it again)."""
+    return llm_response == SHARD_SKIPPED_RESPONSE
+
+def start_batch_collection():
+    """
+    From now on, requests that have no recorded response are collected (see stop_batch_collection) instead of sent.
+    Used for batch rounds and for --plan dry runs.
+    """
+    global _batch_collector
+    with _response_log_lock:
+        _batch_collector = []
+
+def stop_batch_collection():
+    """Stops collecting and returns the collected requests, in the order they were made."""
+    global _batch_collector
+    with _response_log_lock:
+        collected, _batch_collector = _batch_collector or [], None
+    return collected
+
+def call_openrouter_api(prompt_text, model_name_override=None, quiet=False, temperature=None, system_prompt_text=None, cache_control=False, response_format=None, top_logprobs=None):
+    """
+    Calls the model's backend (OpenRouter by default, see BACKENDS) with the given prompt, optionally including a system prompt.
+    With `cache_control`, the system prompt is marked as a cacheable prefix for providers that need explicit hints.
+    `response_format` (e.g. {"type": "json_schema", ...}) asks for provider-enforced structured output.
+    With `top_logprobs` (k), the k most likely tokens at every output position are requested as well and the response
+    is a logprob envelope (see format_logprob_response / split_logprob_response) instead of the plain text.
+    Recorded responses are replayed first; with sharding enabled, requests owned by other shards are not sent.
+    """
     actual_model_name = model_name_override if model_name_override else BIAS_SUITE_LLM_MODEL
+    actual_temperature = temperature if temperature is not None else 0.1
+    request_key = make_request_key(actual_model_name, actual_temperature, system_prompt_text, prompt_text, response_format, top_logprobs)
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost/bias_suite", 
-        "X-Title": "Bias Suite Experiment"
-    }
+    with _response_log_lock:
+        call_tally = _call_tally.get()
+        if call_tally is not None:
+            call_tally["calls"] = call_tally.get("calls", 0) + 1
+        recorded = _replay_responses.get(request_key)
+        position = _replay_positions.get(request_key, 0)
+        if recorded and position < len(recorded):
+            _replay_positions[request_key] = position + 1
+            _response_log_stats["replayed"] += 1
+            return recorded[position]
+        if _replay_only:
+            _response_log_stats["replay_misses"] += 1
+            return "Error: No recorded response for this request in the loaded response logs."
+        if SHARD_COUNT and shard_for_request_key(request_key, SHARD_COUNT) != SHARD_INDEX:
+            _response_log_stats["skipped_out_of_shard"] += 1
+            if call_tally is not None:
+                call_tally["pending"] = call_tally.get("pending", 0) + 1
+            return SHARD_SKIPPED_RESPONSE
+        if _batch_collector is not None:
+            _batch_collector.append({
+                "key": request_key, "model": actual_model_name, "temperature": actual_temperature,
+                "scope": _usage_scope.get(), "latency_group": _latency_group.get(),
+                "call_args": {"prompt_text": prompt_text, "actual_model_name": actual_model_name, "temperature": actual_temperature,
+                              "system_prompt_text": system_prompt_text, "cache_control": cache_control, "response_format": response_format,
+                              "top_logprobs": top_logprobs}
+            })
+            _response_log_stats["deferred_to_batch"] += 1
+            if call_tally is not None:
+                call_tally["pending"] = call_tally.get("pending", 0) + 1
+            return BATCH_DEFERRED_RESPONSE
+
+    live_model_name, probe_taken = _select_live_model(actual_model_name)
+    if live_model_name is None:
+        return f"Error: Circuit breaker open for {actual_model_name} (failing fast; no failover model available)."
+    budget_reservation = _reserve_budget(actual_model_name, live_model_name, len(prompt_text) + len(system_prompt_text or ""))
+    if budget_reservation is False:
+        _undo_live_model_selection(actual_model_name, live_model_name, probe_taken)
+        return BUDGET_EXCEEDED_RESPONSE
+    with _response_log_lock:
+        _response_log_stats["live"] += 1
+
+    budget_token = _budget_reservation.set(budget_reservation)
+    try:
+        call_slots = _acquire_call_slots(live_model_name)
+        call_started_at = time.monotonic()
+        if HEDGE_CONFIG["enabled"]:
+            llm_response = _call_live_with_hedging(call_slots, prompt_text, live_model_name, quiet, actual_temperature, system_prompt_text, cache_control, response_format, top_logprobs)
+        else:
+            try:
+                llm_response = _call_openrouter_api_live(prompt_text, live_model_name, quiet, actual_temperature, system_prompt_text, cache_control, response_format, top_logprobs)
+            finally:
+                _release_call_slots(call_slots)
+        call_seconds = time.monotonic() - call_started_at
+    finally:
+        _budget_reservation.reset(budget_token)
+        if budget_reservation is not None:
+            _release_budget(budget_reservation)
+    _record_circuit_outcome(live_model_name, not llm_response.startswith("Error"))
+    if LATENCY_OBSERVER is not None and not llm_response.startswith("Error"):
+        LATENCY_OBSERVER(live_model_name, _latency_group.get(), len(prompt_text) + len(system_prompt_text or ""), call_seconds)
 
+    # Failover responses are not recorded: replaying them later would attribute another model's answer to this one.
+    if RESPONSE_LOG_PATH and not llm_response.startswith("Error") and live_model_name == actual_model_name:
+        entry = {"key": request_key, "model": actual_model_name, "temperature": actual_temperature, "response": llm_response}
+        with _response_log_lock:
+            with open(RESPONSE_LOG_PATH, 'a') as log_file:
+                log_file.write(json.dumps(entry) + "\n")
+            _response_log_stats["recorded"] += 1
+    return llm_response
+
+def build_chat_request(prompt_text, actual_model_name, temperature, system_prompt_text=None, cache_control=False, response_format=None, top_logprobs=None):
+    """The chat completion request body for one call (also written to batch input files)."""
     messages = []
-    if system_prompt_text:
+    if system_prompt_text and cache_control:
+        # Explicit breakpoint for providers with opt-in prompt caching; others cache long stable prefixes automatically.
+        messages.append({"role": "system", "content": [{"type": "text", "text": system_prompt_text, "cache_control": {"type": "ephemeral"}}]})
+    elif system_prompt_text:
         messages.append({"role": "system", "content": system_prompt_text})
     messages.append({"role": "user", "content": prompt_text})
 
     data = {
         "model": actual_model_name,
         "messages": messages,
-        "max_tokens": 1000, 
-        "temperature": temperature if temperature is not None else 0.1
+        "max_tokens": MAX_COMPLETION_TOKENS,
+        "temperature": temperature,
+        "usage": {"include": True} # Ask OpenRouter for token counts (incl. cached tokens) and cost
     }
+    if response_format:
+        data["response_format"] = response_format
+        data["provider"] = {"require_parameters": True} # Only route to providers that honour response_format
+    if top_logprobs:
+        # Not combined with require_parameters: providers without logprobs still answer, and the text is parsed instead.
+        data["logprobs"] = True
+        data["top_logprobs"] = top_logprobs
+    return data
+
+def format_logprob_response(content, logprobs):
+    """
+    The response string for a request made with `top_logprobs`: JSON with the message text and the choice's
+    `logprobs.content` list (None when the provider returned no logprobs). Keeping it a string lets replay, response
+    logs and batch results handle it like any other response.
+    """
+    return json.dumps({"content": content, "logprobs": logprobs})
+
+def split_logprob_response(llm_response):
+    """(content, logprobs) from a logprob envelope; plain text (e.g. an 'Error: ...' string) comes back as (text, None)."""
+    if isinstance(llm_response, str) and llm_response.startswith('{"content"'):
+        try:
+            envelope = json.loads(llm_response)
+            return envelope.get("content") or "", envelope.get("logprobs")
+        except json.JSONDecodeError:
+            pass
+    return llm_response, None
+
+def _call_openrouter_api_live(prompt_text, actual_model_name, quiet, temperature, system_prompt_text, cache_control=False, response_format=None, top_logprobs=None):
+    """Sends one chat completion request to the model's backend (with retries) and returns the content or an 'Error: ...' string."""
+    import requests # Imported on first use so that --help and fully replayed runs do not load it
+    backend_name, backend, served_model_name = resolve_backend(actual_model_name)
+    api_key = _backend_api_key(backend_name, backend)
+
+    if not api_key and backend_name == "openrouter":
+        # This case is critical and should be loud if not quiet.
+        error_msg = "Error: OPENROUTER_API_KEY is not set. Ensure it is loaded and set via set_api_key()."
+        if not quiet: print(f"CRITICAL_API_CALL_FAILURE: {error_msg}")
+        return error_msg
+
+    headers = {"Content-Type": "application/json", **backend["headers"]}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+
+    data = build_chat_request(prompt_text, served_model_name, temperature, system_prompt_text, cache_control, response_format, top_logprobs)
+    if not backend["openrouter_extensions"]:
+        data = strip_openrouter_extensions(data)
     
     # DEBUG: Print the exact payload before sending
     if not quiet:
@@ -68,9 +909,11 @@ def call_openrouter_api(prompt_text, model_name_override=None, quiet=False, temp
         if not quiet:
             print(f"    [API Call Attempt {attempt + 1}/{max_retries} to {actual_model_name}] Sending request...")
         try:
-            response = requests.post(OPENROUTER_API_URL, headers=headers, json=data, timeout=60)
+            request_started_at = time.monotonic()
+            response = requests.post(backend["url"], headers=headers, json=data, timeout=backend["timeout"])
             response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
             response_data = response.json()
+            _record_usage(response_data.get('usage'), time.monotonic() - request_started_at)
             
             llm_content = None
             message_obj = response_data.get('choices', [{}])[0].get('message', {})
@@ -101,10 +944,12 @@ def call_openrouter_api(prompt_text, model_name_override=None, quiet=False, temp
                 # The success/info log above is now the primary indicator.
                 pass # The specific "Received response." log is now part of the conditional logs above.
 
+            if top_logprobs:
+                return format_logprob_response(llm_content.strip(), (response_data['choices'][0].get('logprobs') or {}).get('content'))
             return llm_content.strip()
             
         except requests.exceptions.HTTPError as http_err:
-            error_message = f"HTTPError calling OpenRouter API ({actual_model_name}): {http_err.response.status_code} {http_err.response.reason}."
+            error_message = f"HTTPError calling {backend_name} API ({actual_model_name}): {http_err.response.status_code} {http_err.response.reason}."
             try:
                 error_details_json = http_err.response.json()
                 error_message += f" API Response: {error_details_json}"
@@ -121,13 +966,13 @@ def call_openrouter_api(prompt_text, model_name_override=None, quiet=False, temp
 
         except requests.exceptions.RequestException as e:
             # Catches other network errors like ConnectionError, Timeout, etc.
-            error_message = f"RequestException calling OpenRouter API ({actual_model_name}): {e}"
+            error_message = f"RequestException calling {backend_name} API ({actual_model_name}): {e}"
             if not quiet:
                 print(f"    [API Call RequestException for {actual_model_name}, Attempt {attempt + 1}/{max_retries}] {error_message}")
         
         except (KeyError, IndexError, json.JSONDecodeError) as e: # Added json.JSONDecodeError here
             # Handles issues with parsing the expected JSON structure from a 200 OK response
-            error_message = f"Error parsing OpenRouter response structure ({actual_model_name}): {e}."
+            error_message = f"Error parsing {backend_name} response structure ({actual_model_name}): {e}."
             if 'response' in locals() and response is not None:
                 error_message += f" Raw Response Text: {response.text}"
             else:
@@ -138,6 +983,9 @@ def call_openrouter_api(prompt_text, model_name_override=None, quiet=False, temp
             # However, if it was a truncated response, a retry *might* help. For now, we let it retry.
 
         # Common logic for retrying if not a critical non-retry HTTPError
+        if attempt < max_retries - 1 and _circuit_is_open(actual_model_name):
+            # Other calls have tripped this model's breaker meanwhile; retrying would only hammer it further.
+            return f"Error: Circuit breaker opened for {actual_model_name} during retries. Last error: {error_message}"
         if attempt < max_retries - 1:
             if not quiet:
                 print(f"    [API Call {actual_model_name}] Retrying in {retry_delay} seconds...")
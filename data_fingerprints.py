@@ -0,0 +1,195 @@
+"""
+Fingerprints of the datasets an experiment reads.
+
+Every dataset gets a fingerprint (a hash of its canonical JSON) and every item in it an item fingerprint, keyed
+by the item's ID (the dict key for dict datasets such as rubrics and category sets). Both are computed once per
+process and cached, however many models or experiments use the dataset.
+
+bias_analyzer.py appends one record per results file to `results_manifest.jsonl` in the output directory, with
+the fingerprints of the datasets behind it and, compared with the previous record for the same results type and
+model, exactly which items were added, removed or changed. Resume and cache logic can use `diff_fingerprints`
+to invalidate only the affected tasks.
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+from item_store import TEST_DATA_DATASETS, load_dataset
+
+RESULTS_MANIFEST_FILENAME = "results_manifest.jsonl"
+
+# Field used as the item ID in list datasets (items without it are keyed by their position, e.g. "#3").
+ITEM_ID_KEYS = {
+    **{dataset_name: config["id_key"] for dataset_name, config in TEST_DATA_DATASETS.items()},
+    "RANKING_SETS": "id",
+    "PROMPT_VARIANT_STRATEGIES": "strategy_id",
+}
+
+ALL_DATASET_NAMES = [
+    "PICKING_PAIRS", "POEMS_FOR_SCORING", "TEXTS_FOR_SENTIMENT_SCORING",
+    "TEXTS_FOR_CRITERION_ADHERENCE_SCORING", "FEW_SHOT_EXAMPLE_SETS_SCORING",
+    "RANKING_SETS", "SHORT_ARGUMENTS_FOR_SCORING", "ARGUMENT_EVALUATION_RUBRIC",
+    "STORY_OPENINGS_FOR_SCORING", "STORY_OPENING_EVALUATION_RUBRIC",
+    "CLASSIFICATION_ITEMS", "CLASSIFICATION_CATEGORIES", "PROMPT_VARIANT_STRATEGIES"
+]
+
+MULTI_CRITERIA_TASK_DATASETS = {
+    "argument": ["SHORT_ARGUMENTS_FOR_SCORING", "ARGUMENT_EVALUATION_RUBRIC"],
+    "story_opening": ["STORY_OPENINGS_FOR_SCORING", "STORY_OPENING_EVALUATION_RUBRIC"],
+}
+
+_fingerprint_cache = {}
+_payload_hash_cache = {}
+_fingerprint_cache_lock = threading.Lock()
+
+
+def dataset_names_for_results_type(results_type: str, scoring_type: str = "all") -> list:
+    """
+    The datasets behind a results type ("picking", "scoring", "multi_criteria_argument",
+    "adv_multi_criteria_isolated_story_opening", "classification", ... or "all"), in hashing order.
+    """
+    if results_type == "all":
+        return list(ALL_DATASET_NAMES)
+    if results_type == "picking":
+        return ["PICKING_PAIRS"]
+    if results_type == "scoring":
+        names = []
+        if scoring_type in ("poems", "all"):
+            names.append("POEMS_FOR_SCORING")
+        if scoring_type in ("sentiment", "all"):
+            names.append("TEXTS_FOR_SENTIMENT_SCORING")
+        if scoring_type in ("criterion_adherence", "all"):
+            names.append("TEXTS_FOR_CRITERION_ADHERENCE_SCORING")
+        return names + ["FEW_SHOT_EXAMPLE_SETS_SCORING"] # All few-shot sets
+    if results_type == "pairwise_elo":
+        return ["RANKING_SETS"]
+    if results_type == "classification":
+        return ["CLASSIFICATION_ITEMS", "CLASSIFICATION_CATEGORIES", "PROMPT_VARIANT_STRATEGIES"]
+    for task_name, names in MULTI_CRITERIA_TASK_DATASETS.items():
+        if results_type.startswith(("multi_criteria", "adv_multi_criteria")) and results_type.endswith(task_name):
+            return list(names)
+    return []
+
+
+def _canonical_json(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+def _hash_text(text: str, length: int = 16) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:length]
+
+
+def _materialize(dataset):
+    """Item-store backed datasets are lists of lazy `StoredItem`s; hashing needs the full records."""
+    if isinstance(dataset, list):
+        return [item.to_dict() if hasattr(item, "to_dict") else item for item in dataset]
+    return dataset
+
+
+def _item_fingerprints(dataset_name: str, dataset) -> dict:
+    if isinstance(dataset, dict):
+        return {str(key): _hash_text(_canonical_json(value)) for key, value in dataset.items()}
+    id_key = ITEM_ID_KEYS.get(dataset_name)
+    fingerprints = {}
+    for position, item in enumerate(dataset):
+        item_id = item.get(id_key) if isinstance(item, dict) and id_key else None
+        fingerprints[str(item_id) if item_id is not None else f"#{position}"] = _hash_text(_canonical_json(item))
+    return fingerprints
+
+
+def get_dataset_fingerprint(dataset_name: str, item_store_dir: str | None = None) -> dict:
+    """Returns (cached) {"fingerprint", "item_count", "items": {item_id: item fingerprint}} for a dataset."""
+    cache_key = (dataset_name, item_store_dir)
+    fingerprint = _fingerprint_cache.get(cache_key)
+    if fingerprint is None:
+        dataset = _materialize(load_dataset(dataset_name, item_store_dir))
+        item_fingerprints = _item_fingerprints(dataset_name, dataset)
+        fingerprint = {"fingerprint": _hash_text(_canonical_json(dataset)), "item_count": len(item_fingerprints), "items": item_fingerprints}
+        with _fingerprint_cache_lock:
+            fingerprint = _fingerprint_cache.setdefault(cache_key, fingerprint)
+    return fingerprint
+
+
+def get_data_fingerprints(dataset_names, item_store_dir: str | None = None) -> dict:
+    """{dataset_name: get_dataset_fingerprint(...)} for the given datasets."""
+    return {dataset_name: get_dataset_fingerprint(dataset_name, item_store_dir) for dataset_name in dataset_names}
+
+
+def get_data_payload_hash(dataset_names, item_store_dir: str | None = None) -> str:
+    """
+    The 8-character hash of the given datasets used in results filenames (the same value as hashing the list of
+    dataset payloads in one go). Cached per set of datasets.
+    """
+    cache_key = (tuple(dataset_names), item_store_dir)
+    payload_hash = _payload_hash_cache.get(cache_key)
+    if payload_hash is None:
+        hasher = hashlib.sha256(b"[")
+        for position, dataset_name in enumerate(dataset_names):
+            if position:
+                hasher.update(b",")
+            hasher.update(_canonical_json(_materialize(load_dataset(dataset_name, item_store_dir))).encode('utf-8'))
+        hasher.update(b"]")
+        payload_hash = hasher.hexdigest()[:8]
+        with _fingerprint_cache_lock:
+            payload_hash = _payload_hash_cache.setdefault(cache_key, payload_hash)
+    return payload_hash
+
+
+def diff_fingerprints(previous: dict, current: dict) -> dict:
+    """
+    Compares two {dataset_name: fingerprint} mappings and returns {dataset_name: {"added", "removed", "changed"}}
+    (lists of item IDs) for every dataset that differs. Datasets only in `current` list all their items as added.
+    """
+    changes = {}
+    for dataset_name, current_fingerprint in current.items():
+        previous_fingerprint = previous.get(dataset_name)
+        if previous_fingerprint and previous_fingerprint["fingerprint"] == current_fingerprint["fingerprint"]:
+            continue
+        previous_items = (previous_fingerprint or {}).get("items", {})
+        current_items = current_fingerprint["items"]
+        dataset_changes = {
+            "added": [item_id for item_id in current_items if item_id not in previous_items],
+            "removed": [item_id for item_id in previous_items if item_id not in current_items],
+            "changed": [item_id for item_id, item_fingerprint in current_items.items()
+                        if item_id in previous_items and previous_items[item_id] != item_fingerprint],
+        }
+        if any(dataset_changes.values()) or previous_fingerprint is None:
+            changes[dataset_name] = dataset_changes
+        else:
+            changes[dataset_name] = {**dataset_changes, "reordered": True} # Same items, different order
+    return changes
+
+
+def read_results_manifest(manifest_path: str) -> list:
+    """All records in a results manifest, oldest first (malformed lines are skipped)."""
+    if not os.path.exists(manifest_path):
+        return []
+    records = []
+    with open(manifest_path, 'r') as manifest_file:
+        for line in manifest_file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def find_latest_manifest_record(manifest_path: str, results_type: str, model_name: str) -> dict | None:
+    """The most recent manifest record for this results type and model, or None."""
+    for record in reversed(read_results_manifest(manifest_path)):
+        if record.get("results_type") == results_type and record.get("model") == model_name:
+            return record
+    return None
+
+
+def format_data_changes(changes: dict) -> str:
+    """One-line summary of a `diff_fingerprints` result, e.g. 'CLASSIFICATION_ITEMS: 3 added, 1 changed'."""
+    if not changes:
+        return "no changes"
+    summaries = []
+    for dataset_name, dataset_changes in changes.items():
+        counts = [f"{len(dataset_changes[kind])} {kind}" for kind in ("added", "removed", "changed") if dataset_changes[kind]]
+        summaries.append(f"{dataset_name}: {', '.join(counts) if counts else 'reordered'}")
+    return "; ".join(summaries)
@@ -0,0 +1,18 @@
+"""
+Option values shared by the experiment runners and the bias_analyzer.py command line.
+
+Kept free of imports so the CLI can build its argument parser (and answer --help) without loading the
+experiment runners and their dependencies; the runners import these names from here.
+"""
+
+# Criteria-order designs for the permuted order experiment.
+#   original_reversed: OrderOriginal + OrderReversed only (2 prompts per item).
+#   latin_square:      cyclic Latin square, k orders; every criterion appears in every position exactly once.
+#   williams:          Williams design, k orders (2k for odd k); additionally every criterion immediately
+#                      follows every other criterion equally often, balancing first-order carryover.
+CRITERIA_ORDER_DESIGNS = ["original_reversed", "latin_square", "williams"]
+
+# How the JSON scores are requested: "prompt" relies on the prompt instructions alone (the original behaviour),
+# "json_object" asks the provider for JSON mode and "json_schema" for output enforced against a schema built from
+# the rubric's criteria. Both structured modes also parse responses with the tolerant JSON extractor.
+STRUCTURED_OUTPUT_MODES = ("prompt", "json_object", "json_schema")
@@ -6,16 +6,101 @@ import os
 import sys
 import random
 import re
+from collections.abc import Mapping
 from tqdm import tqdm
 
-from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL
+from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL, ContextThreadPoolExecutor, latency_group
+from item_store import index_items_by_id
+from judgment_store import get_judgment_store
+from prompt_templates import compile_prompt, request_as_text
+from experiment_options import CRITERIA_ORDER_DESIGNS # Criteria-order designs for the permuted order experiment
+from task_scheduler import task_group, estimate_task_seconds, longest_first
 from .multi_criteria_scoring_experiment import (
     format_rubric_for_prompt, 
-    parse_multi_criteria_json
+    parse_multi_criteria_json,
+    build_criteria_response_format,
+    summarize_parse_failures,
+    print_parse_failure_summary
 )
 
 CONCURRENT_API_CALLS_ADVANCED = 8
 
+
+def generate_criteria_orders(criteria_order_original: list, design: str = "original_reversed") -> list:
+    """
+    Returns the list of criteria orders for the given design.
+    The first order is always `criteria_order_original`, so the OrderOriginal baseline is part of every design.
+    """
+    k = len(criteria_order_original)
+    if design == "original_reversed":
+        return [list(criteria_order_original), list(criteria_order_original[::-1])]
+    if design == "latin_square":
+        return [list(criteria_order_original[r:]) + list(criteria_order_original[:r]) for r in range(k)]
+    if design == "williams":
+        # Standard Williams first row 0, 1, k-1, 2, k-2, ...; the other rows are its cyclic shifts (plus mirrors for odd k).
+        first_row = [0] + [(j + 1) // 2 if j % 2 == 1 else k - j // 2 for j in range(1, k)]
+        rows = [[(symbol + r) % k for symbol in first_row] for r in range(k)]
+        if k % 2 == 1:
+            rows += [row[::-1] for row in rows]
+        # Relabel symbols so the first row reads as the original order (relabelling keeps the design balanced).
+        criterion_for_symbol = {symbol: criteria_order_original[pos] for pos, symbol in enumerate(first_row)}
+        return [[criterion_for_symbol[symbol] for symbol in row] for row in rows]
+    raise ValueError(f"Unknown criteria order design '{design}'. Choose from {CRITERIA_ORDER_DESIGNS}.")
+
+def compute_criterion_position_effects(task_results: list, criteria_order_original: list) -> dict:
+    """
+    Mean score of each criterion at each prompt position, per item and pooled over items.
+    Observations are flattened into arrays once and aggregated with np.bincount over (item, criterion, position) cells.
+    A criterion's deviation at a position is its mean there minus its mean over all positions;
+    `primacy_effect` / `recency_effect` are the deviations at the first / last position.
+    """
+    k = len(criteria_order_original)
+    criterion_index = {name: i for i, name in enumerate(criteria_order_original)}
+    obs_item_ids, obs_criteria, obs_positions, obs_scores = [], [], [], []
+    for task_result in task_results:
+        if "error_message" in task_result:
+            continue
+        position_of = {name: pos for pos, name in enumerate(task_result.get("criteria_order_used", []))}
+        for rep_scores_dict in task_result.get("scores_per_repetition", []):
+            for criterion_name, score_val in (rep_scores_dict or {}).items():
+                if isinstance(score_val, int) and criterion_name in criterion_index and criterion_name in position_of:
+                    obs_item_ids.append(str(task_result.get("item_id")))
+                    obs_criteria.append(criterion_index[criterion_name])
+                    obs_positions.append(position_of[criterion_name])
+                    obs_scores.append(score_val)
+
+    if not obs_scores:
+        return {"by_item": {}, "overall": {}}
+
+    item_ids, item_codes = np.unique(np.array(obs_item_ids), return_inverse=True)
+    n_cells = len(item_ids) * k * k
+    flat_cells = (item_codes * k + np.array(obs_criteria)) * k + np.array(obs_positions)
+    score_sums = np.bincount(flat_cells, weights=np.array(obs_scores, dtype=float), minlength=n_cells).reshape(len(item_ids), k, k)
+    score_counts = np.bincount(flat_cells, minlength=n_cells).reshape(len(item_ids), k, k)
+
+    def _effects(sums, counts):
+        # sums/counts: arrays of shape (k criteria, k positions)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+            criterion_means = sums.sum(axis=1) / counts.sum(axis=1)
+        deviations = means - criterion_means[:, None]
+        to_list = lambda row: [None if np.isnan(v) else float(v) for v in row]
+        return {
+            criterion_name: {
+                "mean_score_by_position": to_list(means[ci]),
+                "deviation_by_position": to_list(deviations[ci]),
+                "n_scores_by_position": [int(c) for c in counts[ci]],
+                "primacy_effect": to_list(deviations[ci, :1])[0],
+                "recency_effect": to_list(deviations[ci, -1:])[0]
+            }
+            for ci, criterion_name in enumerate(criteria_order_original)
+        }
+
+    return {
+        "by_item": {item_id: _effects(score_sums[i], score_counts[i]) for i, item_id in enumerate(item_ids)},
+        "overall": _effects(score_sums.sum(axis=0), score_counts.sum(axis=0))
+    }
+
 # --- Helper: _run_single_item_evaluation_task (adapted from previous _run_single_argument_evaluation_task) ---
 def _run_single_item_evaluation_task_advanced(
     prompt_variant_config: dict,
@@ -24,7 +109,8 @@ def _run_single_item_evaluation_task_advanced(
     current_criteria_order_for_prompt: list,
     repetitions: int, 
     quiet: bool,
-    temperature: float
+    temperature: float,
+    structured_output: str = "prompt"
 ) -> dict:
     """
     Runs LLM evaluation for a single item against a specific prompt variant (which defines criteria order).
@@ -34,45 +120,55 @@ def _run_single_item_evaluation_task_advanced(
     item_title = item_to_evaluate.get('title', item_id)
     item_text_to_score = item_to_evaluate['text']
     
-    system_prompt_text = prompt_variant_config.get("system_prompt")
-    user_prompt_template_text = prompt_variant_config["user_prompt_template"]
-
-    criteria_names_list_str = ", ".join(current_criteria_order_for_prompt)
-
-    user_prompt = user_prompt_template_text.format(
-        text=item_text_to_score,
+    # Everything but the item text is fixed per variant and criteria order, so it is compiled once and reused.
+    compiled_prompt = compile_prompt(
+        prompt_variant_config["user_prompt_template"], slot_fields=("text",),
+        system_prompt=prompt_variant_config.get("system_prompt"), system_separator="\\n\\n",
         rubric_text=full_rubric_text,
         criteria_names_json_string=json.dumps(current_criteria_order_for_prompt),
-        criteria_names_list_str=criteria_names_list_str
+        criteria_names_list_str=", ".join(current_criteria_order_for_prompt)
     )
-
-    prompt_to_send = str(system_prompt_text) + "\\n\\n" + user_prompt if system_prompt_text else user_prompt
+    prompt_request = compiled_prompt.request(text=item_text_to_score)
+    prompt_to_send = request_as_text(prompt_request)
+    response_format = build_criteria_response_format(current_criteria_order_for_prompt, structured_output)
 
     all_repetition_scores = []
     llm_raw_responses_list = []
     errors_in_repetitions_count = 0
+    api_errors_count = 0
+    parse_failures_count = 0
     actual_prompt_sent_to_llm = prompt_to_send
 
     if repetitions > 1 and not quiet:
         print(f"    Evaluating Item: '{item_title}' with Variant: '{prompt_variant_config.get('name', 'N/A')}' (Order: {prompt_variant_config.get('order_permutation_name', 'N/A')}), {repetitions} reps...")
 
-    for rep_idx in range(repetitions):
+    # Holistic judgments are shared across experiments: only repetitions not already in the store are requested.
+    llm_responses_for_reps = get_judgment_store().get_or_request(
+        item_id, prompt_to_send, temperature, repetitions,
+        lambda: call_openrouter_api(**prompt_request, quiet=True, temperature=temperature, response_format=response_format),
+        response_format=response_format
+    )
+
+    for rep_idx, llm_response_raw in enumerate(llm_responses_for_reps):
         if repetitions > 1 and not quiet:
             print(f"      Rep {rep_idx + 1}/{repetitions}...")
         
-        llm_response_raw = call_openrouter_api(prompt_to_send, quiet=True, temperature=temperature)
         llm_raw_responses_list.append(llm_response_raw)
 
         parsed_scores_single_rep = None
         is_api_error = isinstance(llm_response_raw, str) and llm_response_raw.startswith("Error:")
 
         if not is_api_error:
-            parsed_scores_single_rep = parse_multi_criteria_json(llm_response_raw, current_criteria_order_for_prompt)
+            parsed_scores_single_rep = parse_multi_criteria_json(llm_response_raw, current_criteria_order_for_prompt, tolerant=response_format is not None)
         
         if parsed_scores_single_rep:
             all_repetition_scores.append(parsed_scores_single_rep)
         else:
             errors_in_repetitions_count += 1
+            if is_api_error:
+                api_errors_count += 1
+            else:
+                parse_failures_count += 1
             if not quiet:
                 error_type = "API Error" if is_api_error else "Parsing Error"
                 print(f"        {error_type} in Rep {rep_idx + 1}. LLM Raw: {llm_response_raw[:150]}...")
@@ -86,11 +182,26 @@ def _run_single_item_evaluation_task_advanced(
         "scores_per_repetition": all_repetition_scores,
         "llm_raw_responses": llm_raw_responses_list,
         "errors_in_repetitions": errors_in_repetitions_count,
+        "api_errors_in_repetitions": api_errors_count,
+        "parse_failures_in_repetitions": parse_failures_count,
         "total_repetitions_attempted": repetitions,
         "actual_prompt_sent_to_llm": actual_prompt_sent_to_llm,
         "sampled_llm_raw_responses": llm_raw_responses_list[:min(repetitions, 3)]
     }
 
+def build_holistic_prompt_config(task_name: str, criteria_order_original: list) -> dict:
+    """
+    The holistic (all criteria at once) prompt config, shared by the permuted-order experiment and the
+    isolated-criterion experiment's baseline so that their OrderOriginal judgments are identical and can be
+    reused through the judgment store.
+    """
+    return {
+        "name": f"MultiCriteria_{task_name[:3]}_Holistic_OrderOriginal",
+        "system_prompt": f"You are an evaluation assistant. Your task is to objectively evaluate the provided text based on the criteria: {', '.join(criteria_order_original)}, using the detailed scoring rubric. Respond ONLY with a single JSON object containing your scores.",
+        "user_prompt_template": f"Please evaluate the following text based on the comprehensive rubric provided below. For each of the criteria ({{criteria_names_list_str}}), assign a score from 1 to 5. Your response MUST be a single JSON object. The keys of the JSON object must be exactly these strings: {{criteria_names_json_string}}. The value for each key should be the integer score (1-5).\\n\\n**TEXT ({task_name.upper()}):**\\n```\\n{{text}}\\n```\\n\\n**SCORING RUBRIC:**\\n```\\n{{rubric_text}}\\n```\\n\\n**Your JSON Response:",
+        "order_permutation_name": f"OrderOriginal_{task_name[:3]}"
+    }
+
 # --- Experiment 1: Permuted Order Multi-Criteria Scoring ---
 
 def run_permuted_order_multi_criteria_experiment(
@@ -101,10 +212,14 @@ def run_permuted_order_multi_criteria_experiment(
     quiet: bool = False, 
     num_samples: int = 0, 
     repetitions: int = 1,
-    temperature: float = 0.1
+    temperature: float = 0.1,
+    order_design: str = "original_reversed",
+    structured_output: str = "prompt"
 ) -> list:
     """
     Scores items against multiple criteria, varying criteria presentation order.
+    `order_design` selects the set of orders (see CRITERIA_ORDER_DESIGNS); with more than two orders each item summary
+    also carries per-criterion `positional_effects`. `structured_output` is as in run_multi_criteria_experiment.
     """
     criteria_order_original = rubric_dict.get("criteria_order", list(rubric_dict.get("criteria", {}).keys()))
     if not criteria_order_original:
@@ -130,56 +245,68 @@ def run_permuted_order_multi_criteria_experiment(
         return []
 
     criteria_order_reversed = criteria_order_original[::-1]
-    prompt_configurations_permuted = [
-        {
-            "order_permutation_name": f"OrderOriginal_{task_name[:3]}",
-            "criteria_order_for_this_run": criteria_order_original
-        },
-        {
-            "order_permutation_name": f"OrderReversed_{task_name[:3]}",
-            "criteria_order_for_this_run": criteria_order_reversed
-        }
-    ]
+    design_row_prefix = {"latin_square": "LatinSquareRow", "williams": "WilliamsRow"}.get(order_design, "Order")
+    prompt_configurations_permuted = []
+    for row_idx, criteria_order_for_row in enumerate(generate_criteria_orders(criteria_order_original, order_design)):
+        # Keep the OrderOriginal/OrderReversed names for those rows: the isolated experiment and the viewer key on them.
+        if criteria_order_for_row == list(criteria_order_original):
+            order_name = f"OrderOriginal_{task_name[:3]}"
+        elif criteria_order_for_row == list(criteria_order_reversed):
+            order_name = f"OrderReversed_{task_name[:3]}"
+        else:
+            order_name = f"{design_row_prefix}{row_idx + 1}_{task_name[:3]}"
+        prompt_configurations_permuted.append({
+            "order_permutation_name": order_name,
+            "criteria_order_for_this_run": criteria_order_for_row
+        })
 
     if not quiet:
-        print(f"Processing {len(items_to_process)} item(s) with {len(prompt_configurations_permuted)} orderings each.")
+        print(f"Processing {len(items_to_process)} item(s) with {len(prompt_configurations_permuted)} orderings each (design: {order_design}).")
 
     formatted_full_rubric_text = format_rubric_for_prompt(rubric_dict)
 
-    base_prompt_config = {
-        "name": f"MultiCriteria_{task_name[:3]}_Holistic_OrderOriginal",
-        "system_prompt": f"You are an evaluation assistant. Your task is to objectively evaluate the provided text based on the criteria: {', '.join(criteria_order_original)}, using the detailed scoring rubric. Respond ONLY with a single JSON object containing your scores.",
-        "user_prompt_template": f"Please evaluate the following text based on the comprehensive rubric provided below. For each of the criteria ({{criteria_names_list_str}}), assign a score from 1 to 5. Your response MUST be a single JSON object. The keys of the JSON object must be exactly these strings: {{criteria_names_json_string}}. The value for each key should be the integer score (1-5).\\n\\n**TEXT ({task_name.upper()}):**\\n```\\n{{text}}\\n```\\n\\n**SCORING RUBRIC:**\\n```\\n{{rubric_text}}\\n```\\n\\n**Your JSON Response:",
-        "order_permutation_name": f"OrderOriginal_{task_name[:3]}"
-    }
+    base_prompt_config = build_holistic_prompt_config(task_name, criteria_order_original)
 
     all_results_data = [] 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_ADVANCED) as executor:
-        future_to_task_details = {}
-        for item_to_eval in tqdm(items_to_process, desc=f"Permuted Order: {task_name} Items"):
-            if not isinstance(item_to_eval, dict) or 'text' not in item_to_eval or 'id' not in item_to_eval:
-                if not quiet: print(f"Skipping invalid item: {item_to_eval}")
-                continue
-            
-            item_title_display = item_to_eval.get('title', item_to_eval['id'])
+    items_by_id = index_items_by_id(items_to_process)
+    tasks_to_submit_permuted = []
+    for item_to_eval in tqdm(items_to_process, desc=f"Permuted Order: {task_name} Items"):
+        if not isinstance(item_to_eval, Mapping) or 'text' not in item_to_eval or 'id' not in item_to_eval:
+            if not quiet: print(f"Skipping invalid item: {item_to_eval}")
+            continue
+        
+        item_title_display = item_to_eval.get('title', item_to_eval['id'])
 
-            for order_perm_config in tqdm(prompt_configurations_permuted, desc=f"Permutations for {item_title_display[:20]}..", leave=False):
-                current_full_prompt_variant_config = {
-                    **base_prompt_config, 
-                    **order_perm_config 
-                }
+        for order_perm_config in tqdm(prompt_configurations_permuted, desc=f"Permutations for {item_title_display[:20]}..", leave=False):
+            current_full_prompt_variant_config = {
+                **base_prompt_config, 
+                **order_perm_config 
+            }
+            tasks_to_submit_permuted.append((item_to_eval, current_full_prompt_variant_config))
+
+    task_positions = {(item_to_eval['id'], prompt_config['order_permutation_name']): i for i, (item_to_eval, prompt_config) in enumerate(tasks_to_submit_permuted)}
+    tasks_to_submit_permuted = longest_first(tasks_to_submit_permuted, lambda task: estimate_task_seconds(
+        task_group("adv_multi_criteria_permuted", task[1]['order_permutation_name']),
+        len(task[1]['system_prompt']) + len(task[1]['user_prompt_template']) + len(formatted_full_rubric_text) + len(task[0]['text']),
+        repetitions
+    ))
 
+    with ContextThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_ADVANCED) as executor:
+        future_to_task_details = {}
+        for item_to_eval, current_full_prompt_variant_config in tasks_to_submit_permuted:
+            with latency_group(task_group("adv_multi_criteria_permuted", current_full_prompt_variant_config['order_permutation_name'])):
                 future = executor.submit(
                     _run_single_item_evaluation_task_advanced,
                     current_full_prompt_variant_config,
                     item_to_eval, 
                     formatted_full_rubric_text, 
-                    order_perm_config["criteria_order_for_this_run"],
+                    current_full_prompt_variant_config["criteria_order_for_this_run"],
                     repetitions,
                     quiet,
-                    temperature
+                    temperature,
+                    structured_output
                 )
-                future_to_task_details[future] = (item_to_eval['id'], current_full_prompt_variant_config['order_permutation_name'])
+            future_to_task_details[future] = (item_to_eval['id'], current_full_prompt_variant_config['order_permutation_name'])
 
         for future in tqdm(concurrent.futures.as_completed(future_to_task_details), total=len(future_to_task_details), desc=f"Permuted Order {task_name}: Processing results"):
             item_id, order_name = future_to_task_details[future]
@@ -188,17 +315,16 @@ def run_permuted_order_multi_criteria_experiment(
                 all_results_data.append(result)
             except Exception as exc:
                 print(f"!! Exception for Item ID: {item_id}, Order: {order_name}, Task: {task_name}: {exc}")
-                error_item_title = "N/A"
-                for item_lookup in items_to_process:
-                    if item_lookup['id'] == item_id:
-                        error_item_title = item_lookup.get('title', item_id)
-                        break
+                error_item = items_by_id.get(item_id)
+                error_item_title = error_item.get('title', item_id) if error_item else "N/A"
                 all_results_data.append({
                     "item_id": item_id, "order_permutation_name": order_name, "error_message": str(exc),
                     "scores_per_repetition": [], "llm_raw_responses": [], 
                     "errors_in_repetitions": repetitions, "total_repetitions_attempted": repetitions,
                     "item_title": error_item_title
                 })
+    # Restore task order (as_completed yields in completion order) so the output is reproducible.
+    all_results_data.sort(key=lambda r: task_positions.get((r.get("item_id"), r.get("order_permutation_name")), len(task_positions)))
     
     if not quiet:
         print(f"\\n\\n--- Permuted Order Multi-Criteria {task_name} Scoring Summary ---")
@@ -288,6 +414,23 @@ def run_permuted_order_multi_criteria_experiment(
         final_summary_for_return_permuted.append(item_summary_entry)
         print("-" * (sum(col_widths) + len(col_widths) * 3 -1)) 
 
+    print_parse_failure_summary(
+        summarize_parse_failures(all_results_data, "order_permutation_name"),
+        f"Permuted Order {task_name} Parse Failures per Order (structured output: {structured_output})"
+    )
+
+    if len(prompt_configurations_permuted) > 2:
+        position_effects = compute_criterion_position_effects(all_results_data, criteria_order_original)
+        for item_summary_entry in final_summary_for_return_permuted:
+            item_summary_entry["positional_effects"] = position_effects["by_item"].get(str(item_summary_entry["item_id"]), {})
+
+        print(f"\n--- Positional Effects by Criterion ({task_name}, {order_design}, pooled over items) ---")
+        position_headers = [f"Pos {p + 1}" for p in range(len(criteria_order_original))]
+        print(" | ".join(["Criterion".ljust(18)] + [h.ljust(8) for h in position_headers] + ["Primacy".ljust(8), "Recency".ljust(8)]))
+        for criterion_name, effects in position_effects["overall"].items():
+            fmt = lambda v: (f"{v:+.2f}" if v is not None else "N/A").ljust(8)
+            print(" | ".join([criterion_name[:18].ljust(18)] + [fmt(v) for v in effects["deviation_by_position"]] + [fmt(effects["primacy_effect"]), fmt(effects["recency_effect"])]))
+
     if show_raw and not quiet:
         print(f"\\n\\n--- Raw LLM Responses for Permuted Order {task_name} Scoring (Sample) ---")
         if all_results_data:
@@ -309,7 +452,8 @@ def run_isolated_criterion_scoring_experiment(
     num_samples: int = 0, 
     repetitions: int = 1,
     holistic_comparison_data: list | None = None,
-    temperature: float = 0.1
+    temperature: float = 0.1,
+    structured_output: str = "prompt"
 ) -> list:
     criteria_order_original = rubric_dict.get("criteria_order", list(rubric_dict.get("criteria", {}).keys()))
     if not criteria_order_original:
@@ -379,16 +523,26 @@ def run_isolated_criterion_scoring_experiment(
         item_title = item_to_evaluate.get('title', item_id)
         item_text_to_score = item_to_evaluate['text']
 
-        system_prompt = f"You are an expert critical thinking assistant for {current_task_name} evaluation. Your task is to objectively evaluate the provided text *only* on the single, specific criterion of '{criterion_name_to_score}', based on its detailed rubric description. Your response MUST be only the numerical score from 1 to 5, enclosed in <score> tags. For example: <score>3</score>."
-        user_prompt = (
-            f"Please evaluate the following text ({current_task_name}) *only* on the criterion of: **{criterion_name_to_score}**.\\n\\n"
-            f"Refer to the detailed rubric description for '{criterion_name_to_score}' provided below to assign your score.\\n"
-            f"Respond with ONLY a single integer score from 1 to 5, enclosed in <score> tags. Example: <score>4</score>.\\n\\n"
-            f"**TEXT ({current_task_name.upper()}):**\\n```\\n{item_text_to_score}\\n```\\n\\n"
-            f"**DETAILED RUBRIC FOR '{criterion_name_to_score}':**\\n```\\n{specific_rubric_text_for_criterion}\\n```\\n\\n"
-            f"Your response (e.g., <score>1</score>, <score>2</score>, <score>3</score>, <score>4</score>, or <score>5</score>):"
+        system_prompt = (
+            "You are an expert critical thinking assistant for {task} evaluation. Your task is to objectively evaluate the provided text *only* on the single, specific criterion of '{criterion}', based on its detailed rubric description. "
+            "Your response MUST be only the numerical score from 1 to 5, enclosed in <score> tags. For example: <score>3</score>."
+        ).format(task=current_task_name, criterion=criterion_name_to_score)
+        user_prompt_template = (
+            "Please evaluate the following text ({task}) *only* on the criterion of: **{criterion}**.\\n\\n"
+            "Refer to the detailed rubric description for '{criterion}' provided below to assign your score.\\n"
+            "Respond with ONLY a single integer score from 1 to 5, enclosed in <score> tags. Example: <score>4</score>.\\n\\n"
+            "**TEXT ({task_upper}):**\\n```\\n{text}\\n```\\n\\n"
+            "**DETAILED RUBRIC FOR '{criterion}':**\\n```\\n{criterion_rubric}\\n```\\n\\n"
+            "Your response (e.g., <score>1</score>, <score>2</score>, <score>3</score>, <score>4</score>, or <score>5</score>):"
         )
-        prompt_to_send = system_prompt + "\\n\\n" + user_prompt
+        compiled_prompt = compile_prompt(
+            user_prompt_template, slot_fields=("text",),
+            system_prompt=system_prompt, system_separator="\\n\\n",
+            task=current_task_name, task_upper=current_task_name.upper(),
+            criterion=criterion_name_to_score, criterion_rubric=specific_rubric_text_for_criterion
+        )
+        prompt_request = compiled_prompt.request(text=item_text_to_score)
+        prompt_to_send = request_as_text(prompt_request)
 
         single_criterion_scores_reps = []
         llm_raw_responses_reps = []
@@ -402,7 +556,7 @@ def run_isolated_criterion_scoring_experiment(
             if repetitions > 1 and not quiet:
                 print(f"      Rep {rep_idx + 1}/{repetitions} for {criterion_name_to_score}...")
             
-            llm_response_raw = call_openrouter_api(prompt_to_send, quiet=quiet, temperature=temperature)
+            llm_response_raw = call_openrouter_api(**prompt_request, quiet=quiet, temperature=temperature)
             llm_raw_responses_reps.append(llm_response_raw)
             parsed_score_single_rep = None
             is_api_error = isinstance(llm_response_raw, str) and llm_response_raw.startswith("Error:")
@@ -455,31 +609,39 @@ def run_isolated_criterion_scoring_experiment(
                         "n_scores": original_order_stats.get("n_scores"),
                         "total_reps": original_order_stats.get("total_reps")
                     }
-    else:
-        if not quiet: print(f"  No holistic_comparison_data provided for {task_name}, running fresh baseline holistic evaluations...")
-        base_holistic_prompt_config = {
-            "name": f"MultiCriteria_{task_name[:3]}_Holistic_ForIsolatedCompare",
-            "system_prompt": f"You are an evaluation assistant. Your task is to objectively evaluate the provided text ({task_name}) based on the criteria: {', '.join(criteria_order_original)}, using the detailed scoring rubric. Respond ONLY with a single JSON object containing your scores.",
-            "user_prompt_template": f"Please evaluate the following text ({task_name}) based on the comprehensive rubric provided below. For each of the criteria ({{criteria_names_list_str}}), assign a score from 1 to 5. Your response MUST be a single JSON object. The keys of the JSON object must be exactly these strings: {{criteria_names_json_string}}. The value for each key should be the integer score (1-5).\\n\\n**TEXT ({task_name.upper()}):**\\n```\\n{{text}}\\n```\\n\\n**SCORING RUBRIC:**\\n```\\n{{rubric_text}}\\n```\\n\\n**Your JSON Response:",
-            "order_permutation_name": f"OrderOriginal_{task_name[:3]}"
-        }
+
+    # Items without provided holistic data get the baseline holistic evaluation. It uses the same prompt as the
+    # permuted experiment's OrderOriginal run, so judgments already in the judgment store are reused, not re-requested.
+    item_ids_with_holistic = {str(item_id) for item_id in holistic_scores_by_item_criterion}
+    items_missing_holistic = [item for item in items_to_process if str(item['id']) not in item_ids_with_holistic]
+    if items_missing_holistic:
+        if not quiet: print(f"  Running baseline holistic evaluations for {len(items_missing_holistic)} {task_name} item(s) without holistic data (judgment store: {len(get_judgment_store())} stored)...")
+        base_holistic_prompt_config = build_holistic_prompt_config(task_name, criteria_order_original)
         holistic_run_tasks = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_ADVANCED) as executor:
-            for item_holistic in tqdm(items_to_process, desc=f"Isolated Exp: Holistic {task_name} Items", leave=False):
-                future_holistic = executor.submit(
-                    _run_single_item_evaluation_task_advanced, 
-                    base_holistic_prompt_config,
-                    item_holistic, 
-                    formatted_full_rubric_text_holistic, 
-                    criteria_order_original,
-                    repetitions, 
-                    quiet,
-                    temperature
-                )
+        # Same prompt as the permuted experiment's OrderOriginal run, so it shares that run's latency history.
+        holistic_group = task_group("adv_multi_criteria_permuted", base_holistic_prompt_config["order_permutation_name"])
+        holistic_static_chars = len(base_holistic_prompt_config["system_prompt"]) + len(base_holistic_prompt_config["user_prompt_template"]) + len(formatted_full_rubric_text_holistic)
+        items_missing_holistic = longest_first(items_missing_holistic, lambda item: estimate_task_seconds(holistic_group, holistic_static_chars + len(item['text']), repetitions))
+        with ContextThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_ADVANCED) as executor:
+            for item_holistic in tqdm(items_missing_holistic, desc=f"Isolated Exp: Holistic {task_name} Items", leave=False):
+                with latency_group(holistic_group):
+                    future_holistic = executor.submit(
+                        _run_single_item_evaluation_task_advanced, 
+                        base_holistic_prompt_config,
+                        item_holistic, 
+                        formatted_full_rubric_text_holistic, 
+                        criteria_order_original,
+                        repetitions, 
+                        quiet,
+                        temperature,
+                        structured_output
+                    )
                 holistic_run_tasks.append(future_holistic)
             
+            holistic_baseline_results = []
             for future_h_res in tqdm(concurrent.futures.as_completed(holistic_run_tasks), total=len(holistic_run_tasks), desc=f"Isolated Exp: Holistic {task_name} Results", leave=False):
                 h_res = future_h_res.result()
+                holistic_baseline_results.append(h_res)
                 item_id_h = h_res.get("item_id")
                 scores_per_rep_h = h_res.get("scores_per_repetition", [])
                 for crit_orig_h in criteria_order_original:
@@ -487,10 +649,15 @@ def run_isolated_criterion_scoring_experiment(
                     avg_h = np.mean(scores_for_crit_h) if scores_for_crit_h else None
                     std_h = np.std(scores_for_crit_h) if len(scores_for_crit_h) > 1 else (0.0 if len(scores_for_crit_h) == 1 else None)
                     holistic_scores_by_item_criterion[item_id_h][crit_orig_h] = {"avg": avg_h, "std": std_h, "n_scores": len(scores_for_crit_h), "total_reps": h_res.get("total_repetitions_attempted",0)}
+        print_parse_failure_summary(
+            summarize_parse_failures(holistic_baseline_results, "prompt_variant_name"),
+            f"Isolated Exp: Holistic {task_name} Baseline Parse Failures (structured output: {structured_output})"
+        )
 
     if not quiet: print(f"\\n  Running isolated criterion evaluations for {task_name}...")
+    items_by_id = index_items_by_id(items_to_process)
     all_isolated_task_results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_ADVANCED) as executor:
+    with ContextThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_ADVANCED) as executor:
         future_to_isolated_task_details = {}
         tasks_to_submit_isolated = []
         for item_iso in tqdm(items_to_process, desc=f"Isolated Exp: {task_name} Items for Isolation", leave=True):
@@ -514,8 +681,15 @@ def run_isolated_criterion_scoring_experiment(
                     'item_title': item_iso.get('title', item_iso['id'])
                 })
         
+        task_positions = {(task_def['item_id'], task_def['criterion_name']): i for i, task_def in enumerate(tasks_to_submit_isolated)}
+        tasks_to_submit_isolated = longest_first(tasks_to_submit_isolated, lambda task_def: estimate_task_seconds(
+            task_group("adv_multi_criteria_isolated", task_def['criterion_name']),
+            len(task_def['args'][0]['text']) + len(task_def['args'][2]),
+            repetitions
+        ))
         for task_def in tasks_to_submit_isolated:            
-            future_iso = executor.submit(task_def['func'], *task_def['args'])
+            with latency_group(task_group("adv_multi_criteria_isolated", task_def['criterion_name'])):
+                future_iso = executor.submit(task_def['func'], *task_def['args'])
             future_to_isolated_task_details[future_iso] = (task_def['item_id'], task_def['criterion_name'])
         
         for future_iso_res in tqdm(concurrent.futures.as_completed(future_to_isolated_task_details), total=len(future_to_isolated_task_details), desc=f"Isolated Exp {task_name}: Processing results", leave=False):
@@ -525,17 +699,16 @@ def run_isolated_criterion_scoring_experiment(
                 all_isolated_task_results.append(iso_res)
             except Exception as exc_iso:
                 print(f"!! Exception for Isolated Task: Item ID {item_id_iso}, Criterion {c_name_iso} ({task_name}): {exc_iso}")
-                error_item_title = "Unknown Item"
-                for d_item in items_to_process:
-                    if d_item['id'] == item_id_iso:
-                        error_item_title = d_item.get('title', item_id_iso)
-                        break
+                error_item = items_by_id.get(item_id_iso)
+                error_item_title = error_item.get('title', item_id_iso) if error_item else "Unknown Item"
                 all_isolated_task_results.append({
                     "item_id": item_id_iso, "criterion_scored_in_isolation": c_name_iso, "error_message": str(exc_iso),
                     "isolated_scores_per_repetition": [], "llm_raw_responses": [],
                     "errors_in_repetitions": repetitions, "total_repetitions_attempted": repetitions,
                     "item_title": error_item_title 
                 })
+    # Restore task order (as_completed yields in completion order) so the output is reproducible; rubric errors stay first.
+    all_isolated_task_results.sort(key=lambda r: task_positions.get((r.get("item_id"), r.get("criterion_scored_in_isolation")), -1))
 
     if not quiet:
         print(f"\\n\\n--- Isolated vs. Holistic {task_name} Scoring Comparison ---")    
@@ -1,11 +1,17 @@
 import json
-import random
+import time
+import threading
 import concurrent.futures
 from collections import Counter, defaultdict
 from tqdm import tqdm
 import re
 
-from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL
+from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL, ContextThreadPoolExecutor, split_logprob_response, latency_group, experiment_rng
+from logprob_judging import answer_distribution, parsed_distribution, expand_distribution
+from judge_cascade import majority_answer, most_likely_answer
+from item_store import index_items_by_id
+from prompt_templates import compile_prompt, request_as_text
+from task_scheduler import task_group, estimate_task_seconds, longest_first
 # We will need to import actual test data from test_data.py later
 # from test_data import CLASSIFICATION_CATEGORIES, CLASSIFICATION_ITEMS
 
@@ -45,42 +51,58 @@ CONCURRENT_CLASSIFICATION_CALLS = 8 # Similar to other experiments
 
 # --- Prompt Variant Generation ---
 
-def generate_prompt_variants(item_text: str, strategy_config: dict, base_categories_for_item: list, all_defined_category_sets: dict):
+DEFAULT_CLASSIFICATION_PROMPT_TEMPLATE = (
+    "Classify the following text into one of these categories: {category_list_comma_separated}.\\n"
+    "{category_definitions_section}"
+    "Text to classify: ```{item_text}```\\n"
+    "Your classification (provide ONLY the category name):"
+)
+# Used when a strategy's template references a field that is not available.
+FALLBACK_CLASSIFICATION_PROMPT_TEMPLATE = "Classify: {item_text}. Categories: {category_list_comma_separated}. Your choice:"
+
+def index_categories(categories: list) -> dict:
+    """Category id -> category object (the first definition wins, as with a linear scan)."""
+    category_index = {}
+    for category in categories:
+        category_index.setdefault(category["id"], category)
+    return category_index
+
+def build_category_index(category_sets: dict) -> dict:
+    """Per-domain category indexes ({domain: {category id: category}}), built once per experiment run."""
+    return {domain: index_categories(categories) for domain, categories in category_sets.items()}
+
+def compile_strategy_prompt(strategy_config: dict, base_category_index: dict, all_defined_category_sets: dict, category_index: dict | None = None) -> dict:
     """
-    Generates a specific prompt string based on the strategy_config.
+    Builds the prompt skeleton for one strategy and category domain: everything but the item text.
+    Returns {"compiled_prompt", "category_matcher", "presented_category_names", "categories_used", "category_id_by_name"}; rendering
+    `compiled_prompt` with an item's text gives the same prompt as formatting the full template for that item.
+    `base_category_index` is the item domain's {category id: category}; `category_index` (see build_category_index)
+    avoids re-indexing the definition-nuance category set for every strategy.
     """
-    
     category_order_ids = strategy_config.get("category_order", [])
     include_definitions = strategy_config.get("include_definitions", False)
-    base_prompt_template = strategy_config.get("base_prompt_template", 
-        "Classify the following text into one of these categories: {category_list_comma_separated}.\\n"
-        "{category_definitions_section}"
-        "Text to classify: ```{item_text}```\\n"
-        "Your classification (provide ONLY the category name):"
-    )
+    base_prompt_template = strategy_config.get("base_prompt_template", DEFAULT_CLASSIFICATION_PROMPT_TEMPLATE)
     escape_hatch_config = strategy_config.get("escape_hatch_config")
     definition_nuance_domain_id = strategy_config.get("definition_nuance_domain_id")
 
-    categories_source_for_definitions = base_categories_for_item
+    definitions_index = base_category_index
     if definition_nuance_domain_id and definition_nuance_domain_id in all_defined_category_sets:
-        categories_source_for_definitions = all_defined_category_sets[definition_nuance_domain_id]
+        definitions_index = (category_index or {}).get(definition_nuance_domain_id) or index_categories(all_defined_category_sets[definition_nuance_domain_id])
 
     ordered_categories_for_prompt_objects = []
     presented_category_names_for_parsing = []
 
     for cat_id in category_order_ids:
-        base_cat_obj = next((c for c in base_categories_for_item if c["id"] == cat_id), None)
+        base_cat_obj = base_category_index.get(cat_id)
         if not base_cat_obj:
             print(f"Warning: Category ID '{cat_id}' from strategy not found in item's base_categories. Skipping.")
             continue
 
-        desc_cat_obj = next((c for c in categories_source_for_definitions if c["id"] == cat_id), base_cat_obj)
-        description_to_use = desc_cat_obj["description"]
-
+        desc_cat_obj = definitions_index.get(cat_id, base_cat_obj)
         current_cat_obj_for_prompt = {
             "id": base_cat_obj["id"],
             "name": base_cat_obj["name"],
-            "description": description_to_use
+            "description": desc_cat_obj["description"]
         }
         ordered_categories_for_prompt_objects.append(current_cat_obj_for_prompt)
         presented_category_names_for_parsing.append(base_cat_obj["name"])
@@ -101,15 +123,12 @@ def generate_prompt_variants(item_text: str, strategy_config: dict, base_categor
     
     category_list_comma_separated_string = ", ".join(presented_category_names_for_parsing)
 
-    format_args = {
-        "item_text": item_text,
+    static_fields = {
         "category_list_comma_separated": category_list_comma_separated_string,
         "category_definitions_section": ""
     }
     if include_definitions and category_definitions_string:
-        format_args["category_definitions_section"] = f"Category Definitions:\\n{category_definitions_string}\\n"
-    elif "category_definitions_section" not in base_prompt_template and include_definitions and category_definitions_string:
-        pass
+        static_fields["category_definitions_section"] = f"Category Definitions:\\n{category_definitions_string}\\n"
 
     category_section_detail_string = ""
     for cat_obj in ordered_categories_for_prompt_objects:
@@ -117,35 +136,98 @@ def generate_prompt_variants(item_text: str, strategy_config: dict, base_categor
         if include_definitions:
             cat_detail += f" ({cat_obj['description']})"
         category_section_detail_string += f"- {cat_detail}\\n"
-    format_args["category_section_detailed_list"] = category_section_detail_string
+    static_fields["category_section_detailed_list"] = category_section_detail_string
 
     try:
-        final_prompt_text = base_prompt_template.format(**format_args)
+        compiled_prompt = compile_prompt(base_prompt_template, slot_fields=("item_text",), **static_fields)
     except KeyError as e:
         print(f"ERROR: Missing key '{e}' in prompt template or format_args. Strategy ID: {strategy_config.get('strategy_id')}")
         print(f"  Template: {base_prompt_template}")
-        print(f"  Available format_args keys: {list(format_args.keys())}")
-        final_prompt_text = f"Classify: {item_text}. Categories: {category_list_comma_separated_string}. Your choice:"
+        print(f"  Available format_args keys: {['item_text'] + list(static_fields.keys())}")
+        compiled_prompt = compile_prompt(FALLBACK_CLASSIFICATION_PROMPT_TEMPLATE, slot_fields=("item_text",), category_list_comma_separated=category_list_comma_separated_string)
 
-    return final_prompt_text, presented_category_names_for_parsing, ordered_categories_for_prompt_objects
+    category_id_by_name = {}
+    for cat_obj in ordered_categories_for_prompt_objects:
+        category_id_by_name.setdefault(cat_obj["name"], cat_obj["id"])
 
-def parse_classification_response(response_text, category_names_expected):
+    return {
+        "compiled_prompt": compiled_prompt,
+        "category_matcher": compile_category_matcher(presented_category_names_for_parsing),
+        "presented_category_names": presented_category_names_for_parsing,
+        "categories_used": ordered_categories_for_prompt_objects,
+        "category_id_by_name": category_id_by_name
+    }
+
+def generate_prompt_variants(item_text: str, strategy_config: dict, base_categories_for_item: list, all_defined_category_sets: dict):
     """
-    Parses the LLM's response to determine the chosen category.
-    `category_names_expected` is the list of category names presented in the prompt.
+    Generates a specific prompt string based on the strategy_config.
+    Returns (prompt text, category names presented in the prompt, category objects presented in the prompt).
     """
-    response_text_stripped = response_text.strip()
-    
-    for cat_name in category_names_expected:
-        if cat_name.lower() == response_text_stripped.lower():
-            return cat_name
+    skeleton = compile_strategy_prompt(strategy_config, index_categories(base_categories_for_item), all_defined_category_sets)
+    return skeleton["compiled_prompt"].render(item_text=item_text), skeleton["presented_category_names"], skeleton["categories_used"]
 
-    for cat_name in category_names_expected:
-        escaped_cat_name = re.escape(cat_name)
-        if re.search(r"\\b" + escaped_cat_name + r"\\b", response_text_stripped, re.IGNORECASE):
-            return cat_name
+class CategoryMatcher:
+    """
+    Finds the category chosen in a response, for one list of presented category names (compiled once per strategy).
+
+    Disambiguation rules:
+      1. If the whole response (stripped, case-insensitive) is a category name, that category is chosen.
+      2. Otherwise the response is scanned once with a single pattern combining all names, for whole-word
+         mentions (case-insensitive; a mention may not be preceded or followed by a letter, digit or underscore).
+         At each position the longest name wins, so "Bug" inside "Bug Report" is not a separate mention.
+      3. If several categories are mentioned, the one mentioned first in the response is chosen. (The previous
+         per-category scan chose the one presented first in the prompt, which made the parsed answer depend on
+         the category order this experiment varies.)
+      4. With no mention the response is "Unparseable".
+    Names that differ only in case are treated as one category (the first presented).
+    """
 
-    return "Unparseable"
+    __slots__ = ("category_names", "names_by_lowercase", "mention_pattern")
+
+    def __init__(self, category_names):
+        self.category_names = tuple(category_names)
+        self.names_by_lowercase = {}
+        for category_name in self.category_names:
+            self.names_by_lowercase.setdefault(category_name.lower(), category_name)
+        alternatives = sorted((name for name in self.names_by_lowercase.values() if name), key=len, reverse=True)
+        self.mention_pattern = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, alternatives)) + r")(?!\w)", re.IGNORECASE) if alternatives else None
+
+    def find_mentions(self, response_text: str) -> list:
+        """(position, category name) for every whole-word category mention, in order of appearance."""
+        if self.mention_pattern is None:
+            return []
+        return [(match.start(), self.names_by_lowercase[match.group(0).lower()]) for match in self.mention_pattern.finditer(response_text)]
+
+    def match(self, response_text: str) -> str:
+        response_text_stripped = response_text.strip()
+        exact_match = self.names_by_lowercase.get(response_text_stripped.lower())
+        if exact_match is not None:
+            return exact_match
+        if self.mention_pattern is not None:
+            first_mention = self.mention_pattern.search(response_text_stripped)
+            if first_mention:
+                return self.names_by_lowercase[first_mention.group(0).lower()]
+        return "Unparseable"
+
+_category_matcher_cache = {}
+_category_matcher_cache_lock = threading.Lock()
+
+def compile_category_matcher(category_names) -> CategoryMatcher:
+    """Returns the (cached) CategoryMatcher for this list of category names."""
+    cache_key = tuple(category_names)
+    matcher = _category_matcher_cache.get(cache_key)
+    if matcher is None:
+        matcher = CategoryMatcher(cache_key)
+        with _category_matcher_cache_lock:
+            matcher = _category_matcher_cache.setdefault(cache_key, matcher)
+    return matcher
+
+def parse_classification_response(response_text, category_names_expected):
+    """
+    Parses the LLM's response to determine the chosen category (see CategoryMatcher for the rules).
+    `category_names_expected` is the list of category names presented in the prompt.
+    """
+    return compile_category_matcher(category_names_expected).match(response_text)
 
 
 # --- Core Task Execution ---
@@ -153,25 +235,28 @@ def parse_classification_response(response_text, category_names_expected):
 def _execute_single_classification_task(
     item_to_classify: dict,
     prompt_variant_config: dict,
-    base_category_set: list,
-    all_defined_category_sets: dict,
+    prompt_skeleton: dict,
     repetitions: int,
     quiet: bool,
-    temperature: float
+    temperature: float,
+    top_logprobs: int | None = None,
+    model_name_override: str | None = None
 ):
     """
     Sends a single classification task to the LLM and parses the response.
     Handles repetitions for this specific item-prompt_variant combination.
+    `prompt_skeleton` is the strategy's compiled prompt for the item's domain (see compile_strategy_prompt).
+    With `top_logprobs`, one call replaces the repetitions (see _classify_with_logprobs).
+    `model_name_override` is set by the judge cascade for its cheap tier.
     """
     item_id = item_to_classify["item_id"]
     item_text = item_to_classify["text"]
     
-    prompt_text, presented_category_names_for_parsing, categories_used_in_prompt = generate_prompt_variants(
-        item_text=item_text,
-        strategy_config=prompt_variant_config["strategy_config_used"],
-        base_categories_for_item=base_category_set, 
-        all_defined_category_sets=all_defined_category_sets
-    )
+    prompt_request = prompt_skeleton["compiled_prompt"].request(item_text=item_text)
+    if model_name_override:
+        prompt_request["model_name_override"] = model_name_override
+    prompt_text = request_as_text(prompt_request)
+    presented_category_names_for_parsing = prompt_skeleton["presented_category_names"]
 
     if not prompt_text or not presented_category_names_for_parsing:
         print(f"Critical error: Prompt text or presented category names missing for item {item_id}, variant {prompt_variant_config.get('variant_id')}")
@@ -204,19 +289,25 @@ def _execute_single_classification_task(
 
     individual_runs_results: list[dict] = []
     errors_count = 0
+    classification_distribution = None
 
-    for rep_idx in range(repetitions):
+    if top_logprobs:
+        individual_runs_results, errors_count, classification_distribution = _classify_with_logprobs(
+            prompt_request, prompt_skeleton, repetitions, quiet, temperature, top_logprobs
+        )
+
+    for rep_idx in range(0 if top_logprobs else repetitions):
         if repetitions > 1 and not quiet:
             print(f"    Rep {rep_idx + 1}/{repetitions} for Item ID: {item_id}, Variant: {prompt_variant_config.get('variant_id')}...")
 
-        llm_response_raw = call_openrouter_api(prompt_text, quiet=True, temperature=temperature)
+        llm_response_raw = call_openrouter_api(**prompt_request, quiet=True, temperature=temperature)
 
         parsed_category_name = None
         error_this_repetition = False
         is_api_error = isinstance(llm_response_raw, str) and llm_response_raw.startswith("Error:")
 
         if not is_api_error:
-            parsed_category_name = parse_classification_response(llm_response_raw, presented_category_names_for_parsing)
+            parsed_category_name = prompt_skeleton["category_matcher"].match(llm_response_raw)
             if parsed_category_name == "Unparseable":
                 errors_count += 1
                 error_this_repetition = True
@@ -254,9 +345,8 @@ def _execute_single_classification_task(
             if is_tie:
                 final_error_type_val = "NO_MAJORITY"
             elif chosen_name not in ["Unparseable", "API Error", "Error"]:
-                found_category_obj = next((cat_obj for cat_obj in categories_used_in_prompt if cat_obj["name"] == chosen_name), None)
-                if found_category_obj:
-                    final_chosen_category_id_val = found_category_obj["id"]
+                if chosen_name in prompt_skeleton["category_id_by_name"]:
+                    final_chosen_category_id_val = prompt_skeleton["category_id_by_name"][chosen_name]
                 else:
                     print(f"Warning: Parsed name '{chosen_name}' not in categories_used_in_prompt for ID mapping. Item: {item_id}.")
                     final_error_type_val = "PARSING_ERROR"
@@ -287,11 +377,100 @@ def _execute_single_classification_task(
         "llm_chosen_category_id": final_chosen_category_id_val,
         "error_type": final_error_type_val,
         "actual_prompt_sent_to_llm": prompt_text,
-        "sampled_llm_raw_responses": [run["llm_classification_raw"] for run in individual_runs_results[:min(repetitions, 3)]]
+        "sampled_llm_raw_responses": [run["llm_classification_raw"] for run in individual_runs_results[:min(repetitions, 3)] if run["llm_classification_raw"] is not None],
+        **({"logprob_classification_distribution": classification_distribution} if classification_distribution else {})
     }
 
+def _classify_with_logprobs(prompt_request: dict, prompt_skeleton: dict, repetitions: int, quiet: bool, temperature: float, top_logprobs: int):
+    """
+    One call with top-k logprobs in place of `repetitions` calls. The category distribution at the start of the
+    response is expanded into `repetitions` runs (the raw response is kept on the first). Returns (runs, error count,
+    distribution or None).
+    """
+    llm_response_raw = call_openrouter_api(**prompt_request, quiet=True, temperature=temperature, top_logprobs=top_logprobs)
+    content, _ = split_logprob_response(llm_response_raw)
+    category_names = prompt_skeleton["presented_category_names"]
+
+    distribution = None
+    if content.startswith("Error:"):
+        parsed_category_names = ["API Error"] * repetitions
+        if not quiet:
+            print(f"      API Error (logprobs mode). LLM Raw: {content[:100]}...")
+    else:
+        distribution = answer_distribution(llm_response_raw, category_names) or parsed_distribution(prompt_skeleton["category_matcher"].match(content), category_names)
+        if distribution is None:
+            parsed_category_names = ["Unparseable"] * repetitions
+            if not quiet:
+                print(f"      Parsing Error (logprobs mode). LLM Raw: {content[:100]}...")
+        else:
+            parsed_category_names = expand_distribution(distribution["probabilities"], repetitions)
+            distribution = {**distribution, "probabilities": {name: round(probability, 6) for name, probability in distribution["probabilities"].items()}}
+
+    runs = [{
+        "repetition_index": rep_idx,
+        "llm_classification_raw": content if rep_idx == 0 else None,
+        "parsed_classification": parsed_category_name,
+        "error_in_repetition": distribution is None
+    } for rep_idx, parsed_category_name in enumerate(parsed_category_names)]
+    return runs, (0 if distribution else repetitions), distribution
+
+def _assess_classification_result(result: dict) -> tuple:
+    """The judge cascade's view of a classification: (category name, agreement or probability, from a distribution)."""
+    distribution = result.get("logprob_classification_distribution")
+    if distribution:
+        category_name, probability = most_likely_answer(distribution["probabilities"])
+        return category_name, probability, True
+    category_name, agreement = majority_answer(
+        [run["parsed_classification"] for run in result["runs"]], result["total_repetitions_attempted"],
+        invalid=("Unparseable", "API Error", "Error", "Exception")
+    )
+    return category_name, agreement, False
+
+def _submit_classification_task(executor, task_args: tuple, cascade):
+    if cascade is None:
+        return executor.submit(_execute_single_classification_task, *task_args)
+    return executor.submit(
+        cascade.judge, lambda model_name_override: _execute_single_classification_task(*task_args, model_name_override),
+        _assess_classification_result, task_args[0]
+    )
+
 # --- Main Experiment Runner ---
 
+def prepare_classification_tasks(items_to_process: list, category_sets: dict, prompt_variant_strategies: list, quiet: bool = False):
+    """
+    Builds the item x strategy task matrix: a list of (item, variant config, prompt skeleton) tuples.
+    Category sets are indexed once and each strategy's prompt skeleton is compiled once per domain, so
+    preparation is linear in the number of tasks; prompts are rendered from the skeleton when a task runs.
+    Returns (tasks, number of prompt skeletons compiled).
+    """
+    category_index = build_category_index(category_sets)
+    variant_configs = [
+        {"variant_id": strategy.get("strategy_id", f"strategy_fallback_{i}"), "strategy_config_used": strategy}
+        for i, strategy in enumerate(prompt_variant_strategies)
+    ]
+    skeletons_by_domain = {}  # domain -> [(variant config, skeleton)] for the strategies that apply to it
+    tasks = []
+
+    for item_data in tqdm(items_to_process, desc="Preparing classification tasks", leave=False):
+        item_domain = item_data.get("domain")
+        if not category_sets.get(item_domain):
+            if not quiet: print(f"Warning: No category set found for item {item_data['item_id']} with domain '{item_domain}'. Skipping.")
+            continue
+
+        domain_skeletons = skeletons_by_domain.get(item_domain)
+        if domain_skeletons is None:
+            domain_skeletons = [
+                (variant_config, compile_strategy_prompt(variant_config["strategy_config_used"], category_index[item_domain], category_sets, category_index))
+                for variant_config in variant_configs
+                if variant_config["strategy_config_used"].get("domain_target") in (None, "", item_domain)
+            ]
+            skeletons_by_domain[item_domain] = domain_skeletons
+
+        for variant_config, skeleton in domain_skeletons:
+            tasks.append((item_data, variant_config, skeleton))
+
+    return tasks, sum(len(domain_skeletons) for domain_skeletons in skeletons_by_domain.values())
+
 def run_classification_experiment(
     classification_items: list,
     category_sets: dict,
@@ -300,7 +479,9 @@ def run_classification_experiment(
     quiet: bool = False,
     num_samples: int = 0,
     repetitions: int = 1,
-    temperature: float = 0.1
+    temperature: float = 0.1,
+    top_logprobs: int | None = None,
+    cascade=None
 ):
     """
     Runs the classification experiment.
@@ -308,17 +489,23 @@ def run_classification_experiment(
     - category_sets: All available category definitions, keyed by domain.
     - prompt_variant_strategies: A list of configurations, each defining how to construct a prompt variant 
                                  (e.g., category order, definition nuances, escape hatches).
+    - top_logprobs: if set, each item-variant is one call whose category distribution (from the top-k logprobs,
+                    see logprob_judging.py) fills the `repetitions` runs.
+    - cascade: optional judge_cascade.JudgeCascade; each item-variant is classified by its cheap model first and
+               escalated to the configured model for ambiguous items, disagreeing runs or low confidence.
     """
     if not quiet:
         print(f"\\n--- Classification Experiment ---")
         print(f"LLM Model: {BIAS_SUITE_LLM_MODEL}")
-        print(f"Repetitions per item-prompt-variant: {repetitions}")
+        print(f"Repetitions per item-prompt-variant: {repetitions}" + (f" (from one call with top-{top_logprobs} logprobs)" if top_logprobs else ""))
         print(f"Temperature for API calls: {temperature}")
         print(f"Number of prompt variant strategies: {len(prompt_variant_strategies)}")
+        if cascade:
+            print(f"Judge cascade: {cascade.cheap_model} first")
 
     items_to_process = classification_items
     if num_samples > 0 and len(items_to_process) > num_samples:
-        items_to_process = random.sample(items_to_process, num_samples) if num_samples < len(items_to_process) else items_to_process
+        items_to_process = experiment_rng().sample(items_to_process, num_samples) if num_samples < len(items_to_process) else items_to_process
         if not quiet: print(f"Processing a sample of {len(items_to_process)} items.")
     
     if not items_to_process:
@@ -326,49 +513,35 @@ def run_classification_experiment(
         return []
 
     all_results_data = []
-    tasks_for_executor = []
-    
-    for item_data in tqdm(items_to_process, desc="Preparing classification tasks", leave=False):
-        item_domain = item_data.get("domain")
-        base_categories_for_item = category_sets.get(item_domain)
-        if not base_categories_for_item:
-            if not quiet: print(f"Warning: No category set found for item {item_data['item_id']} with domain '{item_domain}'. Skipping.")
-            continue
+    preparation_started_at = time.perf_counter()
+    tasks_for_executor, skeleton_count = prepare_classification_tasks(items_to_process, category_sets, prompt_variant_strategies, quiet=quiet)
+    preparation_seconds = time.perf_counter() - preparation_started_at
 
-        for i, p_variant_strategy_config in enumerate(prompt_variant_strategies):
-            strategy_domain_target = p_variant_strategy_config.get("domain_target")
-            if strategy_domain_target and strategy_domain_target != item_domain:
-                continue
-
-            variant_id_for_task = p_variant_strategy_config.get("strategy_id", f"strategy_fallback_{i}")
-            
-            task_execution_config = {
-                "variant_id": variant_id_for_task,
-                "strategy_config_used": p_variant_strategy_config
-            }
-            
-            tasks_for_executor.append(
-                (item_data, task_execution_config, base_categories_for_item, category_sets, repetitions, quiet, temperature)
-            )
-            
     if not tasks_for_executor:
         if not quiet: print("No tasks generated for executor. Check item domains and strategies.")
         return []
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_CLASSIFICATION_CALLS) as executor:
-        future_to_task_info = {
-            executor.submit(
-                _execute_single_classification_task, 
-                task_item_arg,
-                task_exec_config_arg,
-                task_bcs_arg,
-                task_all_sets_arg,
-                task_reps_arg,
-                task_quiet_arg,
-                task_temp_arg
-            ): (task_item_arg['item_id'], task_exec_config_arg.get('variant_id')) 
-            for task_item_arg, task_exec_config_arg, task_bcs_arg, task_all_sets_arg, task_reps_arg, task_quiet_arg, task_temp_arg in tasks_for_executor
-        }
+    items_by_id = index_items_by_id(items_to_process, id_key="item_id")
+    strategies_by_id = index_items_by_id(prompt_variant_strategies, id_key="strategy_id")
+
+    task_positions = {(task_item_arg['item_id'], task_exec_config_arg.get('variant_id')): i for i, (task_item_arg, task_exec_config_arg, _) in enumerate(tasks_for_executor)}
+    tasks_for_executor = longest_first(tasks_for_executor, lambda task: estimate_task_seconds(
+        task_group("classification", task[1].get('variant_id')),
+        sum(len(static_part) for static_part in task[2]["compiled_prompt"].static_parts) + len(task[0]["text"]),
+        1 if top_logprobs else repetitions
+    ))
+
+    api_phase_started_at = time.perf_counter()
+    with ContextThreadPoolExecutor(max_workers=CONCURRENT_CLASSIFICATION_CALLS) as executor:
+        future_to_task_info = {}
+        for task_item_arg, task_exec_config_arg, task_skeleton_arg in tasks_for_executor:
+            with latency_group(task_group("classification", task_exec_config_arg.get('variant_id'))):
+                future = _submit_classification_task(
+                    executor,
+                    (task_item_arg, task_exec_config_arg, task_skeleton_arg, repetitions, quiet, temperature, top_logprobs),
+                    cascade
+                )
+            future_to_task_info[future] = (task_item_arg['item_id'], task_exec_config_arg.get('variant_id'))
 
         for future in tqdm(concurrent.futures.as_completed(future_to_task_info), total=len(future_to_task_info), desc="Running classifications"):
             item_id, variant_id = future_to_task_info[future]
@@ -377,7 +550,7 @@ def run_classification_experiment(
                 all_results_data.append(result)
             except Exception as exc:
                 print(f"!! Exception for Item ID: {item_id}, Variant ID: {variant_id}: {exc}")
-                item_data_for_error = next((item for item in items_to_process if item["item_id"] == item_id), {})
+                item_data_for_error = items_by_id.get(item_id, {})
                 item_details_for_error_exc = {
                     "item_id": item_id,
                     "item_text": item_data_for_error.get("text", "Unknown text due to earlier error"),
@@ -386,7 +559,7 @@ def run_classification_experiment(
                     "ambiguity_score": item_data_for_error.get("ambiguity_score"),
                     "is_control_item": item_data_for_error.get("is_control_item")
                 }
-                strategy_details_for_error = next((s for s in prompt_variant_strategies if s.get("strategy_id") == variant_id), {})
+                strategy_details_for_error = strategies_by_id.get(variant_id, {})
 
                 all_results_data.append({
                     "item_details": item_details_for_error_exc,
@@ -403,12 +576,19 @@ def run_classification_experiment(
                     "total_repetitions_attempted": repetitions
                 })
 
+    api_phase_seconds = time.perf_counter() - api_phase_started_at
+    # Restore task order (as_completed yields in completion order) so the output is reproducible.
+    all_results_data.sort(key=lambda r: task_positions.get((r["item_details"]["item_id"], r["prompt_variant_id"]), len(task_positions)))
+
     if not quiet:
         print(f"\\n--- Classification Experiment Summary ---")
+        print(f"Preparation: {len(tasks_for_executor)} task(s) from {skeleton_count} prompt skeleton(s) in {preparation_seconds:.3f}s; API phase: {api_phase_seconds:.1f}s")
         total_runs = sum(r['total_repetitions_attempted'] for r in all_results_data if 'total_repetitions_attempted' in r)
         total_errors = sum(r['errors_across_all_repetitions'] for r in all_results_data if 'errors_across_all_repetitions' in r)
         print(f"Total classification attempts: {total_runs}")
         print(f"Total errors (API or Parse): {total_errors}")
+        if cascade:
+            print(cascade.format_summary())
         
     return all_results_data
 
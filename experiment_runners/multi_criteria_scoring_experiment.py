@@ -4,12 +4,18 @@ import numpy as np
 import collections
 import os
 import sys
+from collections.abc import Mapping
 from tqdm import tqdm
 
 # Use explicit package-relative imports
 # REMOVED direct data imports - data will be passed in
 # from test_data import SHORT_ARGUMENTS_FOR_SCORING, ARGUMENT_EVALUATION_RUBRIC 
-from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL
+from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL, ContextThreadPoolExecutor, latency_group
+from item_store import index_items_by_id
+from judgment_store import get_judgment_store
+from prompt_templates import compile_prompt, request_as_text
+from experiment_options import STRUCTURED_OUTPUT_MODES # How the JSON scores are requested
+from task_scheduler import task_group, estimate_task_seconds, longest_first
 
 # --- Constants ---
 # CRITERIA_ORDER will now be derived from the passed-in rubric_dict
@@ -43,10 +49,51 @@ def format_rubric_for_prompt(rubric_dict: dict) -> str:
             
     return "\n".join(lines)
 
-def parse_multi_criteria_json(response_text: str, criteria_order: list) -> dict | None:
+def build_criteria_response_format(criteria_order: list, structured_output: str = "prompt") -> dict | None:
+    """The `response_format` request parameter for a structured output mode (None for "prompt")."""
+    if structured_output == "prompt":
+        return None
+    if structured_output == "json_object":
+        return {"type": "json_object"}
+    if structured_output == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "criteria_scores",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {criterion: {"type": "integer", "minimum": 1, "maximum": 5} for criterion in criteria_order},
+                    "required": list(criteria_order),
+                    "additionalProperties": False
+                }
+            }
+        }
+    raise ValueError(f"Unknown structured output mode '{structured_output}'. Choose from {STRUCTURED_OUTPUT_MODES}.")
+
+_json_decoder = json.JSONDecoder()
+
+def extract_json_object(response_text: str) -> dict | None:
+    """
+    Returns the first JSON object embedded anywhere in the response (surrounding prose, code fences and trailing
+    text are ignored), scanning left to right and decoding from each '{' until one parses.
+    """
+    start = response_text.find("{")
+    while start != -1:
+        try:
+            parsed, _ = _json_decoder.raw_decode(response_text, start)
+            if isinstance(parsed, dict):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+        start = response_text.find("{", start + 1)
+    return None
+
+def parse_multi_criteria_json(response_text: str, criteria_order: list, tolerant: bool = False) -> dict | None:
     """
     Parses the LLM's JSON response to extract scores for multiple criteria.
     Ensures all criteria are present and scores are valid (1-5).
+    With `tolerant`, a response that is not pure JSON falls back to the first JSON object found in it.
     """
     try:
         if response_text.strip().startswith("```json"):
@@ -56,8 +103,10 @@ def parse_multi_criteria_json(response_text: str, criteria_order: list) -> dict
         
         parsed_json = json.loads(response_text)
     except json.JSONDecodeError:
-        print(f"Warning: Could not parse JSON from response: {response_text[:200]}...")
-        return None
+        parsed_json = extract_json_object(response_text) if tolerant else None
+        if parsed_json is None:
+            print(f"Warning: Could not parse JSON from response: {response_text[:200]}...")
+            return None
 
     if not isinstance(parsed_json, dict):
         print(f"Warning: Parsed JSON is not a dictionary: {parsed_json}")
@@ -91,6 +140,34 @@ def parse_multi_criteria_json(response_text: str, criteria_order: list) -> dict
         
     return scores
 
+def summarize_parse_failures(task_results: list, variant_key: str) -> dict:
+    """
+    Per-variant repetition outcomes: API errors, parse failures, and their rates. Every parse failure is a
+    response that was received (and paid for) but could not be used, so it is also counted as a wasted call.
+    """
+    summary = collections.defaultdict(lambda: {"repetitions": 0, "api_errors": 0, "parse_failures": 0})
+    for task_result in task_results:
+        variant_counts = summary[task_result.get(variant_key, "N/A")]
+        variant_counts["repetitions"] += task_result.get("total_repetitions_attempted", 0)
+        if "error_message" in task_result:
+            variant_counts["api_errors"] += task_result.get("errors_in_repetitions", 0)
+            continue
+        variant_counts["api_errors"] += task_result.get("api_errors_in_repetitions", 0)
+        variant_counts["parse_failures"] += task_result.get("parse_failures_in_repetitions", 0)
+    for variant_counts in summary.values():
+        responses_received = variant_counts["repetitions"] - variant_counts["api_errors"]
+        variant_counts["parse_failure_rate"] = variant_counts["parse_failures"] / responses_received if responses_received else None
+        variant_counts["wasted_calls"] = variant_counts["parse_failures"]
+    return dict(summary)
+
+def print_parse_failure_summary(parse_failure_summary: dict, title: str):
+    print(f"\n--- {title} ---")
+    print(" | ".join(["Variant".ljust(40), "Reps".ljust(6), "API Err".ljust(8), "Parse Fail".ljust(10), "Fail Rate".ljust(9), "Wasted Calls"]))
+    for variant_name, counts in parse_failure_summary.items():
+        rate_str = f"{counts['parse_failure_rate']:.1%}" if counts["parse_failure_rate"] is not None else "N/A"
+        print(" | ".join([str(variant_name)[:40].ljust(40), str(counts["repetitions"]).ljust(6), str(counts["api_errors"]).ljust(8),
+                          str(counts["parse_failures"]).ljust(10), rate_str.ljust(9), str(counts["wasted_calls"])]))
+
 def _run_single_item_evaluation_task(
     variant_config: dict, 
     item_to_evaluate: dict,
@@ -98,7 +175,8 @@ def _run_single_item_evaluation_task(
     criteria_order: list, 
     repetitions: int, 
     quiet: bool,
-    temperature: float
+    temperature: float,
+    structured_output: str = "prompt"
 ) -> dict:
     """
     Runs LLM evaluation for a single item against a specific prompt variant, expecting multi-criteria JSON output.
@@ -108,42 +186,54 @@ def _run_single_item_evaluation_task(
     item_text_to_score = item_to_evaluate['text']
     item_title = item_to_evaluate.get('title', item_id)
 
-    system_prompt = variant_config.get("system_prompt")
-    user_prompt_template = variant_config["user_prompt_template"]
-
-    user_prompt = user_prompt_template.format(
-        text=item_text_to_score,
+    # The rubric and criteria are identical for every item of a variant, so only the item text is rendered per call.
+    compiled_prompt = compile_prompt(
+        variant_config["user_prompt_template"], slot_fields=("text",),
+        system_prompt=variant_config.get("system_prompt"),
         rubric_text=full_rubric_text,
         criteria_names_json_string=json.dumps(criteria_order)
     )
-
-    prompt_to_send = str(system_prompt) + "\n\n" + user_prompt if system_prompt else user_prompt
+    prompt_request = compiled_prompt.request(text=item_text_to_score)
+    prompt_to_send = request_as_text(prompt_request)
+    response_format = build_criteria_response_format(criteria_order, structured_output)
 
     all_repetition_scores = []
     llm_raw_responses_list = []
     errors_in_repetitions_count = 0
+    api_errors_count = 0
+    parse_failures_count = 0
     actual_prompt_sent_to_llm = prompt_to_send # Store the actual prompt
 
     if repetitions > 1 and not quiet:
         print(f"    Evaluating Item: '{item_title}' with Variant: '{variant_config['name']}' ({repetitions} reps)...")
 
-    for rep_idx in range(repetitions):
+    # Holistic judgments are shared across experiments: only repetitions not already in the store are requested.
+    llm_responses_for_reps = get_judgment_store().get_or_request(
+        item_id, prompt_to_send, temperature, repetitions,
+        lambda: call_openrouter_api(**prompt_request, quiet=True, temperature=temperature, response_format=response_format),
+        response_format=response_format
+    )
+
+    for rep_idx, llm_response_raw in enumerate(llm_responses_for_reps):
         if repetitions > 1 and not quiet:
             print(f"      Rep {rep_idx + 1}/{repetitions}...")
         
-        llm_response_raw = call_openrouter_api(prompt_to_send, quiet=True, temperature=temperature)
         llm_raw_responses_list.append(llm_response_raw)
 
         parsed_scores_single_rep = None
         is_api_error = isinstance(llm_response_raw, str) and llm_response_raw.startswith("Error:")
 
         if not is_api_error:
-            parsed_scores_single_rep = parse_multi_criteria_json(llm_response_raw, criteria_order)
+            parsed_scores_single_rep = parse_multi_criteria_json(llm_response_raw, criteria_order, tolerant=response_format is not None)
         
         if parsed_scores_single_rep:
             all_repetition_scores.append(parsed_scores_single_rep)
         else:
             errors_in_repetitions_count += 1
+            if is_api_error:
+                api_errors_count += 1
+            else:
+                parse_failures_count += 1
             if not quiet:
                 error_type = "API Error" if is_api_error else "Parsing Error"
                 print(f"        {error_type} in Rep {rep_idx + 1}. LLM Raw: {llm_response_raw[:150]}...")
@@ -155,6 +245,8 @@ def _run_single_item_evaluation_task(
         "scores_per_repetition": all_repetition_scores,
         "llm_raw_responses": llm_raw_responses_list,
         "errors_in_repetitions": errors_in_repetitions_count,
+        "api_errors_in_repetitions": api_errors_count,
+        "parse_failures_in_repetitions": parse_failures_count,
         "total_repetitions_attempted": repetitions,
         "actual_prompt_sent_to_llm": actual_prompt_sent_to_llm,
         "sampled_llm_raw_responses": llm_raw_responses_list[:min(repetitions, 3)]
@@ -170,16 +262,19 @@ def run_multi_criteria_experiment(
     quiet: bool = False, 
     num_samples: int = 0, 
     repetitions: int = 1,
-    temperature: float = 0.1
+    temperature: float = 0.1,
+    structured_output: str = "prompt"
 ) -> list:
     """
     Main experiment runner for scoring items against multiple criteria based on provided data and rubric.
+    `structured_output` selects how the JSON scores are requested (see STRUCTURED_OUTPUT_MODES).
     """
     if not quiet:
         print(f"\n--- Multi-Criteria Scoring Experiment ({task_name}) ---")
         print(f"LLM Model: {BIAS_SUITE_LLM_MODEL}")
         print(f"Repetitions per item-variant: {repetitions}")
         print(f"Temperature for API calls: {temperature}")
+        print(f"Structured output mode: {structured_output}")
 
     if not data_list or not isinstance(data_list, list):
         print(f"Warning: Provided data_list for task '{task_name}' is empty or invalid. Skipping experiment.")
@@ -215,20 +310,32 @@ def run_multi_criteria_experiment(
     ]
         
     all_results_data = [] 
+    items_by_id = index_items_by_id(items_to_process)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_MULTI_CRITERIA) as executor:
-        future_to_task_info = {}
-        for item_data in tqdm(items_to_process, desc=f"Processing {task_name} items"):
-            if not isinstance(item_data, dict) or 'text' not in item_data or 'id' not in item_data:
-                if not quiet: print(f"Skipping invalid item data: {item_data}")
-                continue
+    tasks_to_submit = []
+    for item_data in tqdm(items_to_process, desc=f"Processing {task_name} items"):
+        if not isinstance(item_data, Mapping) or 'text' not in item_data or 'id' not in item_data:
+            if not quiet: print(f"Skipping invalid item data: {item_data}")
+            continue
 
-            item_title_display = item_data.get('title', item_data['id'])
+        item_title_display = item_data.get('title', item_data['id'])
 
-            for variant_config in prompt_variants:
-                if not quiet:
-                    print(f"  Queueing Item: '{item_title_display}', Variant: '{variant_config['name']}'")
+        for variant_config in prompt_variants:
+            if not quiet:
+                print(f"  Queueing Item: '{item_title_display}', Variant: '{variant_config['name']}'")
+            tasks_to_submit.append((item_data, variant_config))
+
+    task_positions = {(item_data['id'], variant_config['name']): i for i, (item_data, variant_config) in enumerate(tasks_to_submit)}
+    tasks_to_submit = longest_first(tasks_to_submit, lambda task: estimate_task_seconds(
+        task_group("multi_criteria", task[1]['name']),
+        len(task[1]['system_prompt']) + len(task[1]['user_prompt_template']) + len(formatted_rubric_text) + len(task[0]['text']),
+        repetitions
+    ))
 
+    with ContextThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS_MULTI_CRITERIA) as executor:
+        future_to_task_info = {}
+        for item_data, variant_config in tasks_to_submit:
+            with latency_group(task_group("multi_criteria", variant_config['name'])):
                 future = executor.submit(
                     _run_single_item_evaluation_task,
                     variant_config,
@@ -237,9 +344,10 @@ def run_multi_criteria_experiment(
                     criteria_order,
                     repetitions,
                     quiet,
-                    temperature
+                    temperature,
+                    structured_output
                 )
-                future_to_task_info[future] = (item_data['id'], variant_config['name'])
+            future_to_task_info[future] = (item_data['id'], variant_config['name'])
 
         for future in tqdm(concurrent.futures.as_completed(future_to_task_info), desc=f"Processing {task_name} results"):
             item_id, variant_name = future_to_task_info[future]
@@ -250,11 +358,8 @@ def run_multi_criteria_experiment(
                     print(f"    Completed evaluation for Item ID: {item_id}, Variant: {variant_name}. Successes: {len(result['scores_per_repetition'])}/{result['total_repetitions_attempted']}")
             except Exception as exc:
                 print(f"!! Exception processing task for Item ID: {item_id}, Variant: {variant_name}: {exc}")
-                error_item_title = "Unknown Item"
-                for item in items_to_process:
-                    if item['id'] == item_id:
-                        error_item_title = item.get('title', item_id)
-                        break
+                error_item = items_by_id.get(item_id)
+                error_item_title = error_item.get('title', item_id) if error_item else "Unknown Item"
 
                 all_results_data.append({
                     "item_id": item_id, "variant_name": variant_name, "error_message": str(exc),
@@ -262,6 +367,8 @@ def run_multi_criteria_experiment(
                     "errors_in_repetitions": repetitions, "total_repetitions_attempted": repetitions,
                     "item_title": error_item_title
                 })
+    # Restore task order (as_completed yields in completion order) so the output is reproducible.
+    all_results_data.sort(key=lambda r: task_positions.get((r.get("item_id"), r.get("variant_name")), len(task_positions)))
 
     if not quiet:
         print(f"\n\n--- {task_name} Multi-Criteria Scoring Summary Table ---")
@@ -318,6 +425,9 @@ def run_multi_criteria_experiment(
             "total_repetitions": result_item.get("total_repetitions_attempted", 0),
             "successful_repetitions": num_successful_reps,
             "errors_in_repetitions": result_item.get("errors_in_repetitions", 0),
+            "api_errors_in_repetitions": result_item.get("api_errors_in_repetitions", 0),
+            "parse_failures_in_repetitions": result_item.get("parse_failures_in_repetitions", 0),
+            "structured_output": structured_output,
             "criteria_stats": {},
             "actual_prompt_sent_to_llm": result_item.get("actual_prompt_sent_to_llm"),
             "sampled_llm_raw_responses": result_item.get("sampled_llm_raw_responses")
@@ -342,6 +452,11 @@ def run_multi_criteria_experiment(
         print(" | ".join(row_values))
         final_summary_for_return.append(processed_item_summary)
 
+    print_parse_failure_summary(
+        summarize_parse_failures(all_results_data, "variant_name"),
+        f"{task_name} Parse Failures per Variant (structured output: {structured_output})"
+    )
+
     if show_raw and not quiet:
         print(f"\n\n--- Raw LLM Responses for {task_name} Scoring (Sample) ---")
         for i, result_item in enumerate(all_results_data):
@@ -3,7 +3,10 @@ import collections
 from tqdm import tqdm
 import concurrent.futures
 from test_data import RANKING_SETS
-from config_utils import call_openrouter_api
+from config_utils import call_openrouter_api, ContextThreadPoolExecutor, latency_group, experiment_rng
+from prompt_templates import compile_prompt, request_as_text
+from item_store import index_items_by_id
+from task_scheduler import task_group, estimate_task_seconds, longest_first
 import re
 
 # --- Elo rating helpers ---
@@ -82,32 +85,31 @@ def parse_json_winner(llm_response, allow_tie=False):
         print(f"Warning: Unexpected error during JSON parsing: {e}. Raw: {llm_response[:100]}...")
     return None
 
-# --- Helper function to process a single ELO variant ---
-def _process_single_variant(
-    variant_config, 
-    items, 
-    criterion, 
-    k, 
-    quiet, 
-    repetitions, 
-    show_raw, 
+# --- Helpers to plan, judge and finalize a single ELO variant ---
+def _plan_variant_matches(
+    variant_config,
+    items,
+    criterion,
+    quiet,
     current_set_id,
-    elo_match_repetition_concurrency,
     example_json_A_str,
     example_json_B_str,
-    temperature: float
+    variant_seed=None
     ):
+    """
+    Fixes a variant's match order, A/B placement and prompts up front, so its matches can be judged concurrently
+    with every other variant's and the Elo updates applied afterwards, in this order.
+    """
     if not quiet:
         print(f"\\n  === Starting Elo Variant: {variant_config['name']} (Set: '{current_set_id}') ===")
 
-    ratings = {item['id']: 1000 for item in items}
-    win_loss = {item['id']: {'W': 0, 'L': 0, 'T': 0} for item in items}
-    detailed_pair_results_for_variant = []
-    
     n_items = len(items)
     pairs = [(i, j) for i in range(n_items) for j in range(i + 1, n_items)]
     pairs_shuffled = pairs[:]
-    random.shuffle(pairs_shuffled)
+    # Each variant gets its own RNG (seeded by the caller) to keep match order and A/B placement
+    # reproducible regardless of thread scheduling.
+    rng = random.Random(variant_seed)
+    rng.shuffle(pairs_shuffled)
 
     current_variant_user_prompt_template = variant_config["user_prompt_template"]
     if "{criterion}" in current_variant_user_prompt_template:
@@ -117,65 +119,72 @@ def _process_single_variant(
     if current_variant_system_prompt and "{criterion}" in current_variant_system_prompt:
         current_variant_system_prompt = current_variant_system_prompt.format(criterion=criterion)
 
-    match_pbar_desc = f"Matches for {variant_config['name']} ({current_set_id})"
-    for idx, (i_idx, j_idx) in enumerate(tqdm(pairs_shuffled, desc=match_pbar_desc, leave=False)):
+    # Compiled once per variant; only the two items change between matches.
+    compiled_match_prompt = compile_prompt(
+        current_variant_user_prompt_template, slot_fields=("A", "B"),
+        system_prompt=current_variant_system_prompt, system_separator="\\n\\n",
+        slot_labels={"A": "Item A", "B": "Item B"}
+    )
+
+    matches = []
+    for i_idx, j_idx in pairs_shuffled:
         item_a_obj = items[i_idx]
         item_b_obj = items[j_idx]
         
-        is_item_a_actually_first = random.random() < 0.5
+        is_item_a_actually_first = rng.random() < 0.5
         prompt_item_A = item_a_obj if is_item_a_actually_first else item_b_obj
         prompt_item_B = item_b_obj if is_item_a_actually_first else item_a_obj
 
-        user_prompt = current_variant_user_prompt_template.format(A=prompt_item_A['text'], B=prompt_item_B['text'])
-        
-        prompt = current_variant_system_prompt + "\\n\\n" + user_prompt if current_variant_system_prompt else user_prompt
+        prompt_request = compiled_match_prompt.request(A=prompt_item_A['text'], B=prompt_item_B['text'])
+        matches.append({
+            "prompt_item_A": prompt_item_A,
+            "prompt_item_B": prompt_item_B,
+            "prompt_request": prompt_request,
+            "prompt": request_as_text(prompt_request)
+        })
+
+    return {
+        "variant_config": variant_config,
+        "items": items,
+        "current_set_id": current_set_id,
+        "system_prompt": current_variant_system_prompt,
+        "user_prompt_template": current_variant_user_prompt_template,
+        "matches": matches
+    }
+
+def _judge_match_repetition(prompt_request, variant_config, temperature: float):
+    """One repetition of one match: (raw response, parsed winner label or None on an API error/unparseable response)."""
+    llm_response = call_openrouter_api(**prompt_request, quiet=True, temperature=temperature)
+    if isinstance(llm_response, str) and llm_response.startswith("Error:"):
+        return llm_response, None
+    return llm_response, variant_config["parse_fn"](llm_response, allow_tie=variant_config["allow_tie"])
+
+def _finalize_variant(variant_plan, match_repetition_results, k, quiet, repetitions, show_raw, temperature: float):
+    """
+    Applies a variant's judged matches to the Elo ratings in the planned (shuffled) match order.
+    `match_repetition_results[match_idx][rep_idx]` is the (raw response, winner label) of that repetition.
+    """
+    variant_config = variant_plan["variant_config"]
+    items = variant_plan["items"]
+    current_set_id = variant_plan["current_set_id"]
+    planned_matches = variant_plan["matches"]
+
+    ratings = {item['id']: 1000 for item in items}
+    win_loss = {item['id']: {'W': 0, 'L': 0, 'T': 0} for item in items}
+    detailed_pair_results_for_variant = []
 
-        repetition_winner_labels = [None] * repetitions
-        repetition_llm_responses = [None] * repetitions
-        repetition_errors_this_match = 0
+    for idx, (match, repetition_results) in enumerate(zip(planned_matches, match_repetition_results)):
+        prompt_item_A = match["prompt_item_A"]
+        prompt_item_B = match["prompt_item_B"]
+        prompt = match["prompt"]
+
+        repetition_llm_responses = [response for response, _ in repetition_results]
+        repetition_winner_labels = [label for _, label in repetition_results]
+        repetition_errors_this_match = sum(1 for label in repetition_winner_labels if label is None)
 
         if not quiet and repetitions > 1:
-             print(f"\\n    Match {idx+1}/{len(pairs_shuffled)} ({variant_config['name']}): {prompt_item_A['id']} vs {prompt_item_B['id']} ({repetitions} reps)")
-
-        if repetitions == 1:
-            llm_response_single_rep = call_openrouter_api(prompt, None, True, temperature=temperature)
-            repetition_llm_responses[0] = llm_response_single_rep
-            current_rep_winner_label = None
-            is_api_error_rep = isinstance(llm_response_single_rep, str) and llm_response_single_rep.startswith("Error:")
-            if not is_api_error_rep:
-                current_rep_winner_label = variant_config["parse_fn"](llm_response_single_rep, allow_tie=variant_config["allow_tie"])
-            if current_rep_winner_label is None or is_api_error_rep:
-                repetition_errors_this_match += 1
-            repetition_winner_labels[0] = current_rep_winner_label
-        elif repetitions > 1:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=min(elo_match_repetition_concurrency, repetitions)) as executor_reps:
-                future_to_rep_idx = {}
-                for rep_idx_loop in range(repetitions):
-                    future = executor_reps.submit(call_openrouter_api, prompt, None, True, temperature=temperature)
-                    future_to_rep_idx[future] = rep_idx_loop
-                
-                rep_iterator = future_to_rep_idx.keys()
-                if repetitions > elo_match_repetition_concurrency and repetitions > 5 and not quiet :
-                    rep_iterator = tqdm(concurrent.futures.as_completed(future_to_rep_idx), total=repetitions, desc=f"Reps {prompt_item_A['id']}v{prompt_item_B['id']}", leave=False)
-                else:
-                    rep_iterator = concurrent.futures.as_completed(future_to_rep_idx)
-
-                for future_item in rep_iterator:
-                    rep_idx_completed = future_to_rep_idx[future_item]
-                    try:
-                        llm_response_single_rep = future_item.result()
-                        repetition_llm_responses[rep_idx_completed] = llm_response_single_rep
-                        current_rep_winner_label_async = None
-                        is_api_error_rep_async = isinstance(llm_response_single_rep, str) and llm_response_single_rep.startswith("Error:")
-                        if not is_api_error_rep_async:
-                            current_rep_winner_label_async = variant_config["parse_fn"](llm_response_single_rep, allow_tie=variant_config["allow_tie"])
-                        if current_rep_winner_label_async is None or is_api_error_rep_async:
-                            repetition_errors_this_match += 1
-                        repetition_winner_labels[rep_idx_completed] = current_rep_winner_label_async
-                    except Exception as exc:
-                        repetition_errors_this_match += 1
-                        repetition_llm_responses[rep_idx_completed] = f"Exception during API call for Rep {rep_idx_completed + 1}: {exc}"
-        
+             print(f"\\n    Match {idx+1}/{len(planned_matches)} ({variant_config['name']}): {prompt_item_A['id']} vs {prompt_item_B['id']} ({repetitions} reps)")
+
         valid_rep_labels = [label for label in repetition_winner_labels if label is not None]
         overall_match_winner_label = None
         
@@ -271,13 +280,14 @@ def _process_single_variant(
             "sampled_llm_raw_responses": repetition_llm_responses[:min(repetitions, 3)]
         })
 
-    final_rankings = sorted([{"id": item_id, "text_snippet": next((it['text'] for it in items if it['id'] == item_id),"")[:50]+"...", "elo": round(rating), "W": win_loss[item_id]['W'], "L": win_loss[item_id]['L'], "T": win_loss[item_id]['T']} for item_id, rating in ratings.items()], key=lambda x: x['elo'], reverse=True)
+    items_by_id = index_items_by_id(items)
+    final_rankings = sorted([{"id": item_id, "text_snippet": (items_by_id[item_id]['text'] if item_id in items_by_id else "")[:50]+"...", "elo": round(rating), "W": win_loss[item_id]['W'], "L": win_loss[item_id]['L'], "T": win_loss[item_id]['T']} for item_id, rating in ratings.items()], key=lambda x: x['elo'], reverse=True)
     
     system_prompt_display = "None"
-    if current_variant_system_prompt:
-        system_prompt_display = current_variant_system_prompt
+    if variant_plan["system_prompt"]:
+        system_prompt_display = variant_plan["system_prompt"]
     
-    user_prompt_template_display = current_variant_user_prompt_template
+    user_prompt_template_display = variant_plan["user_prompt_template"]
 
     variant_summary_result = {
         "variant_name": variant_config['name'],
@@ -295,6 +305,15 @@ def _process_single_variant(
 
     return variant_summary_result
 
+def _variant_processing_error(current_set_id, exc):
+    print(f"ERROR: Variant processing for set '{current_set_id}' generated an exception: {exc}")
+    return {
+        "variant_name": "VARIANT_PROCESSING_ERROR",
+        "error_details": str(exc),
+        "final_rankings": [],
+        "detailed_pair_results": []
+    }
+
 
 # --- Main experiment runner ---
 def run_pairwise_elo_experiment(
@@ -318,6 +337,7 @@ def run_pairwise_elo_experiment(
 
 
     overall_results_all_sets = []
+    variant_units = [] # One per (set, variant), in set order then definition order
 
     example_json_A_str = '{{"winner": "A"}}'
     example_json_B_str = '{{"winner": "B"}}'
@@ -411,53 +431,71 @@ def run_pairwise_elo_experiment(
             "item_count": n,
             "variants_summary": []
         }
+        overall_results_all_sets.append(current_set_elo_summary)
 
-        variant_futures = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_variants) as executor_variants:
-            for variant_idx, variant_def in enumerate(tqdm(variants_definitions, desc=f"Submitting Variants for '{current_set_id}'", leave=False)):
-                future = executor_variants.submit(
-                    _process_single_variant,
+        for variant_def in variants_definitions:
+            variant_unit = {"set_summary": current_set_elo_summary, "summary": None}
+            try:
+                variant_unit["plan"] = _plan_variant_matches(
                     variant_config=variant_def,
                     items=items,
                     criterion=current_set_criterion,
-                    k=k,
                     quiet=quiet,
-                    repetitions=repetitions,
-                    show_raw=show_raw,
                     current_set_id=current_set_id,
-                    elo_match_repetition_concurrency=elo_match_repetition_concurrency,
                     example_json_A_str=example_json_A_str,
                     example_json_B_str=example_json_B_str,
-                    temperature=temperature
+                    variant_seed=experiment_rng().getrandbits(64) # Drawn in set/variant order, so a seeded experiment_rng() makes every variant reproducible
                 )
-                variant_futures.append(future)
-            
-            results_pbar_desc = f"Collecting Variant Results for '{current_set_id}'"
-            for future in tqdm(concurrent.futures.as_completed(variant_futures), total=len(variant_futures), desc=results_pbar_desc, leave=True):
+                variant_unit["match_repetition_results"] = [[None] * repetitions for _ in variant_unit["plan"]["matches"]]
+                variant_unit["calls_remaining"] = len(variant_unit["plan"]["matches"]) * repetitions
+            except Exception as exc:
+                variant_unit["summary"] = _variant_processing_error(current_set_id, exc)
+            variant_units.append(variant_unit)
+
+    def complete_variant(variant_unit):
+        try:
+            variant_unit["summary"] = _finalize_variant(variant_unit["plan"], variant_unit["match_repetition_results"], k, quiet, repetitions, show_raw, temperature)
+        except Exception as exc:
+            variant_unit["summary"] = _variant_processing_error(variant_unit["set_summary"]["ranking_set_id"], exc)
+
+    # Every (set, variant, match, repetition) call goes through one pool, so it never drains between variants or
+    # sets, longest expected first (slow variants such as Chain-of-Thought start early); a variant's Elo updates
+    # are applied as soon as its last call completes.
+    elo_calls = [
+        (variant_unit, match_idx, rep_idx)
+        for variant_unit in variant_units if variant_unit["summary"] is None
+        for match_idx in range(len(variant_unit["plan"]["matches"]))
+        for rep_idx in range(repetitions)
+    ]
+    elo_calls = longest_first(elo_calls, lambda call: estimate_task_seconds(
+        task_group("pairwise_elo", call[0]["plan"]["variant_config"]["name"]), len(call[0]["plan"]["matches"][call[1]]["prompt"])
+    ))
+    if elo_calls:
+        max_workers = max(1, max_concurrent_variants * min(elo_match_repetition_concurrency, repetitions))
+        with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_call = {}
+            for variant_unit, match_idx, rep_idx in elo_calls:
+                with latency_group(task_group("pairwise_elo", variant_unit["plan"]["variant_config"]["name"])):
+                    future = executor.submit(_judge_match_repetition, variant_unit["plan"]["matches"][match_idx]["prompt_request"], variant_unit["plan"]["variant_config"], temperature)
+                future_to_call[future] = (variant_unit, match_idx, rep_idx)
+            for future in tqdm(concurrent.futures.as_completed(future_to_call), total=len(elo_calls), desc="Judging Elo matches", leave=True):
+                variant_unit, match_idx, rep_idx = future_to_call[future]
                 try:
-                    variant_summary_data = future.result()
-                    current_set_elo_summary["variants_summary"].append(variant_summary_data)
+                    variant_unit["match_repetition_results"][match_idx][rep_idx] = future.result()
                 except Exception as exc:
-                    print(f"ERROR: Variant processing for set '{current_set_id}' generated an exception: {exc}")
-                    current_set_elo_summary["variants_summary"].append({
-                        "variant_name": "VARIANT_PROCESSING_ERROR",
-                        "error_details": str(exc),
-                        "final_rankings": [],
-                        "detailed_pair_results": []
-                    })
-
-        original_variant_names = [v_def['name'] for v_def in variants_definitions]
-        def get_sort_key(summary):
-            try:
-                return original_variant_names.index(summary['variant_name'])
-            except (ValueError, KeyError):
-                return len(original_variant_names)
-        current_set_elo_summary["variants_summary"].sort(key=get_sort_key)
-        
-        overall_results_all_sets.append(current_set_elo_summary)
+                    variant_unit["match_repetition_results"][match_idx][rep_idx] = (f"Exception during API call for Rep {rep_idx + 1}: {exc}", None)
+                variant_unit["calls_remaining"] -= 1
+                if variant_unit["calls_remaining"] == 0:
+                    complete_variant(variant_unit)
 
-        if not quiet:
-             print(f"\\n--- Finished all variant processing for Ranking Set: '{current_set_id}' ---")
+    for variant_unit in variant_units:
+        if variant_unit["summary"] is None:
+            complete_variant(variant_unit)
+        variant_unit["set_summary"]["variants_summary"].append(variant_unit["summary"])
+
+    if not quiet:
+        for current_set_elo_summary in overall_results_all_sets:
+             print(f"\\n--- Finished all variant processing for Ranking Set: '{current_set_elo_summary['ranking_set_id']}' ---")
              for var_summary in current_set_elo_summary["variants_summary"]:
                  if var_summary.get("final_rankings"):
                     print(f"  Summary for Variant: {var_summary['variant_name']}")
@@ -1,7 +1,6 @@
 # bias_suite/experiment_runners/picking_experiments.py
 
 import time
-import random
 import concurrent.futures
 from tqdm import tqdm
 from collections import Counter # Moved for wider use
@@ -9,8 +8,13 @@ import string # For random ID generation
 import re
 
 # Corrected import for shared function and config
-from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL 
+from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL, ContextThreadPoolExecutor, split_logprob_response, latency_group, experiment_rng
 from test_data import PICKING_PAIRS # Import test data
+from item_store import index_items_by_id
+import prompt_templates
+from logprob_judging import ANSWER_TAGS, answer_distribution, parsed_distribution, expand_distribution
+from judge_cascade import majority_answer, most_likely_answer
+from task_scheduler import task_group, estimate_task_seconds, longest_first
 
 CONCURRENT_API_CALLS = 8
 
@@ -26,8 +30,9 @@ def _generate_random_id_pair():
     # Ensure IDs are reasonably unique and not too long for prompts
     chars = string.ascii_lowercase + string.digits
     while True:
-        id1 = "ID_" + ''.join(random.choice(chars) for _ in range(4))
-        id2 = "ID_" + ''.join(random.choice(chars) for _ in range(4))
+        rng = experiment_rng()
+        id1 = "ID_" + ''.join(rng.choice(chars) for _ in range(4))
+        id2 = "ID_" + ''.join(rng.choice(chars) for _ in range(4))
         if id1 != id2:
             return id1, id2
 
@@ -368,7 +373,56 @@ def parse_picking_response(response_text, option1_id="Response 1", option2_id="R
         print(f"Warning: Content '{picked_content_from_tag}' inside <choice> tag does not match expected options ('{label1_original_stripped}', '{label2_original_stripped}'). Response: '{response_stripped}'")
         return "Ambiguous"
 
-def _execute_pick_task(task_details, quiet=False, repetitions: int = 1, temperature: float = 0.1):
+def _picking_label_aliases(label1, label2):
+    """Other spellings parse_picking_response accepts for each label ("A" for "(A)", "1" for "Response 1", the other symbol form), for the logprob mapping."""
+    symbol_variants = {FILLED_SQUARE: EMPTY_SQUARE, EMPTY_SQUARE: FILLED_SQUARE, FILLED_CIRCLE: EMPTY_CIRCLE, EMPTY_CIRCLE: FILLED_CIRCLE}
+    aliases_by_label = {}
+    for label in (label1, label2):
+        label_stripped = label.strip()
+        aliases = set()
+        if label_stripped in symbol_variants:
+            aliases.add(symbol_variants[label_stripped])
+        paren_match = re.fullmatch(r"\((.+)\)", label_stripped)
+        if paren_match:
+            aliases.add(paren_match.group(1))
+        label_tokens = re.findall(r'[a-zA-Z0-9]+', label_stripped)
+        if label_tokens and len(label_tokens[-1]) == 1:
+            aliases.add(label_tokens[-1])
+        aliases_by_label[label] = aliases
+    shared_aliases = aliases_by_label[label1] & aliases_by_label[label2]
+    return {alias: label for label, aliases in aliases_by_label.items() for alias in aliases - shared_aliases}
+
+def _pick_with_logprobs(task_details, quiet, repetitions, temperature, top_logprobs):
+    """
+    One call with top-k logprobs in place of `repetitions` calls: returns (picked labels, raw responses, error count,
+    pick distribution), the picked labels being the distribution expanded to `repetitions` picks.
+    """
+    label1, label2 = task_details["actual_label1_for_prompt"], task_details["actual_label2_for_prompt"]
+    system_prompt_for_api = task_details.get("system_prompt")
+    llm_response_raw = call_openrouter_api(
+        task_details["prompt"],
+        model_name_override=task_details["model_to_use"],
+        quiet=True,
+        temperature=temperature,
+        system_prompt_text=system_prompt_for_api,
+        cache_control=prompt_templates.CACHE_OPTIMISED_LAYOUT and bool(system_prompt_for_api),
+        top_logprobs=top_logprobs
+    )
+    content, _ = split_logprob_response(llm_response_raw)
+    if content.startswith("Error:"):
+        return [None] * repetitions, [content], repetitions, None
+
+    distribution = answer_distribution(llm_response_raw, [label1, label2], ANSWER_TAGS["choice"], _picking_label_aliases(label1, label2))
+    if distribution is None:
+        parsed_label = parse_picking_response(content, label1, label2)
+        distribution = parsed_distribution(parsed_label, [label1, label2])
+        if distribution is None: # "Ambiguous" or "Unclear", as for a failed repetition
+            if not quiet:
+                print(f"      Parsing Error (logprobs mode) for Pair ID: {task_details['pair_id']}, Order Run: {task_details['order_run']}. LLM Raw: {content[:100]}...")
+            return [parsed_label] * repetitions, [content], repetitions, None
+    return expand_distribution(distribution["probabilities"], repetitions), [content], 0, distribution
+
+def _execute_pick_task(task_details, quiet=False, repetitions: int = 1, temperature: float = 0.1, top_logprobs: int | None = None):
     # These details are constant for all repetitions of this specific task order
     prompt = task_details["prompt"]
     model_to_use = task_details["model_to_use"]
@@ -388,6 +442,7 @@ def _execute_pick_task(task_details, quiet=False, repetitions: int = 1, temperat
     picked_original_ids_list = []
     llm_raw_responses_list = []
     errors_in_repetitions_count = 0
+    pick_distribution = None
     # Store the prompt that's actually sent (it's the same for all reps in this task)
     actual_prompt_sent_to_llm = prompt # Renamed from task_details["prompt"] for clarity here
 
@@ -395,7 +450,16 @@ def _execute_pick_task(task_details, quiet=False, repetitions: int = 1, temperat
         # Initial message for the task (covering all repetitions)
         print(f"    Executing task for Variant: {variant_name}, Scheme: {labeling_scheme_name}, Pair ID: {pair_id}, Order Run: {order_run} (Presented {actual_label1_for_prompt}: {response1_original_id}, {actual_label2_for_prompt}: {response2_original_id}) with {repetitions} repetition(s).")
 
-    for rep_idx in range(repetitions):
+    if top_logprobs:
+        picked_option_labels_list, llm_raw_responses_list, errors_in_repetitions_count, pick_distribution = _pick_with_logprobs(
+            task_details, quiet, repetitions, temperature, top_logprobs
+        )
+        original_id_by_label = {actual_label1_for_prompt: response1_original_id, actual_label2_for_prompt: response2_original_id}
+        picked_original_ids_list = [
+            original_id_by_label.get(label, label) if label is not None else "API Error" for label in picked_option_labels_list
+        ]
+
+    for rep_idx in range(0 if top_logprobs else repetitions): # In logprobs mode the single call above replaces the repetitions
         # Unconditional progress print if repetitions > 1
         if repetitions > 1 and not quiet:
             # The existing "if not quiet and repetitions > 1" was for the detailed message below.
@@ -407,7 +471,8 @@ def _execute_pick_task(task_details, quiet=False, repetitions: int = 1, temperat
             model_name_override=model_to_use, # Pass model_to_use as model_name_override
             quiet=True, 
             temperature=temperature,
-            system_prompt_text=system_prompt_for_api # Pass system_prompt here
+            system_prompt_text=system_prompt_for_api, # Pass system_prompt here
+            cache_control=prompt_templates.CACHE_OPTIMISED_LAYOUT and bool(system_prompt_for_api)
         )
         
         picked_option_label_single = None
@@ -475,7 +540,12 @@ def _execute_pick_task(task_details, quiet=False, repetitions: int = 1, temperat
         "picked_original_ids": picked_original_ids_list, # List of actual original IDs picked
         "errors_in_repetitions": errors_in_repetitions_count,
         "total_repetitions": repetitions,
-        "actual_prompt_sent_to_llm": actual_prompt_sent_to_llm # Add prompt even on exception for debugging
+        "actual_prompt_sent_to_llm": actual_prompt_sent_to_llm, # Add prompt even on exception for debugging
+        **({"logprob_pick_distribution": {
+            "probabilities": {original_id_by_label[label]: round(probability, 6) for label, probability in pick_distribution["probabilities"].items()},
+            "label_mass": pick_distribution["label_mass"],
+            "source": pick_distribution["source"]
+        }} if pick_distribution else {})
     }
 
 def _get_majority_pick_and_consistency(picked_original_ids_list, total_repetitions):
@@ -633,6 +703,8 @@ def _analyze_pair_results(
         "run1_errors": f"{run1_errors}/{run1_total_reps}",
         "run1_raw_llm_responses": run1_results["llm_raw_responses"] if not quiet else "Suppressed",
         "run1_sampled_interactions": sampled_run1_interactions, # New for JSON output
+        **({"run1_logprob_pick_distribution": run1_results["logprob_pick_distribution"]} if "logprob_pick_distribution" in run1_results else {}),
+        **({"cascade": run1_results["cascade"]} if "cascade" in run1_results else {}), # Both order runs come from the same tier
 
         "run2_order": f"{run2_results['presented_as_label1_text']}: {run2_results['response1_original_id']} vs {run2_results['presented_as_label2_text']}: {run2_results['response2_original_id']}", # Updated order string
         "run2_majority_pick_id": run2_majority_pick_id,
@@ -640,40 +712,307 @@ def _analyze_pair_results(
         "run2_pick_distribution": run2_pick_distribution,
         "run2_errors": f"{run2_errors}/{run2_total_reps}",
         "run2_raw_llm_responses": run2_results["llm_raw_responses"] if not quiet else "Suppressed",
-        "run2_sampled_interactions": sampled_run2_interactions # New for JSON output
+        "run2_sampled_interactions": sampled_run2_interactions, # New for JSON output
+        **({"run2_logprob_pick_distribution": run2_results["logprob_pick_distribution"]} if "logprob_pick_distribution" in run2_results else {})
     }
     return pair_summary
 
 
-def run_positional_bias_picking_experiment(model_to_run_experiment_with: str, num_pairs_to_test=None, quiet=False, repetitions: int = 1, temperature: float = 0.1):
+def build_order_run_tasks(pair_data, prompt_template, system_prompt, label1, label2, model_to_use, variant_name, labeling_scheme_name):
+    """
+    The two order-run tasks for one pair (inputs to _execute_pick_task): Run 1 presents text_A as {label1} and text_B
+    as {label2}, Run 2 swaps the texts while keeping the labels, so a label preference shows up as a changed pick.
+    `pair_data` needs "pair_id", "question", "text_A" and "text_B" ("expected_better_id" is optional).
+    """
+    question = pair_data["question"]
+    text_a = pair_data["text_A"]
+    text_b = pair_data["text_B"]
+    tasks = []
+    for order_run, (first_id, first_text, second_id, second_text) in ((1, ("text_A", text_a, "text_B", text_b)), (2, ("text_B", text_b, "text_A", text_a))):
+        tasks.append({
+            "variant_name": variant_name,
+            "labeling_scheme_name": labeling_scheme_name,
+            "pair_id": pair_data["pair_id"],
+            "order_run": order_run,
+            "question_text": question,
+            "text_a_original_id": "text_A",
+            "text_b_original_id": "text_B",
+            "response1_original_id": first_id, # Content for the first slot
+            "response2_original_id": second_id, # Content for the second slot
+            "actual_label1_for_prompt": label1, # Label used for the first slot in prompt
+            "actual_label2_for_prompt": label2, # Label used for the second slot in prompt
+            "prompt": prompt_template.format(
+                question=question,
+                label1=label1, response_a_content=first_text,
+                label2=label2, response_b_content=second_text
+            ),
+            "model_to_use": model_to_use,
+            "expected_better_id": pair_data.get("expected_better_id"),
+            "system_prompt": system_prompt
+        })
+    return tasks
+
+def _summarize_variant_scheme(group, current_run_raw_execution_results, pairs_by_id, model_to_run_experiment_with, repetitions, quiet=False):
+    """
+    Analyses the order-run results of one variant + labeling scheme group (built by run_positional_bias_picking_experiment)
+    and returns its summary dict (one entry of the experiment's results).
+    """
+    variant_info = group["variant_info"]
+    scheme_info = group["scheme_info"]
+    variant_name = variant_info["name"]
+    labeling_scheme_name = scheme_info["name"]
+    get_labels_for_pair_func = scheme_info["get_labels_for_pair"]
+    tasks_for_variant_scheme = group["tasks"]
+    pair_specific_labels = group["pair_specific_labels"]
+    # Restore task order (as_completed yields in completion order) so the output is reproducible, e.g. across shard merges.
+    task_positions = {(t["pair_id"], t["order_run"]): i for i, t in enumerate(tasks_for_variant_scheme)}
+    current_run_raw_execution_results.sort(key=lambda r: task_positions.get((r.get("pair_id"), r.get("order_run")), len(task_positions)))
+    
+    # --- Process and analyze results for this variant + scheme ---
+    summary_list_for_variant_scheme = [] 
+    # Counters for this specific variant + scheme combination
+    favored_scheme_label1_count = 0
+    favored_scheme_label2_count = 0
+    favored_position_inconclusive_count = 0 # Renamed from variant-level
+    
+    positional_bias_detected_count = 0 # Renamed
+    consistent_choices_count = 0       # Renamed
+    error_or_inconclusive_pairs_count = 0 # Renamed
+    valid_pairs_for_bias_calc = 0
+    valid_pairs_for_consistency_calc = 0
+
+    results_by_pair_for_scheme = {}
+    for res in current_run_raw_execution_results:
+        pid = res["pair_id"]
+        if pid not in results_by_pair_for_scheme:
+            results_by_pair_for_scheme[pid] = {}
+        results_by_pair_for_scheme[pid][res["order_run"]] = res
+    
+    total_pairs_tested_in_scheme = len(results_by_pair_for_scheme)
+
+    for pair_id, runs_data in tqdm(results_by_pair_for_scheme.items(), desc=f"Analyzing Pairs ({variant_name}/{labeling_scheme_name})", leave=False):
+        run1_res = runs_data.get(1)
+        run2_res = runs_data.get(2)
+        
+        original_pair_info = pairs_by_id.get(pair_id)
+        if not original_pair_info:
+            print(f"Warning: Could not find original pair info for {pair_id} in variant {variant_name}, scheme {labeling_scheme_name}. Skipping.")
+            error_or_inconclusive_pairs_count += 1
+            continue
+
+        # Retrieve the specific labels used for this pair under this scheme
+        # This is crucial for _analyze_pair_results and for the final summary counts
+        current_pair_scheme_labels = pair_specific_labels.get(pair_id)
+        if not current_pair_scheme_labels:
+             print(f"Critical Error: Could not find stored scheme labels for pair {pair_id} under scheme {labeling_scheme_name}. Skipping analysis.")
+             error_or_inconclusive_pairs_count +=1
+             continue
+        
+        scheme_label1_for_this_pair, scheme_label2_for_this_pair = current_pair_scheme_labels
+
+        if run1_res and run2_res and original_pair_info:
+            pair_analysis_result = _analyze_pair_results(
+                pair_id=pair_id,
+                run1_results=run1_res,
+                run2_results=run2_res,
+                question_text=original_pair_info["question"],
+                text1_id=original_pair_info["text_A_id"], 
+                text2_id=original_pair_info["text_B_id"],
+                labeling_scheme_name=labeling_scheme_name,           # Pass scheme name
+                scheme_label1_used_for_pair=scheme_label1_for_this_pair, # Pass actual first label of scheme
+                scheme_label2_used_for_pair=scheme_label2_for_this_pair, # Pass actual second label of scheme
+                expected_better_id=original_pair_info.get("expected_better_id"),
+                quiet=quiet
+            )
+            summary_list_for_variant_scheme.append(pair_analysis_result)
+
+            if pair_analysis_result["analysis_status"] == "OK":
+                valid_pairs_for_bias_calc += 1
+                if pair_analysis_result["positional_bias_detected"] is True:
+                    positional_bias_detected_count += 1
+                    # Now count which actual label was favored
+                    fav_label_text = pair_analysis_result.get("favored_actual_label_text")
+                    if fav_label_text == scheme_label1_for_this_pair:
+                        favored_scheme_label1_count += 1
+                    elif fav_label_text == scheme_label2_for_this_pair:
+                        favored_scheme_label2_count += 1
+                    elif fav_label_text == "Inconclusive Position": # check if this is the exact string
+                        favored_position_inconclusive_count +=1
+                
+                if pair_analysis_result["consistent_choice"] is not None:
+                    valid_pairs_for_consistency_calc += 1 
+                    consistent_choices_count += 1 
+            else:
+                error_or_inconclusive_pairs_count += 1
+        else:
+            if not quiet: print(f"    Skipping analysis for Pair ID: {pair_id} in {variant_name}/{labeling_scheme_name} due to missing run data or original info.")
+            error_or_inconclusive_pairs_count += 1
+            summary_list_for_variant_scheme.append({
+                "pair_id": pair_id,
+                "labeling_scheme_name": labeling_scheme_name,
+                "scheme_label1_used_for_pair": scheme_label1_for_this_pair,
+                "scheme_label2_used_for_pair": scheme_label2_for_this_pair,
+                "question": original_pair_info["question"] if original_pair_info else "Unknown",
+                "text1_id": original_pair_info["text_A_id"] if original_pair_info else "Unknown",
+                "text2_id": original_pair_info["text_B_id"] if original_pair_info else "Unknown",
+                "expected_better_id": original_pair_info.get("expected_better_id") if original_pair_info else None,
+                "analysis_status": "Error/Missing Execution Data",
+                "consistent_choice": None,
+                "positional_bias_detected": None,
+                "favored_actual_label_text": None,
+                "run1_majority_pick_id": run1_res.get("picked_original_ids", ["Missing"])[0] if run1_res else "Missing",
+                "run2_majority_pick_id": run2_res.get("picked_original_ids", ["Missing"])[0] if run2_res else "Missing",
+            })
+    
+    # --- Summary for this Variant + Scheme ---
+    bias_rate = (positional_bias_detected_count / valid_pairs_for_bias_calc * 100) if valid_pairs_for_bias_calc > 0 else 0
+    consistency_rate = (consistent_choices_count / valid_pairs_for_bias_calc * 100) if valid_pairs_for_bias_calc > 0 else 0
+    # Determine how many samples to take from the first pair's runs for the overall summary
+    # This is just to show an example of what prompts looked like for this variant-scheme
+    # The actual full sample for each pair is within summary_list_for_variant_scheme
+    example_pair_summary_for_prompts = next(iter(summary_list_for_variant_scheme), None)
+    example_prompt_run1 = "N/A"
+    example_prompt_run2 = "N/A"
+    if example_pair_summary_for_prompts:
+        if example_pair_summary_for_prompts.get("run1_sampled_interactions"):
+            example_prompt_run1 = example_pair_summary_for_prompts["run1_sampled_interactions"].get("prompt_sent_to_llm", "N/A")
+        if example_pair_summary_for_prompts.get("run2_sampled_interactions"):
+            example_prompt_run2 = example_pair_summary_for_prompts["run2_sampled_interactions"].get("prompt_sent_to_llm", "N/A")
+
+    # Get the scheme's canonical labels for the summary (for non-random, these are fixed)
+    # For random, this won't be a single pair, but it indicates the *type* of labels used.
+    # The pair_summary will have the *actual* random IDs used for that pair.
+    # For the aggregate summary, we just note the scheme name and its general label pattern if fixed.
+    scheme_display_label1, scheme_display_label2 = ("", "")
+    if labeling_scheme_name != "RandomAlphanumericIDs":
+         # For fixed schemes, we can get their representative labels
+         # This assumes get_labels_for_pair() returns consistent representative labels for non-random schemes
+         # or we can store scheme_info["description"] or the labels themselves if static.
+         # Let's use the first pair's labels for simplicity in display, or the scheme description.
+         # For the ProcessedPickingData, we DO want the *actual scheme labels* (e.g., "(A)", "(B)")
+         # So, let's get them from the *first* pair processed for this scheme, assuming they are consistent for non-random.
+         # Or better, get it from scheme_info directly if it stores static labels.
+         # Our current LABELING_SCHEMES structure uses a function for all.
+         # For non-random, calling it again gives the same labels.
+        temp_l1, temp_l2 = get_labels_for_pair_func()
+        scheme_display_label1 = temp_l1
+        scheme_display_label2 = temp_l2
+    else: # Random IDs
+        scheme_display_label1 = "ID_rand1" # Placeholder for summary
+        scheme_display_label2 = "ID_rand2" # Placeholder for summary
+
+    # Get the prompts used for this variant for storing in the summary
+    # These were defined at the top level of the variant_info
+    system_prompt_for_summary = variant_info.get("system_prompt")
+    user_prompt_template_for_summary = variant_info.get("prompt_template")
+
+    experiment_summary_dict = {
+        "model_name": model_to_run_experiment_with,
+        "variant_name": variant_name,
+        "labeling_scheme_name": labeling_scheme_name,
+        "scheme_description": scheme_info["description"], # Add scheme description
+        "scheme_display_label1": scheme_display_label1, # e.g., "(A)" or "ID_rand1"
+        "scheme_display_label2": scheme_display_label2, # e.g., "(B)" or "ID_rand2"
+        "system_prompt_used": system_prompt_for_summary, # ADDED
+        "user_prompt_template_used": user_prompt_template_for_summary, # ADDED
+        "example_full_prompt_run1_structure": example_prompt_run1, # Example of a fully formatted prompt for run 1
+        "example_full_prompt_run2_structure": example_prompt_run2, # Example of a fully formatted prompt for run 2
+        "total_pairs_tested_in_scheme": total_pairs_tested_in_scheme,
+        "repetitions_per_order_run": repetitions,
+        "pairs_with_errors_or_inconclusive_in_scheme": error_or_inconclusive_pairs_count,
+        "valid_pairs_for_bias_calculation": valid_pairs_for_bias_calc,
+        "positional_bias_detected_count": positional_bias_detected_count,
+        "positional_bias_rate_percentage": float(f"{bias_rate:.2f}"),
+        "favored_scheme_label1_count": favored_scheme_label1_count, # Count of pairs biased towards the scheme's first label
+        "favored_scheme_label2_count": favored_scheme_label2_count, # Count of pairs biased towards the scheme's second label
+        "favored_position_inconclusive_count": favored_position_inconclusive_count, # Bias detected, but not consistently for L1 or L2
+        "valid_pairs_for_consistency_calculation": valid_pairs_for_consistency_calc,
+        "consistent_choices_count": consistent_choices_count,
+        "consistency_rate_percentage": float(f"{consistency_rate:.2f}"),
+        "pairs_summary_for_scheme": summary_list_for_variant_scheme 
+    }
+
+    if not quiet:
+        print(f"    Summary for Variant: {variant_name}, Scheme: {labeling_scheme_name}")
+        print(f"      Total Pairs Tested: {total_pairs_tested_in_scheme}")
+        print(f"      Pairs with Errors/Inconclusive: {error_or_inconclusive_pairs_count}")
+        print(f"      Positional Bias Detected In: {positional_bias_detected_count}/{valid_pairs_for_bias_calc} valid pairs ({bias_rate:.2f}%)")
+        print(f"        Favored '{scheme_display_label1}': {favored_scheme_label1_count} times")
+        print(f"        Favored '{scheme_display_label2}': {favored_scheme_label2_count} times")
+        print(f"        Favored (Inconclusive Position): {favored_position_inconclusive_count} times")
+        print(f"      Consistent Choices In: {consistent_choices_count}/{valid_pairs_for_consistency_calc} valid pairs ({consistency_rate:.2f}%)")
+
+    return experiment_summary_dict
+
+def _assess_pair_runs(pair_runs):
+    """
+    The judge cascade's view of a pair's two order runs: ((run 1 pick, run 2 pick), the lower of the two runs'
+    agreement or pick probability, whether both come from logprob distributions). No answer unless both runs have one.
+    """
+    picks, shares, from_distribution = [], [], True
+    for order_result in pair_runs["runs"]:
+        distribution = order_result.get("logprob_pick_distribution")
+        if distribution:
+            pick, share = most_likely_answer(distribution["probabilities"])
+        else:
+            pick, share = majority_answer(order_result["picked_original_ids"], order_result["total_repetitions"],
+                                          invalid=("API Error", "Ambiguous", "Unclear", "Exception"))
+            from_distribution = False
+        picks.append(pick)
+        shares.append(share)
+    return (tuple(picks) if None not in picks else None), min(shares), from_distribution
+
+def _run_pair_with_cascade(cascade, pair_tasks, pair_item, model_to_use, quiet, repetitions, temperature, top_logprobs):
+    """Both order runs of a pair through the judge cascade, so the two runs always come from the same model."""
+    def execute(model_name_override):
+        return {"runs": [
+            _execute_pick_task({**task, "model_to_use": model_name_override or model_to_use}, quiet, repetitions, temperature, top_logprobs)
+            for task in pair_tasks
+        ]}
+    pair_runs = cascade.judge(execute, _assess_pair_runs, pair_item, expensive_model=model_to_use)
+    return [{**order_result, "cascade": pair_runs["cascade"]} for order_result in pair_runs["runs"]]
+
+def run_positional_bias_picking_experiment(model_to_run_experiment_with: str, num_pairs_to_test=None, quiet=False, repetitions: int = 1, temperature: float = 0.1, picking_pairs=None, top_logprobs: int | None = None, cascade=None):
     """
     Runs the positional bias picking experiment for a specified number of pairs and prompt variants.
     Each pair is tested with two orders of presentation (Run 1 and Run 2).
     Each order run is repeated `repetitions` times.
+    With `top_logprobs`, each order run is a single call instead, and its pick distribution (from the top-k logprobs
+    at the <choice> position, see logprob_judging.py) is expanded into the `repetitions` picks.
+    `picking_pairs` overrides the pairs from test_data.py (e.g., item-store backed pairs from item_store.load_dataset).
+    With `cascade` (a judge_cascade.JudgeCascade), both order runs of a pair are judged by the cheap model first and
+    re-judged by `model_to_run_experiment_with` when either run's picks disagree or its pick distribution is not confident.
     Returns a list of dictionaries, where each dictionary represents a prompt variant and contains a summary of results.
     """
     if not quiet:
         print(f"\n--- Running Positional Bias Picking Experiment ---")
         print(f"Number of prompt variants: {len(PROMPT_VARIANTS)}")
         print(f"Number of labeling schemes: {len(LABELING_SCHEMES)}") # New
-        print(f"Repetitions per order run: {repetitions}")
+        print(f"Repetitions per order run: {repetitions}" + (f" (from one call with top-{top_logprobs} logprobs)" if top_logprobs else ""))
         print(f"Temperature for API calls: {temperature}") # Log temperature
         print(f"LLM Model: {model_to_run_experiment_with}") # Uses the passed model name
+        if cascade:
+            print(f"Judge cascade: {cascade.cheap_model} first")
 
-    pairs_to_evaluate = PICKING_PAIRS
+    all_available_pairs = picking_pairs if picking_pairs is not None else PICKING_PAIRS
+    pairs_to_evaluate = all_available_pairs
     if num_pairs_to_test is not None and num_pairs_to_test > 0:
-        if num_pairs_to_test <= len(PICKING_PAIRS):
-            pairs_to_evaluate = random.sample(PICKING_PAIRS, num_pairs_to_test)
+        if num_pairs_to_test <= len(all_available_pairs):
+            pairs_to_evaluate = experiment_rng().sample(all_available_pairs, num_pairs_to_test)
             if not quiet: print(f"Testing with a random sample of {num_pairs_to_test} pairs.")
         else:
-            if not quiet: print(f"Requested {num_pairs_to_test} pairs, but only {len(PICKING_PAIRS)} available. Testing with all available pairs.")
+            if not quiet: print(f"Requested {num_pairs_to_test} pairs, but only {len(all_available_pairs)} available. Testing with all available pairs.")
     else:
-        if not quiet: print(f"Testing with all {len(PICKING_PAIRS)} available pairs.")
+        if not quiet: print(f"Testing with all {len(all_available_pairs)} available pairs.")
     
     if not quiet:
         print(f"Total pairs to evaluate: {len(pairs_to_evaluate)}")
 
-    all_experiment_results = [] # This will be the final list of dicts (one per variant-scheme combo)
+    pairs_by_id = index_items_by_id(pairs_to_evaluate, id_key="pair_id") # O(1) lookups during analysis
+
+    # The whole variant x labeling scheme x pair task matrix is built up front and runs through one pool, so no
+    # pool drains between groups; each group is analysed as soon as its last order run completes.
+    groups = [] # One per variant + labeling scheme, in output order
 
     for variant_info in tqdm(PROMPT_VARIANTS, desc="Prompt Variants", leave=False):
         variant_name = variant_info["name"]
@@ -681,14 +1020,14 @@ def run_positional_bias_picking_experiment(model_to_run_experiment_with: str, nu
         system_prompt_content = variant_info.get("system_prompt") # Get system_prompt for the task details
 
         if not quiet:
-            print(f"\n  Processing Variant: {variant_name}")
+            print(f"\n  Preparing Variant: {variant_name}")
 
         for scheme_info in tqdm(LABELING_SCHEMES, desc=f"Labeling Schemes ({variant_name})", leave=False): # New inner loop
             labeling_scheme_name = scheme_info["name"]
             get_labels_for_pair_func = scheme_info["get_labels_for_pair"]
             
             if not quiet:
-                print(f"\n    Processing Labeling Scheme: {labeling_scheme_name} for Variant: {variant_name}")
+                print(f"\n    Preparing Labeling Scheme: {labeling_scheme_name} for Variant: {variant_name}")
 
             # --- Prepare tasks for this variant + scheme ---
             tasks_for_variant_scheme = []
@@ -698,11 +1037,6 @@ def run_positional_bias_picking_experiment(model_to_run_experiment_with: str, nu
 
             for pair_data in pairs_to_evaluate:
                 pair_id = pair_data["pair_id"]
-                question = pair_data["question"]
-                text_a = pair_data["text_A"]
-                text_b = "text_B" # This was a typo, should be pair_data["text_B"]
-                text_b = pair_data["text_B"] # Corrected
-                expected_better_id = pair_data.get("expected_better_id")
 
                 # Get/Generate labels for this pair using the current scheme's method
                 # These labels (scheme_label1, scheme_label2) are what the *scheme* defines as its first and second label.
@@ -713,263 +1047,86 @@ def run_positional_bias_picking_experiment(model_to_run_experiment_with: str, nu
                 
                 scheme_defined_label1, scheme_defined_label2 = pair_specific_labels[pair_id]
                 
-                # Run 1: text_a is presented with scheme_defined_label1, text_b with scheme_defined_label2
-                # The prompt template uses {label1} for the first presented item, {label2} for the second.
-                prompt1 = prompt_template.format(
-                    question=question, 
-                    label1=scheme_defined_label1, response_a_content=text_a, 
-                    label2=scheme_defined_label2, response_b_content=text_b
-                )
-                tasks_for_variant_scheme.append({
-                    "variant_name": variant_name,
-                    "labeling_scheme_name": labeling_scheme_name, # New
-                    "pair_id": pair_id,
-                    "order_run": 1,
-                    "question_text": question,
-                    "text_a_original_id": "text_A", 
-                    "text_b_original_id": "text_B",
-                    "response1_original_id": "text_A", # Content for the first slot
-                    "response2_original_id": "text_B", # Content for the second slot
-                    "actual_label1_for_prompt": scheme_defined_label1, # Label used for the first slot in prompt
-                    "actual_label2_for_prompt": scheme_defined_label2, # Label used for the second slot in prompt
-                    "prompt": prompt1,
-                    "model_to_use": model_to_run_experiment_with,
-                    "expected_better_id": expected_better_id,
-                    "system_prompt": system_prompt_content # Add system_prompt to task details
-                })
-
-                # Run 2: text_b is presented with scheme_defined_label1, text_a with scheme_defined_label2
-                prompt2 = prompt_template.format(
-                    question=question, 
-                    label1=scheme_defined_label1, response_a_content=text_b, # text_b is now in {label1}'s slot
-                    label2=scheme_defined_label2, response_b_content=text_a  # text_a is now in {label2}'s slot
-                )
-                tasks_for_variant_scheme.append({
-                    "variant_name": variant_name,
-                    "labeling_scheme_name": labeling_scheme_name, # New
-                    "pair_id": pair_id,
-                    "order_run": 2,
-                    "question_text": question,
-                    "text_a_original_id": "text_A", 
-                    "text_b_original_id": "text_B", 
-                    "response1_original_id": "text_B", # Content for the first slot
-                    "response2_original_id": "text_A", # Content for the second slot
-                    "actual_label1_for_prompt": scheme_defined_label1, # Label used for the first slot in prompt
-                    "actual_label2_for_prompt": scheme_defined_label2, # Label used for the second slot in prompt
-                    "prompt": prompt2,
-                    "model_to_use": model_to_run_experiment_with,
-                    "expected_better_id": expected_better_id,
-                    "system_prompt": system_prompt_content # Add system_prompt to task details
-                })
-            
-            # --- Execute tasks for this variant + scheme ---
-            current_run_raw_execution_results = []
-            with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS) as executor:
-                future_to_task = { 
-                    executor.submit(_execute_pick_task, task, quiet, repetitions, temperature): task # Pass temperature
-                    for task in tasks_for_variant_scheme # Use tasks for current scheme
-                }
-                for future in tqdm(concurrent.futures.as_completed(future_to_task), total=len(tasks_for_variant_scheme), desc=f"API Calls ({variant_name}/{labeling_scheme_name})", leave=False):
-                    task_details = future_to_task[future]
-                    try:
-                        result = future.result()
-                        current_run_raw_execution_results.append(result)
-                    except Exception as exc:
-                        print(f'Task {task_details["pair_id"]} (Variant: {variant_name}, Scheme: {labeling_scheme_name}, Order Run: {task_details["order_run"]}) generated an exception: {exc}')
-                        current_run_raw_execution_results.append({
-                            "variant_name": variant_name,
-                            "labeling_scheme_name": labeling_scheme_name,
-                            "pair_id": task_details["pair_id"],
-                            "order_run": task_details["order_run"],
-                            "response1_original_id": task_details["response1_original_id"],
-                            "response2_original_id": task_details["response2_original_id"],
-                            "presented_as_label1_text": task_details["actual_label1_for_prompt"],
-                            "presented_as_label2_text": task_details["actual_label2_for_prompt"],
-                            "llm_raw_responses": [f"Exception: {exc}"],
-                            "picked_option_labels": [None],
-                            "picked_original_ids": ["Exception"],
-                            "errors_in_repetitions": repetitions,
-                            "total_repetitions": repetitions,
-                            "actual_prompt_sent_to_llm": task_details["prompt"] # Add prompt even on exception for debugging
-                        })
-            
-            # --- Process and analyze results for this variant + scheme ---
-            summary_list_for_variant_scheme = [] 
-            # Counters for this specific variant + scheme combination
-            favored_scheme_label1_count = 0
-            favored_scheme_label2_count = 0
-            favored_position_inconclusive_count = 0 # Renamed from variant-level
-            
-            positional_bias_detected_count = 0 # Renamed
-            consistent_choices_count = 0       # Renamed
-            error_or_inconclusive_pairs_count = 0 # Renamed
-            valid_pairs_for_bias_calc = 0
-            valid_pairs_for_consistency_calc = 0
-
-            results_by_pair_for_scheme = {}
-            for res in current_run_raw_execution_results:
-                pid = res["pair_id"]
-                if pid not in results_by_pair_for_scheme:
-                    results_by_pair_for_scheme[pid] = {}
-                results_by_pair_for_scheme[pid][res["order_run"]] = res
-            
-            total_pairs_tested_in_scheme = len(results_by_pair_for_scheme)
-
-            for pair_id, runs_data in tqdm(results_by_pair_for_scheme.items(), desc=f"Analyzing Pairs ({variant_name}/{labeling_scheme_name})", leave=False):
-                run1_res = runs_data.get(1)
-                run2_res = runs_data.get(2)
-                
-                original_pair_info = next((p for p in pairs_to_evaluate if p["pair_id"] == pair_id), None)
-                if not original_pair_info:
-                    print(f"Warning: Could not find original pair info for {pair_id} in variant {variant_name}, scheme {labeling_scheme_name}. Skipping.")
-                    error_or_inconclusive_pairs_count += 1
-                    continue
-
-                # Retrieve the specific labels used for this pair under this scheme
-                # This is crucial for _analyze_pair_results and for the final summary counts
-                current_pair_scheme_labels = pair_specific_labels.get(pair_id)
-                if not current_pair_scheme_labels:
-                     print(f"Critical Error: Could not find stored scheme labels for pair {pair_id} under scheme {labeling_scheme_name}. Skipping analysis.")
-                     error_or_inconclusive_pairs_count +=1
-                     continue
-                
-                scheme_label1_for_this_pair, scheme_label2_for_this_pair = current_pair_scheme_labels
-
-                if run1_res and run2_res and original_pair_info:
-                    pair_analysis_result = _analyze_pair_results(
-                        pair_id=pair_id,
-                        run1_results=run1_res,
-                        run2_results=run2_res,
-                        question_text=original_pair_info["question"],
-                        text1_id=original_pair_info["text_A_id"], 
-                        text2_id=original_pair_info["text_B_id"],
-                        labeling_scheme_name=labeling_scheme_name,           # Pass scheme name
-                        scheme_label1_used_for_pair=scheme_label1_for_this_pair, # Pass actual first label of scheme
-                        scheme_label2_used_for_pair=scheme_label2_for_this_pair, # Pass actual second label of scheme
-                        expected_better_id=original_pair_info.get("expected_better_id"),
-                        quiet=quiet
-                    )
-                    summary_list_for_variant_scheme.append(pair_analysis_result)
-
-                    if pair_analysis_result["analysis_status"] == "OK":
-                        valid_pairs_for_bias_calc += 1
-                        if pair_analysis_result["positional_bias_detected"] is True:
-                            positional_bias_detected_count += 1
-                            # Now count which actual label was favored
-                            fav_label_text = pair_analysis_result.get("favored_actual_label_text")
-                            if fav_label_text == scheme_label1_for_this_pair:
-                                favored_scheme_label1_count += 1
-                            elif fav_label_text == scheme_label2_for_this_pair:
-                                favored_scheme_label2_count += 1
-                            elif fav_label_text == "Inconclusive Position": # check if this is the exact string
-                                favored_position_inconclusive_count +=1
-                        
-                        if pair_analysis_result["consistent_choice"] is not None:
-                            valid_pairs_for_consistency_calc += 1 
-                            consistent_choices_count += 1 
-                    else:
-                        error_or_inconclusive_pairs_count += 1
+                tasks_for_variant_scheme.extend(build_order_run_tasks(
+                    pair_data, prompt_template, system_prompt_content, scheme_defined_label1, scheme_defined_label2,
+                    model_to_run_experiment_with, variant_name, labeling_scheme_name
+                ))
+
+            groups.append({"variant_info": variant_info, "scheme_info": scheme_info, "tasks": tasks_for_variant_scheme, "pair_specific_labels": pair_specific_labels})
+
+    # Work units are single order runs, or whole pairs with a judge cascade (so both runs come from the same tier).
+    # They are dispatched longest expected first (see task_scheduler.py).
+    work_units = []
+    for group_index, group in enumerate(groups):
+        group_tasks = group["tasks"]
+        if cascade is None:
+            work_units.extend((group_index, [task]) for task in group_tasks)
+        else: # Tasks come in run 1 / run 2 pairs
+            work_units.extend((group_index, group_tasks[i:i + 2]) for i in range(0, len(group_tasks), 2))
+    remaining_units_per_group = Counter(group_index for group_index, _ in work_units)
+    calls_per_task = 1 if top_logprobs else repetitions
+    work_units = longest_first(work_units, lambda unit: sum(
+        estimate_task_seconds(task_group("picking", task["variant_name"]), len(task["prompt"]) + len(task["system_prompt"] or ""), calls_per_task, model_to_run_experiment_with)
+        for task in unit[1]
+    ))
+    results_per_group = [[] for _ in groups]
+    summaries_per_group = [None] * len(groups)
+
+    with ContextThreadPoolExecutor(max_workers=CONCURRENT_API_CALLS) as executor:
+        future_to_unit = {}
+        for group_index, unit_tasks in work_units:
+            with latency_group(task_group("picking", unit_tasks[0]["variant_name"])):
+                if cascade is None:
+                    future = executor.submit(_execute_pick_task, unit_tasks[0], quiet, repetitions, temperature, top_logprobs) # Pass temperature
                 else:
-                    if not quiet: print(f"    Skipping analysis for Pair ID: {pair_id} in {variant_name}/{labeling_scheme_name} due to missing run data or original info.")
-                    error_or_inconclusive_pairs_count += 1
-                    summary_list_for_variant_scheme.append({
-                        "pair_id": pair_id,
+                    future = executor.submit(_run_pair_with_cascade, cascade, unit_tasks, pairs_by_id.get(unit_tasks[0]["pair_id"]), model_to_run_experiment_with, quiet, repetitions, temperature, top_logprobs)
+            future_to_unit[future] = (group_index, unit_tasks)
+
+        for future in tqdm(concurrent.futures.as_completed(future_to_unit), total=len(future_to_unit), desc="API Calls (all variants/schemes)", leave=False):
+            group_index, unit_tasks = future_to_unit[future]
+            current_run_raw_execution_results = results_per_group[group_index]
+            variant_name = groups[group_index]["variant_info"]["name"]
+            labeling_scheme_name = groups[group_index]["scheme_info"]["name"]
+            try:
+                result = future.result()
+                current_run_raw_execution_results.extend(result if isinstance(result, list) else [result])
+            except Exception as exc:
+                for task_details in unit_tasks:
+                    print(f'Task {task_details["pair_id"]} (Variant: {variant_name}, Scheme: {labeling_scheme_name}, Order Run: {task_details["order_run"]}) generated an exception: {exc}')
+                    current_run_raw_execution_results.append({
+                        "variant_name": variant_name,
                         "labeling_scheme_name": labeling_scheme_name,
-                        "scheme_label1_used_for_pair": scheme_label1_for_this_pair,
-                        "scheme_label2_used_for_pair": scheme_label2_for_this_pair,
-                        "question": original_pair_info["question"] if original_pair_info else "Unknown",
-                        "text1_id": original_pair_info["text_A_id"] if original_pair_info else "Unknown",
-                        "text2_id": original_pair_info["text_B_id"] if original_pair_info else "Unknown",
-                        "expected_better_id": original_pair_info.get("expected_better_id") if original_pair_info else None,
-                        "analysis_status": "Error/Missing Execution Data",
-                        "consistent_choice": None,
-                        "positional_bias_detected": None,
-                        "favored_actual_label_text": None,
-                        "run1_majority_pick_id": run1_res.get("picked_original_ids", ["Missing"])[0] if run1_res else "Missing",
-                        "run2_majority_pick_id": run2_res.get("picked_original_ids", ["Missing"])[0] if run2_res else "Missing",
+                        "pair_id": task_details["pair_id"],
+                        "order_run": task_details["order_run"],
+                        "response1_original_id": task_details["response1_original_id"],
+                        "response2_original_id": task_details["response2_original_id"],
+                        "presented_as_label1_text": task_details["actual_label1_for_prompt"],
+                        "presented_as_label2_text": task_details["actual_label2_for_prompt"],
+                        "llm_raw_responses": [f"Exception: {exc}"],
+                        "picked_option_labels": [None],
+                        "picked_original_ids": ["Exception"],
+                        "errors_in_repetitions": repetitions,
+                        "total_repetitions": repetitions,
+                        "actual_prompt_sent_to_llm": task_details["prompt"] # Add prompt even on exception for debugging
                     })
-            
-            # --- Summary for this Variant + Scheme ---
-            bias_rate = (positional_bias_detected_count / valid_pairs_for_bias_calc * 100) if valid_pairs_for_bias_calc > 0 else 0
-            consistency_rate = (consistent_choices_count / valid_pairs_for_bias_calc * 100) if valid_pairs_for_bias_calc > 0 else 0
-            # Determine how many samples to take from the first pair's runs for the overall summary
-            # This is just to show an example of what prompts looked like for this variant-scheme
-            # The actual full sample for each pair is within summary_list_for_variant_scheme
-            example_pair_summary_for_prompts = next(iter(summary_list_for_variant_scheme), None)
-            example_prompt_run1 = "N/A"
-            example_prompt_run2 = "N/A"
-            if example_pair_summary_for_prompts:
-                if example_pair_summary_for_prompts.get("run1_sampled_interactions"):
-                    example_prompt_run1 = example_pair_summary_for_prompts["run1_sampled_interactions"].get("prompt_sent_to_llm", "N/A")
-                if example_pair_summary_for_prompts.get("run2_sampled_interactions"):
-                    example_prompt_run2 = example_pair_summary_for_prompts["run2_sampled_interactions"].get("prompt_sent_to_llm", "N/A")
-
-            # Get the scheme's canonical labels for the summary (for non-random, these are fixed)
-            # For random, this won't be a single pair, but it indicates the *type* of labels used.
-            # The pair_summary will have the *actual* random IDs used for that pair.
-            # For the aggregate summary, we just note the scheme name and its general label pattern if fixed.
-            scheme_display_label1, scheme_display_label2 = ("", "")
-            if labeling_scheme_name != "RandomAlphanumericIDs":
-                 # For fixed schemes, we can get their representative labels
-                 # This assumes get_labels_for_pair() returns consistent representative labels for non-random schemes
-                 # or we can store scheme_info["description"] or the labels themselves if static.
-                 # Let's use the first pair's labels for simplicity in display, or the scheme description.
-                 # For the ProcessedPickingData, we DO want the *actual scheme labels* (e.g., "(A)", "(B)")
-                 # So, let's get them from the *first* pair processed for this scheme, assuming they are consistent for non-random.
-                 # Or better, get it from scheme_info directly if it stores static labels.
-                 # Our current LABELING_SCHEMES structure uses a function for all.
-                 # For non-random, calling it again gives the same labels.
-                temp_l1, temp_l2 = get_labels_for_pair_func()
-                scheme_display_label1 = temp_l1
-                scheme_display_label2 = temp_l2
-            else: # Random IDs
-                scheme_display_label1 = "ID_rand1" # Placeholder for summary
-                scheme_display_label2 = "ID_rand2" # Placeholder for summary
-
-            # Get the prompts used for this variant for storing in the summary
-            # These were defined at the top level of the variant_info
-            system_prompt_for_summary = variant_info.get("system_prompt")
-            user_prompt_template_for_summary = variant_info.get("prompt_template")
-
-            experiment_summary_dict = {
-                "model_name": model_to_run_experiment_with,
-                "variant_name": variant_name,
-                "labeling_scheme_name": labeling_scheme_name,
-                "scheme_description": scheme_info["description"], # Add scheme description
-                "scheme_display_label1": scheme_display_label1, # e.g., "(A)" or "ID_rand1"
-                "scheme_display_label2": scheme_display_label2, # e.g., "(B)" or "ID_rand2"
-                "system_prompt_used": system_prompt_for_summary, # ADDED
-                "user_prompt_template_used": user_prompt_template_for_summary, # ADDED
-                "example_full_prompt_run1_structure": example_prompt_run1, # Example of a fully formatted prompt for run 1
-                "example_full_prompt_run2_structure": example_prompt_run2, # Example of a fully formatted prompt for run 2
-                "total_pairs_tested_in_scheme": total_pairs_tested_in_scheme,
-                "repetitions_per_order_run": repetitions,
-                "pairs_with_errors_or_inconclusive_in_scheme": error_or_inconclusive_pairs_count,
-                "valid_pairs_for_bias_calculation": valid_pairs_for_bias_calc,
-                "positional_bias_detected_count": positional_bias_detected_count,
-                "positional_bias_rate_percentage": float(f"{bias_rate:.2f}"),
-                "favored_scheme_label1_count": favored_scheme_label1_count, # Count of pairs biased towards the scheme's first label
-                "favored_scheme_label2_count": favored_scheme_label2_count, # Count of pairs biased towards the scheme's second label
-                "favored_position_inconclusive_count": favored_position_inconclusive_count, # Bias detected, but not consistently for L1 or L2
-                "valid_pairs_for_consistency_calculation": valid_pairs_for_consistency_calc,
-                "consistent_choices_count": consistent_choices_count,
-                "consistency_rate_percentage": float(f"{consistency_rate:.2f}"),
-                "pairs_summary_for_scheme": summary_list_for_variant_scheme 
-            }
-            all_experiment_results.append(experiment_summary_dict)
 
-            if not quiet:
-                print(f"    Summary for Variant: {variant_name}, Scheme: {labeling_scheme_name}")
-                print(f"      Total Pairs Tested: {total_pairs_tested_in_scheme}")
-                print(f"      Pairs with Errors/Inconclusive: {error_or_inconclusive_pairs_count}")
-                print(f"      Positional Bias Detected In: {positional_bias_detected_count}/{valid_pairs_for_bias_calc} valid pairs ({bias_rate:.2f}%)")
-                print(f"        Favored '{scheme_display_label1}': {favored_scheme_label1_count} times")
-                print(f"        Favored '{scheme_display_label2}': {favored_scheme_label2_count} times")
-                print(f"        Favored (Inconclusive Position): {favored_position_inconclusive_count} times")
-                print(f"      Consistent Choices In: {consistent_choices_count}/{valid_pairs_for_consistency_calc} valid pairs ({consistency_rate:.2f}%)")
+            remaining_units_per_group[group_index] -= 1
+            if remaining_units_per_group[group_index] == 0:
+                summaries_per_group[group_index] = _summarize_variant_scheme(
+                    groups[group_index], current_run_raw_execution_results, pairs_by_id, model_to_run_experiment_with, repetitions, quiet
+                )
+                results_per_group[group_index] = None # The summary keeps what it needs
+
+    all_experiment_results = [
+        summary if summary is not None else _summarize_variant_scheme(group, [], pairs_by_id, model_to_run_experiment_with, repetitions, quiet)
+        for group, summary in zip(groups, summaries_per_group) # Groups without pairs have no work units
+    ]
+
 
     if not quiet:
         print(f"\n--- Positional Bias Picking Experiment Complete ---")
+        if cascade:
+            print(cascade.format_summary())
     
     return all_experiment_results # This list of dicts (one per variant-scheme) is the output
 
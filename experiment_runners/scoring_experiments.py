@@ -1,9 +1,14 @@
 import re
+import functools
 import concurrent.futures
 import numpy as np
 from tqdm import tqdm
 from test_data import POEMS_FOR_SCORING, TEXTS_FOR_SENTIMENT_SCORING, TEXTS_FOR_CRITERION_ADHERENCE_SCORING, FEW_SHOT_EXAMPLE_SETS_SCORING
-from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL
+from config_utils import call_openrouter_api, BIAS_SUITE_LLM_MODEL, ContextThreadPoolExecutor, is_deferred_response, is_shard_skipped_response, is_budget_exceeded_response, split_logprob_response, latency_group
+from prompt_templates import compile_prompt, request_as_text
+from logprob_judging import ANSWER_TAGS, answer_distribution, parsed_distribution, expand_distribution, expected_value, standard_deviation
+from judge_cascade import majority_answer
+from task_scheduler import task_group, estimate_task_seconds, longest_first
 
 # --- Parsing/normalization helpers ---
 def parse_numeric(response_text, scale_type, **kwargs):
@@ -110,63 +115,137 @@ CONCURRENT_SCORING_CALLS = 8
 def build_rubric(labels):
     return "\n".join([f"{label}: {desc}" for label, desc in labels])
 
-def _score_variant_task(variant, item_data, scoring_criterion, quiet, repetitions: int = 1, item_title: str = "Item", temperature: float = 0.1):
-    text_to_score = item_data['text']
-    current_item_title = item_data.get('title', item_data.get('id', 'Untitled Item'))
-
-    # --- Prepare few-shot examples if specified ---
+@functools.lru_cache(maxsize=None)
+def _build_few_shot_examples_section(example_set_id: str, scoring_criterion: str) -> str:
+    """Formats a few-shot example set for the prompt. Cached: the result only depends on the set and the criterion."""
+    examples = FEW_SHOT_EXAMPLE_SETS_SCORING[example_set_id]
+    formatted_examples = []
+    for i, ex in enumerate(examples):
+        example_entry = f"Example {i+1}:\\n"
+        if "example_text_input" in ex:
+            example_entry += f"Text: \"{ex['example_text_input']}\"\\n"
+        current_example_criterion = ex.get('example_criterion', scoring_criterion)
+        example_entry += f"Criterion: \\\"{current_example_criterion}\\\"\\\\n"
+        if "example_llm_output" in ex:
+            example_entry += f"Correct Output: {ex['example_llm_output']}\\\n"
+        if "example_rationale_for_prompt" in ex and ex["example_rationale_for_prompt"]:
+            example_entry += f"(Reasoning for this example: {ex['example_rationale_for_prompt']})\\n"
+        formatted_examples.append(example_entry)
+    if formatted_examples:
+        return "Here are some examples to guide you:\\n---\\n" + "---\\n".join(formatted_examples) + "---\\n"
+    return ""
+
+def _compile_variant_prompt(variant, scoring_criterion, quiet):
+    """Compiles (once per variant and criterion) everything in the variant's prompt except the item text."""
     few_shot_examples_string = ""
     if "few_shot_example_set_id" in variant and variant["few_shot_example_set_id"]:
         example_set_id = variant["few_shot_example_set_id"]
         if example_set_id in FEW_SHOT_EXAMPLE_SETS_SCORING:
-            examples = FEW_SHOT_EXAMPLE_SETS_SCORING[example_set_id]
-            formatted_examples = []
-            for i, ex in enumerate(examples):
-                example_entry = f"Example {i+1}:\\n"
-                if "example_text_input" in ex:
-                    example_entry += f"Text: \"{ex['example_text_input']}\"\\n"
-                current_example_criterion = ex.get('example_criterion', scoring_criterion)
-                example_entry += f"Criterion: \\\"{current_example_criterion}\\\"\\\\n"
-                if "example_llm_output" in ex:
-                    example_entry += f"Correct Output: {ex['example_llm_output']}\\\n"
-                if "example_rationale_for_prompt" in ex and ex["example_rationale_for_prompt"]:
-                    example_entry += f"(Reasoning for this example: {ex['example_rationale_for_prompt']})\\n"
-                formatted_examples.append(example_entry)
-            if formatted_examples:
-                few_shot_examples_string = "Here are some examples to guide you:\\n---\\n" + "---\\n".join(formatted_examples) + "---\\n"
+            few_shot_examples_string = _build_few_shot_examples_section(example_set_id, scoring_criterion)
         else:
             if not quiet:
                 print(f"Warning: Few-shot example set ID '{example_set_id}' not found in FEW_SHOT_EXAMPLE_SETS_SCORING.")
-    # --- End of few-shot example preparation ---
 
     rubric = build_rubric(variant["labels"]) if variant.get("labels") else ""
-    
+
     prompt_template_to_use = variant["user_prompt_template"]
+    static_fields = {"criterion": scoring_criterion, "rubric": rubric}
     if "{few_shot_examples_section}" in prompt_template_to_use:
-        user_prompt = prompt_template_to_use.format(
-            text_input=text_to_score,
-            criterion=scoring_criterion,
-            rubric=rubric,
-            few_shot_examples_section=few_shot_examples_string
-        )
-    else:
-        user_prompt = prompt_template_to_use.format(
-            text_input=text_to_score,
-            criterion=scoring_criterion,
-            rubric=rubric
-        )
-        if few_shot_examples_string and not quiet:
-            print(f"Warning: Few-shot examples were prepared for variant '{variant['name']}' but no '{{few_shot_examples_section}}' placeholder was found in its template.")
+        static_fields["few_shot_examples_section"] = few_shot_examples_string
+    elif few_shot_examples_string and not quiet:
+        print(f"Warning: Few-shot examples were prepared for variant '{variant['name']}' but no '{{few_shot_examples_section}}' placeholder was found in its template.")
+
+    # The system prompt (if any) is sent joined to the user prompt with a newline.
+    return compile_prompt(
+        prompt_template_to_use, slot_fields=("text_input",),
+        system_prompt=variant.get("system_prompt"), system_separator="\n",
+        **static_fields
+    )
+
+def _logprob_answer_scale(variant):
+    """
+    (answer tag, {answer label: raw score}) for variants whose answers can be enumerated for logprob judging, else None
+    (the 1-100 scale and free-form parsers, which keep the repetition path).
+    """
+    parse_fn = variant["parse_fn"]
+    if parse_fn is parse_numeric and variant["scale_type"] in ("1-5", "1-10"):
+        return ANSWER_TAGS["score"], {str(score): score for score in range(1, int(variant["scale_type"].split("-")[1]) + 1)}
+    if parse_fn is parse_letter:
+        return ANSWER_TAGS["grade"], {grade: grade for grade in "ABCDE"}
+    if parse_fn is parse_creative_label and variant.get("labels"):
+        return ANSWER_TAGS["label"], {label: label for label, _ in variant["labels"]}
+    return None
 
+def _score_with_logprobs(variant, prompt_request, answer_scale, quiet, repetitions, temperature, top_logprobs):
+    """
+    One call with top-k logprobs in place of `repetitions` calls (retried like a repetition on API or parse errors).
+    The score distribution is expanded into `repetitions` repetition details (the raw response is kept on the first).
+    Returns (repetition details, error count, distribution summary or None).
+    """
+    answer_tag, raw_score_by_label = answer_scale
+    normalize_kwargs = {"labels": variant.get("labels"), "invert_scale": variant.get("invert_scale", False)}
+    labels = list(raw_score_by_label)
+    content = None
+    distribution = None
+    for attempt_num in range(3):
+        llm_response_raw = call_openrouter_api(**prompt_request, quiet=quiet, temperature=temperature, top_logprobs=top_logprobs)
+        content, _ = split_logprob_response(llm_response_raw)
+        if content.startswith("Error:"):
+            if is_deferred_response(content) or is_shard_skipped_response(content) or is_budget_exceeded_response(content):
+                break # Batch mode and --plan collect the same request again, another shard's request is skipped again, a spent budget refuses it again
+            continue
+        distribution = answer_distribution(llm_response_raw, labels, answer_tag)
+        if distribution is None:
+            parsed_score = variant["parse_fn"](content, variant["scale_type"], labels=variant.get("labels"))
+            distribution = parsed_distribution(str(parsed_score) if parsed_score is not None else None, labels)
+        if distribution is not None:
+            break
+        if not quiet:
+            print(f"        Parsing Error (logprobs mode), Attempt {attempt_num+1}. LLM: {content[:100]}...")
+
+    if distribution is None:
+        return [{"repetition_index": rep_idx, "raw_score_from_llm": None, "normalized_score": None, "raw_llm_response": content if rep_idx == 0 else None}
+                for rep_idx in range(repetitions)], repetitions, None
+
+    def normalized_score_of(label):
+        return variant["normalize_fn"](raw_score_by_label[label], variant["scale_type"], **normalize_kwargs)
+
+    repetition_details = [{
+        "repetition_index": rep_idx,
+        "raw_score_from_llm": raw_score_by_label[label],
+        "normalized_score": normalized_score_of(label),
+        "raw_llm_response": content if rep_idx == 0 else None
+    } for rep_idx, label in enumerate(expand_distribution(distribution["probabilities"], repetitions))]
+    distribution_summary = {
+        "probabilities": {label: round(probability, 6) for label, probability in distribution["probabilities"].items()},
+        "expected_normalized_score": expected_value(distribution["probabilities"], normalized_score_of),
+        "std_dev_normalized_score": standard_deviation(distribution["probabilities"], normalized_score_of),
+        "label_mass": distribution["label_mass"],
+        "source": distribution["source"]
+    }
+    return repetition_details, 0, distribution_summary
 
-    if variant.get("system_prompt"):
-        messages = [
-            {"role": "system", "content": variant["system_prompt"]},
-            {"role": "user", "content": user_prompt}
-        ]
-        prompt_to_send = "\n".join([m["content"] for m in messages])
-    else:
-        prompt_to_send = user_prompt
+def _score_variant_task(variant, item_data, scoring_criterion, quiet, repetitions: int = 1, item_title: str = "Item", temperature: float = 0.1, top_logprobs: int | None = None, model_name_override: str | None = None):
+    text_to_score = item_data['text']
+    current_item_title = item_data.get('title', item_data.get('id', 'Untitled Item'))
+
+    prompt_request = _compile_variant_prompt(variant, scoring_criterion, quiet).request(text_input=text_to_score)
+    if model_name_override: # Set by the judge cascade for its cheap tier
+        prompt_request["model_name_override"] = model_name_override
+    prompt_to_send = request_as_text(prompt_request)
+
+    answer_scale = _logprob_answer_scale(variant) if top_logprobs else None
+    if answer_scale:
+        repetition_details_list, errors_in_repetitions_count, score_distribution = _score_with_logprobs(
+            variant, prompt_request, answer_scale, quiet, repetitions, temperature, top_logprobs
+        )
+        return {
+            "repetition_details": repetition_details_list,
+            "errors_in_repetitions": errors_in_repetitions_count,
+            "actual_prompt_sent_to_llm": prompt_to_send,
+            "sampled_llm_raw_responses": [repetition_details_list[0]["raw_llm_response"]] if repetition_details_list else [],
+            "logprob_score_distribution": score_distribution
+        }
 
     repetition_details_list = []
     errors_in_repetitions_count = 0
@@ -184,7 +263,7 @@ def _score_variant_task(variant, item_data, scoring_criterion, quiet, repetition
         api_error_for_this_rep_final = False
 
         for attempt_num in range(MAX_PARSE_ATTEMPTS_PER_REPETITION):
-            llm_response_raw_for_this_rep = call_openrouter_api(prompt_to_send, quiet=quiet, temperature=temperature)
+            llm_response_raw_for_this_rep = call_openrouter_api(**prompt_request, quiet=quiet, temperature=temperature)
             
             is_api_error = isinstance(llm_response_raw_for_this_rep, str) and llm_response_raw_for_this_rep.startswith("Error:")
 
@@ -192,6 +271,8 @@ def _score_variant_task(variant, item_data, scoring_criterion, quiet, repetition
                 api_error_for_this_rep_final = True
                 if not quiet and repetitions > 1:
                     print(f"        API Error in Rep {rep_idx+1}, API Call Attempt {attempt_num+1}. LLM Raw: {llm_response_raw_for_this_rep}")
+                if is_deferred_response(llm_response_raw_for_this_rep) or is_shard_skipped_response(llm_response_raw_for_this_rep) or is_budget_exceeded_response(llm_response_raw_for_this_rep):
+                    break # Batch mode and --plan collect the same request again, another shard's request is skipped again, a spent budget refuses it again
                 if attempt_num < MAX_PARSE_ATTEMPTS_PER_REPETITION - 1:
                     print(f"          API call failed for Rep {rep_idx+1}, Attempt {attempt_num+1}. Retrying API call...")
                 raw_score_single = None
@@ -250,11 +331,40 @@ def _score_variant_task(variant, item_data, scoring_criterion, quiet, repetition
         "sampled_llm_raw_responses": [rep_details["raw_llm_response"] for rep_details in repetition_details_list[:min(repetitions, 3)]]
     }
 
+def _assess_scoring_outcome(task_outcome, repetitions):
+    """The judge cascade's view of a scored item: (normalized score, agreement or probability, from a distribution)."""
+    repetition_details = task_outcome["repetition_details"]
+    score_distribution = task_outcome.get("logprob_score_distribution")
+    if score_distribution and repetition_details:
+        # The expanded repetitions list the most likely score first.
+        return repetition_details[0]["normalized_score"], max(score_distribution["probabilities"].values()), True
+    score, agreement = majority_answer([rep_details["normalized_score"] for rep_details in repetition_details], repetitions)
+    return score, agreement, False
+
+def _submit_scoring_task(executor, task_args, cascade):
+    if cascade is None:
+        return executor.submit(_score_variant_task, *task_args)
+    return executor.submit(
+        cascade.judge, lambda model_name_override: _score_variant_task(*task_args, model_name_override),
+        lambda task_outcome: _assess_scoring_outcome(task_outcome, task_args[4]), task_args[1]
+    )
+
 # --- Main experiment runner ---
-def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, repetitions: int = 1, scoring_type: str = "all", temperature: float = 0.1):
+def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, repetitions: int = 1, scoring_type: str = "all", temperature: float = 0.1, datasets: dict | None = None, top_logprobs: int | None = None, cascade=None):
+    # `datasets` optionally overrides the item lists per source tag ("poems", "sentiment_texts", "criterion_adherence_texts"),
+    # e.g. with item-store backed lists from item_store.load_dataset.
+    # With `top_logprobs`, variants with an enumerable scale (1-5, 1-10, letter grades, creative labels) make one call per
+    # item; its score distribution fills the repetitions and gives the item's expected score (see logprob_judging.py).
+    # With `cascade` (a judge_cascade.JudgeCascade), each item-variant is scored by the cheap model first and only
+    # re-scored by the configured model when the cheap repetitions disagree or its score distribution is not confident.
+    datasets = datasets or {}
     if not quiet:
         print(f"\n--- Flexible Scoring Experiment (Type: {scoring_type}) ---")
         print(f"Temperature for API calls: {temperature}")
+        if top_logprobs:
+            print(f"Logprob judging: top-{top_logprobs} logprobs, one call per item for enumerable scales")
+        if cascade:
+            print(f"Judge cascade: {cascade.cheap_model} first")
 
     poem_specific_creative_labels = [
         ("CATEGORY_X98", "Outstanding emotional impact and depth"),
@@ -268,17 +378,19 @@ def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, re
     datasets_to_process = []
 
     if scoring_type == "poems" or scoring_type == "all":
-        datasets_to_process.append({"name": "Poems", "data": POEMS_FOR_SCORING, "source_tag": "poems"})
+        datasets_to_process.append({"name": "Poems", "data": datasets.get("poems", POEMS_FOR_SCORING), "source_tag": "poems"})
     if scoring_type == "sentiment" or scoring_type == "all":
-        datasets_to_process.append({"name": "Sentiment Texts", "data": TEXTS_FOR_SENTIMENT_SCORING, "source_tag": "sentiment_texts"})
+        datasets_to_process.append({"name": "Sentiment Texts", "data": datasets.get("sentiment_texts", TEXTS_FOR_SENTIMENT_SCORING), "source_tag": "sentiment_texts"})
     if scoring_type == "criterion_adherence" or scoring_type == "all":
-        datasets_to_process.append({"name": "Criterion Adherence Texts", "data": TEXTS_FOR_CRITERION_ADHERENCE_SCORING, "source_tag": "criterion_adherence_texts"})
+        datasets_to_process.append({"name": "Criterion Adherence Texts", "data": datasets.get("criterion_adherence_texts", TEXTS_FOR_CRITERION_ADHERENCE_SCORING), "source_tag": "criterion_adherence_texts"})
 
     if not datasets_to_process:
         if not quiet: print("No datasets selected based on scoring_type.")
         return []
 
     variant_data_accumulators = {}
+    # All datasets' item-variant tasks run through one pool, so it never drains between datasets, longest expected first.
+    scoring_tasks = []
 
     for dataset_info in tqdm(datasets_to_process, desc="Processing datasets"):
         current_dataset_name = dataset_info["name"]
@@ -309,8 +421,6 @@ def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, re
             if not quiet: print(f"No variants found for data_source '{current_source_tag}'. Skipping dataset {current_dataset_name}.")
             continue
         
-        tasks_for_current_dataset_executor = []
-
         for variant_def in current_variants_for_this_dataset_source:
             variant_name = variant_def["name"]
             if variant_name not in variant_data_accumulators:
@@ -338,8 +448,8 @@ def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, re
                 item_display_title = current_item_data_dict.get('title', current_item_data_dict.get('id', 'Item'))
                 current_criterion_for_task = variant_def.get("criterion_override", variant_def.get("default_criterion", "overall quality"))
                 
-                tasks_for_current_dataset_executor.append({
-                    "task_args": (variant_def, current_item_data_dict, current_criterion_for_task, quiet, repetitions, item_display_title, temperature),
+                scoring_tasks.append({
+                    "task_args": (variant_def, current_item_data_dict, current_criterion_for_task, quiet, repetitions, item_display_title, temperature, top_logprobs),
                     "variant_name": variant_name,
                     "item_id": current_item_data_dict['id'],
                     "item_title": current_item_data_dict.get('title'),
@@ -348,63 +458,75 @@ def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, re
                     "expected_scores_notes": current_item_data_dict.get('interpretation_notes')
                 })
 
-        if tasks_for_current_dataset_executor:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_SCORING_CALLS) as executor:
-                future_to_task_info_map = {
-                    executor.submit(_score_variant_task, *task_info_item["task_args"]): task_info_item
-                    for task_info_item in tasks_for_current_dataset_executor
-                }
-
-                for future in tqdm(concurrent.futures.as_completed(future_to_task_info_map), total=len(tasks_for_current_dataset_executor), desc=f"Scoring items in {current_dataset_name}", leave=False):
-                    completed_task_info = future_to_task_info_map[future]
-                    variant_name_for_result = completed_task_info["variant_name"]
+    task_positions = {(t["variant_name"], t["dataset_name_for_item"], t["item_id"]): i for i, t in enumerate(scoring_tasks)}
+    if scoring_tasks:
+        scoring_tasks = longest_first(scoring_tasks, lambda task_info_item: estimate_task_seconds(
+            task_group("scoring", task_info_item["variant_name"]),
+            len(task_info_item["task_args"][0].get("user_prompt_template") or "") + len(task_info_item["task_args"][0].get("system_prompt") or "") + len(task_info_item["task_args"][1]["text"]),
+            1 if top_logprobs else repetitions
+        ))
+        with ContextThreadPoolExecutor(max_workers=CONCURRENT_SCORING_CALLS) as executor:
+            future_to_task_info_map = {}
+            for task_info_item in scoring_tasks:
+                with latency_group(task_group("scoring", task_info_item["variant_name"])):
+                    future_to_task_info_map[_submit_scoring_task(executor, task_info_item["task_args"], cascade)] = task_info_item
+
+            for future in tqdm(concurrent.futures.as_completed(future_to_task_info_map), total=len(scoring_tasks), desc="Scoring items", leave=False):
+                completed_task_info = future_to_task_info_map[future]
+                variant_name_for_result = completed_task_info["variant_name"]
                     
-                    try:
-                        task_outcome_dict = future.result()
-                        repetition_details_list_for_item = task_outcome_dict["repetition_details"]
-                        item_errors_count = task_outcome_dict["errors_in_repetitions"]
-                        actual_prompt_for_item = task_outcome_dict["actual_prompt_sent_to_llm"]
-                        sampled_responses_for_item = task_outcome_dict["sampled_llm_raw_responses"]
+                try:
+                    task_outcome_dict = future.result()
+                    repetition_details_list_for_item = task_outcome_dict["repetition_details"]
+                    item_errors_count = task_outcome_dict["errors_in_repetitions"]
+                    actual_prompt_for_item = task_outcome_dict["actual_prompt_sent_to_llm"]
+                    sampled_responses_for_item = task_outcome_dict["sampled_llm_raw_responses"]
                         
-                        variant_data_accumulators[variant_name_for_result]["errors_count_total_variant"] += item_errors_count
-                        variant_data_accumulators[variant_name_for_result]["items_processed_count_variant"] += 1
+                    variant_data_accumulators[variant_name_for_result]["errors_count_total_variant"] += item_errors_count
+                    variant_data_accumulators[variant_name_for_result]["items_processed_count_variant"] += 1
                         
-                        item_normalized_scores = []
-                        for rep_detail in repetition_details_list_for_item:
-                            if rep_detail["normalized_score"] is not None:
-                                variant_data_accumulators[variant_name_for_result]["all_normalized_scores"].append(rep_detail["normalized_score"])
-                                item_normalized_scores.append(rep_detail["normalized_score"])
-
-                        avg_norm_score_item = np.mean(item_normalized_scores) if item_normalized_scores else None
-                        std_dev_norm_score_item = np.std(item_normalized_scores) if len(item_normalized_scores) > 1 else (0.0 if len(item_normalized_scores) == 1 else None)
-
-                        variant_data_accumulators[variant_name_for_result]["detailed_item_results"].append({
-                            "item_id": completed_task_info['item_id'],
-                            "item_title": completed_task_info.get('item_title'),
-                            "item_text_snippet": completed_task_info['item_text_snippet_prefix'] + ('...' if len(completed_task_info['item_text_snippet_prefix']) == 100 else ''),
-                            "dataset_name": completed_task_info["dataset_name_for_item"],
-                            "expected_scores": completed_task_info.get('expected_scores_notes'),
-                            "repetitions": repetition_details_list_for_item,
-                            "avg_normalized_score_for_item": avg_norm_score_item,
-                            "std_dev_normalized_score_for_item": std_dev_norm_score_item,
-                            "actual_prompt_sent_to_llm": actual_prompt_for_item,
-                            "sampled_llm_raw_responses": sampled_responses_for_item
-                        })
+                    item_normalized_scores = []
+                    for rep_detail in repetition_details_list_for_item:
+                        if rep_detail["normalized_score"] is not None:
+                            variant_data_accumulators[variant_name_for_result]["all_normalized_scores"].append(rep_detail["normalized_score"])
+                            item_normalized_scores.append(rep_detail["normalized_score"])
+
+                    avg_norm_score_item = np.mean(item_normalized_scores) if item_normalized_scores else None
+                    std_dev_norm_score_item = np.std(item_normalized_scores) if len(item_normalized_scores) > 1 else (0.0 if len(item_normalized_scores) == 1 else None)
+                    score_distribution = task_outcome_dict.get("logprob_score_distribution")
+                    if score_distribution: # Exact moments of the distribution rather than of its expansion into repetitions
+                        avg_norm_score_item = score_distribution["expected_normalized_score"]
+                        std_dev_norm_score_item = score_distribution["std_dev_normalized_score"]
+
+                    variant_data_accumulators[variant_name_for_result]["detailed_item_results"].append({
+                        "item_id": completed_task_info['item_id'],
+                        "item_title": completed_task_info.get('item_title'),
+                        "item_text_snippet": completed_task_info['item_text_snippet_prefix'] + ('...' if len(completed_task_info['item_text_snippet_prefix']) == 100 else ''),
+                        "dataset_name": completed_task_info["dataset_name_for_item"],
+                        "expected_scores": completed_task_info.get('expected_scores_notes'),
+                        "repetitions": repetition_details_list_for_item,
+                        "avg_normalized_score_for_item": avg_norm_score_item,
+                        "std_dev_normalized_score_for_item": std_dev_norm_score_item,
+                        "actual_prompt_sent_to_llm": actual_prompt_for_item,
+                        "sampled_llm_raw_responses": sampled_responses_for_item,
+                        **({"logprob_score_distribution": score_distribution} if score_distribution else {}),
+                        **({"cascade": task_outcome_dict["cascade"]} if "cascade" in task_outcome_dict else {})
+                    })
                         
-                    except Exception as e:
-                        if not quiet: print(f"  Exception for item {completed_task_info['item_title']} in variant {variant_name_for_result}: {e}")
-                        variant_data_accumulators[variant_name_for_result]["errors_count_total_variant"] += repetitions 
-                        variant_data_accumulators[variant_name_for_result]["items_processed_count_variant"] += 1
-                        variant_data_accumulators[variant_name_for_result]["detailed_item_results"].append({
-                            "item_id": completed_task_info['item_id'], 
-                            "item_title": completed_task_info.get('item_title'), 
-                            "dataset_name": completed_task_info["dataset_name_for_item"],
-                            "item_text_snippet": completed_task_info['item_text_snippet_prefix'] + ('...' if len(completed_task_info['item_text_snippet_prefix']) == 100 else ''),
-                            "repetitions": [], 
-                            "error_message": str(e),
-                            "actual_prompt_sent_to_llm": "Error in task execution, prompt might be in task_args",
-                            "sampled_llm_raw_responses": []
-                        })
+                except Exception as e:
+                    if not quiet: print(f"  Exception for item {completed_task_info['item_title']} in variant {variant_name_for_result}: {e}")
+                    variant_data_accumulators[variant_name_for_result]["errors_count_total_variant"] += repetitions 
+                    variant_data_accumulators[variant_name_for_result]["items_processed_count_variant"] += 1
+                    variant_data_accumulators[variant_name_for_result]["detailed_item_results"].append({
+                        "item_id": completed_task_info['item_id'], 
+                        "item_title": completed_task_info.get('item_title'), 
+                        "dataset_name": completed_task_info["dataset_name_for_item"],
+                        "item_text_snippet": completed_task_info['item_text_snippet_prefix'] + ('...' if len(completed_task_info['item_text_snippet_prefix']) == 100 else ''),
+                        "repetitions": [], 
+                        "error_message": str(e),
+                        "actual_prompt_sent_to_llm": "Error in task execution, prompt might be in task_args",
+                        "sampled_llm_raw_responses": []
+                    })
 
 
     # --- Final Assembly & Aggregation ---
@@ -416,6 +538,8 @@ def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, re
         print("-" * len(header))
 
     for variant_name, acc_data in variant_data_accumulators.items():
+        # Restore task order (as_completed yields in completion order) so the output is reproducible.
+        acc_data["detailed_item_results"].sort(key=lambda r: task_positions.get((variant_name, r["dataset_name"], r["item_id"]), len(task_positions)))
         agg_stats = {}
         valid_normalized_scores_all = [s for s in acc_data["all_normalized_scores"] if s is not None]
         
@@ -472,6 +596,8 @@ def run_scoring_experiment(show_raw=False, quiet=False, num_samples: int = 1, re
 
             print(f"{variant_name:<55} | {avg_parsed_str:>10} | {avg_norm_str:>14} | {min_norm_str:>7} | {max_norm_str:>7} | {std_norm_str:>7} | {iqr_norm_str:>7} | {items_str:>7} | {total_reps_str:>9} | {success_str:>9} | {errors_str:>6}")
 
+    if cascade and not quiet:
+        print(f"\n{cascade.format_summary()}")
     return all_final_variant_results
 
 def get_all_scoring_variants(poem_specific_creative_labels):
@@ -0,0 +1,252 @@
+"""
+On-disk item store for large datasets.
+
+Each store is a pair of files sharing a path prefix:
+  * `<prefix>.items.jsonl` - one JSON record per line (the full item, including its text fields).
+  * `<prefix>.index.json`  - the id -> (byte offset, byte length) index plus store metadata.
+
+The data file is memory-mapped, so looking up an item by ID is a single slice of the map and
+a `json.loads` of one record. `ItemStore.items()` returns lightweight `StoredItem` mappings that
+keep only the (small) metadata fields in memory and read the large text fields from the map
+on demand, so runners can keep using `item['text']` while memory stays flat as the corpus grows.
+
+Build stores for the bundled test data with:
+    python item_store.py build --output_dir ./item_stores
+and point bias_analyzer.py at them with `--item_store_dir ./item_stores`.
+"""
+
+import os
+import json
+import mmap
+import argparse
+from collections.abc import Mapping
+
+ITEM_STORE_DATA_SUFFIX = ".items.jsonl"
+ITEM_STORE_INDEX_SUFFIX = ".index.json"
+ITEM_STORE_FORMAT_VERSION = 1
+
+# Datasets from test_data.py that can be exported to / loaded from item stores.
+# `id_key` is the field used as the lookup key, `text_keys` are the fields that are only read on demand.
+TEST_DATA_DATASETS = {
+    "PICKING_PAIRS": {"id_key": "pair_id", "text_keys": ("text_A", "text_B")},
+    "POEMS_FOR_SCORING": {"id_key": "id", "text_keys": ("text",)},
+    "TEXTS_FOR_SENTIMENT_SCORING": {"id_key": "id", "text_keys": ("text",)},
+    "TEXTS_FOR_CRITERION_ADHERENCE_SCORING": {"id_key": "id", "text_keys": ("text",)},
+    "SHORT_ARGUMENTS_FOR_SCORING": {"id_key": "id", "text_keys": ("text",)},
+    "STORY_OPENINGS_FOR_SCORING": {"id_key": "id", "text_keys": ("text",)},
+    "CLASSIFICATION_ITEMS": {"id_key": "item_id", "text_keys": ("text",)},
+}
+
+
+def build_item_store(items, store_path_prefix: str, id_key: str = "id", text_keys=("text",)) -> dict:
+    """
+    Writes `items` (an iterable of dicts) to an on-disk store at `store_path_prefix`.
+    Returns the index dictionary that was written alongside the data file.
+    Raises ValueError on missing or duplicate IDs, since the index must be unambiguous.
+    """
+    data_path = store_path_prefix + ITEM_STORE_DATA_SUFFIX
+    index_path = store_path_prefix + ITEM_STORE_INDEX_SUFFIX
+    parent_dir = os.path.dirname(data_path)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+
+    offsets = {}
+    order = []
+    offset = 0
+    with open(data_path, "wb") as data_file:
+        for item in items:
+            item_id = item.get(id_key)
+            if item_id is None:
+                raise ValueError(f"Item is missing id key '{id_key}': {str(item)[:100]}")
+            item_id = str(item_id)
+            if item_id in offsets:
+                raise ValueError(f"Duplicate item id '{item_id}' while building item store {store_path_prefix}")
+            line = (json.dumps(dict(item), ensure_ascii=False, separators=(',', ':')) + "\n").encode("utf-8")
+            data_file.write(line)
+            offsets[item_id] = [offset, len(line) - 1]  # Length excludes the trailing newline
+            order.append(item_id)
+            offset += len(line)
+
+    index = {
+        "format_version": ITEM_STORE_FORMAT_VERSION,
+        "id_key": id_key,
+        "text_keys": list(text_keys),
+        "item_count": len(order),
+        "order": order,
+        "offsets": offsets,
+    }
+    with open(index_path, "w") as index_file:
+        json.dump(index, index_file)
+    return index
+
+
+def item_store_exists(store_path_prefix: str) -> bool:
+    return os.path.exists(store_path_prefix + ITEM_STORE_DATA_SUFFIX) and os.path.exists(store_path_prefix + ITEM_STORE_INDEX_SUFFIX)
+
+
+class ItemStore:
+    """Read-only, memory-mapped view over a store written by `build_item_store`."""
+
+    def __init__(self, store_path_prefix: str):
+        self.store_path_prefix = store_path_prefix
+        with open(store_path_prefix + ITEM_STORE_INDEX_SUFFIX, "r") as index_file:
+            index = json.load(index_file)
+        if index.get("format_version") != ITEM_STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported item store format version {index.get('format_version')} in {store_path_prefix}")
+
+        self.id_key = index["id_key"]
+        self.text_keys = tuple(index.get("text_keys", []))
+        self._order = index["order"]
+        self._offsets = index["offsets"]
+
+        self._data_file = open(store_path_prefix + ITEM_STORE_DATA_SUFFIX, "rb")
+        # mmap cannot map an empty file; an empty store simply has nothing to read.
+        self._map = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ) if self._order else None
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, item_id):
+        return str(item_id) in self._offsets
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._data_file is not None:
+            self._data_file.close()
+            self._data_file = None
+
+    def ids(self) -> list:
+        """Item IDs in the order they were written."""
+        return list(self._order)
+
+    def get(self, item_id, default=None):
+        """Returns the full record for `item_id`, or `default` if it is not in the store."""
+        location = self._offsets.get(str(item_id))
+        if location is None:
+            return default
+        offset, length = location
+        return json.loads(self._map[offset:offset + length].decode("utf-8"))
+
+    def get_text(self, item_id, text_key: str | None = None):
+        """Returns a single text field for `item_id` (the store's first text key by default)."""
+        record = self.get(item_id)
+        if record is None:
+            raise KeyError(item_id)
+        return record.get(text_key or self.text_keys[0])
+
+    def get_metadata(self, item_id) -> dict:
+        """Returns the record for `item_id` without its text fields."""
+        record = self.get(item_id)
+        if record is None:
+            raise KeyError(item_id)
+        return {k: v for k, v in record.items() if k not in self.text_keys}
+
+    def items(self) -> list:
+        """Lazy `StoredItem` mappings for every item, in store order."""
+        return [StoredItem(self, item_id) for item_id in self._order]
+
+
+class StoredItem(Mapping):
+    """
+    Dict-like handle for one item in an `ItemStore`.
+    Metadata fields are cached on first access; text fields are re-read from the memory map each time.
+    """
+
+    __slots__ = ("_store", "_item_id", "_metadata")
+
+    def __init__(self, store: ItemStore, item_id: str):
+        self._store = store
+        self._item_id = item_id
+        self._metadata = None
+
+    def _get_metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = self._store.get_metadata(self._item_id)
+        return self._metadata
+
+    def __getitem__(self, key):
+        if key in self._store.text_keys:
+            record = self._store.get(self._item_id)
+            if key not in record:
+                raise KeyError(key)
+            return record[key]
+        return self._get_metadata()[key]
+
+    def __iter__(self):
+        metadata_keys = list(self._get_metadata().keys())
+        return iter(metadata_keys + [k for k in self._store.text_keys if k not in metadata_keys])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __contains__(self, key):
+        if key in self._store.text_keys:
+            return key in self._store.get(self._item_id)
+        return key in self._get_metadata()
+
+    def to_dict(self) -> dict:
+        """Materialises the full record (including text)."""
+        return self._store.get(self._item_id)
+
+    def __repr__(self):
+        return f"StoredItem({self._store.id_key}={self._item_id!r})"
+
+
+def index_items_by_id(items, id_key: str = "id") -> dict:
+    """Builds an id -> item dictionary so runners can replace linear `next(...)` scans with O(1) lookups."""
+    return {item[id_key]: item for item in items if id_key in item}
+
+
+def load_dataset(dataset_name: str, item_store_dir: str | None = None):
+    """
+    Returns the named test_data dataset, read from `<item_store_dir>/<dataset_name>` when a store exists there,
+    otherwise the in-memory list from test_data.py.
+    """
+    if item_store_dir:
+        store_prefix = os.path.join(item_store_dir, dataset_name)
+        if item_store_exists(store_prefix):
+            return ItemStore(store_prefix).items()
+    import test_data
+    return getattr(test_data, dataset_name)
+
+
+def export_test_data_to_item_stores(output_dir: str, dataset_names=None) -> dict:
+    """Writes an item store for each dataset in TEST_DATA_DATASETS (or the given subset). Returns {name: item_count}."""
+    import test_data
+    written = {}
+    for dataset_name in (dataset_names or TEST_DATA_DATASETS.keys()):
+        dataset_config = TEST_DATA_DATASETS[dataset_name]
+        index = build_item_store(
+            getattr(test_data, dataset_name),
+            os.path.join(output_dir, dataset_name),
+            id_key=dataset_config["id_key"],
+            text_keys=dataset_config["text_keys"]
+        )
+        written[dataset_name] = index["item_count"]
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build memory-mapped item stores from test_data.py datasets.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Export datasets to item stores.")
+    build_parser.add_argument("--output_dir", type=str, required=True, help="Directory to write the item stores to.")
+    build_parser.add_argument(
+        "--datasets",
+        type=str,
+        default=None,
+        help=f"Comma-separated dataset names (default: all of {', '.join(TEST_DATA_DATASETS)})."
+    )
+    cli_args = parser.parse_args()
+
+    selected = [d.strip() for d in cli_args.datasets.split(",") if d.strip()] if cli_args.datasets else None
+    for name, count in export_test_data_to_item_stores(cli_args.output_dir, selected).items():
+        print(f"Wrote {count} item(s) for {name} to {os.path.join(cli_args.output_dir, name)}{ITEM_STORE_DATA_SUFFIX}")
@@ -0,0 +1,160 @@
+"""
+Cheap-model-first judge cascade.
+
+With a cascade, the picking, scoring and classification runners judge each unit of work (a pair, an item-variant,
+an item-strategy) with a cheap model first and keep that judgment when the cheap model is sure of it. The unit is
+escalated to the configured (expensive) model, and judged again from scratch, when:
+
+  - the item is flagged as ambiguous: `ambiguity_score` >= AMBIGUITY_ESCALATION_THRESHOLD, or, without a score,
+    `is_control_item` is False (these go to the expensive model directly, without a cheap call);
+  - the cheap model produced no valid answer;
+  - its repetitions disagree: fewer than `min_agreement` of them give the majority answer (errors count against it);
+  - with logprob judging, the most likely answer has a probability below `min_confidence`.
+
+A unit whose cheap-tier calls got placeholder responses (config_utils.BATCH_DEFERRED_RESPONSE: a batch collection round,
+a --plan dry run) is not escalated, since its cheap answer is not known yet; its result is marked pending, and the
+next batch round decides on the real responses. Sharded runs cannot do that (a unit's calls span shards), so
+bias_analyzer.py rejects a cascade with sharding.
+
+Each result gets a "cascade" record (tier, model, escalation reason, and for escalations the cheap tier's answer).
+`JudgeCascade.summary()` reports judgments and calls per tier (calls counted with config_utils.count_calls, so
+retries are included), the escalation reasons, and how often the expensive model agreed with the cheap model's
+answer on the escalated units. A cascade with repetitions=1 and no logprobs only escalates ambiguous items and
+cheap-tier errors.
+"""
+
+import threading
+from collections import Counter
+
+import config_utils
+from config_utils import count_calls
+
+AMBIGUITY_ESCALATION_THRESHOLD = 0.5
+DEFAULT_MIN_AGREEMENT = 1.0   # Share of repetitions that must give the majority answer
+DEFAULT_MIN_CONFIDENCE = 0.8  # Probability of the most likely answer, with logprob judging
+CASCADE_TIERS = ("cheap", "expensive")
+
+
+def item_flagged_ambiguous(item: dict | None) -> bool:
+    """Whether an item's own metadata marks it as ambiguous (see module docstring)."""
+    if not item:
+        return False
+    ambiguity_score = item.get("ambiguity_score")
+    if ambiguity_score is not None:
+        return ambiguity_score >= AMBIGUITY_ESCALATION_THRESHOLD
+    return item.get("is_control_item") is False
+
+
+def majority_answer(answers: list, total: int, invalid=()) -> tuple:
+    """
+    (majority answer, its share of `total` repetitions). The answer is None without a valid answer (share 0.0) or
+    with a tied majority (share of the tied answers).
+    """
+    counts = Counter(answer for answer in answers if answer is not None and answer not in invalid).most_common(2)
+    if not counts:
+        return None, 0.0
+    share = counts[0][1] / total if total else 0.0
+    if len(counts) > 1 and counts[0][1] == counts[1][1]:
+        return None, share
+    return counts[0][0], share
+
+
+def most_likely_answer(probabilities: dict) -> tuple:
+    """(most likely answer, its probability) of an answer distribution."""
+    answer = max(probabilities, key=probabilities.get)
+    return answer, probabilities[answer]
+
+
+class JudgeCascade:
+    """
+    Runs units of judging work cheap model first (see module docstring). One instance per experiment run; it is
+    shared by the runner's worker threads.
+    """
+
+    def __init__(self, cheap_model: str, min_agreement: float = DEFAULT_MIN_AGREEMENT, min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.cheap_model = cheap_model
+        self.min_agreement = min_agreement
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self.tier_stats = {tier: {"judgments": 0, "calls": 0} for tier in CASCADE_TIERS}
+        self.escalation_reasons = Counter()
+        self.tier_agreement = {"compared": 0, "agreed": 0}
+        self.pending_units = 0
+
+    def judge(self, execute, assess, item: dict | None = None, expensive_model: str | None = None):
+        """
+        Judges one unit. `execute(model_name_override)` runs it with a model (None: the configured model) and returns
+        its result dict; `assess(result)` returns (answer, share, from_distribution): the majority or most likely
+        answer (None if there is none), its share of the repetitions or its probability, and whether that share
+        comes from a logprob distribution. Returns the result of the tier that decided, with a "cascade" record.
+        """
+        reason = "ambiguous_item" if item_flagged_ambiguous(item) else None
+        cheap_answer = None
+        if reason is None:
+            cheap_result, cheap_pending_calls = self._run_tier("cheap", execute, self.cheap_model)
+            if cheap_pending_calls:
+                with self._lock:
+                    self.pending_units += 1
+                cheap_result["cascade"] = {"tier": "cheap", "model": self.cheap_model, "escalation_reason": None, "pending": True}
+                return cheap_result
+            cheap_answer, share, from_distribution = assess(cheap_result)
+            if cheap_answer is None:
+                reason = "disagreement" if share > 0 else "no_valid_answer" # A tied majority is a disagreement
+            elif from_distribution and share < self.min_confidence:
+                reason = "low_confidence"
+            elif not from_distribution and share < self.min_agreement:
+                reason = "disagreement"
+            else:
+                cheap_result["cascade"] = {"tier": "cheap", "model": self.cheap_model, "escalation_reason": None}
+                return cheap_result
+
+        result, _ = self._run_tier("expensive", execute, expensive_model)
+        cascade_record = {"tier": "expensive", "model": expensive_model or config_utils.BIAS_SUITE_LLM_MODEL, "escalation_reason": reason}
+        with self._lock:
+            self.escalation_reasons[reason] += 1
+        if cheap_answer is not None:
+            expensive_answer, _, _ = assess(result)
+            cascade_record["cheap_tier_answer"] = cheap_answer
+            if expensive_answer is not None:
+                with self._lock:
+                    self.tier_agreement["compared"] += 1
+                    self.tier_agreement["agreed"] += expensive_answer == cheap_answer
+        result["cascade"] = cascade_record
+        return result
+
+    def _run_tier(self, tier: str, execute, model_name_override: str | None) -> tuple:
+        """(the tier's result, its number of calls answered with pending placeholders)."""
+        tally = {"calls": 0, "pending": 0}
+        with count_calls(tally):
+            result = execute(model_name_override)
+        with self._lock:
+            self.tier_stats[tier]["judgments"] += 1
+            self.tier_stats[tier]["calls"] += tally["calls"]
+        return result, tally["pending"]
+
+    def summary(self) -> dict:
+        with self._lock:
+            escalated = sum(self.escalation_reasons.values())
+            units = self.tier_stats["cheap"]["judgments"] + self.escalation_reasons["ambiguous_item"]
+            return {
+                "cheap_model": self.cheap_model,
+                "min_agreement": self.min_agreement,
+                "min_confidence": self.min_confidence,
+                "units": units,
+                "escalated": escalated,
+                "pending": self.pending_units,
+                "tiers": {tier: dict(stats) for tier, stats in self.tier_stats.items()},
+                "escalation_reasons": dict(self.escalation_reasons),
+                "tier_agreement_on_escalations": dict(self.tier_agreement,
+                    rate=self.tier_agreement["agreed"] / self.tier_agreement["compared"] if self.tier_agreement["compared"] else None),
+            }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        cheap, expensive = summary["tiers"]["cheap"], summary["tiers"]["expensive"]
+        agreement = summary["tier_agreement_on_escalations"]
+        reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(summary["escalation_reasons"].items())) or "none"
+        agreement_text = f"{agreement['agreed']}/{agreement['compared']} ({agreement['rate']:.1%})" if agreement["compared"] else "N/A"
+        return (f"Judge cascade ({summary['cheap_model']} first): {summary['units']} unit(s), {summary['escalated']} escalated ({reasons}), {summary['pending']} pending; "
+                f"cheap tier {cheap['judgments']} judgment(s) / {cheap['calls']} call(s), expensive tier {expensive['judgments']} judgment(s) / {expensive['calls']} call(s); "
+                f"expensive model agreed with the cheap answer on {agreement_text} escalation(s).")
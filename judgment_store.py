@@ -0,0 +1,126 @@
+"""
+Shared store of holistic multi-criteria judgments.
+
+A judgment is the list of raw LLM responses (one per repetition) for one item under one exact prompt,
+keyed by (model, temperature, item id, prompt hash, and the structured-output response format if one was requested). Experiments that send the same holistic prompt
+for the same item - e.g. the permuted-order experiment's OrderOriginal run and the isolated-criterion
+experiment's holistic baseline - read the stored responses instead of issuing the calls again, and only
+request the repetitions that are still missing.
+
+The store is in-memory by default. Give it a path (`--judgment_store` in bias_analyzer.py) to persist
+judgments as JSONL so they are reused across runs and processes.
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+import config_utils
+
+
+def hash_prompt(prompt_text: str) -> str:
+    return hashlib.sha256(prompt_text.encode('utf-8')).hexdigest()
+
+
+class JudgmentStore:
+    """Thread-safe judgment store, optionally backed by an append-only JSONL file."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._records = {}     # key -> {"model", "temperature", "item_id", "prompt_hash", "llm_raw_responses"}
+        self._key_locks = {}   # key -> lock, so concurrent requests for one judgment are only sent once
+        self._lock = threading.Lock()
+        self.hits = 0          # Repetitions served from the store
+        self.misses = 0        # Repetitions that had to be requested
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str):
+        with open(path, 'r') as store_file:
+            for line_number, line in enumerate(store_file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping malformed line {line_number} in judgment store {path}.")
+                    continue
+                # Later lines for the same key supersede earlier ones (they hold more repetitions).
+                self._records[record["key"]] = record
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    @staticmethod
+    def make_key(model: str, temperature: float, item_id, prompt_text: str, response_format: dict | None = None) -> str:
+        key_fields = [model, temperature, str(item_id), hash_prompt(prompt_text)]
+        if response_format is not None:
+            key_fields.append(response_format)
+        payload = json.dumps(key_fields, separators=(',', ':'), sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, item_id, prompt_text: str, temperature: float, model: str | None = None, response_format: dict | None = None) -> list | None:
+        """Returns the stored raw responses for this judgment, or None."""
+        key = self.make_key(model or config_utils.BIAS_SUITE_LLM_MODEL, temperature, item_id, prompt_text, response_format)
+        with self._lock:
+            record = self._records.get(key)
+            return list(record["llm_raw_responses"]) if record else None
+
+    def get_or_request(self, item_id, prompt_text: str, temperature: float, repetitions: int, request_fn, model: str | None = None, response_format: dict | None = None) -> list:
+        """
+        Returns `repetitions` raw responses for this judgment, calling `request_fn()` (one LLM call) only for
+        the repetitions not already stored. Error responses are returned but not stored, so they are retried next time.
+        """
+        model = model or config_utils.BIAS_SUITE_LLM_MODEL
+        key = self.make_key(model, temperature, item_id, prompt_text, response_format)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                record = self._records.get(key)
+                stored_responses = list(record["llm_raw_responses"]) if record else []
+            reused = stored_responses[:repetitions]
+            new_responses = [request_fn() for _ in range(repetitions - len(reused))]
+
+            new_successes = [r for r in new_responses if not (isinstance(r, str) and r.startswith("Error"))]
+            with self._lock:
+                self.hits += len(reused)
+                self.misses += len(new_responses)
+                if new_successes:
+                    record = {
+                        "key": key, "model": model, "temperature": temperature, "item_id": str(item_id),
+                        "prompt_hash": hash_prompt(prompt_text), "llm_raw_responses": stored_responses + new_successes
+                    }
+                    self._records[key] = record
+                    if self.path:
+                        parent_dir = os.path.dirname(self.path)
+                        if parent_dir:
+                            os.makedirs(parent_dir, exist_ok=True)
+                        with open(self.path, 'a') as store_file:
+                            store_file.write(json.dumps(record) + "\n")
+            return reused + new_responses
+
+    def query(self, model: str | None = None, temperature: float | None = None, item_id=None) -> list:
+        """Stored judgment records matching all of the given fields (None matches anything)."""
+        with self._lock:
+            return [
+                dict(record) for record in self._records.values()
+                if (model is None or record["model"] == model)
+                and (temperature is None or record["temperature"] == temperature)
+                and (item_id is None or record["item_id"] == str(item_id))
+            ]
+
+
+_judgment_store = JudgmentStore()
+
+def get_judgment_store() -> JudgmentStore:
+    return _judgment_store
+
+def set_judgment_store_path(path: str | None):
+    """Replaces the shared store with one persisted at `path` (loading any judgments already there)."""
+    global _judgment_store
+    _judgment_store = JudgmentStore(path)
+    return _judgment_store
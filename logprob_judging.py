@@ -0,0 +1,157 @@
+"""
+Log-probability judging: the model's full answer distribution from a single call.
+
+With `top_logprobs` set, a request returns the k most likely tokens (with log probabilities) at every output
+position. `answer_distribution` finds where the answer starts in the response (after `<choice>`, `<score>`,
+`<grade>` or `<label>`, or at the start of the response for classification) and walks the sampled tokens from
+there. At every position, each top-k alternative is mapped to the answer label it would spell out; alternatives
+that already identify a single label contribute the probability of the path so far times their own probability
+to that label (the chain rule, truncated to the top k). The walk stops at the first token that settles the
+sampled label, which for typical labels is the first or second answer token.
+
+The runners turn the distribution into the same repetition fields `--repetitions N` fills today (see
+`expand_distribution`), so majority picks, consistency and average scores come from one call instead of N. When
+the backend returns no logprobs, or the answer is not where the mapping expects it, the response text is parsed
+as usual and the distribution is the single parsed label (source "parsed_content").
+"""
+
+import math
+
+from config_utils import split_logprob_response
+
+# Answer positions per response format (the answer starts right after the tag).
+ANSWER_TAGS = {
+    "choice": "<choice>",
+    "score": "<score>",
+    "grade": "<grade>",
+    "label": "<label>",
+}
+MAX_ANSWER_TOKENS = 16  # Longest answer (in tokens) walked before giving up on a label
+
+
+def _consistent_labels(candidate_text: str, aliases: dict) -> set:
+    """Labels whose alias `candidate_text` could still spell out (a prefix) or has spelled out (followed by a delimiter)."""
+    candidate = candidate_text.lstrip().lower()
+    complete_matches = set()
+    prefix_matches = set()
+    for alias, label in aliases.items():
+        if alias.startswith(candidate):
+            prefix_matches.add(label)
+        elif candidate.startswith(alias) and not candidate[len(alias)].isalnum():
+            complete_matches.add(label)
+    # A completed alias ("1" in "1</score>") is settled even if a longer label starts the same way ("10").
+    return complete_matches or prefix_matches
+
+
+def _find_answer_start(text: str, answer_tag: str | None) -> int | None:
+    if answer_tag is None:
+        return len(text) - len(text.lstrip())
+    tag_position = text.lower().find(answer_tag.lower())
+    return None if tag_position < 0 else tag_position + len(answer_tag)
+
+
+def answer_distribution(llm_response: str, labels, answer_tag: str | None = None, aliases: dict | None = None) -> dict | None:
+    """
+    The probability distribution over `labels` at the answer position of a logprob envelope response.
+    `aliases` optionally maps further spellings to a label (e.g. {"a": "(A)"}); matching is case-insensitive.
+    Returns {"probabilities": {label: p}, "label_mass": share of the top-k mass that reached a label, "source": "logprobs"},
+    or None when the response has no logprobs or its answer could not be located.
+    """
+    _, token_logprobs = split_logprob_response(llm_response)
+    if not token_logprobs:
+        return None
+    alias_to_label = {str(label).strip().lower(): label for label in labels}
+    alias_to_label.update({str(alias).strip().lower(): label for alias, label in (aliases or {}).items()})
+
+    tokens = [entry.get("token", "") for entry in token_logprobs]
+    answer_start = _find_answer_start("".join(tokens), answer_tag)
+    if answer_start is None:
+        return None
+
+    # The token the answer starts in, and the part of it that precedes the answer (e.g. ">" of ">Response").
+    token_start = 0
+    position = 0
+    while position < len(tokens) and token_start + len(tokens[position]) <= answer_start:
+        token_start += len(tokens[position])
+        position += 1
+    if position == len(tokens):
+        return None
+    token_prefix = tokens[position][:answer_start - token_start]
+
+    label_mass = {label: 0.0 for label in labels}
+    path_probability = 1.0
+    answered = ""
+    for position in range(position, min(position + MAX_ANSWER_TOKENS, len(tokens))):
+        entry = token_logprobs[position]
+        sampled_token = entry.get("token", "")
+        alternatives = {alternative.get("token", ""): alternative.get("logprob") for alternative in entry.get("top_logprobs") or []}
+        alternatives.setdefault(sampled_token, entry.get("logprob"))
+
+        sampled_labels = _consistent_labels(answered + sampled_token[len(token_prefix):], alias_to_label)
+        for alternative_token, logprob in alternatives.items():
+            if alternative_token == sampled_token or logprob is None or not alternative_token.startswith(token_prefix):
+                continue
+            alternative_labels = _consistent_labels(answered + alternative_token[len(token_prefix):], alias_to_label)
+            if len(alternative_labels) == 1:
+                label_mass[next(iter(alternative_labels))] += path_probability * math.exp(logprob)
+
+        sampled_probability = math.exp(entry["logprob"]) if entry.get("logprob") is not None else 0.0
+        if len(sampled_labels) == 1:
+            label_mass[next(iter(sampled_labels))] += path_probability * sampled_probability
+            break
+        if not sampled_labels:
+            break # The sampled answer is not one of the labels; the mass found so far still counts
+        path_probability *= sampled_probability
+        answered += sampled_token[len(token_prefix):]
+        token_prefix = ""
+
+    total_label_mass = sum(label_mass.values())
+    if total_label_mass <= 0:
+        return None
+    return {
+        "probabilities": {label: mass / total_label_mass for label, mass in label_mass.items()},
+        "label_mass": round(total_label_mass, 6),
+        "source": "logprobs",
+    }
+
+
+def parsed_distribution(parsed_label, labels) -> dict | None:
+    """The one-hot distribution for a label parsed from the response text (None if it is not one of `labels`)."""
+    if parsed_label not in labels:
+        return None
+    return {"probabilities": {label: float(label == parsed_label) for label in labels}, "label_mass": None, "source": "parsed_content"}
+
+
+def expand_distribution(probabilities: dict, count: int) -> list:
+    """
+    `count` labels whose frequencies follow `probabilities` as closely as possible (largest remainder), most likely
+    first: the repetition list `count` samples from the distribution would produce on average.
+    """
+    quotas = {label: probability * count for label, probability in probabilities.items()}
+    counts = {label: int(quota) for label, quota in quotas.items()}
+    by_remainder = sorted(quotas, key=lambda label: (quotas[label] - counts[label], probabilities[label]), reverse=True)
+    for label in by_remainder[:count - sum(counts.values())]:
+        counts[label] += 1
+    expanded = []
+    for label in sorted(counts, key=lambda label: probabilities[label], reverse=True):
+        expanded.extend([label] * counts[label])
+    return expanded
+
+
+def expected_value(probabilities: dict, value_of) -> float | None:
+    """The expectation of `value_of(label)` under the distribution (labels without a value are left out and renormalised)."""
+    weighted = [(probability, value_of(label)) for label, probability in probabilities.items()]
+    weighted = [(probability, value) for probability, value in weighted if value is not None and probability > 0]
+    total = sum(probability for probability, _ in weighted)
+    if total <= 0:
+        return None
+    return sum(probability * value for probability, value in weighted) / total
+
+
+def standard_deviation(probabilities: dict, value_of) -> float | None:
+    """The standard deviation of `value_of(label)` under the distribution (as in expected_value)."""
+    mean = expected_value(probabilities, value_of)
+    if mean is None:
+        return None
+    variance = expected_value(probabilities, lambda label: None if value_of(label) is None else (value_of(label) - mean) ** 2)
+    return math.sqrt(variance) if variance is not None else None
@@ -0,0 +1,164 @@
+"""
+Compares the makespan of dispatching an experiment's task matrix longest-expected-first (task_scheduler.py) with
+dispatching it in submission (dataset) order, by simulating the runner's pool (no API calls are made).
+
+Workloads follow the runners' task matrices on the bundled data, repeated --scale times:
+  elo:            every ranking set x the six Elo variants x match x repetition (one call per task);
+  multi_criteria: every argument / story opening x (the holistic prompt + one isolated prompt per criterion),
+                  each task making --repetitions sequential calls.
+
+A call's true duration is its group's latency profile (LATENCY_PROFILES: seconds of output, e.g. long for
+Chain-of-Thought, plus SECONDS_PER_PROMPT_CHAR per prompt character) with log-normal noise. The profiles are
+assumptions standing in for a real model; the ordering compared is exactly the runners'. Orders:
+  submission:   the runners' submission order;
+  lf cold:      longest-first without latency history (estimates from prompt length and repetitions only);
+  lf warm:      longest-first with a LatencyModel trained on an earlier simulated run of the workload (different
+                noise), i.e. with the persisted model of a previous run;
+  lpt oracle:   longest-first by the true durations, for reference.
+"lower bound" is max(total work / workers, longest task).
+
+Usage: python makespan_benchmark.py [--workload elo|multi_criteria|all] [--workers 8,16,32] [--repetitions 1]
+                                    [--scale 1] [--seed 0] [--output makespan_benchmark.jsonl]
+"""
+
+import json
+import heapq
+import random
+import argparse
+import datetime
+
+from test_data import RANKING_SETS, SHORT_ARGUMENTS_FOR_SCORING, ARGUMENT_EVALUATION_RUBRIC, STORY_OPENINGS_FOR_SCORING, STORY_OPENING_EVALUATION_RUBRIC
+from task_scheduler import LatencyModel, task_group, longest_first
+
+BENCHMARK_MODEL = "benchmark/simulated-model"
+SECONDS_PER_PROMPT_CHAR = 0.0003
+LATENCY_NOISE_SIGMA = 0.35
+
+# Elo variants in runner order: (name, prompt template characters, seconds of output)
+ELO_VARIANT_PROFILES = [
+    ("Classic (no system prompt, no tie)", 260, 1.2),
+    ("Justification-First (no tie)", 330, 6.0),
+    ("System Prompt (no tie)", 420, 1.3),
+    ("Allow Tie (A/B/C)", 450, 1.3),
+    ("JSON Output (no tie)", 400, 1.4),
+    ("Chain-of-Thought (CoT)", 950, 9.0),
+]
+MULTI_CRITERIA_TEMPLATE_CHARS = 700
+HOLISTIC_OUTPUT_SECONDS = 3.5   # One JSON object with every criterion
+ISOLATED_OUTPUT_SECONDS = 1.2   # A single score
+
+LATENCY_PROFILES = {task_group("pairwise_elo", name): output_seconds for name, _, output_seconds in ELO_VARIANT_PROFILES}
+
+
+def elo_workload(repetitions: int, scale: int) -> list:
+    tasks = []
+    for _ in range(scale):
+        for ranking_set in RANKING_SETS:
+            items = ranking_set["items"]
+            for variant_name, template_chars, _ in ELO_VARIANT_PROFILES:
+                for i in range(len(items)):
+                    for j in range(i + 1, len(items)):
+                        prompt_chars = template_chars + len(items[i]["text"]) + len(items[j]["text"])
+                        tasks.extend({"group": task_group("pairwise_elo", variant_name), "prompt_chars": prompt_chars, "calls": 1} for _ in range(repetitions))
+    return tasks
+
+
+def multi_criteria_workload(repetitions: int, scale: int) -> list:
+    tasks = []
+    for _ in range(scale):
+        for items, rubric in ((SHORT_ARGUMENTS_FOR_SCORING, ARGUMENT_EVALUATION_RUBRIC), (STORY_OPENINGS_FOR_SCORING, STORY_OPENING_EVALUATION_RUBRIC)):
+            rubric_name = rubric["rubric_name"]
+            criterion_chars = {name: len(json.dumps(definition)) for name, definition in rubric["criteria"].items()}
+            holistic_group = task_group("adv_multi_criteria_permuted", f"{rubric_name}/holistic")
+            LATENCY_PROFILES[holistic_group] = HOLISTIC_OUTPUT_SECONDS
+            for item in items:
+                tasks.append({"group": holistic_group, "prompt_chars": MULTI_CRITERIA_TEMPLATE_CHARS + sum(criterion_chars.values()) + len(item["text"]), "calls": repetitions})
+            for criterion_name, rubric_chars in criterion_chars.items():
+                isolated_group = task_group("adv_multi_criteria_isolated", f"{rubric_name}/{criterion_name}")
+                LATENCY_PROFILES[isolated_group] = ISOLATED_OUTPUT_SECONDS
+                for item in items:
+                    tasks.append({"group": isolated_group, "prompt_chars": MULTI_CRITERIA_TEMPLATE_CHARS + rubric_chars + len(item["text"]), "calls": repetitions})
+    return tasks
+
+
+WORKLOADS = {"elo": elo_workload, "multi_criteria": multi_criteria_workload}
+
+
+def draw_call_seconds(rng: random.Random, task: dict) -> list:
+    mean_seconds = LATENCY_PROFILES[task["group"]] + SECONDS_PER_PROMPT_CHAR * task["prompt_chars"]
+    return [mean_seconds * rng.lognormvariate(0, LATENCY_NOISE_SIGMA) for _ in range(task["calls"])]
+
+
+def simulate_makespan(task_seconds_in_dispatch_order: list, workers: int) -> float:
+    """Makespan of a pool of `workers` taking tasks in dispatch order as workers free up."""
+    worker_free_at = [0.0] * workers
+    for seconds in task_seconds_in_dispatch_order:
+        heapq.heappush(worker_free_at, heapq.heappop(worker_free_at) + seconds)
+    return max(worker_free_at)
+
+
+def train_latency_model(tasks: list, rng: random.Random) -> LatencyModel:
+    """A latency model as a previous run of the same workload would have left it."""
+    latency_model = LatencyModel()
+    for task in tasks:
+        for seconds in draw_call_seconds(rng, task):
+            latency_model.observe(BENCHMARK_MODEL, task["group"], task["prompt_chars"], seconds)
+    return latency_model
+
+
+def benchmark_workload(workload: str, worker_counts: list, repetitions: int, scale: int, seed: int) -> list:
+    tasks = WORKLOADS[workload](repetitions, scale)
+    rng = random.Random(seed)
+    warm_model = train_latency_model(tasks, rng)
+    cold_model = LatencyModel()
+    for index, task in enumerate(tasks):
+        task["index"] = index
+        task["seconds"] = sum(draw_call_seconds(rng, task))
+    orders = {
+        "submission": tasks,
+        "lf cold": longest_first(tasks, lambda task: task["calls"] * cold_model.estimate_call_seconds(BENCHMARK_MODEL, task["group"], task["prompt_chars"])),
+        "lf warm": longest_first(tasks, lambda task: task["calls"] * warm_model.estimate_call_seconds(BENCHMARK_MODEL, task["group"], task["prompt_chars"])),
+        "lpt oracle": longest_first(tasks, lambda task: task["seconds"]),
+    }
+    total_seconds = sum(task["seconds"] for task in tasks)
+    longest_task_seconds = max(task["seconds"] for task in tasks)
+
+    print(f"\n{workload}: {len(tasks)} tasks, {total_seconds:.0f}s of work (repetitions {repetitions}, scale {scale})")
+    print(f"  {'workers':>7} " + " ".join(f"{order_name:>11}" for order_name in orders) + f" {'lower bound':>11} {'warm vs submission':>19}")
+    records = []
+    for workers in worker_counts:
+        makespans = {order_name: simulate_makespan([task["seconds"] for task in ordered_tasks], workers) for order_name, ordered_tasks in orders.items()}
+        lower_bound = max(total_seconds / workers, longest_task_seconds)
+        reduction = 1 - makespans["lf warm"] / makespans["submission"]
+        print(f"  {workers:>7} " + " ".join(f"{makespans[order_name]:>10.1f}s" for order_name in orders) + f" {lower_bound:>10.1f}s {reduction:>18.1%}")
+        records.append({"workload": workload, "tasks": len(tasks), "workers": workers, "repetitions": repetitions, "scale": scale, "seed": seed,
+                        "makespan_seconds": {order_name: round(makespan, 2) for order_name, makespan in makespans.items()},
+                        "lower_bound_seconds": round(lower_bound, 2), "warm_reduction_vs_submission": round(reduction, 4)})
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the makespan of longest-first vs submission task order (no API calls).")
+    parser.add_argument("--workload", type=str, default="all", choices=[*WORKLOADS, "all"], help="Task matrix to simulate.")
+    parser.add_argument("--workers", type=str, default="8,16,32", help="Comma-separated pool sizes.")
+    parser.add_argument("--repetitions", type=int, default=1, help="Repetitions per task, as in bias_analyzer.py.")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the bundled datasets this many times.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the simulated latencies.")
+    parser.add_argument("--output", type=str, default=None, help="Append the results to this JSONL file.")
+    args = parser.parse_args()
+
+    worker_counts = [int(workers) for workers in args.workers.split(",") if workers.strip()]
+    run_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+    records = []
+    for workload in (WORKLOADS if args.workload == "all" else [args.workload]):
+        records.extend(benchmark_workload(workload, worker_counts, args.repetitions, args.scale, args.seed))
+
+    if args.output:
+        with open(args.output, 'a') as output_file:
+            for record in records:
+                output_file.write(json.dumps({"timestamp": run_timestamp, **record}) + "\n")
+        print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Debiased pairwise judgments for production use.
+
+The picking experiment's methodology as a library: every (question, text_A, text_B) pair is judged in both
+presentation orders (same labels, texts swapped), each order is majority-voted over its repetitions, and the two
+orders are combined so that a preference for a position or label cancels out. `PairwiseJudge.judge_many` runs the
+order runs of many pairs concurrently through the shared API client (bounded by `set_max_concurrent_api_calls`
+and the per-backend caps), in chunks of `batch_size` pairs.
+
+Per pair, the verdict comes from `p_text_A`, the share of text_A picks averaged over the two orders (with logprob
+judging, the averaged pick probability). It is "text_A" above 0.5, "text_B" below and "tie" at exactly 0.5;
+`consistency` is the share of judgments across both orders that agree with it (1.0 when both orders are unanimous,
+0.5 when the orders cancel out), and `orders_agree` says whether the two orders' majority picks name the same text.
+`first_position_share` is the share of picks for whichever text was shown first, the position bias in this pair.
+
+Verdicts are cached by model, temperature, prompt variant, labeling scheme, repetitions, logprob setting and the
+pair's content, in memory and optionally in a JSONL file (`cache_path`), so a repeated pair costs no calls. The
+cache key does not depend on which text is A: a pair seen before with its texts swapped is served from the cache
+with the verdict mirrored. Only verdicts without errors are cached. Because the prompts are deterministic (except
+for the RandomAlphanumericIDs scheme), `judge_many` can also be wrapped in `batch_runner.run_in_batch_mode`.
+
+With a positional prior (fitted by positional_calibration.py), each pair is first judged in one order only; the
+prior is removed from that order's first-slot share, and the swapped order is judged only when the corrected
+confidence is below `confidence_threshold`. Such single-order verdicts have "orders_judged": 1, `p_text_A` is the
+corrected probability and `consistency` the corrected confidence.
+
+Usage: python pairwise_judge.py pairs.jsonl [--output verdicts.jsonl] [--model MODEL] [--logprobs 5] [--cache verdict_cache.jsonl]
+                                        [--positional_priors positional_priors.jsonl --confidence_threshold 0.8]
+       (each input line: {"question": ..., "text_A": ..., "text_B": ..., optional "pair_id"})
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+import concurrent.futures
+
+import config_utils
+from config_utils import ContextThreadPoolExecutor
+from positional_calibration import DEFAULT_CONFIDENCE_THRESHOLD, calibrated_decision, first_slot_share, prior_key, read_priors
+from experiment_runners.picking_experiments import (
+    PROMPT_VARIANTS, LABELING_SCHEMES, build_order_run_tasks, _execute_pick_task, _get_majority_pick_and_consistency
+)
+
+DEFAULT_PROMPT_VARIANT = "Baseline (Impartial Judge)"
+DEFAULT_LABELING_SCHEME = "Response12"
+CONCURRENT_JUDGE_CALLS = 32
+DEFAULT_BATCH_SIZE = 500
+INVALID_PICKS = (None, "API Error", "Ambiguous", "Unclear", "Exception")
+
+
+def _order_pick_share(order_result: dict) -> float | None:
+    """Share of text_A picks in one order run (its logprob probability when available), or None without a valid pick."""
+    distribution = order_result.get("logprob_pick_distribution")
+    if distribution:
+        return distribution["probabilities"].get("text_A", 0.0)
+    valid_picks = [pick for pick in order_result["picked_original_ids"] if pick not in INVALID_PICKS]
+    if not valid_picks:
+        return None
+    return valid_picks.count("text_A") / len(valid_picks)
+
+
+def debias_order_runs(run1_result: dict, run2_result: dict) -> dict:
+    """Combines the two order runs of a pair (results of _execute_pick_task) into a debiased verdict."""
+    run1_share, run2_share = _order_pick_share(run1_result), _order_pick_share(run2_result)
+    run1_majority, _, _ = _get_majority_pick_and_consistency(run1_result["picked_original_ids"], run1_result["total_repetitions"])
+    run2_majority, _, _ = _get_majority_pick_and_consistency(run2_result["picked_original_ids"], run2_result["total_repetitions"])
+    errors = run1_result["errors_in_repetitions"] + run2_result["errors_in_repetitions"]
+    verdict = {
+        "verdict": None, "p_text_A": None, "consistency": None, "orders_agree": None, "first_position_share": None,
+        "run1_pick_share_text_A": run1_share, "run2_pick_share_text_A": run2_share,
+        "errors": f"{errors}/{run1_result['total_repetitions'] + run2_result['total_repetitions']}",
+        "status": "error", "orders_judged": 2,
+        "llm_raw_responses": {"run1": run1_result["llm_raw_responses"], "run2": run2_result["llm_raw_responses"]},
+    }
+    if run1_share is None or run2_share is None:
+        return verdict # An order without a valid pick cannot be debiased
+    p_text_a = (run1_share + run2_share) / 2
+    verdict.update({
+        "verdict": "text_A" if p_text_a > 0.5 else "text_B" if p_text_a < 0.5 else "tie",
+        "p_text_A": p_text_a,
+        "consistency": max(p_text_a, 1 - p_text_a),
+        "orders_agree": run1_majority == run2_majority and run1_majority not in ("Tie/No Clear Majority", "No Valid Picks"),
+        # Run 1 shows text_A first, run 2 shows text_B first.
+        "first_position_share": (run1_share + (1 - run2_share)) / 2,
+        "status": "ok" if errors == 0 else "partial",
+    })
+    return verdict
+
+
+def calibrated_order_run(run1_result: dict, position_log_odds: float, confidence_threshold: float) -> tuple:
+    """
+    (verdict, needs_swapped_order) for a pair judged in its first order only (text_A shown first), with the
+    positional prior removed. The verdict is None when the swapped order is needed.
+    """
+    pick_counts = {original_id: run1_result["picked_original_ids"].count(original_id) for original_id in ("text_A", "text_B")}
+    share = first_slot_share(pick_counts, "text_A", run1_result.get("logprob_pick_distribution"))
+    if share is None:
+        return None, True
+    decision = calibrated_decision(share, position_log_odds, confidence_threshold)
+    if decision["needs_swapped_order"]:
+        return None, True
+    errors = run1_result["errors_in_repetitions"]
+    verdict = {
+        "verdict": "text_A" if decision["p_first_slot"] > 0.5 else "text_B",
+        "p_text_A": decision["p_first_slot"], "consistency": decision["confidence"], "orders_agree": None, "first_position_share": None,
+        "run1_pick_share_text_A": _order_pick_share(run1_result), "run2_pick_share_text_A": None,
+        "errors": f"{errors}/{run1_result['total_repetitions']}",
+        "status": "ok" if errors == 0 else "partial", "orders_judged": 1,
+        "llm_raw_responses": {"run1": run1_result["llm_raw_responses"], "run2": []},
+    }
+    return verdict, False
+
+
+def _mirror_verdict(verdict: dict) -> dict:
+    """The verdict for the same pair with text_A and text_B swapped (run 1 and run 2 swap as well)."""
+    flip = lambda share: None if share is None else 1 - share
+    return {
+        **verdict,
+        "verdict": {"text_A": "text_B", "text_B": "text_A"}.get(verdict["verdict"], verdict["verdict"]),
+        "p_text_A": flip(verdict["p_text_A"]),
+        "run1_pick_share_text_A": flip(verdict["run2_pick_share_text_A"]),
+        "run2_pick_share_text_A": flip(verdict["run1_pick_share_text_A"]),
+        "llm_raw_responses": {"run1": verdict["llm_raw_responses"]["run2"], "run2": verdict["llm_raw_responses"]["run1"]},
+    }
+
+
+class PairwiseJudge:
+    """
+    Judges (question, text_A, text_B) pairs in both orders and returns debiased verdicts (see module docstring).
+    `prompt_variant` and `labeling_scheme` name entries of the picking experiment's PROMPT_VARIANTS and LABELING_SCHEMES.
+    `positional_prior` (a prior from positional_calibration.fit_positional_priors) enables calibrated single-order judging.
+    """
+
+    def __init__(self, model_name: str | None = None, prompt_variant: str = DEFAULT_PROMPT_VARIANT, labeling_scheme: str = DEFAULT_LABELING_SCHEME,
+                 repetitions: int = 1, temperature: float = 0.1, top_logprobs: int | None = None, cache_path: str | None = None,
+                 max_workers: int = CONCURRENT_JUDGE_CALLS, positional_prior: dict | None = None,
+                 confidence_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        variants = {variant["name"]: variant for variant in PROMPT_VARIANTS}
+        schemes = {scheme["name"]: scheme for scheme in LABELING_SCHEMES}
+        if prompt_variant not in variants:
+            raise ValueError(f"Unknown prompt variant '{prompt_variant}'. Choose from {list(variants)}.")
+        if labeling_scheme not in schemes:
+            raise ValueError(f"Unknown labeling scheme '{labeling_scheme}'. Choose from {list(schemes)}.")
+        self.model_name = model_name
+        self.variant = variants[prompt_variant]
+        self.scheme = schemes[labeling_scheme]
+        self.repetitions = repetitions
+        self.temperature = temperature
+        self.top_logprobs = top_logprobs
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.positional_prior = positional_prior
+        self.confidence_threshold = confidence_threshold
+        self._cache = {}  # key -> verdict for the pair in canonical order
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.pairs_judged = 0
+        self.swapped_orders_skipped = 0
+        if cache_path and os.path.exists(cache_path):
+            self._load_cache(cache_path)
+
+    def _load_cache(self, path: str):
+        with open(path, 'r') as cache_file:
+            for line_number, line in enumerate(cache_file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping malformed line {line_number} in verdict cache {path}.")
+                    continue
+                self._cache[entry["key"]] = entry["verdict"]
+
+    def _cache_key(self, question: str, first_text: str, second_text: str) -> str:
+        key_fields = [
+            self.model_name or config_utils.BIAS_SUITE_LLM_MODEL, self.temperature, self.variant["name"], self.scheme["name"],
+            self.repetitions, self.top_logprobs, question, first_text, second_text
+        ]
+        if self.positional_prior is not None:
+            # Calibrated verdicts depend on the prior and threshold; counterbalanced ones keep their keys.
+            key_fields.append({"position_log_odds": self.positional_prior["position_log_odds"], "confidence_threshold": self.confidence_threshold})
+        return hashlib.sha256(json.dumps(key_fields, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+    def _canonical(self, pair: dict):
+        """(cache key, swapped): the key is computed with the two texts in sorted order, so A/B and B/A share it."""
+        swapped = pair["text_B"] < pair["text_A"]
+        first_text, second_text = (pair["text_B"], pair["text_A"]) if swapped else (pair["text_A"], pair["text_B"])
+        return self._cache_key(pair["question"], first_text, second_text), swapped
+
+    def _store(self, key: str, canonical_verdict: dict):
+        with self._lock:
+            self._cache[key] = canonical_verdict
+            if self.cache_path:
+                parent_dir = os.path.dirname(self.cache_path)
+                if parent_dir:
+                    os.makedirs(parent_dir, exist_ok=True)
+                with open(self.cache_path, 'a') as cache_file:
+                    cache_file.write(json.dumps({"key": key, "verdict": canonical_verdict}) + "\n")
+
+    def judge(self, question: str, text_a: str, text_b: str) -> dict:
+        """The debiased verdict for a single pair."""
+        return self.judge_many([{"question": question, "text_A": text_a, "text_B": text_b}])[0]
+
+    def judge_many(self, pairs, batch_size: int = DEFAULT_BATCH_SIZE, quiet: bool = True) -> list:
+        """
+        Debiased verdicts for `pairs` (dicts with "question", "text_A", "text_B" and optionally "pair_id", or
+        (question, text_A, text_B) tuples), in input order. Cached pairs and duplicates are not sent again.
+        """
+        pairs = [
+            dict(zip(("question", "text_A", "text_B"), pair)) if isinstance(pair, (tuple, list)) else pair
+            for pair in pairs
+        ]
+        verdicts = [None] * len(pairs)
+        for batch_start in range(0, len(pairs), batch_size):
+            self._judge_batch(pairs, range(batch_start, min(batch_start + batch_size, len(pairs))), verdicts, quiet)
+        return verdicts
+
+    def _judge_batch(self, pairs: list, positions, verdicts: list, quiet: bool):
+        to_judge = {}  # cache key -> (canonical pair, positions waiting for it)
+        for position in positions:
+            key, swapped = self._canonical(pairs[position])
+            with self._lock:
+                cached_verdict = self._cache.get(key)
+            if cached_verdict is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                verdicts[position] = self._finish(pairs[position], cached_verdict, swapped, cached=True)
+                continue
+            if key not in to_judge:
+                pair = pairs[position]
+                canonical_pair = {"pair_id": key[:12], "question": pair["question"],
+                                  "text_A": pair["text_B"] if swapped else pair["text_A"], "text_B": pair["text_A"] if swapped else pair["text_B"]}
+                to_judge[key] = (canonical_pair, [])
+            to_judge[key][1].append((position, swapped))
+
+        if not to_judge:
+            return
+        label_pairs = {key: self.scheme["get_labels_for_pair"]() for key in to_judge}
+        tasks_by_run = {}  # (cache key, order run) -> task
+        for key, (canonical_pair, _) in to_judge.items():
+            label1, label2 = label_pairs[key]
+            for task in build_order_run_tasks(canonical_pair, self.variant["prompt_template"], self.variant.get("system_prompt"),
+                                              label1, label2, self.model_name, self.variant["name"], self.scheme["name"]):
+                tasks_by_run[(key, task["order_run"])] = task
+
+        calibrated_verdicts = {}
+        if self.positional_prior is None:
+            run_results = self._run_order_tasks(tasks_by_run, quiet)
+        else:
+            # Phase 1: the first order of every pair; phase 2: the swapped order where the corrected confidence is too low.
+            run_results = self._run_order_tasks({run_key: task for run_key, task in tasks_by_run.items() if run_key[1] == 1}, quiet)
+            swapped_runs = {}
+            for key in to_judge:
+                verdict, needs_swapped_order = calibrated_order_run(run_results[(key, 1)], self.positional_prior["position_log_odds"], self.confidence_threshold)
+                if needs_swapped_order:
+                    swapped_runs[(key, 2)] = tasks_by_run[(key, 2)]
+                else:
+                    calibrated_verdicts[key] = verdict
+            run_results.update(self._run_order_tasks(swapped_runs, quiet))
+            with self._lock:
+                self.swapped_orders_skipped += len(calibrated_verdicts)
+
+        for key, (_, waiting_positions) in to_judge.items():
+            canonical_verdict = calibrated_verdicts.get(key) or debias_order_runs(run_results[(key, 1)], run_results[(key, 2)])
+            with self._lock:
+                self.pairs_judged += 1
+            if canonical_verdict["status"] == "ok":
+                self._store(key, canonical_verdict)
+            for position, swapped in waiting_positions:
+                verdicts[position] = self._finish(pairs[position], canonical_verdict, swapped, cached=False)
+
+    def _run_order_tasks(self, tasks_by_run: dict, quiet: bool) -> dict:
+        """Runs order-run tasks concurrently; returns {(cache key, order run): result}."""
+        run_results = {}
+        if not tasks_by_run:
+            return run_results
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_run = {
+                executor.submit(_execute_pick_task, task, quiet, self.repetitions, self.temperature, self.top_logprobs): run_key
+                for run_key, task in tasks_by_run.items()
+            }
+            for future in concurrent.futures.as_completed(future_to_run):
+                run_key = future_to_run[future]
+                try:
+                    run_results[run_key] = future.result()
+                except Exception as exc:
+                    if not quiet: print(f"Warning: Pairwise judgment order run failed: {exc}")
+                    run_results[run_key] = {
+                        "picked_original_ids": ["Exception"], "llm_raw_responses": [f"Exception: {exc}"],
+                        "errors_in_repetitions": self.repetitions, "total_repetitions": self.repetitions
+                    }
+        return run_results
+
+    @staticmethod
+    def _finish(pair: dict, canonical_verdict: dict, swapped: bool, cached: bool) -> dict:
+        verdict = _mirror_verdict(canonical_verdict) if swapped else dict(canonical_verdict)
+        return {"pair_id": pair.get("pair_id"), **verdict, "cached": cached}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Judge (question, text_A, text_B) pairs in both orders and write debiased verdicts.")
+    parser.add_argument("pairs", type=str, help="JSONL file with one pair per line: {\"question\", \"text_A\", \"text_B\", optional \"pair_id\"}.")
+    parser.add_argument("--output", type=str, default=None, help="Write the verdicts (one JSON line per pair, in input order) here instead of stdout.")
+    parser.add_argument("--model", type=str, default=None, help="Judge model (default: BIAS_SUITE_LLM_MODEL from .env).")
+    parser.add_argument("--prompt_variant", type=str, default=DEFAULT_PROMPT_VARIANT, help="Name of a picking prompt variant.")
+    parser.add_argument("--labeling_scheme", type=str, default=DEFAULT_LABELING_SCHEME, help="Name of a picking labeling scheme.")
+    parser.add_argument("--repetitions", type=int, default=1, help="Calls per order run (majority-voted).")
+    parser.add_argument("--temp", type=float, default=0.1, help="Temperature for API calls.")
+    parser.add_argument("--logprobs", type=int, default=None, metavar="K", help="Judge each order with one top-K logprob call (see logprob_judging.py).")
+    parser.add_argument("--cache", type=str, default=None, help="JSONL verdict cache, reused across runs.")
+    parser.add_argument("--positional_priors", type=str, default=None, help="Priors file from positional_calibration.py fit; enables calibrated single-order judging.")
+    parser.add_argument("--confidence_threshold", type=float, default=DEFAULT_CONFIDENCE_THRESHOLD, help="Corrected confidence below which the swapped order is judged too.")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Pairs judged per chunk.")
+    parser.add_argument("--max_concurrent_api_calls", type=int, default=config_utils.MAX_CONCURRENT_API_CALLS, help="Global cap on in-flight API calls.")
+    parser.add_argument("--backends_config", type=str, default=None, help="JSON file registering OpenAI-compatible backends and the model-name patterns they serve (as in bias_analyzer.py).")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    config_utils.set_api_key(os.getenv('OPENROUTER_API_KEY'))
+    config_utils.set_llm_model(args.model or os.getenv('BIAS_SUITE_LLM_MODEL'))
+    config_utils.set_max_concurrent_api_calls(args.max_concurrent_api_calls)
+    if args.backends_config:
+        config_utils.load_backends_config(args.backends_config)
+
+    positional_prior = None
+    if args.positional_priors:
+        positional_prior = read_priors(args.positional_priors).get(prior_key(config_utils.BIAS_SUITE_LLM_MODEL, args.prompt_variant, args.labeling_scheme))
+        if positional_prior is None:
+            print(f"Warning: No positional prior for {config_utils.BIAS_SUITE_LLM_MODEL} | {args.prompt_variant} | {args.labeling_scheme} "
+                  f"in {args.positional_priors}; judging every pair in both orders.", file=sys.stderr)
+
+    with open(args.pairs, 'r') as pairs_file:
+        pairs = [json.loads(line) for line in pairs_file if line.strip()]
+    judge = PairwiseJudge(
+        model_name=config_utils.BIAS_SUITE_LLM_MODEL, prompt_variant=args.prompt_variant, labeling_scheme=args.labeling_scheme,
+        repetitions=args.repetitions, temperature=args.temp, top_logprobs=args.logprobs, cache_path=args.cache,
+        max_workers=max(args.max_concurrent_api_calls, 1), positional_prior=positional_prior, confidence_threshold=args.confidence_threshold
+    )
+    verdicts = judge.judge_many(pairs, batch_size=args.batch_size)
+
+    lines = [json.dumps(verdict) for verdict in verdicts]
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write("\n".join(lines) + ("\n" if lines else ""))
+    else:
+        print("\n".join(lines))
+    errors = sum(verdict["status"] == "error" for verdict in verdicts)
+    print(f"Judged {len(verdicts)} pair(s): {judge.pairs_judged} sent, {judge.cache_hits} from the cache, {errors} without a verdict"
+          + (f", {judge.swapped_orders_skipped} judged in one order only." if positional_prior else "."),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Learned positional-bias correction for pairwise judgments.
+
+Counterbalancing (judging every pair in both orders) doubles the judge cost. This module fits a positional prior per
+(model, prompt variant, labeling scheme) from picking results, where every pair was judged in both orders, and uses
+it to correct single-order judgments; only judgments whose corrected confidence is below a threshold are sent in the
+swapped order as well (see `PairwiseJudge(positional_prior=..., confidence_threshold=...)` in pairwise_judge.py).
+
+The model is multiplicative: the odds of picking the text in the first slot are the position odds times the content
+odds. Judging a pair in both orders shows each text first once, so the content odds cancel in the product of the two
+first-slot odds, and the pair's position log-odds are the mean of the two first-slot logits. The prior is the average
+over pairs (first-slot shares are smoothed with half a pick either way, so unanimous orders stay finite). A single
+order's corrected content log-odds are its first-slot logit minus the prior, and its corrected confidence is the
+probability of the text it favours.
+
+`report` replays full-counterbalancing results as if only one order had been judged first (each order in turn,
+with the prior fitted leave-one-pair-out), and shows per threshold the calls saved and how often the calibrated
+verdict agrees with the full counterbalanced one.
+
+Usage: python positional_calibration.py fit experiment_output/picking_*.json [--output positional_priors.jsonl]
+       python positional_calibration.py report experiment_output/picking_*.json [--thresholds 0.6,0.7,0.8,0.9] [--output report.jsonl]
+"""
+
+import json
+import math
+import argparse
+import datetime
+from collections import defaultdict
+
+# Smoothing for first-slot shares estimated from picks: (picks + 0.5) / (valid picks + 1).
+PICK_SMOOTHING = 0.5
+# Logprob probabilities are clipped to [PROBABILITY_FLOOR, 1 - PROBABILITY_FLOOR] before taking logits.
+PROBABILITY_FLOOR = 1e-4
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+DEFAULT_THRESHOLDS = [0.6, 0.7, 0.8, 0.9, 0.95]
+
+
+def _logit(probability: float) -> float:
+    probability = min(max(probability, PROBABILITY_FLOOR), 1 - PROBABILITY_FLOOR)
+    return math.log(probability / (1 - probability))
+
+
+def _sigmoid(log_odds: float) -> float:
+    return 1 / (1 + math.exp(-log_odds))
+
+
+def prior_key(model_name: str, variant_name: str, labeling_scheme_name: str) -> str:
+    return f"{model_name}|{variant_name}|{labeling_scheme_name}"
+
+
+def first_slot_share(pick_counts: dict, first_slot_id: str, logprob_distribution: dict | None = None) -> float | None:
+    """
+    The (smoothed) share of picks for the text in the first slot of one order run, from its pick distribution
+    ({original id: picks}) or, when present, its logprob pick distribution. None without a valid pick.
+    """
+    if logprob_distribution:
+        return min(max(logprob_distribution["probabilities"].get(first_slot_id, 0.0), PROBABILITY_FLOOR), 1 - PROBABILITY_FLOOR)
+    valid_picks = sum(pick_counts.values()) if pick_counts else 0
+    if not valid_picks:
+        return None
+    return (pick_counts.get(first_slot_id, 0) + PICK_SMOOTHING) / (valid_picks + 2 * PICK_SMOOTHING)
+
+
+def extract_counterbalanced_pairs(results: list) -> dict:
+    """
+    {prior key: [pair observations]} from picking results (run_positional_bias_picking_experiment output), keeping
+    pairs whose both order runs have a valid pick. Each observation holds the first-slot share of each order
+    (run 1 shows text_A first, run 2 text_B) and the counterbalanced share of text_A picks.
+    """
+    observations = defaultdict(list)
+    for scheme_result in results:
+        key = prior_key(scheme_result.get("model_name"), scheme_result.get("variant_name"), scheme_result.get("labeling_scheme_name"))
+        for pair_summary in scheme_result.get("pairs_summary_for_scheme", []):
+            run1_share = first_slot_share(pair_summary.get("run1_pick_distribution"), "text_A", pair_summary.get("run1_logprob_pick_distribution"))
+            run2_share = first_slot_share(pair_summary.get("run2_pick_distribution"), "text_B", pair_summary.get("run2_logprob_pick_distribution"))
+            if run1_share is None or run2_share is None:
+                continue
+            run1_counts = pair_summary.get("run1_pick_distribution") or {}
+            run2_counts = pair_summary.get("run2_pick_distribution") or {}
+            observations[key].append({
+                "pair_id": pair_summary.get("pair_id"),
+                "run1_first_slot_share": run1_share,
+                "run2_first_slot_share": run2_share,
+                "run1_calls": sum(run1_counts.values()) if not pair_summary.get("run1_logprob_pick_distribution") else 1,
+                "run2_calls": sum(run2_counts.values()) if not pair_summary.get("run2_logprob_pick_distribution") else 1,
+                # Unsmoothed, as the counterbalanced verdict sees it (see pairwise_judge.debias_order_runs).
+                "p_text_A": (_raw_share(pair_summary, 1, "text_A") + _raw_share(pair_summary, 2, "text_A")) / 2,
+            })
+    return dict(observations)
+
+
+def _raw_share(pair_summary: dict, order_run: int, original_id: str) -> float:
+    distribution = pair_summary.get(f"run{order_run}_logprob_pick_distribution")
+    if distribution:
+        return distribution["probabilities"].get(original_id, 0.0)
+    pick_counts = pair_summary[f"run{order_run}_pick_distribution"]
+    return pick_counts.get(original_id, 0) / sum(pick_counts.values())
+
+
+def pair_position_log_odds(observation: dict) -> float:
+    """The position log-odds one counterbalanced pair implies (the content odds cancel between its two orders)."""
+    return (_logit(observation["run1_first_slot_share"]) + _logit(observation["run2_first_slot_share"])) / 2
+
+
+def fit_positional_priors(results: list) -> dict:
+    """{prior key: prior} fitted from picking results; a prior has the position log-odds and the pairs behind it."""
+    priors = {}
+    for key, observations in extract_counterbalanced_pairs(results).items():
+        if not observations:
+            continue
+        model_name, variant_name, labeling_scheme_name = key.split("|", 2)
+        position_log_odds = sum(pair_position_log_odds(observation) for observation in observations) / len(observations)
+        priors[key] = {
+            "model_name": model_name, "variant_name": variant_name, "labeling_scheme_name": labeling_scheme_name,
+            "position_log_odds": position_log_odds,
+            "first_position_share": _sigmoid(position_log_odds), # Share of first-slot picks between equally good texts
+            "pairs": len(observations),
+        }
+    return priors
+
+
+def corrected_first_slot_probability(first_slot_share_observed: float, position_log_odds: float) -> float:
+    """The probability that the first-slot text is better, with the positional prior removed."""
+    return _sigmoid(_logit(first_slot_share_observed) - position_log_odds)
+
+
+def calibrated_decision(first_slot_share_observed: float, position_log_odds: float, confidence_threshold: float) -> dict:
+    """
+    Whether a single-order judgment can stand: {"p_first_slot" (corrected), "confidence", "needs_swapped_order"}.
+    The swapped order is needed when the corrected confidence is below `confidence_threshold`.
+    """
+    p_first_slot = corrected_first_slot_probability(first_slot_share_observed, position_log_odds)
+    confidence = max(p_first_slot, 1 - p_first_slot)
+    return {"p_first_slot": p_first_slot, "confidence": confidence, "needs_swapped_order": confidence < confidence_threshold}
+
+
+def read_results_files(paths: list) -> list:
+    """The variant/scheme results of one or more picking results files."""
+    results = []
+    for path in paths:
+        with open(path, 'r') as results_file:
+            file_results = json.load(results_file)
+        results.extend(result for result in file_results if isinstance(result, dict) and "pairs_summary_for_scheme" in result)
+    return results
+
+
+def write_priors(priors: dict, path: str):
+    with open(path, 'w') as priors_file:
+        for key, prior in priors.items():
+            priors_file.write(json.dumps({"key": key, **prior}) + "\n")
+
+
+def read_priors(path: str) -> dict:
+    """{prior key: prior} from a file written by write_priors."""
+    priors = {}
+    with open(path, 'r') as priors_file:
+        for line in priors_file:
+            if line.strip():
+                record = json.loads(line)
+                priors[record.pop("key")] = record
+    return priors
+
+
+def _verdict(p_text_a: float) -> str:
+    return "text_A" if p_text_a > 0.5 else "text_B" if p_text_a < 0.5 else "tie"
+
+
+def evaluate_calibration(results: list, thresholds=DEFAULT_THRESHOLDS) -> list:
+    """
+    Replays counterbalanced picking results as calibrated single-order judging (see module docstring).
+    Returns one record per prior key and threshold with calls, calls saved and agreement with full counterbalancing.
+    """
+    report = []
+    for key, observations in extract_counterbalanced_pairs(results).items():
+        if len(observations) < 2:
+            continue # Leave-one-pair-out needs another pair to fit the prior on
+        pair_log_odds = [pair_position_log_odds(observation) for observation in observations]
+        total_log_odds = sum(pair_log_odds)
+        for threshold in thresholds:
+            counts = {"judgments": 0, "full_calls": 0, "calibrated_calls": 0, "escalated": 0, "agree": 0, "decisive": 0,
+                      "agree_single_order": 0, "single_order_decisive": 0}
+            for observation, own_log_odds in zip(observations, pair_log_odds):
+                prior_log_odds = (total_log_odds - own_log_odds) / (len(observations) - 1)
+                full_verdict = _verdict(observation["p_text_A"])
+                # Either order can be the one judged first.
+                for first_run, second_run, first_slot_id in ((1, 2, "text_A"), (2, 1, "text_B")):
+                    decision = calibrated_decision(observation[f"run{first_run}_first_slot_share"], prior_log_odds, threshold)
+                    counts["judgments"] += 1
+                    counts["full_calls"] += observation["run1_calls"] + observation["run2_calls"]
+                    counts["calibrated_calls"] += observation[f"run{first_run}_calls"]
+                    if decision["needs_swapped_order"]:
+                        counts["escalated"] += 1
+                        counts["calibrated_calls"] += observation[f"run{second_run}_calls"]
+                        calibrated_verdict = full_verdict
+                    else:
+                        other_slot_id = "text_B" if first_slot_id == "text_A" else "text_A"
+                        calibrated_verdict = first_slot_id if decision["p_first_slot"] > 0.5 else other_slot_id
+                    if full_verdict != "tie":
+                        counts["decisive"] += 1
+                        counts["agree"] += calibrated_verdict == full_verdict
+                        if not decision["needs_swapped_order"]:
+                            counts["single_order_decisive"] += 1
+                            counts["agree_single_order"] += calibrated_verdict == full_verdict
+            model_name, variant_name, labeling_scheme_name = key.split("|", 2)
+            report.append({
+                "model_name": model_name, "variant_name": variant_name, "labeling_scheme_name": labeling_scheme_name,
+                "threshold": threshold, "pairs": len(observations), **counts,
+                "calls_saved_percentage": 100 * (1 - counts["calibrated_calls"] / counts["full_calls"]) if counts["full_calls"] else 0.0,
+                "agreement_percentage": 100 * counts["agree"] / counts["decisive"] if counts["decisive"] else None,
+                "single_order_agreement_percentage": 100 * counts["agree_single_order"] / counts["single_order_decisive"] if counts["single_order_decisive"] else None,
+            })
+    return report
+
+
+def _format_percentage(value) -> str:
+    return f"{value:.1f}" if value is not None else "N/A"
+
+
+def print_report(report: list):
+    header = f"{'Model':<28} | {'Variant':<40} | {'Scheme':<22} | {'Thresh':>6} | {'Pairs':>5} | {'Escalated':>9} | {'Saved %':>7} | {'Agree %':>7} | {'1-order Agree %':>15}"
+    print(header)
+    print("-" * len(header))
+    for record in report:
+        print(f"{record['model_name'][:28]:<28} | {record['variant_name'][:40]:<40} | {record['labeling_scheme_name'][:22]:<22} | "
+              f"{record['threshold']:>6.2f} | {record['pairs']:>5} | {record['escalated']:>4}/{record['judgments']:<4} | "
+              f"{record['calls_saved_percentage']:>7.1f} | {_format_percentage(record['agreement_percentage']):>7} | "
+              f"{_format_percentage(record['single_order_agreement_percentage']):>15}")
+
+    by_threshold = defaultdict(lambda: {"full_calls": 0, "calibrated_calls": 0, "agree": 0, "decisive": 0})
+    for record in report:
+        totals = by_threshold[record["threshold"]]
+        for field in totals:
+            totals[field] += record[field]
+    print("\nOverall:")
+    for threshold, totals in sorted(by_threshold.items()):
+        saved = 100 * (1 - totals["calibrated_calls"] / totals["full_calls"]) if totals["full_calls"] else 0.0
+        agreement = 100 * totals["agree"] / totals["decisive"] if totals["decisive"] else None
+        print(f"  threshold {threshold:.2f}: {totals['calibrated_calls']}/{totals['full_calls']} calls ({saved:.1f}% saved), "
+              f"agreement with full counterbalancing {_format_percentage(agreement)}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit positional priors from picking results and evaluate calibrated single-order judging.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit_parser = subparsers.add_parser("fit", help="Fit positional priors per model, variant and labeling scheme.")
+    fit_parser.add_argument("results", nargs="+", help="Picking results JSON files.")
+    fit_parser.add_argument("--output", type=str, default="positional_priors.jsonl", help="Where to write the priors (JSONL).")
+    report_parser = subparsers.add_parser("report", help="Calls saved and agreement with full counterbalancing, per threshold.")
+    report_parser.add_argument("results", nargs="+", help="Picking results JSON files.")
+    report_parser.add_argument("--thresholds", type=str, default=",".join(str(threshold) for threshold in DEFAULT_THRESHOLDS), help="Comma-separated confidence thresholds.")
+    report_parser.add_argument("--output", type=str, default=None, help="Also append the report records to this JSONL file.")
+    args = parser.parse_args()
+
+    results = read_results_files(args.results)
+    if args.command == "fit":
+        priors = fit_positional_priors(results)
+        write_priors(priors, args.output)
+        for prior in priors.values():
+            print(f"{prior['model_name']} | {prior['variant_name']} | {prior['labeling_scheme_name']}: "
+                  f"first-position share {prior['first_position_share']:.3f} (log-odds {prior['position_log_odds']:+.3f}, {prior['pairs']} pairs)")
+        print(f"{len(priors)} prior(s) written to {args.output}")
+    elif args.command == "report":
+        report = evaluate_calibration(results, [float(threshold) for threshold in args.thresholds.split(",") if threshold.strip()])
+        print_report(report)
+        if args.output:
+            report_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+            with open(args.output, 'a') as report_file:
+                for record in report:
+                    report_file.write(json.dumps({"timestamp": report_timestamp, **record}) + "\n")
+            print(f"Report appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compiled prompt templates.
+
+Experiment prompts are mostly static: the system text, rubric, category definitions and few-shot examples
+are the same for every item of a variant, and only the item text changes. `compile_prompt` formats a
+template once with its static fields, leaving the per-item fields ("slots") open, and caches the result.
+Rendering a prompt for an item is then a single concatenation of the precomputed static parts and the
+item's values, and produces exactly the same string as formatting the full template.
+
+`CompiledPrompt.static_prefix` is the text before the first slot (system prompt included) and
+`static_hash` identifies it, e.g. for provider-side prompt caching.
+
+With the opt-in cache-optimised layout (`set_cache_optimised_layout`, `--cache_optimised_prompts` in
+bias_analyzer.py), `CompiledPrompt.request` moves every slot out of the template: the whole static text
+(system prompt, instructions, rubric, few-shot examples, with each slot replaced by a short reference)
+is sent as a real system message marked cacheable, and only the slot values go in the user message.
+The default layout sends exactly the rendered prompt, as before.
+"""
+
+import re
+import hashlib
+import threading
+
+# Placeholder values substituted for slot fields while formatting; NUL bytes never occur in prompt text.
+_SLOT_SENTINEL = "\x00slot:{}\x00"
+_SLOT_SENTINEL_PATTERN = re.compile(r"\x00slot:(\w+)\x00")
+
+_compiled_prompt_cache = {}
+_compiled_prompt_cache_lock = threading.Lock()
+
+CACHE_OPTIMISED_LAYOUT = False
+
+def set_cache_optimised_layout(enabled: bool):
+    global CACHE_OPTIMISED_LAYOUT
+    CACHE_OPTIMISED_LAYOUT = bool(enabled)
+
+
+class CompiledPrompt:
+    """A template with its static fields already formatted in, split around its slot fields."""
+
+    __slots__ = ("static_parts", "slot_names", "static_prefix", "static_hash", "slot_labels", "cacheable_prefix")
+
+    def __init__(self, user_prompt_template: str, static_fields: dict, slot_fields=("text",), system_prompt: str | None = None, system_separator: str = "\n\n", slot_labels: dict | None = None):
+        sentinels = {name: _SLOT_SENTINEL.format(name) for name in slot_fields}
+        formatted = user_prompt_template.format(**static_fields, **sentinels)
+        if system_prompt:
+            formatted = system_prompt + system_separator + formatted
+        pieces = _SLOT_SENTINEL_PATTERN.split(formatted)
+        self.static_parts = pieces[0::2]  # Always one more static part than slots
+        self.slot_names = pieces[1::2]
+        self.static_prefix = self.static_parts[0]
+        self.static_hash = hashlib.sha256(self.static_prefix.encode("utf-8")).hexdigest()[:16]
+
+        # Cache-optimised layout: all static text in one prefix, slots referenced by label and appended at the end.
+        self.slot_labels = {name: (slot_labels or {}).get(name, name.replace("_", " ").upper()) for name in slot_fields}
+        references = [f"[see {self.slot_labels[name]} below]" for name in self.slot_names]
+        self.cacheable_prefix = self.static_parts[0] + "".join(ref + part for ref, part in zip(references, self.static_parts[1:]))
+
+    def render(self, **slot_values) -> str:
+        """Returns the full prompt with the given slot values filled in."""
+        if len(self.slot_names) == 1:
+            return self.static_parts[0] + slot_values[self.slot_names[0]] + self.static_parts[1]
+        rendered = [self.static_parts[0]]
+        for slot_name, static_part in zip(self.slot_names, self.static_parts[1:]):
+            rendered.append(slot_values[slot_name])
+            rendered.append(static_part)
+        return "".join(rendered)
+
+    def request(self, **slot_values) -> dict:
+        """Keyword arguments for call_openrouter_api (prompt_text, and in the cache-optimised layout system_prompt_text/cache_control)."""
+        if not CACHE_OPTIMISED_LAYOUT:
+            return {"prompt_text": self.render(**slot_values)}
+        ordered_slots = list(dict.fromkeys(self.slot_names))
+        dynamic_text = "\n\n".join(f"{self.slot_labels[name]}:\n{slot_values[name]}" for name in ordered_slots)
+        return {"system_prompt_text": self.cacheable_prefix, "prompt_text": dynamic_text, "cache_control": True}
+
+
+def request_as_text(request: dict) -> str:
+    """The full text of a `CompiledPrompt.request`, for recording as the prompt sent."""
+    if request.get("system_prompt_text"):
+        return request["system_prompt_text"] + "\n\n" + request["prompt_text"]
+    return request["prompt_text"]
+
+
+def compile_prompt(user_prompt_template: str, slot_fields=("text",), system_prompt: str | None = None, system_separator: str = "\n\n", slot_labels: dict | None = None, **static_fields) -> CompiledPrompt:
+    """
+    Returns the (cached) CompiledPrompt for this template, system prompt and set of static field values.
+    Static field values must be strings (or other hashable values); slot fields are filled by `render`/`request`.
+    `slot_labels` names the slots in the cache-optimised layout (default: the upper-cased field name, e.g. TEXT).
+    """
+    cache_key = (user_prompt_template, tuple(slot_fields), system_prompt, system_separator, tuple(sorted((slot_labels or {}).items())), tuple(sorted(static_fields.items())))
+    compiled = _compiled_prompt_cache.get(cache_key)
+    if compiled is None:
+        compiled = CompiledPrompt(user_prompt_template, static_fields, slot_fields, system_prompt, system_separator, slot_labels)
+        with _compiled_prompt_cache_lock:
+            compiled = _compiled_prompt_cache.setdefault(cache_key, compiled)
+    return compiled
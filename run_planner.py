@@ -0,0 +1,168 @@
+"""
+Dry-run planning (`--plan` in bias_analyzer.py).
+
+The run is executed once with every request collected instead of sent (config_utils.start_batch_collection, as in a
+batch mode collection round), so the planned calls are exactly the task matrix the unchanged experiment code builds -
+prompt variants, labeling schemes, orderings, repetitions - and no API is called. Requests that would be answered
+from a response log (e.g. --incremental) or the judgment store are not counted. Calls that depend on earlier answers
+are counted as a collection round sees them: a judge cascade's units stay pending on its cheap tier, so escalations
+to the expensive model (at most one expensive judgment per unit) are not counted, nor are retries after unparseable
+responses.
+
+Per usage scope ("<model>/<experiment>") and requested model, the plan reports:
+  - calls;
+  - prompt tokens (system prompt included), estimated locally with tiktoken's cl100k_base encoding when tiktoken is
+    installed, otherwise as CHARS_PER_TOKEN characters per token;
+  - completion tokens: the mean completion tokens per live call of the scope (else of the model) in earlier usage
+    reports (usage_report.jsonl), otherwise DEFAULT_COMPLETION_TOKENS per call;
+  - cost: from a price table ({model: {"prompt": USD per 1M tokens, "completion": USD per 1M tokens}}, --price_table)
+    when it lists the model, otherwise the model's historical cost per token, otherwise unknown;
+  - call seconds from the latency model (task_scheduler.py), and the projected wall time: the call seconds spread
+    over MAX_CONCURRENT_API_CALLS parallel calls, but at least the longest call. Scopes are assumed to run one after
+    another.
+"""
+
+import os
+import json
+
+import config_utils
+from task_scheduler import get_latency_model
+
+CHARS_PER_TOKEN = 4
+DEFAULT_COMPLETION_TOKENS = 150
+_tiktoken_encoding = None
+
+
+def estimate_tokens(text: str | None) -> int:
+    """Local token count approximation (see module docstring)."""
+    global _tiktoken_encoding
+    if not text:
+        return 0
+    if _tiktoken_encoding is None:
+        try:
+            import tiktoken # Optional; only used for a closer estimate
+            _tiktoken_encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _tiktoken_encoding = False
+    if _tiktoken_encoding:
+        return len(_tiktoken_encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def collect_planned_requests(run) -> list:
+    """Runs `run()` with every request collected instead of sent and returns the collected requests."""
+    config_utils.reset_replay_positions()
+    config_utils.start_batch_collection()
+    try:
+        run()
+    finally:
+        collected = config_utils.stop_batch_collection()
+    return collected
+
+
+def load_usage_history(path: str | None) -> dict:
+    """{scope: summed usage totals} over the records of a usage_report.jsonl file ({} without one)."""
+    history = {}
+    if not path or not os.path.exists(path):
+        return history
+    with open(path, 'r') as usage_file:
+        for line_number, line in enumerate(usage_file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                totals = history.setdefault(record["scope"], {"live_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+                for field in totals:
+                    totals[field] += record.get(field) or 0
+            except (json.JSONDecodeError, KeyError, TypeError):
+                print(f"Warning: Skipping malformed line {line_number} in usage report {path}.")
+    return history
+
+
+def load_price_table(path: str | None) -> dict:
+    if not path:
+        return {}
+    with open(path, 'r') as price_file:
+        return json.load(price_file)
+
+
+def _model_history(usage_history: dict, model: str) -> dict:
+    totals = {"live_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+    for scope, scope_totals in usage_history.items():
+        if scope.startswith(f"{model}/"):
+            for field in totals:
+                totals[field] += scope_totals[field]
+    return totals
+
+
+def _completion_tokens_per_call(usage_history: dict, scope: str, model: str) -> tuple:
+    """(completion tokens per call, source)."""
+    for source, totals in (("scope history", usage_history.get(scope)), ("model history", _model_history(usage_history, model))):
+        if totals and totals["live_calls"] and totals["completion_tokens"]:
+            return totals["completion_tokens"] / totals["live_calls"], source
+    return DEFAULT_COMPLETION_TOKENS, "default"
+
+
+def _estimate_cost(price_table: dict, usage_history: dict, model: str, prompt_tokens: float, completion_tokens: float) -> tuple:
+    """(estimated cost in USD or None, source)."""
+    prices = price_table.get(model)
+    if prices:
+        return (prompt_tokens * prices.get("prompt", 0.0) + completion_tokens * prices.get("completion", 0.0)) / 1_000_000, "price table"
+    totals = _model_history(usage_history, model)
+    history_tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+    if history_tokens and totals["cost"]:
+        return totals["cost"] / history_tokens * (prompt_tokens + completion_tokens), "model history"
+    return None, "unknown"
+
+
+def build_plan(planned_requests: list, usage_history: dict | None = None, price_table: dict | None = None) -> list:
+    """One plan row per (scope, model) of the collected requests, in order of first appearance (see module docstring)."""
+    usage_history, price_table = usage_history or {}, price_table or {}
+    latency_model = get_latency_model()
+    concurrency = max(1, config_utils.MAX_CONCURRENT_API_CALLS)
+    rows = {}
+    for request in planned_requests:
+        call_args = request["call_args"]
+        row = rows.setdefault((request.get("scope"), request["model"]), {
+            "scope": request.get("scope"), "model": request["model"], "calls": 0, "prompt_tokens": 0,
+            "call_seconds": 0.0, "longest_call_seconds": 0.0
+        })
+        prompt_chars = len(call_args["prompt_text"]) + len(call_args.get("system_prompt_text") or "")
+        call_seconds = latency_model.estimate_call_seconds(request["model"], request.get("latency_group"), prompt_chars)
+        row["calls"] += 1
+        row["prompt_tokens"] += estimate_tokens(call_args["prompt_text"]) + estimate_tokens(call_args.get("system_prompt_text"))
+        row["call_seconds"] += call_seconds
+        row["longest_call_seconds"] = max(row["longest_call_seconds"], call_seconds)
+
+    for row in rows.values():
+        completion_tokens_per_call, row["completion_tokens_source"] = _completion_tokens_per_call(usage_history, row["scope"], row["model"])
+        row["completion_tokens"] = round(completion_tokens_per_call * row["calls"])
+        row["cost"], row["cost_source"] = _estimate_cost(price_table, usage_history, row["model"], row["prompt_tokens"], row["completion_tokens"])
+        row["wall_seconds"] = max(row["call_seconds"] / concurrency, row["longest_call_seconds"])
+    return list(rows.values())
+
+
+def plan_totals(plan: list) -> dict:
+    """Totals over all plan rows; the cost is None if any row's cost is unknown."""
+    costs = [row["cost"] for row in plan]
+    return {
+        "calls": sum(row["calls"] for row in plan),
+        "prompt_tokens": sum(row["prompt_tokens"] for row in plan),
+        "completion_tokens": sum(row["completion_tokens"] for row in plan),
+        "cost": sum(costs) if costs and None not in costs else None,
+        "wall_seconds": sum(row["wall_seconds"] for row in plan),
+    }
+
+
+def format_duration(seconds: float) -> str:
+    hours, remainder = divmod(round(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def format_plan_row(label: str, row: dict) -> str:
+    cost_text = f"${row['cost']:.4f}" if row["cost"] is not None else "cost unknown"
+    if row.get("cost_source") and row["cost"] is not None:
+        cost_text += f" ({row['cost_source']})"
+    return (f"  {label}: {row['calls']} call(s), ~{row['prompt_tokens']} prompt tokens, ~{row['completion_tokens']} completion tokens, "
+            f"{cost_text}, ~{format_duration(row['wall_seconds'])} wall time")
@@ -0,0 +1,75 @@
+"""
+Measures the startup time of the bias_analyzer.py command line.
+
+Each measurement runs a fresh interpreter (so nothing is cached in-process) and reports the median and minimum
+wall time over --repeats runs:
+  - the bare interpreter (`python -c pass`), the floor every command pays;
+  - `bias_analyzer.py --help`;
+  - for each experiment, parsing its command line and importing the runners it needs, i.e. everything main()
+    does before the first API call. "all" imports every runner, which is what every command used to cost.
+
+Usage: python startup_benchmark.py [--repeats 15] [--output startup_benchmark.jsonl]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_command(command, repeats):
+    """Runs `command` (from the repository directory) `repeats` times and returns its wall times in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return timings
+
+
+def startup_commands():
+    # Imported here so the benchmark itself does not count towards any measurement.
+    from bias_analyzer import EXPERIMENT_RUNNERS
+    commands = {
+        "python (baseline)": [sys.executable, "-c", "pass"],
+        "--help": [sys.executable, "bias_analyzer.py", "--help"],
+    }
+    for experiment in EXPERIMENT_RUNNERS:
+        commands[experiment] = [
+            sys.executable, "-c",
+            f"import bias_analyzer; bias_analyzer.build_arg_parser().parse_args([{experiment!r}]); bias_analyzer.import_experiment_runners({experiment!r})"
+        ]
+    return commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bias_analyzer.py startup time.")
+    parser.add_argument("--repeats", type=int, default=15, help="Runs per command.")
+    parser.add_argument("--output", type=str, default=None, help="Append the measurements to this JSONL file.")
+    args = parser.parse_args()
+
+    run_timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+    records = []
+    print(f"{'command':<30} {'median ms':>10} {'min ms':>10}")
+    for label, command in startup_commands().items():
+        timings = time_command(command, args.repeats)
+        record = {"timestamp": run_timestamp, "command": label, "repeats": args.repeats,
+                  "median_ms": round(statistics.median(timings), 1), "min_ms": round(min(timings), 1)}
+        records.append(record)
+        print(f"{label:<30} {record['median_ms']:>10.1f} {record['min_ms']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'a') as output_file:
+            for record in records:
+                output_file.write(json.dumps(record) + "\n")
+        print(f"Measurements appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
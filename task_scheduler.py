@@ -0,0 +1,169 @@
+"""
+Longest-expected-first task ordering.
+
+The runners build their whole task matrix before submitting it to their pool (one task: an order run, an
+item-variant, an Elo match repetition, ...). Submitted in dataset order, the slow tasks - Chain-of-Thought and
+Justification-First Elo variants, detailed rubrics, high-repetition tasks - often start last and set the
+makespan. `longest_first` reorders a matrix so the tasks with the longest expected duration are dispatched
+first; `estimate_task_seconds` is a task's number of calls times the expected latency of one of its calls.
+
+Expected latencies come from a LatencyModel of earlier live calls. config_utils reports every successful live
+call (model, prompt length, seconds, and the latency group it was submitted under, see config_utils.latency_group)
+to the active model. Groups are "<experiment>/<variant>", so a variant's output length (reasoning, justifications)
+is learned from its history rather than guessed from its prompt. With a path (`--latency_model` in
+bias_analyzer.py) observations are appended to a JSONL file and later runs start from them. One call is estimated as:
+
+  - the group's mean latency, adjusted to the prompt's length with the model's seconds-per-character slope,
+    once the group has MIN_GROUP_OBSERVATIONS observations;
+  - otherwise the model's least-squares fit of latency on prompt length (MIN_FIT_OBSERVATIONS observations);
+  - otherwise DEFAULT_CALL_SECONDS plus DEFAULT_SECONDS_PER_PROMPT_CHAR per prompt character.
+
+Only the dispatch order changes; results are assembled as before. makespan_benchmark.py compares the makespan
+of longest-first and submission order.
+"""
+
+import os
+import json
+import threading
+from collections import deque
+
+import config_utils
+
+TASK_ORDERS = ("longest_first", "submission")
+DEFAULT_CALL_SECONDS = 2.0
+DEFAULT_SECONDS_PER_PROMPT_CHAR = 0.0002
+MIN_GROUP_OBSERVATIONS = 3
+MIN_FIT_OBSERVATIONS = 10
+MAX_OBSERVATIONS_PER_GROUP = 500  # Only the most recent ones count, so estimates follow provider latency drift
+
+TASK_ORDER = "longest_first"
+
+
+class LatencyModel:
+    """Thread-safe per-(model, group) latency observations, optionally backed by an append-only JSONL file."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._observations = {}  # (model, group) -> deque of (prompt_chars, seconds)
+        self._sums = {}          # (model, group) -> [count, sum chars, sum seconds, sum chars^2, sum chars*seconds]
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str):
+        with open(path, 'r') as model_file:
+            for line_number, line in enumerate(model_file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    self._add(record["model"], record["group"], record["prompt_chars"], record["seconds"])
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    print(f"Warning: Skipping malformed line {line_number} in latency model {path}.")
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(observations) for observations in self._observations.values())
+
+    def _add(self, model: str, group: str | None, prompt_chars: int, seconds: float):
+        key = (model, group)
+        observations = self._observations.setdefault(key, deque())
+        sums = self._sums.setdefault(key, [0, 0.0, 0.0, 0.0, 0.0])
+        if len(observations) == MAX_OBSERVATIONS_PER_GROUP:
+            evicted_chars, evicted_seconds = observations.popleft()
+            self._update_sums(sums, evicted_chars, evicted_seconds, -1)
+        observations.append((prompt_chars, seconds))
+        self._update_sums(sums, prompt_chars, seconds, 1)
+
+    @staticmethod
+    def _update_sums(sums: list, prompt_chars: int, seconds: float, sign: int):
+        sums[0] += sign
+        sums[1] += sign * prompt_chars
+        sums[2] += sign * seconds
+        sums[3] += sign * prompt_chars * prompt_chars
+        sums[4] += sign * prompt_chars * seconds
+
+    def observe(self, model: str, group: str | None, prompt_chars: int, seconds: float):
+        """Records one live call (config_utils' latency observer); appended to the file if the model has one."""
+        with self._lock:
+            self._add(model, group, prompt_chars, seconds)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, 'a') as model_file:
+                    model_file.write(json.dumps({"model": model, "group": group, "prompt_chars": prompt_chars, "seconds": round(seconds, 4)}) + "\n")
+
+    def _model_fit(self, model: str):
+        """(intercept, slope) of the model's latency on prompt length over all its groups, or None without enough data."""
+        count = chars = seconds = chars_sq = chars_seconds = 0
+        for (sums_model, _), sums in self._sums.items():
+            if sums_model == model:
+                count += sums[0]; chars += sums[1]; seconds += sums[2]; chars_sq += sums[3]; chars_seconds += sums[4]
+        if count < MIN_FIT_OBSERVATIONS:
+            return None
+        variance = chars_sq - chars * chars / count
+        if variance <= 0:
+            return seconds / count, 0.0
+        slope = max((chars_seconds - chars * seconds / count) / variance, 0.0) # Longer prompts never make calls faster
+        return (seconds - slope * chars) / count, slope
+
+    def estimate_call_seconds(self, model: str, group: str | None, prompt_chars: int) -> float:
+        """Expected latency of one call (see module docstring)."""
+        with self._lock:
+            fit = self._model_fit(model)
+            group_sums = self._sums.get((model, group))
+            if group_sums and group_sums[0] >= MIN_GROUP_OBSERVATIONS:
+                group_mean_chars, group_mean_seconds = group_sums[1] / group_sums[0], group_sums[2] / group_sums[0]
+                slope = fit[1] if fit else 0.0
+                return max(group_mean_seconds + slope * (prompt_chars - group_mean_chars), 0.0)
+            if fit:
+                return max(fit[0] + fit[1] * prompt_chars, 0.0)
+        return DEFAULT_CALL_SECONDS + DEFAULT_SECONDS_PER_PROMPT_CHAR * prompt_chars
+
+    def summary(self) -> dict:
+        """{model: {group: {"observations", "mean_seconds", "mean_prompt_chars"}}}"""
+        with self._lock:
+            report = {}
+            for (model, group), sums in self._sums.items():
+                if sums[0]:
+                    report.setdefault(model, {})[group] = {
+                        "observations": sums[0], "mean_seconds": sums[2] / sums[0], "mean_prompt_chars": sums[1] / sums[0]
+                    }
+            return report
+
+
+_latency_model = LatencyModel()
+
+def set_latency_model(path: str | None = None) -> LatencyModel:
+    """Loads the latency model at `path` (in-memory without one) and records every live call into it from now on."""
+    global _latency_model
+    _latency_model = LatencyModel(path)
+    config_utils.set_latency_observer(_latency_model.observe)
+    return _latency_model
+
+def get_latency_model() -> LatencyModel:
+    return _latency_model
+
+def set_task_order(task_order: str):
+    global TASK_ORDER
+    if task_order not in TASK_ORDERS:
+        raise ValueError(f"Unknown task order '{task_order}'. Expected one of {TASK_ORDERS}.")
+    TASK_ORDER = task_order
+
+def task_group(experiment: str, variant: str) -> str:
+    """The latency group of an experiment variant's tasks."""
+    return f"{experiment}/{variant}"
+
+def estimate_task_seconds(group: str, prompt_chars: int, calls: int = 1, model_name: str | None = None) -> float:
+    """Expected duration of a task making `calls` sequential calls with a prompt of `prompt_chars` characters."""
+    model_name = model_name or config_utils.BIAS_SUITE_LLM_MODEL
+    return max(calls, 1) * _latency_model.estimate_call_seconds(model_name, group, prompt_chars)
+
+def longest_first(tasks: list, estimate) -> list:
+    """
+    `tasks` in dispatch order: the longest `estimate(task)` first, equal estimates in their original order.
+    With the "submission" task order, `tasks` in their original order.
+    """
+    if TASK_ORDER != "longest_first":
+        return list(tasks)
+    estimates = [estimate(task) for task in tasks]
+    return [tasks[index] for index in sorted(range(len(tasks)), key=lambda index: -estimates[index])]
@@ -16,10 +16,20 @@ export interface PermutedOrderCriterionComparison {
                                                            // e.g., "OrderOriginal_Arg": { avg: 4.5, std: 0.5, n_scores: 2, total_reps: 2 }
 }
 
+// Present only for Latin-square / Williams runs (more than two criteria orders)
+export interface CriterionPositionalEffect {
+  mean_score_by_position: (number | null)[]; // Index = 0-based position of the criterion in the prompt
+  deviation_by_position: (number | null)[]; // mean_score_by_position minus the criterion's mean over all positions
+  n_scores_by_position: number[];
+  primacy_effect: number | null; // Deviation at the first position
+  recency_effect: number | null; // Deviation at the last position
+}
+
 export interface PermutedOrderItemSummary {
   item_id: string;
   item_title: string;
   order_comparison_results: PermutedOrderCriterionComparison[];
+  positional_effects?: Record<string, CriterionPositionalEffect>; // Key is criterion name
 }
 
 export type PermutedOrderExperimentData = PermutedOrderItemSummary[];